@@ -5,6 +5,7 @@ import sys
 import threading
 import random
 import time
+import weakref
 from base64 import b64decode, b64encode
 from typing import Optional
 
@@ -31,6 +32,248 @@ def setup_etcd_store(self, rdzv_version):
     return EtcdStore(etcd_client=self.client, etcd_store_prefix=store_path)
 
 
+class Etcd3LeaseHold(object):
+    """
+    持有一个共享租约，直到cancel。
+    Keeps a shared lease of an :py:class:`Etcd3LeaseManager` alive until
+    cancelled.
+    """
+
+    def __init__(self, manager, shared):
+        self._manager = manager
+        self._shared = shared
+        self._cancelled = False
+
+    @property
+    def lease(self):
+        return self._shared.lease
+
+    def cancel(self):
+        """
+        停止为此持有者续约。最后一个持有者cancel后，租约及其key在TTL后过期。
+        Stops keeping the lease alive for this holder. Once the last holder is
+        gone, the lease and its keys expire after its TTL. Can be called more
+        than once.
+        """
+        self._manager._release(self)
+
+
+class _SharedLease(object):
+    def __init__(self, lease, ttl):
+        self.lease = lease
+        self.ttl = ttl
+        self.holders = 0
+        # 下次续约的时间，以及租约到期的时间（monotonic）。
+        # The monotonic times of the next keep-alive and of the expiry.
+        self.due = time.monotonic() + ttl / 2
+        self.expires = time.monotonic() + ttl
+
+
+class Etcd3LeaseManager(object):
+    """
+    每个TTL只使用一个原生v3租约，由同一个线程为进程内所有key续约。
+    Shares one native etcd v3 lease per TTL among all the keys of a process
+    that use that TTL, and keeps the leases alive from a single thread. In v3
+    a key is attached to a lease instead of having a TTL of its own, so one
+    keep-alive renews any number of keys, unlike the per-key refreshes of v2.
+
+    A key created by another process stays on the lease of that process;
+    holding it by its id keeps it alive along with the shared leases, the
+    way every process refreshed the same v2 key.
+
+    The leases due within ``_BATCH_WINDOW`` of each other are kept alive in
+    the same wake-up of the thread, which only runs while the leases are
+    held. Use :py:func:`get_etcd3_lease_manager` to get the manager of a
+    client.
+    """
+
+    # 在第一个租约之后这么多秒内到期的租约一并续约。
+    # Leases due within this many seconds of the first one are kept alive
+    # along with it.
+    _BATCH_WINDOW = 1.0
+
+    # 出错后重试续约前等待的时间。
+    # How long to wait before keeping a lease alive again after an error.
+    _RETRY_DELAY = 1.0
+
+    def __init__(self, client):
+        self._client_ref = weakref.ref(client)
+
+        self._cond = threading.Condition()
+
+        # ttl -> _SharedLease
+        self._leases = {}
+
+        # 其他进程授予的租约：lease_id -> _SharedLease
+        # The leases granted by other processes: lease_id -> _SharedLease
+        self._foreign_leases = {}
+
+        self._thread = None
+
+    def get_lease(self, ttl):
+        """
+        返回该TTL的共享租约；如果没有，或者它可能在TTL的一半之内过期，则授予一个新的。
+        Returns the shared lease of ``ttl``, granting a new one if there is
+        none, or if the current one is not held and may expire within half of
+        its TTL. A key put with it and never kept alive expires like a v2 key
+        written with a TTL.
+        """
+        with self._cond:
+            return self._get_shared(ttl).lease
+
+    def hold(self, ttl, lease_id=None):
+        """
+        开始为共享租约续约，直到返回的持有者被cancel；若给出lease_id，则为该租约续约。
+        Starts keeping the shared lease of ``ttl`` alive until the returned
+        :py:class:`Etcd3LeaseHold` is cancelled. If ``lease_id`` is given and
+        is not the shared lease, keeps the lease of that id alive instead,
+        e.g. the lease another process has created a key with.
+        """
+        with self._cond:
+            shared = self._leases.get(ttl)
+
+            if lease_id and (shared is None or lease_id != shared.lease.id):
+                shared = self._foreign_leases.get(lease_id)
+                if shared is None:
+                    lease = etcd.Lease(lease_id, ttl, etcd_client=self._client_ref())
+
+                    shared = self._foreign_leases[lease_id] = _SharedLease(lease, ttl)
+            else:
+                shared = self._get_shared(ttl)
+
+            shared.holders += 1
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="Etcd3LeaseManager", daemon=True
+                )
+                self._thread.start()
+
+            self._cond.notify_all()
+
+            return Etcd3LeaseHold(self, shared)
+
+    def _release(self, hold):
+        with self._cond:
+            if hold._cancelled:
+                return
+
+            hold._cancelled = True
+
+            hold._shared.holders -= 1
+
+            if hold._shared.holders == 0:
+                self._forget_foreign(hold._shared)
+
+            self._cond.notify_all()
+
+    #
+    # 调用时必须持有锁。
+    # Must be called with the lock held.
+    #
+    def _get_shared(self, ttl):
+        shared = self._leases.get(ttl)
+        if shared is None or (
+            shared.holders == 0 and shared.expires < time.monotonic() + ttl / 2
+        ):
+            client = self._client_ref()
+
+            shared = self._leases[ttl] = _SharedLease(client.lease(ttl), ttl)
+
+        return shared
+
+    def _forget_foreign(self, shared):
+        if self._foreign_leases.get(shared.lease.id) is shared:
+            del self._foreign_leases[shared.lease.id]
+
+    def _next_batch(self):
+        while True:
+            held = [
+                shared
+                for leases in (self._leases, self._foreign_leases)
+                for shared in leases.values()
+                if shared.holders > 0
+            ]
+            if not held:
+                return None
+
+            now = time.monotonic()
+
+            due = min(shared.due for shared in held)
+            if due <= now:
+                break
+
+            self._cond.wait(due - now)
+
+        return [shared for shared in held if shared.due <= now + self._BATCH_WINDOW]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                if batch is None:
+                    self._thread = None
+                    return
+
+            client = self._client_ref()
+            if client is None:
+                with self._cond:
+                    self._leases.clear()
+                    self._foreign_leases.clear()
+                    self._thread = None
+                return
+
+            for shared in batch:
+                try:
+                    responses = list(client.refresh_lease(shared.lease.id))
+                except etcd.exceptions.Etcd3Exception as exc:
+                    log.warning(
+                        f"The lease {shared.lease.id} could not be kept alive due to an error "
+                        f"of type {type(exc).__name__}; retrying."
+                    )
+
+                    with self._cond:
+                        shared.due = time.monotonic() + self._RETRY_DELAY
+                    continue
+
+                remaining = responses[0].TTL if responses else 0
+
+                with self._cond:
+                    now = time.monotonic()
+
+                    if remaining <= 0:
+                        # 租约已经过期，它的key也已被删除；下次get_lease会授予新的租约。
+                        # The lease has expired along with its keys; the next
+                        # get_lease grants a new one.
+                        shared.holders = 0
+                        if self._leases.get(shared.ttl) is shared:
+                            del self._leases[shared.ttl]
+                        self._forget_foreign(shared)
+                    else:
+                        shared.due = now + shared.ttl / 2
+                        shared.expires = now + remaining
+
+            del client
+
+
+_lease_managers = weakref.WeakKeyDictionary()
+_lease_managers_lock = threading.Lock()
+
+
+def get_etcd3_lease_manager(client):
+    """
+    返回client的租约管理器，首次使用时创建。
+    Returns the lease manager of ``client``, creating it on first use, so that
+    all rendezvous sharing a client share its leases and keep-alive thread.
+    """
+    with _lease_managers_lock:
+        manager = _lease_managers.get(client)
+        if manager is None:
+            manager = _lease_managers[client] = Etcd3LeaseManager(client)
+
+    return manager
+
+
 class EtcdRendezvous(object):
     """
     一个使用`etcd`作为后端存储的rendezvous实现。
@@ -46,10 +289,10 @@ class EtcdRendezvous(object):
         self._prefix = prefix
         self._run_id = run_id
 
-        # 用于清除TTL刷新线程(用于临时keys)
-        # For cleaning up TTL refresher threads (for ephemeral keys)
-        self._lease_run_id_stop = None
-        self._lease_this_rank_stop = None
+        # 临时key的租约，cancel后停止续约
+        # The leases on the ephemeral keys, cancelled to stop renewing them
+        self._lease_run_id = None
+        self._lease_this_rank = None
 
         if not self._prefix.endswith("/"):
             self._prefix += "/"
@@ -57,6 +300,8 @@ class EtcdRendezvous(object):
         self.client = etcd.client(host=endpoints)
         log.info("Etcd machines: " + str(self.client.machines))
 
+        self._leases = get_etcd3_lease_manager(self.client)
+
         # 如果不存在，则设置一个永久前缀dir
         if self._prefix != "/":
             self.create_path_if_not_exists(self._prefix)
@@ -65,7 +310,7 @@ class EtcdRendezvous(object):
         # 租用特定于此job实例的“sub-root”节点(run_id)
         # Lease a "sub-root" node specific to this job instance (run_id)
         self.create_path_if_not_exists(self.get_path(""), ttl=CONST_RUNID_SUBROOT_TTL)
-        self._lease_run_id_stop = self.setup_lease_renewal(
+        self._lease_run_id = self.setup_lease_renewal(
             self.get_path(""), ttl=CONST_RUNID_SUBROOT_TTL
         )
 
@@ -81,11 +326,11 @@ class EtcdRendezvous(object):
             pass
 
     def __del__(self):
-        if self._lease_run_id_stop is not None:
-            self._lease_run_id_stop.set()
+        if self._lease_run_id is not None:
+            self._lease_run_id.cancel()
 
-        if self._lease_this_rank_stop is not None:
-            self._lease_this_rank_stop.set()
+        if self._lease_this_rank is not None:
+            self._lease_this_rank.cancel()
 
     def get_path(self, path):
         if not path.startswith("/"):
@@ -101,40 +346,33 @@ class EtcdRendezvous(object):
 
 
     def create_path_if_not_exists(self, full_path, ttl=None):
-        try:
-            self.client.put(
-                key=full_path, value=None, dir=True, prevExist=False, ttl=ttl
-            )
-        except etcd.EtcdAlreadyExist:
-            pass
-
-    def setup_lease_renewal(self, full_path, ttl):
-        # 注意:要使临时密钥TTL更新(~lease)正确工作，请确保您没有调用任何没有释放Python的GIL的长阻塞方法!
-        # 这方面的一个例子是调用一个阻塞/长时间运行的pybind11扩展函数，但没有执行GIL的作用域发布。
-        # NOTE: For ephemeral key TTL renewal (~lease) to work correctly,
-        # make sure you don't call any long-blocking methods that do not
-        # release the Python's GIL! An example of this is calling a pybind11
-        # extension function that is blocking / long-running, but is not
-        # doing a scoped release of the GIL.
-        def lease_worker(client, path, ttl, stop_event):
-            while True:
-                try:
-                    client.refresh(path, ttl=ttl)
-                except etcd.EtcdKeyNotFound:
-                    break
-
-                if stop_event.wait(timeout=ttl / 2):
-                    break
-
-        lease_stop_event = threading.Event()
-        lease_thread = threading.Thread(
-            target=lease_worker, args=(self.client, full_path, ttl, lease_stop_event)
+        # v3中没有目录，key也没有自己的TTL：仅当key不存在时创建它，并挂在该TTL的共享租约上。
+        # v3 has no directories and no per-key TTL: create the key only if it
+        # does not exist, attached to the shared lease of the TTL.
+        lease = None if ttl is None else self._leases.get_lease(ttl)
+
+        self.client.transaction(
+            compare=[self.client.transactions.create(full_path) == 0],
+            success=[self.client.transactions.put(full_path, "", lease)],
+            failure=[],
         )
 
-        lease_thread.daemon = True
-        lease_thread.start()
-
-        return lease_stop_event
+    def setup_lease_renewal(self, full_path, ttl):
+        # 所有共享client的rendezvous的同TTL的key共用一个原生租约和一个续约线程，见Etcd3LeaseManager。
+        # The keys of the same TTL of all rendezvous sharing the client share
+        # one native lease and one keep-alive thread; see Etcd3LeaseManager.
+        #
+        # 该key可能是由另一个进程用它自己的租约创建的；为该租约续约，而不是把key挂到本进程的租约上，
+        # 否则key会在最后写入它的进程退出时过期。
+        # The key may have been created by another process with a lease of
+        # its own. Keep that lease alive rather than moving the key to the
+        # lease of this process, which would make the key expire once the
+        # process that wrote it last is gone.
+        self.create_path_if_not_exists(full_path, ttl=ttl)
+
+        value, meta = self.client.get(full_path)
+
+        return self._leases.hold(ttl, meta.lease_id if value is not None else None)
 
     def setup_kv_store(self, rdzv_version):
         store_path = self.get_path(f"/rdzv/v_{rdzv_version}/kv")
@@ -149,11 +387,27 @@ class EtcdStore():
     instance. This is the store object returned by ``EtcdRendezvous``
     """
 
+    # etcd服务端对一个事务中操作数的默认上限（--max-txn-ops）。
+    # The default limit of etcd on the operations of a transaction (--max-txn-ops).
+    _MAX_TXN_OPS = 128
+
+    # 缓存的已编码键的最大数量，见_get_key。
+    # The maximum number of encoded keys kept, see _get_key.
+    _KEY_CACHE_SIZE = 4096
+
+    # add在比较失败后随机退避时间的基数和上限（秒），退避上限随连续失败次数翻倍。
+    # The base and the cap, in seconds, of the jittered backoff of add after
+    # a failed comparison; the bound doubles with each consecutive failure.
+    _ADD_BACKOFF_BASE = 0.001
+    _ADD_BACKOFF_CAP = 0.01
+
     def __init__(
         self,
         etcd_client,
         etcd_store_prefix,
         timeout: Optional[datetime.timedelta] = None,
+        counter_shard: Optional[str] = None,
+        encoding: str = "base64",
     ):
 
         self.client = etcd_client
@@ -164,14 +418,40 @@ class EtcdStore():
         if not self.prefix.endswith("/"):
             self.prefix += "/"
 
+        # 键和值的编码。"base64"与v2的EtcdStore相同；"raw"直接存储字节，
+        # 只对键中的'%'和'/'进行转义，这样一个键永远不会是另一个键的前缀目录。
+        # The encoding of the keys and values. "base64" is the one of the v2
+        # EtcdStore; "raw" stores the bytes as they are and only escapes '%'
+        # and '/' in keys, so that no key is a directory prefix of another.
+        if encoding not in ("base64", "raw"):
+            raise ValueError(f"The encoding must be 'base64' or 'raw', not '{encoding}'")
+        self.encoding = encoding
+
+        self._prefix_bytes = self.prefix.encode()
+
+        # 键 -> 带前缀的已编码键，用于重复的wait和get。
+        # key -> encoded key with the prefix, for repeated waits and gets.
+        self._key_cache = {}
+
+        # 分片计数器模式：每个store只增加自己的槽，读者对所有槽求和，见add。
+        # 每个共享计数器的store必须使用不同的分片名（例如rank）。
+        # Sharded counter mode: each store increments only its own slot and
+        # readers sum the slots, see add. The stores sharing a counter must
+        # use distinct shard names, e.g. their ranks.
+        self.counter_shard = counter_shard
+
+        # 本store写入的各个槽的(value, mod revision)。
+        # The (value, mod revision) of the slots written by this store.
+        self._counter_slots = {}
+
     def set(self, key, value, lease=None):
         """
         在 EtcdStore 中写入一个键/值对。键和值可以是 str 或者是 bytes。
         """
         if lease is None:
-            self.client.put(key=self.prefix + self._encode(key), value=self._encode(value))
+            self.client.put(key=self._get_key(key), value=self._encode_value(value))
         else:
-            self.client.put(key=self.prefix + self._encode(key), value=self._encode(value), lease=lease)
+            self.client.put(key=self._get_key(key), value=self._encode_value(value), lease=lease)
 
     def get(self, key) -> bytes:
         """
@@ -181,35 +461,195 @@ class EtcdStore():
         Raises:
             LookupError - If key still not published after timeout
         """
-        b64_key = self.prefix + self._encode(key)
-        kvs = self._try_wait_get([b64_key])
+        etcd_key = self._get_key(key)
+        kvs = self._try_wait_get([etcd_key])
 
         if kvs is None:
             raise LookupError(f"Key {key} not found in EtcdStore")
 
-        return self._decode(kvs[b64_key])
+        return self._decode_value(kvs[etcd_key])
+
+    def multi_set(self, keys, values, lease=None):
+        """
+        在一个etcd v3事务中写入多个键/值对（键数超过事务的操作数上限时分为多个事务）。
+        Writes several key/value pairs in one etcd v3 transaction (several if
+        there are more keys than the operation limit of a transaction).
+        """
+        if len(keys) != len(values):
+            raise ValueError("The number of keys and values must be equal")
+
+        ops = [
+            self.client.transactions.put(
+                self._get_key(key), self._encode_value(value), lease=lease
+            )
+            for key, value in zip(keys, values)
+        ]
+
+        for i in range(0, len(ops), self._MAX_TXN_OPS):
+            self.client.transaction(compare=[], success=ops[i : i + self._MAX_TXN_OPS], failure=[])
+
+    def multi_get(self, keys, override_timeout: Optional[datetime.timedelta] = None):
+        """
+        在一个etcd v3事务中读取多个键，返回与``keys``顺序相同的值；如果有键还没有发布，
+        则等待它发布，最长等待到超时。
+        Reads several keys in one etcd v3 transaction and returns their values
+        in the order of ``keys``; if some are not published yet, waits for
+        them until timeout.
+        Raises:
+            LookupError - If the keys are still not published after timeout
+        """
+        etcd_keys = [self._get_key(key) for key in keys]
+        kvs = self._try_wait_get(etcd_keys, override_timeout)
+
+        if kvs is None:
+            raise LookupError("Timeout while waiting for keys in EtcdStore")
+
+        return [self._decode_value(kvs[k]) for k in etcd_keys]
+
+    def add(self, key, num: int) -> int:
+        """
+        原子地将一个值增加一个整数量。整数以10进制字符串表示。如果键不存在，则假定默认值为0。
+        每次尝试是一个比较mod revision的事务，失败时事务同时返回当前值，因此重试不需要额外的读取；
+        重试前随机退避，以免竞争的store同时重试。许多store同时增加同一个计数器时（例如屏障），
+        应使用分片计数器模式（counter_shard），它不会发生冲突。
+        Atomically increments a value by an integer amount, assuming ``0`` if
+        the key is not present. Each attempt is one transaction comparing the
+        mod revision of the key; a failed one also returns the current value,
+        so a retry needs no other read. It backs off for a jittered delay
+        first, so that the contending stores do not retry in lockstep. For a
+        counter that many stores increment at once, e.g. the one of a
+        barrier, use the sharded counter mode (``counter_shard``), which does
+        not contend at all.
+        Returns:
+            the new (incremented) value
+        """
+        if self.counter_shard is not None:
+            return self._add_sharded(key, num)
+
+        etcd_key = self._get_key(key)
+
+        txn = self.client.transactions
+
+        # 先假定键不存在（version为0），与v2实现的prevExist=False一样。
+        # Assume first that the key does not exist (version 0), like the
+        # prevExist=False write of the v2 store.
+        kv = None
+        failures = 0
+        while True:
+            if kv is None:
+                compare = txn.version(etcd_key) == 0
+                new_value = num
+            else:
+                compare = txn.mod(etcd_key) == kv[1].mod_revision
+                new_value = int(self._decode_value(kv[0])) + num
+
+            succeeded, responses = self.client.transaction(
+                compare=[compare],
+                success=[txn.put(etcd_key, self._encode_value(str(new_value)))],
+                failure=[txn.get(etcd_key)],
+            )
+            if succeeded:
+                return new_value
+
+            kv = responses[0][0] if responses[0] else None
+
+            # 第一次失败后立即用返回的值重试；再次失败说明竞争激烈，随机退避。
+            # Retry right away with the returned value after the first failure;
+            # another one means heavy contention, so back off.
+            if failures > 0:
+                time.sleep(
+                    random.uniform(
+                        0, min(self._ADD_BACKOFF_CAP, self._ADD_BACKOFF_BASE * 2 ** failures)
+                    )
+                )
+            failures += 1
+
+    # 在分片计数器模式下，一次事务写入本store的槽并读取所有槽；事务是原子的，
+    # 所以返回的和就是这次增加后计数器的值。只有本store写自己的槽，所以比较不会失败，
+    # 除非分片名被其他store重复使用，此时用返回的槽重试。
+    # 计数器的值只能通过add(key, 0)读取。
+    # base64编码的键可能包含'/'（例如b"abc\xfc"编码为"YWJj/A=="），所以槽的前缀中的键
+    # 像"raw"编码一样转义，一个计数器的槽前缀就不会是另一个计数器的槽的前缀。
+    # In sharded counter mode one transaction writes the slot of this store
+    # and reads all the slots; being atomic, the returned sum is the value of
+    # the counter right after this increment. Only this store writes its
+    # slot, so the comparison fails only if another store reuses the shard
+    # name, in which case it retries with the returned slot. The value of the
+    # counter can only be read with add(key, 0).
+    # A base64 encoded key may contain '/', e.g. b"abc\xfc" encodes to
+    # "YWJj/A==", so the key in the prefix of the slots is escaped as with the
+    # "raw" encoding; the slots prefix of one counter is then never a prefix
+    # of the slots of another.
+    def _add_sharded(self, key, num: int) -> int:
+        encoded_key = self._encode_key(key)
+        if self.encoding == "base64":
+            encoded_key = self._escape_key(encoded_key)
+
+        slots_prefix = self._prefix_bytes + encoded_key + b"/"
+        slot_key = slots_prefix + self._encode_key(self.counter_shard)
+
+        txn = self.client.transactions
+
+        slots_range_end = etcd.utils.increment_last_byte(slots_prefix)
+
+        while True:
+            slot = self._counter_slots.get(slot_key)
+            if slot is None:
+                compare = txn.version(slot_key) == 0
+                new_value = num
+            else:
+                compare = txn.mod(slot_key) == slot[1]
+                new_value = slot[0] + num
+
+            succeeded, responses = self.client.transaction(
+                compare=[compare],
+                success=[
+                    txn.put(slot_key, self._encode_value(str(new_value))),
+                    txn.get(slots_prefix, slots_range_end),
+                ],
+                failure=[txn.get(slot_key)],
+            )
+
+            if not succeeded:
+                if responses[0]:
+                    value, metadata = responses[0][0]
+                    self._counter_slots[slot_key] = (
+                        int(self._decode_value(value)),
+                        metadata.mod_revision,
+                    )
+                else:
+                    self._counter_slots.pop(slot_key, None)
+                continue
+
+            total = 0
+            for value, metadata in responses[1]:
+                total += int(self._decode_value(value))
+                if metadata.key == slot_key:
+                    self._counter_slots[slot_key] = (new_value, metadata.mod_revision)
+
+            return total
 
     def delete(self, key):
         """
             删除键
         """
-        self.client.put(key=self.prefix + self._encode(key))
+        self.client.put(key=self._get_key(key))
 
     def lease(self, ttl, lease_id):
         return self.client.lease(ttl=ttl, lease_id=lease_id)
 
     def watch(self, key):
-        return self.client.watch(key=self.prefix + self._encode(key))
+        return self.client.watch(key=self._get_key(key))
 
     def watch_prefix(self, key):
-        return self.client.watch_prefix(key=self.prefix + self._encode(key))
+        return self.client.watch_prefix(key=self._get_key(key))
 
     def wait(self, keys, override_timeout: Optional[datetime.timedelta] = None):
         """
         等待所有键发布，直到超时。
         """
-        b64_keys = [self.prefix + self._encode(key) for key in keys]
-        kvs = self._try_wait_get(b64_keys, override_timeout)
+        etcd_keys = [self._get_key(key) for key in keys]
+        kvs = self._try_wait_get(etcd_keys, override_timeout)
         if kvs is None:
             raise LookupError("Timeout while waiting for keys in EtcdStore")
         # No return value on success
@@ -230,43 +670,107 @@ class EtcdStore():
             return b64decode(value.encode())
         raise ValueError("Value must be of type str or bytes")
 
-    # 一次获取所有(base64编码的)etcd键，或者等待所有键被发布或发生超时。
+    # 带前缀的已编码键（bytes）。编码结果会被缓存，因为同一批键常常被反复等待。
+    # The encoded key (bytes) with the prefix. The result is cached, since the
+    # same keys are often waited for again and again.
+    def _get_key(self, key) -> bytes:
+        etcd_key = self._key_cache.get(key)
+        if etcd_key is None:
+            if len(self._key_cache) >= self._KEY_CACHE_SIZE:
+                self._key_cache.clear()
+
+            etcd_key = self._prefix_bytes + self._encode_key(key)
+
+            self._key_cache[key] = etcd_key
+
+        return etcd_key
+
+    # 按store的编码方式编码一个键（不带前缀）。
+    # Encodes a key (without the prefix) in the encoding of the store.
+    def _encode_key(self, key) -> bytes:
+        if self.encoding == "base64":
+            return self._encode(key).encode()
+
+        if type(key) == str:
+            key = key.encode()
+        elif type(key) != bytes:
+            raise ValueError("Value must be of type str or bytes")
+
+        return self._escape_key(key)
+
+    # 转义'%'和'/'，使转义后的键不含'/'。
+    # Escapes '%' and '/', so that the escaped key contains no '/'.
+    @staticmethod
+    def _escape_key(key: bytes) -> bytes:
+        return key.replace(b"%", b"%25").replace(b"/", b"%2F")
+
+    def _encode_value(self, value):
+        if self.encoding == "base64":
+            return self._encode(value)
+
+        if type(value) == str:
+            return value.encode()
+        elif type(value) == bytes:
+            return value
+        raise ValueError("Value must be of type str or bytes")
+
+    def _decode_value(self, value) -> bytes:
+        if self.encoding == "base64":
+            return self._decode(value)
+
+        if type(value) == str:
+            return value.encode()
+        return value
+
+    # 在一个或多个事务中获取所有(已编码的)etcd键，或者等待所有键被发布或发生超时。
     # 如果成功，将返回一个字典{etcd key -> etcd value}。超时返回None。
-    def _try_wait_get(self, b64_keys, override_timeout=None):
+    # Gets all the (encoded) etcd keys in one or more transactions, or waits
+    # until all of them are published or the timeout occurs. Returns a dict
+    # {etcd key -> etcd value} on success and None on timeout.
+    def _try_wait_get(self, etcd_keys, override_timeout=None):
         timeout = self.timeout if override_timeout is None else override_timeout
         deadline = time.time() + timeout.total_seconds()
 
+        values = {}
         while True:
-            # Read whole directory (of keys), filter only the ones waited for
-            all_nodes = self.client.get(key=self.prefix)
-            req_nodes = {
-                node.key: node.value
-                for node in all_nodes.children
-                if node.key in b64_keys
-            }
-
-            if len(req_nodes) == len(b64_keys):
-                # All keys are available
-                return req_nodes
+            missing = [k for k in etcd_keys if k not in values]
 
+            for i in range(0, len(missing), self._MAX_TXN_OPS):
+                chunk = missing[i : i + self._MAX_TXN_OPS]
+
+                _, responses = self.client.transaction(
+                    compare=[],
+                    success=[self.client.transactions.get(k) for k in chunk],
+                    failure=[],
+                )
+
+                for k, response in zip(chunk, responses):
+                    if response:
+                        values[k] = response[0][0]
+
+            missing = [k for k in etcd_keys if k not in values]
+            if not missing:
+                return values
+
+            # 只监视第一个缺失的键；从读取它时的revision开始监视，以免错过中间的写入。
+            # Watch only the first missing key, starting from the revision it
+            # was read at so that a write in between is not missed.
             watch_timeout = deadline - time.time()
             if watch_timeout <= 0:
                 return None
 
+            response = self.client.get_response(missing[0])
+            if response.kvs:
+                continue
+
             try:
-                self.client.watch(
-                    key=self.prefix,
-                    recursive=True,
+                self.client.watch_once(
+                    missing[0],
                     timeout=watch_timeout,
-                    index=all_nodes.etcd_index + 1,
+                    start_revision=response.header.revision + 1,
                 )
-            except etcd.EtcdWatchTimedOut:
-                if time.time() >= deadline:
-                    return None
-                else:
-                    continue
-            except etcd.EtcdEventIndexCleared:
-                continue
+            except etcd.exceptions.WatchTimedOut:
+                pass
 
 if __name__ == "__main__":
     logging.basicConfig(
@@ -11,7 +11,6 @@ import json
 import logging
 import random
 import sys
-import threading
 import time
 from base64 import b64decode, b64encode
 from typing import Optional
@@ -24,6 +23,7 @@ from torchelastic.rendezvous import (
     RendezvousNonRetryableError,
     RendezvousTimeoutException,
 )
+from torchelastic.rendezvous.etcd_lease import get_etcd_lease_manager
 
 
 _log_fmt = logging.Formatter("%(levelname)s %(asctime)s %(message)s")
@@ -233,10 +233,10 @@ class EtcdRendezvous(object):
         self._timeout = timeout
         self._last_call_timeout = last_call_timeout
 
-        # 用于清除TTL刷新线程(用于临时keys)
-        # For cleaning up TTL refresher threads (for ephemeral keys)
-        self._lease_run_id_stop = None
-        self._lease_this_rank_stop = None
+        # 临时key的租约，cancel后停止续约
+        # The leases on the ephemeral keys, cancelled to stop renewing them
+        self._lease_run_id = None
+        self._lease_this_rank = None
 
         if not self._prefix.endswith("/"):
             self._prefix += "/"
@@ -253,7 +253,7 @@ class EtcdRendezvous(object):
         # 租用特定于此job实例的“子根”节点(run_id)
         # Lease a "sub-root" node specific to this job instance (run_id)
         self.create_path_if_not_exists(self.get_path(""), ttl=CONST_RUNID_SUBROOT_TTL)
-        self._lease_run_id_stop = self.setup_lease_renewal(
+        self._lease_run_id = self.setup_lease_renewal(
             self.get_path(""), ttl=CONST_RUNID_SUBROOT_TTL
         )
 
@@ -271,11 +271,11 @@ class EtcdRendezvous(object):
 
     def __del__(self):
         # TODO: look into using weakref here instead.
-        if self._lease_run_id_stop is not None:
-            self._lease_run_id_stop.set()
+        if self._lease_run_id is not None:
+            self._lease_run_id.cancel()
 
-        if self._lease_this_rank_stop is not None:
-            self._lease_this_rank_stop.set()
+        if self._lease_this_rank is not None:
+            self._lease_this_rank.cancel()
 
     def rendezvous_barrier(self):
         """
@@ -306,12 +306,12 @@ class EtcdRendezvous(object):
                 # Dis-own our lease in the previous rendezvous, if exists
                 '''
                 def confirm_membership(self, expected_version, this_rank):
-                    self._lease_this_rank_stop = self.setup_lease_renewal(
+                    self._lease_this_rank = self.setup_lease_renewal(
                         this_lease_key, ttl=CONST_WORKER_KEEPALIVE_TTL
                     )
                 '''
-                if self._lease_this_rank_stop is not None:
-                    self._lease_this_rank_stop.set()
+                if self._lease_this_rank is not None:
+                    self._lease_this_rank.cancel()
 
                 return self.init_phase()
 
@@ -684,7 +684,7 @@ class EtcdRendezvous(object):
                     ttl=None if finalize else CONST_ETCD_FROZEN_TTL,
                 )
 
-                self._lease_this_rank_stop = self.setup_lease_renewal(
+                self._lease_this_rank = self.setup_lease_renewal(
                     this_lease_key, ttl=CONST_WORKER_KEEPALIVE_TTL
                 )
                 return active_version
@@ -970,32 +970,10 @@ class EtcdRendezvous(object):
             pass
 
     def setup_lease_renewal(self, full_path, ttl):
-        # 注意:要使临时密钥TTL更新(~lease)正确工作，请确保您没有调用任何没有释放Python的GIL的长阻塞方法!
-        # 这方面的一个例子是调用一个阻塞/长时间运行的pybind11扩展函数，但没有执行GIL的作用域发布。
-        # NOTE: For ephemeral key TTL renewal (~lease) to work correctly,
-        # make sure you don't call any long-blocking methods that do not
-        # release the Python's GIL! An example of this is calling a pybind11
-        # extension function that is blocking / long-running, but is not
-        # doing a scoped release of the GIL.
-        def lease_worker(client, path, ttl, stop_event):
-            while True:
-                try:
-                    client.refresh(path, ttl=ttl)
-                except etcd.EtcdKeyNotFound:
-                    break
-
-                if stop_event.wait(timeout=ttl / 2):
-                    break
-
-        lease_stop_event = threading.Event()
-        lease_thread = threading.Thread(
-            target=lease_worker, args=(self.client, full_path, ttl, lease_stop_event)
-        )
-
-        lease_thread.daemon = True
-        lease_thread.start()
-
-        return lease_stop_event
+        # 共享同一个client的所有handler的临时key由同一个线程续约，见EtcdLeaseManager。
+        # The keys of all handlers sharing the client are renewed by a single
+        # thread; see EtcdLeaseManager.
+        return get_etcd_lease_manager(self.client).lease(full_path, ttl)
 
     def store_extra_data(self, rdzv_version, key, value):
         node = self.get_path("/rdzv/v_{}/extra_data".format(rdzv_version))
@@ -5,7 +5,6 @@
 #
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
-import sys
 import abc
 import functools
 import json
@@ -16,6 +15,7 @@ import traceback
 import warnings
 from contextlib import closing
 from dataclasses import dataclass, field
+from datetime import timedelta
 from enum import Enum
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
@@ -25,6 +25,7 @@ from torch.distributed import Store
 from torch.distributed.elastic.events import Event, EventSource, record
 from torch.distributed.elastic.metrics import prof, put_metric
 from torch.distributed.elastic.multiprocessing import ProcessFailure, Std
+from torch.distributed.elastic.rendezvous.tracing import traced
 from torch.distributed.elastic.utils.logging import get_logger
 
 
@@ -385,6 +386,40 @@ def _get_fq_hostname() -> str:
     return socket.getfqdn(socket.gethostname())
 
 
+def _synchronize(
+    store,
+    data: bytes,
+    rank: int,
+    world_size: int,
+    key_prefix: str,
+    barrier_timeout: float = 300,
+) -> List[bytes]:
+    """
+    Same as ``store_util.synchronize``, but on stores that offer a
+    ``multi_get`` (the etcd stores) the data of all ranks is read with one
+    call instead of one ``get`` per rank.
+    """
+    multi_get = getattr(store, "multi_get", None)
+    if multi_get is None:
+        return store_util.synchronize(
+            store, data, rank, world_size, key_prefix, barrier_timeout
+        )
+
+    store.set_timeout(timedelta(seconds=barrier_timeout))
+    store.set(f"{key_prefix}{rank}", data)
+    return multi_get([f"{key_prefix}{idx}" for idx in range(world_size)])
+
+
+def _barrier(
+    store, rank: int, world_size: int, key_prefix: str, barrier_timeout: float = 300
+) -> None:
+    """
+    Same as ``store_util.barrier``, built on ``_synchronize``.
+    """
+    data = f"{rank}".encode(encoding="UTF-8")
+    _synchronize(store, data, rank, world_size, key_prefix, barrier_timeout)
+
+
 class ElasticAgent(abc.ABC):
     """
     Agent process responsible for managing one or more worker processes.
@@ -461,15 +496,12 @@ class SimpleElasticAgent(ElasticAgent):
         self._exit_barrier_timeout = exit_barrier_timeout
         self._total_execution_time = 0
 
+    @traced
     def get_worker_group(self, role: str = DEFAULT_ROLE) -> WorkerGroup:
-        log.debug(f" =====> agent.sever.api 当前函数名：get_worker_group")
         return self._worker_group
 
     @abc.abstractmethod
     def _start_workers(self, worker_group: WorkerGroup) -> Dict[int, Any]:
-        print(f" =====> agent.sever.api 当前函数名：_start_workers")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         r"""
         Starts ``worker_group.spec.local_world_size`` number of workers
         according to worker spec for the worker group .
@@ -480,9 +512,6 @@ class SimpleElasticAgent(ElasticAgent):
 
     @abc.abstractmethod
     def _stop_workers(self, worker_group: WorkerGroup) -> None:
-        log.debug(f" =====> agent.sever.api 当前函数名：stop_workers")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         r"""
         Stops all workers in the given worker group. Implementors
         must deal with workers in all states defined by ``WorkerState``.
@@ -493,8 +522,6 @@ class SimpleElasticAgent(ElasticAgent):
 
     @abc.abstractmethod
     def _monitor_workers(self, worker_group: WorkerGroup) -> RunResult:
-        log.debug(f" =====> agent.sever.api 当前函数名：_monitor_workers")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         r"""
         Checks on the workers for the ``worker_group`` and returns
         the new state of the worker group.
@@ -509,11 +536,10 @@ class SimpleElasticAgent(ElasticAgent):
         raise NotImplementedError()
 
     @staticmethod
+    @traced
     def _set_master_addr_port(
         store: Store, master_addr: Optional[str], master_port: Optional[int]
     ):
-        log.debug(f" =====> agent.sever.api 当前函数名：_set_master_add_port")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         if master_port is None:
             sock = _get_socket_with_port()
             with closing(sock):
@@ -526,9 +552,8 @@ class SimpleElasticAgent(ElasticAgent):
         store.set("MASTER_PORT", str(master_port).encode(encoding="UTF-8"))
 
     @staticmethod
+    @traced
     def _get_master_addr_port(store: Store) -> Tuple[str, int]:
-        log.debug(f" =====> agent.sever.api 当前函数名：_get_master_add_port")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         master_addr = store.get("MASTER_ADDR").decode(encoding="UTF-8")
         master_port = int(store.get("MASTER_PORT").decode(encoding="UTF-8"))
         return (master_addr, master_port)
@@ -536,6 +561,7 @@ class SimpleElasticAgent(ElasticAgent):
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `torch.distributed.elastic.metrics.prof`.
     @prof
+    @traced
     def _rendezvous(self, worker_group: WorkerGroup) -> None:
         r"""
           运行rdzv，为worker分配一个新的global rank 和 world size。更新worker组的rdzv store。
@@ -543,9 +569,6 @@ class SimpleElasticAgent(ElasticAgent):
         Assigns workers a new global rank and world size.
         Updates the rendezvous store for the worker group.
         """
-        log.debug(f" =====> agent.sever.api 当前函数名：_rendezvous")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
 
         spec = worker_group.spec
 
@@ -577,6 +600,7 @@ class SimpleElasticAgent(ElasticAgent):
             f"  global_world_sizes={[worker.world_size for worker in workers]}\n"
         )
 
+    @traced
     def _get_ranks(
         self,
         role_infos: List[_RoleInstanceInfo],
@@ -584,10 +608,6 @@ class SimpleElasticAgent(ElasticAgent):
         start_idx: int = 0,
         end_idx: int = -1,
     ) -> Tuple[int, List[int]]:
-        log.debug(f" =====> agent.sever.api 当前函数名：_get_ranks")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
-
         if end_idx == -1:
             end_idx = len(role_infos)
         prefix_sum = 0
@@ -604,6 +624,7 @@ class SimpleElasticAgent(ElasticAgent):
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `torch.distributed.elastic.metrics.prof`.
     @prof
+    @traced
     def _assign_worker_ranks(
         self, store, group_rank: int, group_world_size: int, spec: WorkerSpec
     ) -> List[Worker]:
@@ -630,9 +651,6 @@ class SimpleElasticAgent(ElasticAgent):
            in the point 3 with the exception that the offset is done from the first
            agent that has the same role as current one and has the minimum group rank.
         """
-        log.debug(f" =====> agent.sever.api 当前函数名：_assign_worker_rank")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
 
         role_infos = self._share_and_gather(store, group_rank, group_world_size, spec)
         my_role_info = role_infos[group_rank]
@@ -663,13 +681,10 @@ class SimpleElasticAgent(ElasticAgent):
             workers.append(worker)
         return workers
 
+    @traced
     def _share_and_gather(
         self, store, group_rank: int, group_world_size: int, spec: WorkerSpec
     ) -> List:
-        log.debug(f" =====> agent.sever.api 当前函数名：_share_and_gather")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
-
         agent_role_info = _RoleInstanceInfo(
             spec.role, group_rank, spec.local_world_size
         )
@@ -678,7 +693,7 @@ class SimpleElasticAgent(ElasticAgent):
 
         key_prefix = "torchelastic/role_info"
         agent_config_enc = agent_role_info.serialize()
-        role_infos_bytes = store_util.synchronize(
+        role_infos_bytes = _synchronize(
             store, agent_config_enc, group_rank, group_world_size, key_prefix
         )
         role_infos = [
@@ -691,6 +706,7 @@ class SimpleElasticAgent(ElasticAgent):
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `torch.distributed.elastic.metrics.prof`.
     @prof
+    @traced
     def _initialize_workers(self, worker_group: WorkerGroup) -> None:
         r"""
         Starts a fresh set of workers for the worker_group.
@@ -705,9 +721,6 @@ class SimpleElasticAgent(ElasticAgent):
         just started as ``HEALTHY`` and delegates the actual monitoring
         of state to ``_monitor_workers()`` method
         """
-        print(f" =====> agent.sever.api 当前函数名：_initialize_workers")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
 
         role = worker_group.spec.role
         log.info(f"[{role}] Rendezvous'ing worker group") # role默认为default
@@ -729,13 +742,11 @@ class SimpleElasticAgent(ElasticAgent):
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `torch.distributed.elastic.metrics.prof`.
     @prof
+    @traced
     def _restart_workers(self, worker_group: WorkerGroup) -> None:
         """
         Restarts (stops, rendezvous, starts) all local workers in the group.
         """
-        log.debug(f" =====> agent.sever.api 当前函数名：_restart_workers")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
 
         role = worker_group.spec.role
         log.info(f"[{role}] Stopping worker group")
@@ -746,10 +757,8 @@ class SimpleElasticAgent(ElasticAgent):
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `torch.distributed.elastic.metrics.prof`.
     @prof
+    @traced
     def run(self, role: str = DEFAULT_ROLE) -> RunResult:
-        print(f" =====> agent.sever.api 当前函数名：run ")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         start_time = time.monotonic()
         try:
             result = self._invoke_run(role)
@@ -762,26 +771,23 @@ class SimpleElasticAgent(ElasticAgent):
             self._total_execution_time = int(time.monotonic() - start_time)
             self._shutdown()
 
+    @traced
     def get_agent_status_event(self, state: WorkerState) -> Event:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         raw_error = traceback.format_exc() if state == WorkerState.FAILED else None
         return self._construct_event(
             state.value, EventSource.AGENT, raw_error=raw_error
         )
 
+    @traced
     def _record_worker_events(self, result: RunResult) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         for worker in self._worker_group.workers:
             failure = result.failures.get(worker.global_rank)
             state: str = self._get_worker_state(worker, result)
             raw_error = json.dumps(failure.error_file_data) if failure else None
             record(self._construct_event(state, EventSource.WORKER, worker, raw_error))
 
+    @traced
     def _get_worker_state(self, worker: Worker, result: RunResult) -> str:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         failure = result.failures.get(worker.global_rank)
         if result.state in {WorkerState.UNHEALTHY, WorkerState.FAILED} and not failure:
             # The worker got terminated by the torchelastic agent via SIGTERM signal
@@ -791,6 +797,7 @@ class SimpleElasticAgent(ElasticAgent):
         else:
             raise ValueError(f"Unknow worker: {worker.global_rank}")
 
+    @traced
     def _construct_event(
         self,
         state: str,
@@ -798,8 +805,6 @@ class SimpleElasticAgent(ElasticAgent):
         worker: Optional[Worker] = None,
         raw_error: Optional[str] = None,
     ) -> Event:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         wg = self._worker_group
         spec = wg.spec
         md = {
@@ -834,9 +839,8 @@ class SimpleElasticAgent(ElasticAgent):
             f"torchelastic.worker.status.{state}", source=source, metadata=metadata
         )
 
+    @traced
     def _record_metrics(self, group_results: RunResult):
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         is_failed = group_results.is_failed()
         self._record_flakiness_metric(is_failed)
         spec = self._worker_group.spec
@@ -855,18 +859,16 @@ class SimpleElasticAgent(ElasticAgent):
             "run_failed_no_retries", is_failed and not restarts_happened
         )
 
+    @traced
     def _record_metric_with_condition(self, metric_name, condition):
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         spec = self._worker_group.spec
         if condition:
             put_metric(f"workers.{spec.role}.{metric_name}", 1)
         else:
             put_metric(f"workers.{spec.role}.{metric_name}", 0)
 
+    @traced
     def _record_flakiness_metric(self, is_failed: bool = False):
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         if is_failed:
             flakiness = 100.0
         else:
@@ -878,11 +880,9 @@ class SimpleElasticAgent(ElasticAgent):
 
         put_metric(f"workers.{spec.role}.flakiness", int(flakiness))
 
+    @traced
     def _invoke_run(self, role: str = DEFAULT_ROLE) -> RunResult:
         # NOTE: currently only works for a single role
-        print(f" =====> agent.sever.api 当前函数名：_invoke_run")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
 
         spec = self._worker_group.spec
         role = spec.role
@@ -896,7 +896,6 @@ class SimpleElasticAgent(ElasticAgent):
         rdzv_handler = spec.rdzv_handler
 
         while True:
-            print(f" =====> agent.sever.api === _invoke_run while循环中")
             assert self._worker_group.state != WorkerState.INIT
             time.sleep(monitor_interval)
             run_result = self._monitor_workers(self._worker_group)
@@ -941,6 +940,7 @@ class SimpleElasticAgent(ElasticAgent):
             else:
                 raise Exception(f"[{role}] Worker group in {state.name} state")
 
+    @traced
     def _exit_barrier(self):
         """
         Wait for ``exit_barrier_timeout`` seconds for all agents to finish
@@ -948,9 +948,6 @@ class SimpleElasticAgent(ElasticAgent):
         acts as a safety guard against user scripts that terminate at different
         times. This barrier keeps the agent process alive until all workers finish.
         """
-        log.debug(f" =====> agent.sever.api 当前函数名：_exit_barrier")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
 
         log.info(
             f"Local worker group finished ({self._worker_group.state}). "
@@ -958,7 +955,7 @@ class SimpleElasticAgent(ElasticAgent):
         )
         start = time.time()
         try:
-            store_util.barrier(
+            _barrier(
                 self._store,
                 self._worker_group.group_rank,
                 self._worker_group.group_world_size,
@@ -21,10 +21,10 @@ from torch.distributed.elastic.agent.server.api import (
 )
 from torch.distributed.elastic.metrics.api import prof
 from torch.distributed.elastic.multiprocessing import start_processes, PContext
+from torch.distributed.elastic.rendezvous.tracing import traced
 from torch.distributed.elastic.utils import macros
 from torch.distributed.elastic.utils.logging import get_logger
 
-import sys
 import logging
 log = logging.getLogger(__name__)
 log = get_logger()
@@ -99,6 +99,7 @@ class LocalElasticAgent(SimpleElasticAgent):
 
     """
 
+    @traced
     def __init__(
         self,
         spec: WorkerSpec,
@@ -106,19 +107,14 @@ class LocalElasticAgent(SimpleElasticAgent):
         exit_barrier_timeout: float = 300,
         log_dir: Optional[str] = None,
     ):
-        log.info(f" =====> agent.sever.local_elastic_agent 当前函数名：_init_")
-        log.info(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.info(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         super().__init__(spec, exit_barrier_timeout)
         self._start_method = start_method
         self._pcontext: Optional[PContext] = None
         rdzv_run_id = spec.rdzv_handler.get_run_id()
         self._log_dir = self._make_log_dir(log_dir, rdzv_run_id)
 
+    @traced
     def _make_log_dir(self, log_dir: Optional[str], rdzv_run_id: str):
-        log.info(f" =====> agent.sever.local_elastic_agent 当前函数名：_make_log_dir")
-        log.info(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.info(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         base_log_dir = log_dir or tempfile.mkdtemp(prefix="torchelastic_")
         os.makedirs(base_log_dir, exist_ok=True)
         dir = tempfile.mkdtemp(prefix=f"{rdzv_run_id}_", dir=base_log_dir)
@@ -128,19 +124,15 @@ class LocalElasticAgent(SimpleElasticAgent):
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `torch.distributed.elastic.metrics.prof`.
     @prof
+    @traced
     def _stop_workers(self, worker_group: WorkerGroup) -> None:
-
         self._shutdown()
-        log.info(f" =====> agent.sever.local_elastic_agent 当前函数名：_stop_workers")
-        log.info(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.info(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
+
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `torch.distributed.elastic.metrics.prof`.
     @prof
+    @traced
     def _start_workers(self, worker_group: WorkerGroup) -> Dict[int, Any]:
-        log.info(f" =====> agent.sever.local_elastic_agent 当前函数名：_start_workers")
-        log.info(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.info(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         spec = worker_group.spec
         store = worker_group.store
         assert store is not None
@@ -200,20 +192,17 @@ class LocalElasticAgent(SimpleElasticAgent):
 
         return self._pcontext.pids()
 
+    @traced
     def _shutdown(self) -> None:
-        log.info(f" =====> agent.sever.local_elastic_agent 当前函数名：_shutdown")
         if self._pcontext:
             self._pcontext.close()
 
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `torch.distributed.elastic.metrics.prof`.
     @prof
+    @traced
     def _monitor_workers(self, worker_group: WorkerGroup) -> RunResult:
-        log.info(f" =====> agent.sever.api 当前函数名：_monitor_workers")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         role = worker_group.spec.role
-        log.info(f" =====> role：{role}")
         worker_pids = {w.id for w in worker_group.workers}
         assert self._pcontext is not None
         pc_pids = set(self._pcontext.pids().values())
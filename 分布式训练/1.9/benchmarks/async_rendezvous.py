@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Runs ``--runs`` rendezvous of ``--nodes-per-run`` nodes each in one process,
+100 handlers by default, once with a :py:class:`DynamicRendezvousHandler` per
+node in its own thread and once with an :py:class:`AsyncDynamicRendezvousHandler`
+per node driven by a single event loop. The blocking in-memory backend of each
+rendezvous is shared by the async handlers of that rendezvous through one
+:py:class:`AsyncRendezvousBackendAdapter` whose calls run in a thread pool of
+``--workers`` threads.
+
+For each mode it reports the time until all handlers have joined, the peak
+number of threads, the number of threads left once the rounds are complete
+(the heartbeat timers of the threaded handlers), the CPU time of the process,
+and the backend operation counts.
+
+::
+
+    python async_rendezvous.py --runs 10 --nodes-per-run 10 --latency 0.002
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from torch.distributed import HashStore
+from torch.distributed.elastic.rendezvous.async_dynamic_rendezvous import (
+    AsyncDynamicRendezvousHandler,
+    AsyncRendezvousBackendAdapter,
+)
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import DynamicRendezvousHandler
+
+from in_memory_backend import InMemoryRendezvousBackend
+
+
+class _ThreadCounter:
+    """Samples the number of live threads until stopped."""
+
+    def __init__(self) -> None:
+        self.peak = threading.active_count()
+
+        self._stop = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "_ThreadCounter":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+
+def _make_backends(args: argparse.Namespace) -> List[InMemoryRendezvousBackend]:
+    return [InMemoryRendezvousBackend(latency=args.latency) for _ in range(args.runs)]
+
+
+def _report(
+    mode: str,
+    join_time: float,
+    cpu_time: float,
+    counter: _ThreadCounter,
+    num_threads: int,
+    backends: List[InMemoryRendezvousBackend],
+) -> Dict[str, Any]:
+    stats: Counter = Counter()
+    for backend in backends:
+        stats.update(backend.stats)
+
+    return {
+        "mode": mode,
+        "join_time_s": join_time,
+        "peak_threads": counter.peak,
+        "threads_after_join": num_threads,
+        "cpu_time_s": cpu_time,
+        "state_gets": stats["state_reads"],
+        "state_sets": stats["state_writes"] + stats["failed_state_writes"],
+    }
+
+
+def _run_threads(args: argparse.Namespace) -> Dict[str, Any]:
+    backends = _make_backends(args)
+
+    store = HashStore()
+
+    handlers = [
+        DynamicRendezvousHandler.from_backend(
+            f"run-{i}", store, backend, args.nodes_per_run, args.nodes_per_run
+        )
+        for i, backend in enumerate(backends)
+        for _ in range(args.nodes_per_run)
+    ]
+
+    barrier = threading.Barrier(len(handlers) + 1)
+
+    def run(handler: DynamicRendezvousHandler) -> None:
+        barrier.wait()
+
+        handler.next_rendezvous()
+
+    threads = [threading.Thread(target=run, args=(h,), daemon=True) for h in handlers]
+
+    with _ThreadCounter() as counter:
+        for t in threads:
+            t.start()
+
+        barrier.wait()
+
+        cpu_start = time.process_time()
+        start = time.monotonic()
+
+        for t in threads:
+            t.join()
+
+        join_time = time.monotonic() - start
+        cpu_time = time.process_time() - cpu_start
+
+        num_threads = threading.active_count()
+
+    for handler in handlers:
+        handler._stop_heartbeats()
+
+    return _report("threads", join_time, cpu_time, counter, num_threads, backends)
+
+
+async def _run_asyncio_main(
+    args: argparse.Namespace, backends: List[InMemoryRendezvousBackend]
+) -> Dict[str, Any]:
+    loop = asyncio.get_event_loop()
+
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    store = HashStore()
+
+    adapters = []
+
+    handlers = []
+    for i, backend in enumerate(backends):
+        # 同一个rdzv的handler共享一个适配器，从而共享一个监视者。
+        # The handlers of a rendezvous share the adapter and so its watcher.
+        adapter = AsyncRendezvousBackendAdapter(backend, executor)
+
+        adapters.append(adapter)
+
+        handlers += [
+            AsyncDynamicRendezvousHandler.from_backend(
+                f"run-{i}", store, adapter, args.nodes_per_run, args.nodes_per_run
+            )
+            for _ in range(args.nodes_per_run)
+        ]
+
+    with _ThreadCounter() as counter:
+        cpu_start = time.process_time()
+        start = loop.time()
+
+        await asyncio.gather(*(h.next_rendezvous() for h in handlers))
+
+        join_time = loop.time() - start
+        cpu_time = time.process_time() - cpu_start
+
+        num_threads = threading.active_count()
+
+    for handler in handlers:
+        await handler._stop_heartbeats()
+
+    for adapter in adapters:
+        await adapter.close()
+
+    executor.shutdown()
+
+    return _report("asyncio", join_time, cpu_time, counter, num_threads, backends)
+
+
+def _run_asyncio(args: argparse.Namespace) -> Dict[str, Any]:
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_run_asyncio_main(args, _make_backends(args)))
+    finally:
+        loop.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--nodes-per-run", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.002, help="The backend RTT in seconds.")
+    parser.add_argument(
+        "--workers", type=int, default=32, help="The threads running the backend calls."
+    )
+    args = parser.parse_args()
+
+    print(f"{args.runs * args.nodes_per_run} handlers in {args.runs} rendezvous")
+    print(
+        f"{'mode':>8} {'join (s)':>9} {'peak threads':>13} {'threads after':>14} "
+        f"{'cpu (s)':>8} {'gets':>6} {'sets':>6}"
+    )
+    for run in (_run_threads, _run_asyncio):
+        result = run(args)
+
+        print(
+            f"{result['mode']:>8} {result['join_time_s']:>9.2f} {result['peak_threads']:>13} "
+            f"{result['threads_after_join']:>14} {result['cpu_time_s']:>8.2f} "
+            f"{result['state_gets']:>6} {result['state_sets']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
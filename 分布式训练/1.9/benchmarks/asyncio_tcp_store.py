@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Load test of the asyncio TCP store. A :py:class:`StoreServer` runs in a
+process of its own, pinned to one core where the platform allows it, and
+``--procs`` client processes hold ``--clients`` connections to it in total.
+Every connection issues a mix of ``get``, ``set`` and ``add`` one after the
+other for ``--duration`` seconds; the throughput and the p50/p99/p99.9 latency
+of all operations are reported for each number of connections.
+
+Then all connections ``wait`` for one key at once and the time from its
+``set`` until the last waiter has been woken is reported, the fan-out of a
+barrier on the store.
+
+::
+
+    python asyncio_tcp_store.py --clients 100 1000 10000 --procs 4 --duration 5
+"""
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import resource
+import statistics
+import time
+from typing import Any, Dict, List
+
+from torch.distributed.elastic.rendezvous.asyncio_tcp_store import AsyncStoreClient, StoreServer
+
+
+def _serve(port: int, ready: Any) -> None:
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+    async def run() -> None:
+        server = StoreServer("127.0.0.1", port)
+
+        await server.start()
+
+        ready.set()
+
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+async def _connect(port: int, num_clients: int) -> List[AsyncStoreClient]:
+    clients = []
+    # Connect in batches to not overflow the listen backlog of the server.
+    for i in range(0, num_clients, 256):
+        clients += await asyncio.gather(
+            *(
+                AsyncStoreClient.connect("127.0.0.1", port)
+                for _ in range(min(256, num_clients - i))
+            )
+        )
+    return clients
+
+
+async def _load(port: int, num_clients: int, rank: int, duration: float, start: Any, result: Any) -> None:
+    clients = await _connect(port, num_clients)
+
+    await clients[0].set(f"key{rank}", b"x" * 64)
+
+    start.wait()
+
+    deadline = time.monotonic() + duration
+
+    latencies: List[float] = []
+
+    async def run(client: AsyncStoreClient, i: int) -> None:
+        key = f"key{rank}"
+        op = i
+        while time.monotonic() < deadline:
+            begin = time.perf_counter()
+
+            if op % 4 == 0:
+                await client.set(key, b"x" * 64)
+            elif op % 4 == 1:
+                await client.add(f"counter{i % 64}", 1)
+            else:
+                await client.get(key)
+
+            latencies.append(time.perf_counter() - begin)
+
+            op += 1
+
+    await asyncio.gather(*(run(client, i) for i, client in enumerate(clients)))
+
+    # The wake-up of every connection waiting on the same key.
+    waits = [asyncio.ensure_future(client.wait(["go"])) for client in clients]
+
+    await clients[0].add("waiting", len(clients))
+
+    await asyncio.gather(*waits)
+
+    result.put((latencies, time.perf_counter()))
+
+    for client in clients:
+        client.close()
+
+
+def _client(port: int, num_clients: int, rank: int, duration: float, start: Any, result: Any) -> None:
+    asyncio.run(_load(port, num_clients, rank, duration, start, result))
+
+
+async def _release(port: int, num_clients: int) -> float:
+    client = await AsyncStoreClient.connect("127.0.0.1", port)
+
+    while int(await client.add("waiting", 0)) < num_clients:
+        await asyncio.sleep(0.01)
+
+    # Give the last waits time to reach the server.
+    await asyncio.sleep(0.2)
+
+    begin = time.perf_counter()
+
+    await client.set("go", b"1")
+
+    client.close()
+
+    return begin
+
+
+def _run(args: argparse.Namespace, num_clients: int, port: int) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+
+    ready = ctx.Event()
+
+    server = ctx.Process(target=_serve, args=(port, ready), daemon=True)
+    server.start()
+
+    ready.wait()
+
+    start = ctx.Event()
+    result = ctx.Queue()
+
+    num_procs = min(args.procs, num_clients)
+
+    clients = [
+        ctx.Process(
+            target=_client,
+            args=(
+                port,
+                num_clients // num_procs + (rank < num_clients % num_procs),
+                rank,
+                args.duration,
+                start,
+                result,
+            ),
+        )
+        for rank in range(num_procs)
+    ]
+    for p in clients:
+        p.start()
+
+    start.set()
+
+    released = asyncio.run(_release(port, num_clients))
+
+    latencies: List[float] = []
+    woken = 0.0
+    for _ in clients:
+        proc_latencies, proc_woken = result.get()
+
+        latencies += proc_latencies
+        woken = max(woken, proc_woken)
+
+    for p in clients:
+        p.join()
+
+    server.kill()
+    server.join()
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+    return {
+        "ops": len(latencies) / args.duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(0.99),
+        "p999_ms": percentile(0.999),
+        "wake_ms": (woken - released) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--procs", type=int, default=4, help="The client processes.")
+    parser.add_argument("--duration", type=float, default=5.0, help="In seconds.")
+    parser.add_argument("--port", type=int, default=29578)
+    args = parser.parse_args()
+
+    # Each connection takes a file descriptor on both of its ends.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    print(
+        f"{'clients':>8} {'ops/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'p99.9 (ms)':>11} "
+        f"{'wake all (ms)':>14}"
+    )
+    for i, num_clients in enumerate(args.clients):
+        result = _run(args, num_clients, args.port + i)
+
+        print(
+            f"{num_clients:>8} {result['ops']:>9.0f} {result['p50_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['p999_ms']:>11.2f} {result['wake_ms']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures the bytes moved and the latency of a state write of the C10d
+rendezvous backend as the state grows with the number of participants.
+
+``legacy`` is the previous write, a ``compare_set`` of the whole state whose
+fencing token was the stored state itself and whose success was decided by
+comparing the returned state with the local one; ``versioned`` is the current
+write, which creates the change key of the version it replaces. Both a
+successful write and one based on a stale state are measured, against an
+in-memory store that adds
+``--latency`` to each call and the transfer time of its bytes at
+``--bandwidth``.
+
+::
+
+    python c10d_rendezvous_backend.py --nodes 8 64 256 1024 4096 --latency 0.0005 --bandwidth 1.25e8
+"""
+
+import argparse
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple
+
+from torch.distributed import HashStore, Store
+from torch.distributed.elastic.rendezvous.c10d_rendezvous_backend import C10dRendezvousBackend
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    _NodeDesc,
+    _RendezvousState,
+    _RendezvousStateCodec,
+)
+
+
+def _size(value: Any) -> int:
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_size(v) for v in value)
+    return 8
+
+
+class _MeteredStore(Store):
+    """Forwards the calls to a store, counting the bytes moved and adding a
+    fixed latency and the transfer time of the bytes to each call."""
+
+    def __init__(self, store: Store, latency: float, bandwidth: float) -> None:
+        super().__init__()
+
+        self.bytes = 0
+        self.calls = 0
+
+        self._store = store
+        self._latency = latency
+        self._bandwidth = bandwidth
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        fn = getattr(self._store, name)
+
+        def call(*args: Any) -> Any:
+            result = fn(*args)
+
+            size = _size(args) + _size(result)
+
+            time.sleep(self._latency + size / self._bandwidth)
+
+            self.calls += 1
+            self.bytes += size
+
+            return result
+
+        return call
+
+
+class _LegacyBackend:
+    """The write of the previous C10d backend."""
+
+    _RAW_PREFIX = b"\x00"
+
+    def __init__(self, store: Store) -> None:
+        self._store = store
+
+        self._key = "torch.rendezvous.legacy"
+
+    def get_state(self) -> Optional[Tuple[bytes, Any]]:
+        value = self._store.get(self._key)
+
+        return value[1:], value
+
+    def set_state(self, state: bytes, token: Any) -> Tuple[bytes, Any, bool]:
+        value = self._RAW_PREFIX + state
+
+        new_value = self._store.compare_set(self._key, token, value)
+
+        has_set = new_value[1:] == state
+        if has_set:
+            # The change key was named after a digest of the replaced state.
+            self._store.set(self._key + ".next.0123456789abcdef0123456789abcdef01234567", "1")
+
+        return new_value[1:], new_value, has_set
+
+
+def _make_state(num_nodes: int) -> bytes:
+    state = _RendezvousState()
+    state.complete = True
+
+    now = datetime.utcnow()
+    for rank in range(num_nodes):
+        node = _NodeDesc(f"trainer-{rank:05d}.cluster.example.com", 1000 + rank, 0)
+
+        state.participants[node] = rank
+        state.last_heartbeats[node] = now
+
+    return _RendezvousStateCodec().encode(state)
+
+
+def _measure(
+    store: _MeteredStore, write: Callable[[], Any], number: int
+) -> Tuple[float, float]:
+    store.bytes = 0
+
+    start = time.perf_counter()
+    for _ in range(number):
+        write()
+    elapsed = time.perf_counter() - start
+
+    return store.bytes / number, elapsed / number * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[8, 64, 256, 1024, 4096])
+    parser.add_argument("--latency", type=float, default=0.0005, help="The latency of a call.")
+    parser.add_argument(
+        "--bandwidth", type=float, default=1.25e8, help="The bandwidth in bytes per second."
+    )
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    print(
+        f"{'nodes':>6} {'state (B)':>10} {'backend':>10} "
+        f"{'ok (B)':>10} {'ok (ms)':>8} {'stale (B)':>10} {'stale (ms)':>11}"
+    )
+    for num_nodes in args.nodes:
+        state = _make_state(num_nodes)
+
+        store = _MeteredStore(HashStore(), args.latency, args.bandwidth)
+
+        legacy = _LegacyBackend(store)
+        store.set(legacy._key, legacy._RAW_PREFIX + state)
+
+        versioned = C10dRendezvousBackend(store, "versioned")
+        versioned.set_state(state)
+
+        backends = {"legacy": legacy, "versioned": versioned}
+
+        # The legacy token is the stored state itself, so the state written
+        # must differ from the one the stale token was read with.
+        new_state = state + b" "
+
+        for name, backend in backends.items():
+            stale_token = backend.get_state()[1]  # type: ignore[index]
+
+            # Keep the token current so that every write succeeds.
+            token = [backend.set_state(new_state, stale_token)[1]]  # type: ignore[union-attr]
+
+            def write_ok() -> None:
+                token[0] = backend.set_state(new_state, token[0])[1]  # type: ignore[union-attr]
+
+            def write_stale() -> None:
+                assert not backend.set_state(state[:-1], stale_token)[2]  # type: ignore[union-attr]
+
+            ok_bytes, ok_ms = _measure(store, write_ok, args.number)
+            stale_bytes, stale_ms = _measure(store, write_stale, args.number)
+
+            print(
+                f"{num_nodes:>6} {len(state):>10} {name:>10} "
+                f"{ok_bytes:>10.0f} {ok_ms:>8.2f} {stale_bytes:>10.0f} {stale_ms:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures how long it takes for ``N`` nodes to join a dynamic rendezvous when
+the executor polls the backend (``polling``, the old behavior) versus when
+it waits for state changes through the backend (``watch``). Along with the
+time it reports how many state writes conflicted with another node per
+successful write, and the bytes of the rejected writes, when waiting for state
+changes.
+
+::
+
+    python dynamic_rendezvous_join.py --nodes 8 16 32 --rounds 3 --latency 0.002
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from typing import List, Tuple
+
+from torch.distributed import HashStore
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import DynamicRendezvousHandler
+
+from in_memory_backend import InMemoryRendezvousBackend
+
+
+def _join_once(num_nodes: int, watch: bool, latency: float) -> Tuple[float, float, int]:
+    backend = InMemoryRendezvousBackend(watch=watch, latency=latency)
+    store = HashStore()
+
+    handlers = [
+        DynamicRendezvousHandler.from_backend(
+            "bench", store, backend, min_nodes=num_nodes, max_nodes=num_nodes
+        )
+        for _ in range(num_nodes)
+    ]
+
+    barrier = threading.Barrier(num_nodes + 1)
+
+    def run(handler):
+        barrier.wait()
+        handler.next_rendezvous()
+
+    threads = [threading.Thread(target=run, args=(h,)) for h in handlers]
+    for t in threads:
+        t.start()
+
+    barrier.wait()
+    start = time.monotonic()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    for handler in handlers:
+        handler._stop_heartbeats()
+
+    conflicts = sum(h._op_executor.stats.conflicts for h in handlers)
+    wasted_bytes = sum(h._op_executor.stats.wasted_bytes for h in handlers)
+
+    return elapsed, conflicts / backend.stats["state_writes"], wasted_bytes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="The backend round-trip time in seconds."
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'nodes':>6} {'polling (s)':>12} {'watch (s)':>10} "
+        f"{'conflicts/write':>16} {'wasted (KB)':>12}"
+    )
+    for num_nodes in args.nodes:
+        results: List[List[Tuple[float, float, int]]] = []
+        for watch in (False, True):
+            results.append(
+                [_join_once(num_nodes, watch, args.latency) for _ in range(args.rounds)]
+            )
+
+        poll = statistics.median(r[0] for r in results[0])
+        watch = statistics.median(r[0] for r in results[1])
+
+        conflict_ratio = statistics.median(r[1] for r in results[1])
+        wasted_bytes = statistics.median(r[2] for r in results[1])
+
+        print(
+            f"{num_nodes:>6} {poll:>12.3f} {watch:>10.3f} "
+            f"{conflict_ratio:>16.2f} {wasted_bytes / 1024:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Counts the etcd requests caused by ``--agents`` agents, each with its own
+:py:class:`EtcdRendezvousBackend`, that call ``get_state()`` every
+``--period`` seconds, without and with the watch-invalidated state cache of
+the backend. All agents talk to one in-memory etcd that adds ``--latency`` to
+each request.
+
+Two phases are run: ``idle``, where the state does not change, and
+``churn``, where another node writes the state every ``--change-interval``
+seconds. At the end of each run every agent checks that it reads the latest
+state.
+
+::
+
+    python etcd_backend_state_cache.py --agents 32 --period 0.05 --duration 10
+"""
+
+import argparse
+import threading
+import time
+from typing import Any, Dict
+
+from torch.distributed.elastic.rendezvous.etcd_rendezvous_backend import EtcdRendezvousBackend
+
+from in_memory_etcd import InMemoryEtcdClient
+
+
+def _run(args: argparse.Namespace, cache_state: bool, change_interval: float) -> Dict[str, Any]:
+    client = InMemoryEtcdClient(latency=args.latency)
+
+    writer = EtcdRendezvousBackend(client, "run", "/torch/elastic/rendezvous", cache_state=False)
+
+    _, token, _ = writer.set_state(b"state 0")  # type: ignore[misc]
+
+    backends = [
+        EtcdRendezvousBackend(client, "run", "/torch/elastic/rendezvous", cache_state=cache_state)
+        for _ in range(args.agents)
+    ]
+
+    stop = threading.Event()
+
+    def poll(backend: EtcdRendezvousBackend) -> None:
+        while not stop.wait(args.period):
+            backend.get_state()
+
+    threads = [threading.Thread(target=poll, args=(backend,)) for backend in backends]
+    for t in threads:
+        t.start()
+
+    # Let every backend do its first read before counting.
+    time.sleep(args.period * 2)
+
+    requests = client.stats.copy()
+
+    deadline = time.monotonic() + args.duration
+
+    version = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        if change_interval <= 0:
+            time.sleep(remaining)
+            continue
+
+        time.sleep(min(change_interval, remaining))
+
+        version += 1
+
+        _, token, _ = writer.set_state(f"state {version}".encode(), token)  # type: ignore[misc]
+
+    stop.set()
+
+    for t in threads:
+        t.join()
+
+    reads = client.stats["reads"] - requests["reads"]
+    watches = client.stats["watchs"] - requests["watchs"]
+
+    # The watchers apply the last change within a request or two.
+    time.sleep(args.latency * 4 + 0.05)
+
+    expected = f"state {version}".encode()
+
+    stale = sum(1 for backend in backends if backend.get_state()[0] != expected)  # type: ignore[index]
+
+    hits = sum(backend.cache_stats.hits for backend in backends) if cache_state else 0  # type: ignore[union-attr]
+
+    return {
+        "reads_per_s": reads / args.duration,
+        "watches_per_s": watches / args.duration,
+        "hits": hits,
+        "stale": stale,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=32)
+    parser.add_argument("--period", type=float, default=0.05, help="The seconds between reads.")
+    parser.add_argument("--duration", type=float, default=10.0, help="The seconds per run.")
+    parser.add_argument("--change-interval", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.001, help="The etcd RTT in seconds.")
+    args = parser.parse_args()
+
+    print(
+        f"{'phase':>6} {'cache':>6} {'reads/s':>9} {'watches/s':>10} {'cache hits':>11} "
+        f"{'stale':>6}"
+    )
+    for phase, change_interval in (("idle", 0.0), ("churn", args.change_interval)):
+        for cache_state in (False, True):
+            result = _run(args, cache_state, change_interval)
+
+            print(
+                f"{phase:>6} {'on' if cache_state else 'off':>6} {result['reads_per_s']:>9.1f} "
+                f"{result['watches_per_s']:>10.1f} {result['hits']:>11} {result['stale']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
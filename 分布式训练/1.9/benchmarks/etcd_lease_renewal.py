@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Counts the threads and the refresh requests of the TTL renewal of ephemeral
+keys when ``--handlers`` :py:class:`EtcdRendezvous` share one in-memory etcd
+client, and each of them leases a new keep-alive key with a TTL of ``--ttl``
+seconds every ``--interval`` seconds for ``--rounds`` rendezvous rounds,
+cancelling the lease of the previous round, as ``rendezvous_barrier()`` does.
+
+``thread`` renews each lease from a thread of its own, the way
+:py:class:`EtcdRendezvous` used to; ``manager`` renews all of them from the
+:py:class:`EtcdLeaseManager` of the client.
+
+::
+
+    python etcd_lease_renewal.py --handlers 8 32 128 --rounds 10 --ttl 2
+"""
+
+import argparse
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import etcd  # type: ignore[import]
+from torch.distributed.elastic.rendezvous.etcd_rendezvous import EtcdRendezvous
+
+from in_memory_etcd import InMemoryEtcdClient
+
+
+class _ThreadLease:
+    def __init__(self, stop_event: threading.Event) -> None:
+        self._stop_event = stop_event
+
+    def cancel(self) -> None:
+        self._stop_event.set()
+
+
+class _ThreadPerLeaseEtcdRendezvous(EtcdRendezvous):
+    """The lease renewal of :py:class:`EtcdRendezvous` before it had a lease
+    manager."""
+
+    def setup_lease_renewal(self, full_path, ttl):
+        def lease_worker(client, path, ttl, stop_event):
+            while True:
+                try:
+                    client.refresh(path, ttl=ttl)
+                except etcd.EtcdKeyNotFound:
+                    break
+
+                if stop_event.wait(timeout=ttl / 2):
+                    break
+
+        lease_stop_event = threading.Event()
+        lease_thread = threading.Thread(
+            target=lease_worker, args=(self.client, full_path, ttl, lease_stop_event)
+        )
+
+        lease_thread.daemon = True
+        lease_thread.start()
+
+        return _ThreadLease(lease_stop_event)
+
+
+def _num_renewal_threads() -> int:
+    return sum(
+        1
+        for t in threading.enumerate()
+        if t.name == "EtcdLeaseManager" or t.name.endswith("(lease_worker)")
+    )
+
+
+def _run(args: argparse.Namespace, num_handlers: int, per_thread: bool) -> Dict[str, Any]:
+    client = InMemoryEtcdClient(latency=args.latency)
+
+    cls = _ThreadPerLeaseEtcdRendezvous if per_thread else EtcdRendezvous
+
+    rdzvs = [
+        cls(
+            client=client,
+            prefix="/torchelastic/p2p",
+            run_id="bench",
+            num_min_workers=1,
+            num_max_workers=num_handlers,
+            timeout=600,
+            last_call_timeout=30,
+        )
+        for _ in range(num_handlers)
+    ]
+
+    # Let the leases of the run_id directory start.
+    time.sleep(0.1)
+
+    requests = client.stats.copy()
+
+    leases: List[Optional[Any]] = [None] * num_handlers
+
+    max_threads = _num_renewal_threads()
+
+    start = time.monotonic()
+
+    for round_ in range(args.rounds):
+        for i, rdzv in enumerate(rdzvs):
+            if leases[i] is not None:
+                leases[i].cancel()  # type: ignore[union-attr]
+
+            key = rdzv.get_path(f"/rdzv/v_{round_}/rank_{i}")
+
+            client.set(key, value=None, ttl=args.ttl)
+
+            leases[i] = rdzv.setup_lease_renewal(key, ttl=args.ttl)
+
+        max_threads = max(max_threads, _num_renewal_threads())
+
+        time.sleep(args.interval)
+
+        max_threads = max(max_threads, _num_renewal_threads())
+
+    elapsed = time.monotonic() - start
+
+    refreshes = client.stats["writes"] - requests["writes"] - num_handlers * args.rounds
+
+    for lease in leases:
+        lease.cancel()  # type: ignore[union-attr]
+
+    return {
+        "max_threads": max_threads,
+        "refreshes_per_s": refreshes / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--handlers", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.5, help="The seconds per round.")
+    parser.add_argument("--ttl", type=int, default=2, help="The TTL of the keys in seconds.")
+    parser.add_argument("--latency", type=float, default=0.001, help="The etcd RTT in seconds.")
+    args = parser.parse_args()
+
+    logging.getLogger("torch.distributed.elastic.rendezvous.etcd_rendezvous").setLevel(
+        logging.WARNING
+    )
+
+    print(f"{'handlers':>9} {'renewal':>8} {'max threads':>12} {'refreshes/s':>12}")
+    for num_handlers in args.handlers:
+        for mode in ("thread", "manager"):
+            result = _run(args, num_handlers, mode == "thread")
+
+            print(
+                f"{num_handlers:>9} {mode:>8} {result['max_threads']:>12} "
+                f"{result['refreshes_per_s']:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures how long ``--nodes`` nodes, each with its own :py:class:`EtcdRendezvous`,
+take to complete ``rendezvous_barrier()`` against one in-memory etcd that adds
+``--latency`` to each request, and counts the requests they send.
+
+``watch`` waits for a state change the way :py:class:`EtcdRendezvous` does: a
+one-shot watch of ``active_version`` per wait, followed by a read of the
+state. ``watcher`` is an alternative that was tried and not adopted: each
+rendezvous keeps a local view of ``active_version``, fed by its reads and by
+a single watcher thread that re-polls the node from the next index while a
+phase waits, and the phases block on the view instead of watching and
+reading. The watcher replays the changes one event at a time, so it sends
+more watches than it saves reads, and does not complete the barrier sooner.
+
+::
+
+    python etcd_rendezvous_barrier.py --nodes 64 128 --latency 0.001
+"""
+
+import argparse
+import copy
+import json
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, List
+
+import etcd  # type: ignore[import]
+from torch.distributed.elastic.rendezvous.etcd_rendezvous import (
+    EtcdRendezvous,
+    RendezvousTimeoutError,
+)
+
+from in_memory_etcd import InMemoryEtcdClient
+
+
+class _ActiveVersionWatcher:
+    """
+    A local view of the ``active_version`` node, followed by a single watcher
+    thread while somebody waits on it.
+    """
+
+    _WATCH_TIMEOUT = 10.0
+
+    # The number of etcd changes past a change of active_version at which the
+    # watcher reads the node instead of replaying its changes one by one.
+    _MAX_LAG = 8
+
+    def __init__(self, client, active_version_path: str) -> None:
+        self._client = client
+        self._path = active_version_path
+
+        self._cond = threading.Condition()
+
+        self._active_version = None
+        self._active_index = 0
+
+        # The etcd index as of which the view is current.
+        self._index = 0
+
+        self._num_waiters = 0
+
+        threading.Thread(
+            target=_ActiveVersionWatcher._watch_weak, args=(weakref.ref(self),), daemon=True
+        ).start()
+
+    def get(self):
+        with self._cond:
+            if self._active_version is None:
+                raise etcd.EtcdKeyNotFound(f"Key not found : {self._path}")
+
+            active_version = copy.copy(self._active_version)
+            active_version.etcd_index = self._index
+
+            return active_version
+
+    def wait(self, index: int, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            self._num_waiters += 1
+
+            self._cond.notify_all()
+
+            try:
+                while self._index < index:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+
+                    self._cond.wait(remaining)
+            finally:
+                self._num_waiters -= 1
+
+    def apply(self, result) -> None:
+        with self._cond:
+            self._apply(result)
+
+            self._index = max(
+                self._index, result.modifiedIndex, getattr(result, "etcd_index", None) or 0
+            )
+
+            self._cond.notify_all()
+
+    def _apply(self, result) -> None:
+        if result.modifiedIndex < self._active_index:
+            return
+
+        self._active_index = result.modifiedIndex
+
+        if result.action in ("delete", "expire", "compareAndDelete"):
+            self._active_version = None
+        else:
+            self._active_version = result
+
+    @staticmethod
+    def _watch_weak(weak_self) -> None:
+        while True:
+            self = weak_self()
+            if self is None:
+                return
+
+            self._watch_once()
+
+            del self
+
+    def _watch_once(self) -> None:
+        with self._cond:
+            if self._num_waiters == 0:
+                self._cond.wait(self._WATCH_TIMEOUT)
+                return
+
+            index = self._index
+
+        if index == 0:
+            self._reload()
+            return
+
+        try:
+            result = self._client.watch(key=self._path, timeout=self._WATCH_TIMEOUT, index=index + 1)
+        except etcd.EtcdWatchTimedOut:
+            return
+        except etcd.EtcdEventIndexCleared:
+            self._reload()
+            return
+
+        with self._cond:
+            self._apply(result)
+
+            self._index = max(self._index, result.modifiedIndex)
+
+            self._cond.notify_all()
+
+        if (getattr(result, "etcd_index", None) or 0) - result.modifiedIndex > self._MAX_LAG:
+            self._reload()
+
+    def _reload(self) -> None:
+        try:
+            result = self._client.get(self._path)
+        except etcd.EtcdKeyNotFound as exc:
+            with self._cond:
+                index = int((getattr(exc, "payload", None) or {}).get("index", 0))
+                if index >= self._active_index:
+                    self._active_version = None
+                    self._active_index = index
+
+                self._index = max(self._index, index)
+
+                self._cond.notify_all()
+        else:
+            self.apply(result)
+
+
+class _WatcherEtcdRendezvous(EtcdRendezvous):
+    """Waits for state changes on an :py:class:`_ActiveVersionWatcher`."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+
+        self._watcher = _ActiveVersionWatcher(self.client, self.get_path("/rdzv/active_version"))
+
+    def get_rdzv_state(self):
+        active_version, state = super().get_rdzv_state()
+        self._watcher.apply(active_version)
+        return active_version, state
+
+    def try_wait_for_state_change(self, etcd_index, timeout=None):
+        overall_timeout = max(self._rendezvous_deadline - time.time(), 0.0) + 1.0
+        timeout = overall_timeout if timeout is None else min(timeout, overall_timeout)
+
+        self._watcher.wait(etcd_index, timeout)
+
+        if time.time() > self._rendezvous_deadline:
+            raise RendezvousTimeoutError()
+
+        active_version = self._watcher.get()
+        return active_version, json.loads(active_version.value)
+
+
+def _run(args: argparse.Namespace, num_nodes: int, shared_watcher: bool) -> Dict[str, Any]:
+    client = InMemoryEtcdClient(latency=args.latency)
+
+    cls = _WatcherEtcdRendezvous if shared_watcher else EtcdRendezvous
+
+    rdzvs = [
+        cls(
+            client=client,
+            prefix="/torchelastic/p2p",
+            run_id="bench",
+            num_min_workers=num_nodes,
+            num_max_workers=num_nodes,
+            timeout=600,
+            last_call_timeout=30,
+        )
+        for _ in range(num_nodes)
+    ]
+
+    barrier = threading.Barrier(num_nodes + 1)
+
+    results: List[Any] = []
+
+    def run(rdzv: EtcdRendezvous) -> None:
+        barrier.wait()
+
+        results.append(rdzv.rendezvous_barrier())
+
+    threads = [threading.Thread(target=run, args=(rdzv,)) for rdzv in rdzvs]
+    for t in threads:
+        t.start()
+
+    requests = client.stats.copy()
+
+    barrier.wait()
+
+    start = time.monotonic()
+
+    for t in threads:
+        t.join()
+
+    elapsed = time.monotonic() - start
+
+    assert sorted(rank for _, rank, _ in results) == list(range(num_nodes))
+
+    return {
+        "time_s": elapsed,
+        "reads": client.stats["reads"] - requests["reads"],
+        "watches": client.stats["watchs"] - requests["watchs"],
+        "writes": client.stats["writes"] - requests["writes"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[64, 128])
+    parser.add_argument("--latency", type=float, default=0.001, help="The etcd RTT in seconds.")
+    args = parser.parse_args()
+
+    logging.getLogger("torch.distributed.elastic.rendezvous.etcd_rendezvous").setLevel(
+        logging.WARNING
+    )
+
+    print(f"{'nodes':>6} {'mode':>8} {'time (s)':>9} {'reads':>8} {'watches':>8} {'writes':>7}")
+    for num_nodes in args.nodes:
+        for mode in ("watch", "watcher"):
+            result = _run(args, num_nodes, mode == "watcher")
+
+            print(
+                f"{num_nodes:>6} {mode:>8} {result['time_s']:>9.2f} {result['reads']:>8} "
+                f"{result['watches']:>8} {result['writes']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures the downtime of a restart after a worker failure with
+:py:class:`EtcdRendezvous`: ``--nodes`` nodes complete a rendezvous against
+one in-memory etcd that expires keys after their TTL; then one node fails
+and re-enters the barrier, and the others follow within ``--spread``
+seconds, as their agents notice it. The downtime is the time from the first
+re-entry until the last node has its new rank.
+
+``full`` runs the full protocol, which waits for a keep-alive key of the
+previous rendezvous to expire before a new one can be joined; ``sticky``
+renews the previous rendezvous with the same ranks when all of its
+participants come back within the sticky window.
+
+::
+
+    python etcd_rendezvous_restart.py --nodes 8 32 --spread 1
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from torch.distributed.elastic.rendezvous.etcd_rendezvous import EtcdRendezvous
+
+from in_memory_etcd import InMemoryEtcdClient
+
+
+def _barrier(rdzvs: List[EtcdRendezvous], delays: List[float]) -> Tuple[float, List[Tuple[str, int]]]:
+    results: List[Tuple[str, int]] = [("", -1)] * len(rdzvs)
+
+    start = time.monotonic()
+
+    def run(i: int) -> None:
+        time.sleep(delays[i])
+
+        version, rank, _ = rdzvs[i].rendezvous_barrier()
+
+        results[i] = (version, rank)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(rdzvs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return time.monotonic() - start, results
+
+
+def _run(args: argparse.Namespace, num_nodes: int, sticky: bool) -> Dict[str, Any]:
+    client = InMemoryEtcdClient(latency=args.latency, expire=True)
+
+    rdzvs = [
+        EtcdRendezvous(
+            client=client,
+            prefix="/torchelastic/p2p",
+            run_id="bench",
+            num_min_workers=num_nodes,
+            num_max_workers=num_nodes,
+            timeout=600,
+            last_call_timeout=30,
+            sticky_window=args.window if sticky else 0,
+        )
+        for _ in range(num_nodes)
+    ]
+
+    _, before = _barrier(rdzvs, [0.0] * num_nodes)
+
+    # Node 0 fails first; the others notice within the spread.
+    delays = [0.0] + [random.uniform(0, args.spread) for _ in range(num_nodes - 1)]
+
+    downtime, after = _barrier(rdzvs, delays)
+
+    assert sorted(rank for _, rank in after) == list(range(num_nodes))
+    assert len({version for version, _ in after}) == 1
+
+    return {
+        "downtime_s": downtime,
+        "same_ranks": sum(1 for b, a in zip(before, after) if b[1] == a[1]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--spread", type=float, default=1.0, help="In seconds.")
+    parser.add_argument("--window", type=int, default=10, help="The sticky window in seconds.")
+    parser.add_argument("--latency", type=float, default=0.001, help="The etcd RTT in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    logging.getLogger("torch.distributed.elastic.rendezvous.etcd_rendezvous").setLevel(
+        logging.WARNING
+    )
+
+    print(f"{'nodes':>6} {'mode':>7} {'downtime (s)':>13} {'same ranks':>11}")
+    for num_nodes in args.nodes:
+        for mode in ("full", "sticky"):
+            result = _run(args, num_nodes, mode == "sticky")
+
+            print(
+                f"{num_nodes:>6} {mode:>7} {result['downtime_s']:>13.2f} "
+                f"{result['same_ranks']:>8}/{num_nodes}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Simulates ``--agents`` agents that restart together and retry their
+rendezvous attempts against an etcd that can serve ``--capacity`` attempts
+per second; the attempts beyond it in any ``--bucket`` second window fail and
+are retried after the delay of the retry policy of each agent. No time is
+actually spent waiting: the delays are drawn from the retry policies of
+:py:mod:`etcd_rendezvous` and played out on a simulated clock.
+
+For each policy the peak rate of attempts seen by etcd once the restart
+itself has passed, i.e. the peak of the retries, the total number of attempts
+and the time until half and all of the agents got through are reported.
+
+::
+
+    python etcd_rendezvous_retry.py --agents 100 300 1000 --capacity 200
+"""
+
+import argparse
+import heapq
+import random
+import statistics
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+from torch.distributed.elastic.rendezvous.etcd_rendezvous import (
+    DecorrelatedJitterRetryPolicy,
+    EtcdRendezvousRetryPolicy,
+    FixedDelayRetryPolicy,
+)
+
+
+def _simulate(
+    args: argparse.Namespace, num_agents: int, create_policy: Callable[[], EtcdRendezvousRetryPolicy]
+) -> Dict[str, Any]:
+    policies = [create_policy() for _ in range(num_agents)]
+
+    # The agents come back within a few milliseconds of each other.
+    attempts: List[Tuple[float, int]] = [(random.uniform(0, 0.01), agent) for agent in range(num_agents)]
+    heapq.heapify(attempts)
+
+    # bucket -> attempts
+    load: Counter = Counter()
+
+    capacity = args.capacity * args.bucket
+
+    done: List[float] = []
+
+    while attempts:
+        t, agent = heapq.heappop(attempts)
+
+        bucket = int(t / args.bucket)
+
+        load[bucket] += 1
+
+        if load[bucket] <= capacity:
+            done.append(t)
+        else:
+            delay = policies[agent].get_delay(EtcdRendezvousRetryPolicy.RETRYABLE_FAILURE)
+
+            heapq.heappush(attempts, (t + delay, agent))
+
+    return {
+        # The first window holds the restart, which no policy can spread.
+        "peak_rate": max(n for bucket, n in load.items() if bucket > 0) / args.bucket,
+        "attempts": sum(load.values()),
+        "p50_s": statistics.median(done),
+        "last_s": max(done),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--capacity", type=float, default=200, help="Attempts per second.")
+    parser.add_argument("--bucket", type=float, default=0.1, help="In seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    policies = {
+        "fixed": FixedDelayRetryPolicy,
+        "jitter": DecorrelatedJitterRetryPolicy,
+    }
+
+    print(
+        f"{'agents':>7} {'policy':>7} {'peak retries/s':>15} {'attempts':>9} {'p50 (s)':>8} "
+        f"{'all (s)':>8}"
+    )
+    for num_agents in args.agents:
+        for name, create_policy in policies.items():
+            result = _simulate(args, num_agents, create_policy)
+
+            print(
+                f"{num_agents:>7} {name:>7} {result['peak_rate']:>15.0f} {result['attempts']:>9} "
+                f"{result['p50_s']:>8.2f} {result['last_s']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures ``add`` of the etcd stores under contention: ``--threads`` threads,
+each with its own store, increment the same key ``--adds`` times at once, as
+the agents of a store based barrier do.
+
+``v2`` is :py:class:`EtcdStore` of the etcd v2 API, whose ``add`` retries a
+read and a ``test_and_set`` after a random delay of up to 100 ms whenever the
+value has changed in between; ``v3`` is the store of the etcd v3 API, whose
+``add`` is a transaction comparing the mod revision of the key that also
+returns the current value if it fails, retried after a jittered backoff from
+the second failure on; ``v3 sharded`` is the same store in its
+sharded counter mode, where the store of each thread increments its own slot
+and reads the sum of the slots in the same transaction. All run against an
+in-memory etcd that adds ``--latency`` to each request.
+
+For each it reports the total time, the p50 and p99 latency of an ``add``, and
+the number of writes that failed and had to be retried.
+
+::
+
+    python etcd_store_add.py --threads 16 64 256 --adds 4 --latency 0.001
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from torch.distributed.elastic.rendezvous.etcd_store import EtcdStore
+from torchelastic.rendezvous.etcdStore3 import EtcdStore as Etcd3Store
+
+from in_memory_etcd import InMemoryEtcdClient
+from in_memory_etcd3 import InMemoryEtcd3Client
+
+
+def _percentile(values: List[float], p: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[int(p) - 1]
+
+
+def _run(args: argparse.Namespace, num_threads: int, v3: bool, sharded: bool) -> Dict[str, Any]:
+    if v3:
+        client = InMemoryEtcd3Client(latency=args.latency)
+
+        stores = [
+            Etcd3Store(
+                client, "/torchelastic/store", counter_shard=str(rank) if sharded else None
+            )
+            for rank in range(num_threads)
+        ]
+    else:
+        client = InMemoryEtcdClient(latency=args.latency)  # type: ignore[assignment]
+
+        stores = [
+            EtcdStore(client, "/torchelastic/store", timedelta(seconds=300))
+            for _ in range(num_threads)
+        ]
+
+    barrier = threading.Barrier(num_threads + 1)
+
+    latencies: List[float] = []
+
+    def run(store: Any) -> None:
+        barrier.wait()
+
+        for _ in range(args.adds):
+            start = time.monotonic()
+
+            store.add("counter", 1)
+
+            latencies.append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=run, args=(store,)) for store in stores]
+    for t in threads:
+        t.start()
+
+    barrier.wait()
+
+    start = time.monotonic()
+
+    for t in threads:
+        t.join()
+
+    elapsed = time.monotonic() - start
+
+    assert stores[0].add("counter", 0) == num_threads * args.adds
+
+    failed_writes = client.stats["failed_txns" if v3 else "failed_writes"]
+
+    return {
+        "time_s": elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "retries": failed_writes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--adds", type=int, default=4, help="The adds per thread.")
+    parser.add_argument("--latency", type=float, default=0.001, help="The etcd RTT in seconds.")
+    args = parser.parse_args()
+
+    print(
+        f"{'threads':>8} {'store':>11} {'time (s)':>9} {'p50 (ms)':>9} "
+        f"{'p99 (ms)':>9} {'retries':>8}"
+    )
+    for num_threads in args.threads:
+        for mode, v3, sharded in (
+            ("v2", False, False),
+            ("v3", True, False),
+            ("v3 sharded", True, True),
+        ):
+            result = _run(args, num_threads, v3, sharded)
+
+            print(
+                f"{num_threads:>8} {mode:>11} {result['time_s']:>9.2f} "
+                f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['retries']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
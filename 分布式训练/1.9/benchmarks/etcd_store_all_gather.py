@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Runs an all-gather of ``--agents`` agents over :py:class:`EtcdStore`, the way
+``store_util.synchronize`` does it: every agent, in its own thread and with its
+own store, sets its key and then gets the keys of all agents in rank order.
+The agents share an in-memory etcd that adds ``--latency`` to each request.
+
+``legacy`` is the previous read path of the store, which re-read the whole
+prefix and set up a new watch every time a key it waited for was missing;
+``mirror`` is the current one, where each store keeps a mirror of the prefix
+fed by one watcher thread and answers its reads from it.
+
+For each mode it reports the time until every agent has gathered all keys, the
+number of etcd requests, and the number of etcd nodes returned by them.
+
+::
+
+    python etcd_store_all_gather.py --agents 16 64 128 --latency 0.001
+"""
+
+import argparse
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict
+
+import etcd  # type: ignore[import]
+from torch.distributed.elastic.rendezvous.etcd_store import EtcdStore
+
+from in_memory_etcd import InMemoryEtcdClient
+
+
+class _LegacyEtcdStore(EtcdStore):
+    """The read path of the previous ``EtcdStore``."""
+
+    def _try_wait_get(self, b64_keys, override_timeout=None):
+        timeout = self.timeout if override_timeout is None else override_timeout
+        deadline = time.time() + timeout.total_seconds()
+
+        while True:
+            all_nodes = self.client.get(key=self.prefix)
+            req_nodes = {
+                node.key: node.value for node in all_nodes.children if node.key in b64_keys
+            }
+
+            if len(req_nodes) == len(b64_keys):
+                return req_nodes
+
+            watch_timeout = deadline - time.time()
+            if watch_timeout <= 0:
+                return None
+
+            try:
+                self.client.watch(
+                    key=self.prefix,
+                    recursive=True,
+                    timeout=watch_timeout,
+                    index=all_nodes.etcd_index + 1,
+                )
+            except etcd.EtcdWatchTimedOut:
+                if time.time() >= deadline:
+                    return None
+                else:
+                    continue
+            except etcd.EtcdEventIndexCleared:
+                continue
+
+
+def _run(args: argparse.Namespace, num_agents: int, legacy: bool) -> Dict[str, Any]:
+    client = InMemoryEtcdClient(latency=args.latency)
+
+    store_class = _LegacyEtcdStore if legacy else EtcdStore
+
+    stores = [
+        store_class(client, "/torchelastic/store", timedelta(seconds=args.timeout))
+        for _ in range(num_agents)
+    ]
+
+    barrier = threading.Barrier(num_agents + 1)
+
+    results = [None] * num_agents
+
+    def run(rank: int) -> None:
+        store = stores[rank]
+
+        barrier.wait()
+
+        store.set(f"key{rank}", f"value{rank}")
+
+        results[rank] = [store.get(f"key{i}") for i in range(num_agents)]  # type: ignore[call-overload]
+
+    threads = [threading.Thread(target=run, args=(rank,)) for rank in range(num_agents)]
+    for t in threads:
+        t.start()
+
+    barrier.wait()
+
+    start = time.monotonic()
+
+    for t in threads:
+        t.join()
+
+    elapsed = time.monotonic() - start
+
+    expected = [f"value{i}".encode() for i in range(num_agents)]
+    assert all(r == expected for r in results)
+
+    return {
+        "time_s": elapsed,
+        "requests": client.stats["requests"],
+        "nodes_read": client.stats["nodes_read"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--latency", type=float, default=0.001, help="The etcd RTT in seconds.")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    print(f"{'agents':>7} {'store':>7} {'time (s)':>9} {'requests':>9} {'nodes read':>11}")
+    for num_agents in args.agents:
+        for mode, legacy in (("legacy", True), ("mirror", False)):
+            result = _run(args, num_agents, legacy)
+
+            print(
+                f"{num_agents:>7} {mode:>7} {result['time_s']:>9.2f} "
+                f"{result['requests']:>9} {result['nodes_read']:>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures the ``set``/``get``/``wait`` throughput of the etcd v3 store in its
+``base64`` encoding, the one of the etcd v2 store, and in its ``raw`` encoding,
+together with the bytes sent to etcd per key/value pair, for a sweep of value
+sizes. The store talks to an in-memory etcd v3 without any added latency, so
+the numbers are the client side cost of a call.
+
+::
+
+    python etcd_store_encoding.py --value-sizes 16 1024 65536 --number 20000
+"""
+
+import argparse
+import os
+import time
+from typing import Any, Callable, Dict
+
+from torchelastic.rendezvous.etcdStore3 import EtcdStore
+
+from in_memory_etcd3 import InMemoryEtcd3Client
+
+
+def _ops_per_s(fn: Callable[[int], Any], number: int) -> float:
+    start = time.perf_counter()
+    for i in range(number):
+        fn(i)
+    return number / (time.perf_counter() - start)
+
+
+def _run(args: argparse.Namespace, encoding: str, value_size: int) -> Dict[str, Any]:
+    client = InMemoryEtcd3Client()
+
+    store = EtcdStore(client, "/torchelastic/store", encoding=encoding)
+
+    keys = [f"torchelastic/role_info{i % args.keys}" for i in range(args.number)]
+
+    value = os.urandom(value_size)
+
+    set_ops = _ops_per_s(lambda i: store.set(keys[i], value), args.number)
+    get_ops = _ops_per_s(lambda i: store.get(keys[i]), args.number)
+    wait_ops = _ops_per_s(lambda i: store.wait(keys[:8]), args.number)
+
+    assert store.get(keys[0]) == value
+
+    key, (stored_value, *_) = next(iter(client._kvs.items()))
+
+    return {
+        "set_ops": set_ops,
+        "get_ops": get_ops,
+        "wait_ops": wait_ops,
+        "bytes": len(key) + len(stored_value),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--value-sizes", type=int, nargs="+", default=[16, 1024, 65536])
+    parser.add_argument("--keys", type=int, default=64, help="The distinct keys used.")
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(
+        f"{'value (B)':>10} {'encoding':>9} {'set/s':>9} {'get/s':>9} "
+        f"{'wait(8)/s':>10} {'sent (B)':>9}"
+    )
+    for value_size in args.value_sizes:
+        for encoding in ("base64", "raw"):
+            result = _run(args, encoding, value_size)
+
+            print(
+                f"{value_size:>10} {encoding:>9} {result['set_ops']:>9.0f} "
+                f"{result['get_ops']:>9.0f} {result['wait_ops']:>10.0f} {result['bytes']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures the etcd round trips and the wall time of the gather of the agent's
+``_share_and_gather`` and exit barrier over :py:class:`EtcdStore` as seen by
+the last agent to arrive, the one whose gather finds every other key already
+published, for a sweep of participant counts. The store talks to an in-memory
+etcd that adds ``--latency`` to each request.
+
+``get`` is ``store_util.synchronize`` on the previous store, which read the
+whole prefix for every ``get``; ``get (mirror)`` is the same on the current
+store, which reads the prefix once and keeps a mirror of it; ``multi_get`` is
+``_synchronize`` of the agent, which sets the key of the agent with ``set``
+and reads the keys of all agents with one ``multi_get``.
+
+::
+
+    python etcd_store_multi_get.py --participants 64 256 1024 2048 --latency 0.0005
+"""
+
+import argparse
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List
+
+from torch.distributed.elastic.rendezvous.etcd_store import EtcdStore
+
+from etcd_store_all_gather import _LegacyEtcdStore
+from in_memory_etcd import InMemoryEtcdClient
+
+_KEY_PREFIX = "torchelastic/role_info"
+
+
+def _gather_get(store: EtcdStore, data: bytes, rank: int, world_size: int) -> List[bytes]:
+    store.set(f"{_KEY_PREFIX}{rank}", data)
+    return [store.get(f"{_KEY_PREFIX}{idx}") for idx in range(world_size)]
+
+
+def _gather_multi_get(store: EtcdStore, data: bytes, rank: int, world_size: int) -> List[bytes]:
+    store.set(f"{_KEY_PREFIX}{rank}", data)
+    return store.multi_get([f"{_KEY_PREFIX}{idx}" for idx in range(world_size)])
+
+
+def _run(
+    args: argparse.Namespace,
+    world_size: int,
+    store_class: type,
+    gather: Callable[..., List[bytes]],
+) -> Dict[str, Any]:
+    client = InMemoryEtcdClient(latency=args.latency)
+
+    rank = world_size - 1
+
+    # The other agents have already published their role infos.
+    publisher = EtcdStore(client, "/torchelastic/store", timedelta(seconds=args.timeout))
+    publisher.multi_set(
+        [f"{_KEY_PREFIX}{idx}" for idx in range(rank)],
+        [f"role_info{idx}" for idx in range(rank)],
+    )
+
+    store = store_class(client, "/torchelastic/store", timedelta(seconds=args.timeout))
+
+    client.stats.clear()
+
+    start = time.monotonic()
+
+    result = gather(store, f"role_info{rank}".encode(), rank, world_size)
+
+    elapsed = time.monotonic() - start
+
+    assert result == [f"role_info{idx}".encode() for idx in range(world_size)]
+
+    return {
+        "time_ms": elapsed * 1000,
+        # The watcher of the mirror polls etcd in the background; only the
+        # requests the gather waits for are round trips.
+        "round_trips": client.stats["requests"] - client.stats["watchs"],
+        "nodes_read": client.stats["nodes_read"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--participants", type=int, nargs="+", default=[64, 256, 1024, 2048])
+    parser.add_argument("--latency", type=float, default=0.0005, help="The etcd RTT in seconds.")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    modes = (
+        ("get", _LegacyEtcdStore, _gather_get),
+        ("get (mirror)", EtcdStore, _gather_get),
+        ("multi_get", EtcdStore, _gather_multi_get),
+    )
+
+    print(f"{'agents':>7} {'gather':>13} {'time (ms)':>10} {'round trips':>12} {'nodes read':>11}")
+    for world_size in args.participants:
+        for mode, store_class, gather in modes:
+            result = _run(args, world_size, store_class, gather)
+
+            print(
+                f"{world_size:>7} {mode:>13} {result['time_ms']:>10.1f} "
+                f"{result['round_trips']:>12} {result['nodes_read']:>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from torch.distributed.elastic.rendezvous import RendezvousConnectionError
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import RendezvousBackend, Token
+
+
+class InMemoryRendezvousBackend(RendezvousBackend):
+    """Represents a process-local rendezvous backend used by the benchmarks.
+
+    Args:
+        watch:
+            A boolean value indicating whether the backend supports watching
+            the state. If ``False``, the default polling behavior of
+            :py:class:`RendezvousBackend` is used.
+        latency:
+            The round-trip time, in seconds, added to each operation.
+        jitter:
+            The upper bound, in seconds, of a random delay added on top of
+            ``latency``.
+        failure_rate:
+            The probability with which an operation fails with a
+            :py:class:`RendezvousConnectionError`.
+        seed:
+            The seed of the random number generator used for the jitter and
+            the failures.
+
+    Attributes:
+        stats:
+            The number of operations served by the backend. ``state_reads``,
+            ``state_writes``, and ``failed_state_writes`` count the accesses
+            to the shared state; ``heartbeat_reads`` and ``heartbeat_writes``
+            count the accesses to the per-node heartbeat keys, and
+            ``injected_failures`` the operations failed on purpose.
+            ``bytes_written`` is the size of all values stored, whereas
+            ``bytes_sent`` and ``bytes_received`` are the sizes of all values
+            sent to and returned by the backend, including the ones of
+            rejected writes.
+    """
+
+    stats: Counter
+
+    _watch: bool
+    _latency: float
+    _jitter: float
+    _failure_rate: float
+    _random: random.Random
+    _cond: threading.Condition
+    _state: Optional[bytes]
+    _version: int
+    _heartbeats: Dict[str, datetime]
+
+    def __init__(
+        self,
+        watch: bool = True,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.stats = Counter()
+
+        self._watch = watch
+        self._latency = latency
+        self._jitter = jitter
+        self._failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._cond = threading.Condition()
+        self._state = None
+        self._version = 0
+        self._heartbeats = {}
+
+    @property
+    def name(self) -> str:
+        """See base class."""
+        return "in-memory"
+
+    def get_state(self) -> Optional[Tuple[bytes, Token]]:
+        """See base class."""
+        self._round_trip()
+
+        with self._cond:
+            self.stats["state_reads"] += 1
+
+            if self._state is None:
+                return None
+
+            self.stats["bytes_received"] += len(self._state)
+
+            return self._state, self._version
+
+    def set_state(
+        self, state: bytes, token: Optional[Token] = None
+    ) -> Optional[Tuple[bytes, Token, bool]]:
+        """See base class."""
+        self._round_trip()
+
+        with self._cond:
+            self.stats["bytes_sent"] += len(state)
+
+            if (token or 0) != self._version:
+                self.stats["failed_state_writes"] += 1
+
+                if self._state is None:
+                    return None
+
+                self.stats["bytes_received"] += len(self._state)
+
+                return self._state, self._version, False
+
+            self.stats["state_writes"] += 1
+            self.stats["bytes_written"] += len(state)
+
+            self._state = state
+            self._version += 1
+
+            self._cond.notify_all()
+
+            return self._state, self._version, True
+
+    def wait_for_state_change(self, token: Optional[Token], timeout: timedelta) -> bool:
+        """See base class."""
+        if not self._watch:
+            return super().wait_for_state_change(token, timeout)
+
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._version != (token or 0), timeout.total_seconds()
+            )
+
+    @property
+    def supports_heartbeats(self) -> bool:
+        """See base class."""
+        return True
+
+    def set_heartbeat(self, node: str, ttl: timedelta) -> None:
+        """See base class."""
+        self._round_trip()
+
+        with self._cond:
+            self.stats["heartbeat_writes"] += 1
+            # The node id and the timestamp, as the etcd and C10d backends
+            # would write them.
+            self.stats["bytes_written"] += len(node) + 18
+            self.stats["bytes_sent"] += len(node) + 18
+
+            self._heartbeats[node] = datetime.utcnow()
+
+    def get_heartbeats(self, nodes: List[str]) -> Dict[str, datetime]:
+        """See base class."""
+        self._round_trip()
+
+        with self._cond:
+            self.stats["heartbeat_reads"] += 1
+
+            heartbeats = {
+                node: self._heartbeats[node] for node in nodes if node in self._heartbeats
+            }
+
+            self.stats["bytes_received"] += sum(len(node) + 18 for node in heartbeats)
+
+            return heartbeats
+
+    def delete_heartbeat(self, node: str) -> None:
+        """See base class."""
+        self._round_trip()
+
+        with self._cond:
+            self.stats["heartbeat_writes"] += 1
+
+            self._heartbeats.pop(node, None)
+
+    def _round_trip(self) -> None:
+        with self._cond:
+            delay = self._latency
+            if self._jitter > 0:
+                delay += self._random.uniform(0, self._jitter)
+
+            fail = self._failure_rate > 0 and self._random.random() < self._failure_rate
+            if fail:
+                self.stats["injected_failures"] += 1
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if fail:
+            raise RendezvousConnectionError("The in-memory backend has injected a failure.")
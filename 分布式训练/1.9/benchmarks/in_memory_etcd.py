@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+An in-process stand-in for an etcd v2 server and the ``etcd.Client`` methods
+used by :py:class:`EtcdStore`, :py:class:`EtcdRendezvousBackend`, and
+:py:class:`EtcdRendezvous`, for benchmarks that need etcd semantics (compare
+and swap on an index, recursive watches from an index, a bounded event
+history) without a server.
+
+TTLs are accepted, but keys only expire after them if ``expire`` is set.
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import etcd  # type: ignore[import]
+
+
+class InMemoryEtcdClient:
+    """Holds the keys of an in-memory etcd and serves them through a subset of
+    the ``etcd.Client`` interface. The same instance can be shared by any
+    number of simulated agents.
+
+    Args:
+        latency:
+            The time, in seconds, that every request takes in addition to the
+            time it blocks for.
+        history:
+            The number of events kept for watches, like the event history of
+            etcd v2.
+        expire:
+            A boolean value indicating whether keys and directories written
+            with a TTL expire after it unless refreshed.
+    """
+
+    def __init__(self, latency: float = 0.0, history: int = 1000, expire: bool = False) -> None:
+        self.stats: Counter = Counter()
+
+        self._latency = latency
+        self._history = history
+        self._expire = expire
+
+        self._cond = threading.Condition()
+
+        # key -> (value, created index, modified index)
+        self._nodes: Dict[str, Tuple[Optional[str], int, int]] = {}
+        self._dirs = {"/"}
+
+        # (index, action, key, value)
+        self._events: List[Tuple[int, str, str, Optional[str]]] = []
+
+        self._index = 1
+
+        # key -> monotonic time at which it expires
+        self._expiries: Dict[str, float] = {}
+
+    @property
+    def machines(self) -> List[str]:
+        return ["http://in-memory:2379"]
+
+    def read(
+        self,
+        key: str,
+        recursive: bool = False,
+        wait: bool = False,
+        waitIndex: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> etcd.EtcdResult:
+        self._request("watch" if wait else "read")
+
+        key = self._normalize(key)
+
+        with self._cond:
+            self._expire_keys()
+
+            if wait:
+                return self._wait(key, recursive, waitIndex, timeout)
+
+            if key in self._nodes:
+                result = self._result("get", key)
+            elif key in self._dirs or self._children(key):
+                nodes = [self._node(k) for k in self._children(key)]
+
+                self.stats["nodes_read"] += len(nodes)
+
+                result = etcd.EtcdResult("get", {"key": key, "dir": True, "nodes": nodes})
+            else:
+                raise etcd.EtcdKeyNotFound(
+                    f"Key not found : {key}", {"errorCode": 100, "index": self._index}
+                )
+
+            self.stats["nodes_read"] += 1
+
+            result.etcd_index = self._index
+
+            return result
+
+    def get(self, key: str) -> etcd.EtcdResult:
+        return self.read(key)
+
+    def watch(
+        self,
+        key: str,
+        index: Optional[int] = None,
+        timeout: Optional[float] = None,
+        recursive: Optional[bool] = None,
+    ) -> etcd.EtcdResult:
+        return self.read(key, recursive=bool(recursive), wait=True, waitIndex=index, timeout=timeout)
+
+    def write(
+        self,
+        key: str,
+        value: Optional[str],
+        ttl: Optional[int] = None,
+        dir: bool = False,
+        append: bool = False,
+        **kwargs: Any,
+    ) -> etcd.EtcdResult:
+        self._request("write")
+
+        key = self._normalize(key)
+
+        with self._cond:
+            self._expire_keys()
+
+            exists = key in self._nodes or key in self._dirs
+
+            if kwargs.get("prevExist") is False and exists:
+                self.stats["failed_writes"] += 1
+
+                raise etcd.EtcdAlreadyExist(f"Key already exists : {key}", {"errorCode": 105})
+
+            if "prevIndex" in kwargs or "prevValue" in kwargs:
+                if key not in self._nodes:
+                    raise etcd.EtcdKeyNotFound(f"Key not found : {key}", {"errorCode": 100})
+
+                value_, _, modified_index = self._nodes[key]
+
+                if "prevIndex" in kwargs and int(kwargs["prevIndex"]) != modified_index:
+                    self.stats["failed_writes"] += 1
+
+                    raise etcd.EtcdCompareFailed(f"Compare failed : {key}", {"errorCode": 101})
+
+                if "prevValue" in kwargs and kwargs["prevValue"] != value_:
+                    self.stats["failed_writes"] += 1
+
+                    raise etcd.EtcdCompareFailed(f"Compare failed : {key}", {"errorCode": 101})
+
+                action = "compareAndSwap"
+            else:
+                action = "create" if not exists else "set"
+
+            self._index += 1
+
+            # Like in etcd, a write without a TTL makes the key permanent.
+            if self._expire and ttl is not None:
+                self._expiries[key] = time.monotonic() + ttl
+            else:
+                self._expiries.pop(key, None)
+
+            if dir:
+                self._dirs.add(key)
+
+                self._events.append((self._index, action, key, None))
+
+                self._notify()
+
+                result = etcd.EtcdResult(action, {"key": key, "dir": True})
+            else:
+                created_index = self._nodes[key][1] if key in self._nodes else self._index
+
+                self._nodes[key] = (value, created_index, self._index)
+
+                self._events.append((self._index, action, key, value))
+
+                self._notify()
+
+                result = self._result(action, key)
+
+            result.etcd_index = self._index
+
+            return result
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> etcd.EtcdResult:
+        return self.write(key, value, ttl)
+
+    def test_and_set(
+        self, key: str, value: str, prev_value: str, ttl: Optional[int] = None
+    ) -> etcd.EtcdResult:
+        return self.write(key, value, ttl, prevValue=prev_value)
+
+    def update(self, obj: etcd.EtcdResult) -> etcd.EtcdResult:
+        return self.write(obj.key, obj.value, prevIndex=obj.modifiedIndex)
+
+    def refresh(self, key: str, ttl: Optional[int] = None, **kwargs: Any) -> etcd.EtcdResult:
+        # A refresh only resets the TTL and does not notify the watchers.
+        self._request("write")
+
+        key = self._normalize(key)
+
+        with self._cond:
+            self._expire_keys()
+
+            if key in self._expiries and ttl is not None:
+                self._expiries[key] = time.monotonic() + ttl
+
+            if key in self._dirs:
+                return etcd.EtcdResult("update", {"key": key, "dir": True})
+
+            if key not in self._nodes:
+                raise etcd.EtcdKeyNotFound(f"Key not found : {key}", {"errorCode": 100})
+
+            return self._result("update", key)
+
+    def delete(self, key: str, recursive: bool = False, **kwargs: Any) -> etcd.EtcdResult:
+        self._request("delete")
+
+        key = self._normalize(key)
+
+        with self._cond:
+            self._expire_keys()
+
+            keys = [key] if key in self._nodes else []
+            if recursive:
+                keys += self._children(key)
+
+            if not keys and key not in self._dirs:
+                raise etcd.EtcdKeyNotFound(f"Key not found : {key}", {"errorCode": 100})
+
+            if "prevValue" in kwargs and (
+                key not in self._nodes or self._nodes[key][0] != kwargs["prevValue"]
+            ):
+                raise etcd.EtcdCompareFailed(f"Compare failed : {key}", {"errorCode": 101})
+
+            for k in keys:
+                self._index += 1
+
+                del self._nodes[k]
+                self._expiries.pop(k, None)
+
+                self._events.append((self._index, "delete", k, None))
+
+            self._dirs.discard(key)
+            self._expiries.pop(key, None)
+
+            self._notify()
+
+            return etcd.EtcdResult("delete", {"key": key, "modifiedIndex": self._index})
+
+    def _wait(
+        self, key: str, recursive: bool, wait_index: Optional[int], timeout: Optional[float]
+    ) -> etcd.EtcdResult:
+        if wait_index is None:
+            wait_index = self._index + 1
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            self._expire_keys()
+
+            if self._events and wait_index < self._events[0][0]:
+                raise etcd.EtcdEventIndexCleared(
+                    "The event in requested index is outdated and cleared", {"errorCode": 401}
+                )
+
+            for index, action, event_key, value in self._events:
+                if index < wait_index:
+                    continue
+
+                if event_key == key or (recursive and event_key.startswith(key + "/")):
+                    self.stats["nodes_read"] += 1
+
+                    node = {"key": event_key, "modifiedIndex": index, "createdIndex": index}
+                    if value is not None:
+                        node["value"] = value
+                    elif action not in ("delete", "expire"):
+                        node["dir"] = True
+
+                    result = etcd.EtcdResult(action, node)
+                    result.etcd_index = self._index
+
+                    return result
+
+            now = time.monotonic()
+
+            remaining = None if deadline is None else deadline - now
+            if remaining is not None and remaining <= 0:
+                raise etcd.EtcdWatchTimedOut("Watch timed out")
+
+            # Wake up for the next expiry, which may be the event we wait for.
+            if self._expiries:
+                next_expiry = min(self._expiries.values()) - now
+                remaining = next_expiry if remaining is None else min(remaining, next_expiry)
+
+            self._cond.wait(max(remaining, 0.001) if remaining is not None else None)
+
+    def _expire_keys(self) -> None:
+        now = time.monotonic()
+
+        expired = [key for key, expiry in self._expiries.items() if expiry <= now]
+        if not expired:
+            return
+
+        for key in sorted(expired):
+            if key not in self._expiries:
+                continue
+
+            # A directory expires along with the keys in it.
+            for k in [key] + self._children(key):
+                self._nodes.pop(k, None)
+                self._expiries.pop(k, None)
+
+            for d in [d for d in self._dirs if d == key or d.startswith(key.rstrip("/") + "/")]:
+                self._dirs.discard(d)
+                self._expiries.pop(d, None)
+
+            self._index += 1
+
+            self._events.append((self._index, "expire", key, None))
+
+        self._notify()
+
+    def _notify(self) -> None:
+        del self._events[: -self._history]
+
+        self._cond.notify_all()
+
+    def _request(self, kind: str) -> None:
+        self.stats["requests"] += 1
+        self.stats[kind + "s"] += 1
+
+        if self._latency > 0:
+            time.sleep(self._latency)
+
+    def _children(self, key: str) -> List[str]:
+        prefix = key.rstrip("/") + "/"
+        return [k for k in self._nodes if k.startswith(prefix)]
+
+    def _node(self, key: str) -> Dict[str, Any]:
+        value, created_index, modified_index = self._nodes[key]
+        return {
+            "key": key,
+            "value": value,
+            "createdIndex": created_index,
+            "modifiedIndex": modified_index,
+        }
+
+    def _result(self, action: str, key: str) -> etcd.EtcdResult:
+        return etcd.EtcdResult(action, self._node(key))
+
+    @staticmethod
+    def _normalize(key: str) -> str:
+        key = "/" + key.strip("/")
+        return key
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+An in-process stand-in for an etcd v3 server and the ``etcd3.Etcd3Client``
+methods used by the etcd v3 store, for benchmarks that need etcd v3 semantics
+(revisions, transactions, watches from a revision) without a server. The
+operations and comparisons of transactions are the ones of
+``etcd3.transactions``.
+
+Leases are accepted but keys never expire.
+"""
+
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+import etcd3  # type: ignore[import]
+from etcd3 import etcdrpc, transactions  # type: ignore[import]
+
+
+class InMemoryEtcd3Client:
+    """Holds the keys of an in-memory etcd v3 and serves them through a subset
+    of the ``etcd3.Etcd3Client`` interface. The same instance can be shared by
+    any number of simulated agents.
+
+    Args:
+        latency:
+            The time, in seconds, that every request takes in addition to the
+            time it blocks for.
+    """
+
+    transactions = etcd3.Transactions()
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.stats: Counter = Counter()
+
+        self._latency = latency
+
+        self._cond = threading.Condition()
+
+        # key -> (value, create revision, mod revision, version)
+        self._kvs: Dict[bytes, Tuple[bytes, int, int, int]] = {}
+
+        # (revision, key)
+        self._events: List[Tuple[int, bytes]] = []
+
+        self._revision = 1
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Any]:
+        self._request("range")
+
+        with self._cond:
+            return self._get(self._to_bytes(key))
+
+    def get_response(self, key: str) -> Any:
+        self._request("range")
+
+        with self._cond:
+            value, metadata = self._get(self._to_bytes(key))
+
+            kvs = [] if value is None else [SimpleNamespace(value=value, **vars(metadata))]
+
+            return SimpleNamespace(kvs=kvs, header=SimpleNamespace(revision=self._revision))
+
+    def put(self, key: str, value: Any, lease: Any = None, prev_kv: bool = False) -> None:
+        self._request("put")
+
+        with self._cond:
+            self._put(self._to_bytes(key), self._to_bytes(value))
+
+    def delete(self, key: str) -> bool:
+        self._request("delete_range")
+
+        with self._cond:
+            return self._delete(self._to_bytes(key))
+
+    def transaction(
+        self, compare: List[Any], success: List[Any] = None, failure: List[Any] = None
+    ) -> Tuple[bool, List[Any]]:
+        self._request("txn")
+
+        with self._cond:
+            succeeded = all(self._compare(c) for c in compare)
+            if not succeeded:
+                self.stats["failed_txns"] += 1
+
+            responses: List[Any] = []
+            for op in (success if succeeded else failure) or []:
+                key = self._to_bytes(op.key)
+                if isinstance(op, transactions.Put):
+                    self._put(key, self._to_bytes(op.value))
+
+                    responses.append(SimpleNamespace())
+                elif isinstance(op, transactions.Get) and op.range_end is not None:
+                    range_end = self._to_bytes(op.range_end)
+
+                    keys = sorted(k for k in self._kvs if key <= k < range_end)
+
+                    responses.append([self._get(k) for k in keys])
+                elif isinstance(op, transactions.Get):
+                    value, metadata = self._get(key)
+
+                    responses.append([] if value is None else [(value, metadata)])
+                elif isinstance(op, transactions.Delete):
+                    self._delete(key)
+
+                    responses.append(SimpleNamespace())
+                else:
+                    raise ValueError(f"Unsupported operation {op!r}")
+
+            return succeeded, responses
+
+    def watch_once(self, key: str, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        self._request("watch")
+
+        key = self._to_bytes(key)
+
+        start_revision = kwargs.get("start_revision")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            if start_revision is None:
+                start_revision = self._revision + 1
+
+            while True:
+                for revision, event_key in self._events:
+                    if revision >= start_revision and event_key == key:
+                        return SimpleNamespace(key=key, mod_revision=revision)
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise etcd3.exceptions.WatchTimedOut()
+
+                self._cond.wait(remaining)
+
+    def _compare(self, compare: Any) -> bool:
+        value, create_revision, mod_revision, version = self._kvs.get(
+            self._to_bytes(compare.key), (None, 0, 0, 0)
+        )
+
+        if isinstance(compare, transactions.Value):
+            actual, expected = value, self._to_bytes(compare.value)
+        elif isinstance(compare, transactions.Version):
+            actual, expected = version, compare.value
+        elif isinstance(compare, transactions.Create):
+            actual, expected = create_revision, compare.value
+        elif isinstance(compare, transactions.Mod):
+            actual, expected = mod_revision, compare.value
+        else:
+            raise ValueError(f"Unsupported comparison {compare!r}")
+
+        if compare.op == etcdrpc.Compare.EQUAL:
+            return actual == expected
+        if compare.op == etcdrpc.Compare.NOT_EQUAL:
+            return actual != expected
+        if actual is None:
+            return False
+        if compare.op == etcdrpc.Compare.LESS:
+            return actual < expected
+        return actual > expected
+
+    def _get(self, key: bytes) -> Tuple[Optional[bytes], Any]:
+        if key not in self._kvs:
+            return None, None
+
+        value, create_revision, mod_revision, version = self._kvs[key]
+
+        metadata = SimpleNamespace(
+            key=key,
+            create_revision=create_revision,
+            mod_revision=mod_revision,
+            version=version,
+            lease_id=0,
+        )
+
+        return value, metadata
+
+    def _put(self, key: bytes, value: bytes) -> None:
+        self._revision += 1
+
+        _, create_revision, _, version = self._kvs.get(key, (None, self._revision, 0, 0))
+
+        self._kvs[key] = (value, create_revision, self._revision, version + 1)
+
+        self._events.append((self._revision, key))
+
+        self._cond.notify_all()
+
+    def _delete(self, key: bytes) -> bool:
+        if key not in self._kvs:
+            return False
+
+        self._revision += 1
+
+        del self._kvs[key]
+
+        self._events.append((self._revision, key))
+
+        self._cond.notify_all()
+
+        return True
+
+    def _request(self, kind: str) -> None:
+        self.stats["requests"] += 1
+        self.stats[kind + "s"] += 1
+
+        if self._latency > 0:
+            time.sleep(self._latency)
+
+    @staticmethod
+    def _to_bytes(value: Any) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures the size of the rendezvous state as written to etcd (base64) and to a
+C10d store (raw) with and without zlib compression, and the time it takes to
+compress and decompress it, for a sweep of participant counts.
+
+The FQDNs follow a typical cluster naming scheme; ``--nodes-per-host`` nodes
+share a host, as the local agents of a multi-GPU machine would.
+
+::
+
+    python rendezvous_compression.py --nodes 64 256 1024 4096 --levels 1 6 9
+"""
+
+import argparse
+import timeit
+from base64 import b64encode
+from datetime import datetime, timedelta
+
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    RendezvousStateCompression,
+    _NodeDesc,
+    _RendezvousState,
+    _RendezvousStateCodec,
+)
+
+
+def _make_state(num_nodes: int, nodes_per_host: int) -> bytes:
+    state = _RendezvousState()
+    state.complete = True
+
+    now = datetime.utcnow()
+    for rank in range(num_nodes):
+        host = rank // nodes_per_host
+
+        node = _NodeDesc(
+            f"trainer-{host:05d}.rack-{host // 32:03d}.dc1.cluster.example.com", 1000 + rank, 0
+        )
+
+        state.participants[node] = rank
+        state.last_heartbeats[node] = now - timedelta(milliseconds=rank % 5000)
+
+    return _RendezvousStateCodec().encode(state)
+
+
+def _time_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[64, 256, 1024, 4096])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--nodes-per-host", type=int, default=8)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'nodes':>6} {'level':>6} {'raw (B)':>9} {'etcd (B)':>9} "
+        f"{'ratio':>6} {'compress (us)':>14} {'decompress (us)':>16}"
+    )
+    for num_nodes in args.nodes:
+        state = _make_state(num_nodes, args.nodes_per_host)
+
+        print(
+            f"{num_nodes:>6} {'-':>6} {len(state):>9} {len(b64encode(state)):>9} "
+            f"{1:>6.2f} {'-':>14} {'-':>16}"
+        )
+
+        for level in args.levels:
+            compression = RendezvousStateCompression(level, threshold=0)
+
+            value = compression.compress(state)
+
+            assert compression.decompress(value) == state
+
+            compress_us = _time_us(lambda: compression.compress(state), args.number)
+            decompress_us = _time_us(lambda: compression.decompress(value), args.number)
+
+            print(
+                f"{num_nodes:>6} {level:>6} {len(value):>9} {len(b64encode(value)):>9} "
+                f"{len(value) / len(state):>6.2f} {compress_us:>14.1f} {decompress_us:>16.1f}"
+            )
+
+    stats = compression.stats
+    print()
+    print(
+        f"stats of the last compression: {stats.compressed} states, ratio {stats.ratio:.2f}, "
+        f"{stats.encode_time / stats.compressed * 1e6:.1f} us to compress and "
+        f"{stats.decode_time / stats.decoded * 1e6:.1f} us to decompress on average"
+    )
+
+
+if __name__ == "__main__":
+    main()
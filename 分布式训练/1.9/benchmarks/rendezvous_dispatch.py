@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures how long the threads of one dynamic rendezvous handler wait for each
+other against a slow backend: a monitor thread polling ``num_nodes_waiting()``
+like the agent's main loop, ``--readers`` threads polling ``is_closed()``, and
+the keep-alive timer.
+
+``serial`` is the previous behavior, where every caller takes the handler lock
+and then runs its own sync; ``coalesced`` is the dispatcher of the handler,
+where a query arriving while another operation is in flight is answered from
+the state that operation syncs.
+
+::
+
+    python rendezvous_dispatch.py --latency 0.05 --readers 2 --duration 10
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from torch.distributed import HashStore
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    DynamicRendezvousHandler,
+    RendezvousSettings,
+    RendezvousTimeout,
+    _BackendRendezvousStateHolder,
+    _NodeDesc,
+    _RendezvousDispatcher,
+    _RendezvousKeepAliveOp,
+    _RendezvousState,
+    _RendezvousStateCache,
+    _RendezvousStateCodec,
+)
+
+from in_memory_backend import InMemoryRendezvousBackend
+
+
+class _SerialDispatcher(_RendezvousDispatcher):
+    """Runs every query and heartbeat on its own once the lock is free."""
+
+    def query(self, fn: Callable[[_RendezvousState], Any]) -> Any:
+        with self._cond:
+            self._wait_until_idle()
+
+            self._busy = True
+
+        failed = True
+        try:
+            self._state_holder.sync()
+
+            result = fn(self._state_holder.state)
+
+            failed = False
+
+            return result
+        finally:
+            self._release(failed)
+
+    def keep_alive(self, deadline: float) -> None:
+        self.run(_RendezvousKeepAliveOp(), deadline)
+
+
+def _run(args: argparse.Namespace, serial: bool) -> Dict[str, Any]:
+    backend = InMemoryRendezvousBackend(latency=args.latency)
+
+    settings = RendezvousSettings(
+        "bench",
+        1,
+        2,
+        RendezvousTimeout(),
+        keep_alive_interval=timedelta(seconds=args.keep_alive_interval),
+        keep_alive_max_attempt=3,
+    )
+
+    node = _NodeDesc("localhost", 1, 0)
+
+    state = _RendezvousState()
+    state.complete = True
+    state.participants[node] = 0
+    state.last_heartbeats[node] = datetime.utcnow()
+
+    backend.set_state(_RendezvousStateCodec().encode(state))
+
+    state_holder = _BackendRendezvousStateHolder(
+        backend, settings, state_cache=_RendezvousStateCache()
+    )
+
+    handler = DynamicRendezvousHandler(node, settings, backend.name, HashStore(), state_holder)
+
+    if serial:
+        handler._dispatcher = _SerialDispatcher(state_holder, handler._op_executor)
+
+    handler._state_holder.sync()
+    handler._start_heartbeats()
+
+    backend.stats.clear()
+
+    stop = threading.Event()
+
+    latencies: List[float] = []
+
+    def monitor() -> None:
+        while not stop.is_set():
+            start = time.monotonic()
+
+            handler.num_nodes_waiting()
+
+            latencies.append(time.monotonic() - start)
+
+            time.sleep(args.period)
+
+    def read() -> None:
+        while not stop.is_set():
+            handler.is_closed()
+
+            time.sleep(args.period)
+
+    threads = [threading.Thread(target=monitor)]
+    threads += [threading.Thread(target=read) for _ in range(args.readers)]
+
+    for t in threads:
+        t.start()
+
+    time.sleep(args.duration)
+
+    stop.set()
+    for t in threads:
+        t.join()
+
+    handler._stop_heartbeats()
+
+    stats = handler.get_dispatch_stats()
+
+    num_ops = (
+        backend.stats["state_reads"]
+        + backend.stats["state_writes"]
+        + backend.stats["failed_state_writes"]
+    )
+
+    return {
+        "monitor_ms_mean": statistics.mean(latencies) * 1000,
+        "monitor_ms_max": max(latencies) * 1000,
+        "lock_wait_ms_mean": stats.mean_lock_wait_time * 1000,
+        "lock_wait_ms_max": stats.max_lock_wait_time * 1000,
+        "backend_ops_per_s": num_ops / args.duration,
+        "coalesced_reads": stats.coalesced_reads,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05, help="The backend RTT in seconds.")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--period", type=float, default=0.05, help="The polling period.")
+    parser.add_argument("--keep-alive-interval", type=float, default=0.2)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':>10} {'monitor mean (ms)':>18} {'monitor max (ms)':>17} "
+        f"{'wait mean (ms)':>15} {'wait max (ms)':>14} {'backend ops/s':>14} {'coalesced':>10}"
+    )
+    for mode, serial in (("serial", True), ("coalesced", False)):
+        result = _run(args, serial)
+
+        print(
+            f"{mode:>10} {result['monitor_ms_mean']:>18.1f} {result['monitor_ms_max']:>17.1f} "
+            f"{result['lock_wait_ms_mean']:>15.1f} {result['lock_wait_ms_max']:>14.1f} "
+            f"{result['backend_ops_per_s']:>14.1f} {result['coalesced_reads']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
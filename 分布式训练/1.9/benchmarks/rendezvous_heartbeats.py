@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Counts the backend writes of an idle rendezvous, i.e. one that has completed
+and where the nodes only send keep-alive heartbeats, when the heartbeats are
+written to the shared state (the old behavior) versus to per-node keys.
+
+The keep-alive interval is scaled down by ``--interval`` to keep the run short;
+the rates are reported per minute for the default interval of 5 seconds.
+
+::
+
+    python rendezvous_heartbeats.py --nodes 512 --interval 3 --duration 30
+"""
+
+import argparse
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from torch.distributed import HashStore
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    DynamicRendezvousHandler,
+    RendezvousSettings,
+    RendezvousTimeout,
+    _BackendRendezvousStateHolder,
+    _RendezvousState,
+    _RendezvousStateCache,
+    _RendezvousStateCodec,
+)
+
+from in_memory_backend import InMemoryRendezvousBackend
+
+# The keep-alive interval used by ``DynamicRendezvousHandler.from_backend``.
+_DEFAULT_INTERVAL = 5.0
+
+
+def _run_idle(
+    num_nodes: int, per_node_heartbeats: bool, interval: float, duration: float
+) -> Tuple[Dict[str, float], int]:
+    backend = InMemoryRendezvousBackend()
+    store = HashStore()
+
+    settings = RendezvousSettings(
+        "bench",
+        num_nodes,
+        num_nodes,
+        RendezvousTimeout(heartbeat=timedelta(seconds=max(interval, 5))),
+        keep_alive_interval=timedelta(seconds=interval),
+        keep_alive_max_attempt=3,
+    )
+
+    handlers = []
+    for _ in range(num_nodes):
+        node = DynamicRendezvousHandler._node_desc_generator.generate()
+
+        # Do not let the simulated nodes share the state cache of the process.
+        state_holder = _BackendRendezvousStateHolder(
+            backend,
+            settings,
+            per_node_heartbeats=per_node_heartbeats,
+            state_cache=_RendezvousStateCache(),
+        )
+
+        handlers.append(
+            DynamicRendezvousHandler(node, settings, backend.name, store, state_holder)
+        )
+
+    # Skip the join phase and start from a completed rendezvous.
+    state = _RendezvousState()
+    state.complete = True
+
+    now = datetime.utcnow()
+    for rank, handler in enumerate(handlers):
+        state.participants[handler._this_node] = rank
+        state.last_heartbeats[handler._this_node] = now
+
+    backend.set_state(_RendezvousStateCodec().encode(state))
+
+    for handler in handlers:
+        handler._state_holder.sync()
+        handler._start_heartbeats()
+
+    # Let the timers of the nodes spread out before measuring.
+    time.sleep(interval)
+
+    start_stats = Counter(backend.stats)
+    start = time.monotonic()
+
+    time.sleep(duration)
+
+    stats = backend.stats - start_stats
+    elapsed = time.monotonic() - start
+
+    for handler in handlers:
+        handler._stop_heartbeats()
+
+    # Scale the counts to one minute of the default keep-alive interval.
+    scale = 60.0 / elapsed * interval / _DEFAULT_INTERVAL
+
+    rates = {name: count * scale for name, count in stats.items()}
+
+    # The number of nodes considered dead by at least one other node.
+    dead_nodes = set()
+    for handler in handlers:
+        handler._state_holder.sync()
+        dead_nodes.update(
+            h._this_node
+            for h in handlers
+            if h._this_node not in handler._state_holder.state.participants
+        )
+
+    return rates, len(dead_nodes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=512)
+    parser.add_argument("--interval", type=float, default=3.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+
+    columns = [
+        "state_writes",
+        "failed_state_writes",
+        "state_reads",
+        "heartbeat_writes",
+        "heartbeat_reads",
+        "bytes_written",
+    ]
+
+    print(f"{args.nodes} idle nodes, per minute:")
+    print(f"{'mode':>12} " + " ".join(f"{c:>19}" for c in columns) + f" {'dead nodes':>10}")
+    for per_node_heartbeats in (False, True):
+        rates, num_dead = _run_idle(args.nodes, per_node_heartbeats, args.interval, args.duration)
+
+        mode = "per-node" if per_node_heartbeats else "shared"
+
+        print(
+            f"{mode:>12} "
+            + " ".join(f"{rates.get(c, 0):>19.0f}" for c in columns)
+            + f" {num_dead:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures the cost of removing the dead nodes from the rendezvous state after a
+sync, for a sweep of participant counts.
+
+``scan`` is the previous approach, a pass over all heartbeats on every sync;
+``sanitize`` is the expiry heap of :py:class:`_BackendRendezvousStateHolder`
+once it has been built. The two ``sync`` columns are the cost of a whole sync
+against a zero-latency backend when the state has not changed since the last
+one (the heap and the decoded state are reused) and when it has (the state is
+decoded and the heap rebuilt).
+
+::
+
+    python rendezvous_sanitize.py --nodes 64 256 1024 4096 8192
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable
+
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    RendezvousSettings,
+    RendezvousTimeout,
+    _BackendRendezvousStateHolder,
+    _NodeDesc,
+    _RendezvousState,
+    _RendezvousStateCodec,
+)
+
+from in_memory_backend import InMemoryRendezvousBackend
+
+
+def _time_us(fn: Callable[[], object], number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def _make_holder(num_nodes: int, num_dead: int) -> _BackendRendezvousStateHolder:
+    backend = InMemoryRendezvousBackend()
+
+    settings = RendezvousSettings(
+        "bench",
+        num_nodes,
+        num_nodes,
+        RendezvousTimeout(),
+        keep_alive_interval=timedelta(seconds=5),
+        keep_alive_max_attempt=3,
+    )
+
+    state = _RendezvousState()
+    state.complete = True
+
+    now = datetime.utcnow()
+    for rank in range(num_nodes):
+        node = _NodeDesc(f"trainer-{rank:05d}.cluster.example.com", 1000 + rank, 0)
+
+        state.participants[node] = rank
+        # Spread the heartbeats over the last keep-alive interval, and let the
+        # last ``num_dead`` nodes expire.
+        if rank < num_nodes - num_dead:
+            state.last_heartbeats[node] = now - timedelta(milliseconds=rank % 5000)
+        else:
+            state.last_heartbeats[node] = now - timedelta(minutes=1)
+
+    backend.set_state(_RendezvousStateCodec().encode(state))
+
+    # Always go to the backend, like a node that is waiting for others.
+    return _BackendRendezvousStateHolder(backend, settings, cache_duration=0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[64, 256, 1024, 4096, 8192])
+    parser.add_argument("--dead", type=int, default=1, help="The number of dead nodes.")
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    print(
+        f"{'nodes':>6} {'scan (us)':>10} {'sanitize (us)':>14} "
+        f"{'sync, same token (us)':>22} {'sync, new token (us)':>21}"
+    )
+    for num_nodes in args.nodes:
+        holder = _make_holder(num_nodes, args.dead)
+        holder.sync()
+
+        assert len(holder._dead_nodes) == args.dead
+
+        settings = holder._settings
+
+        def scan() -> None:
+            expire_time = datetime.utcnow() - (
+                settings.keep_alive_interval * settings.keep_alive_max_attempt
+            )
+
+            [
+                node
+                for node, last_heartbeat in holder.state.last_heartbeats.items()
+                if last_heartbeat < expire_time
+            ]
+
+        backend = holder._backend
+
+        def sync_new_token() -> None:
+            # Bump the token without changing the state itself.
+            state_bits, token = backend.get_state()
+            backend.set_state(state_bits, token)
+
+            holder.sync()
+
+        scan_us = _time_us(scan, args.number)
+        sanitize_us = _time_us(holder._sanitize, args.number)
+        sync_same_us = _time_us(holder.sync, args.number)
+        sync_new_us = _time_us(sync_new_token, args.number)
+
+        print(
+            f"{num_nodes:>6} {scan_us:>10.1f} {sanitize_us:>14.1f} "
+            f"{sync_same_us:>22.1f} {sync_new_us:>21.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Simulates a dynamic rendezvous of ``N`` nodes in a single process. Each node is
+a :py:class:`DynamicRendezvousHandler` running in its own thread against an
+in-memory backend with a configurable latency, jitter, and failure rate.
+
+The following scenarios are run, each against a fresh backend:
+
+- ``cold_start``: ``N`` nodes join an empty rendezvous at the same time.
+- ``node_leave``: one node of a complete round dies; the remaining nodes
+  re-rendezvous once its heartbeat has expired.
+- ``burst_join``: ``k`` nodes join a complete round at the same time; the
+  existing nodes re-rendezvous to admit them.
+
+For each scenario a JSON object is written on its own line with the time it
+took to complete the round, the backend operation counts, the CAS failure rate,
+the bytes transferred, and the CPU time spent per node.
+
+::
+
+    python rendezvous_scale.py --nodes 1024 --burst 64 --latency 0.002 --jitter 0.002
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from torch.distributed import HashStore
+from torch.distributed.elastic.rendezvous import RendezvousError
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    DynamicRendezvousHandler,
+    RendezvousSettings,
+    RendezvousTimeout,
+    _BackendRendezvousStateHolder,
+    _RendezvousState,
+    _RendezvousStateCache,
+    _RendezvousStateCodec,
+)
+
+from in_memory_backend import InMemoryRendezvousBackend
+
+
+class _Simulation:
+    """Holds the nodes of a simulated rendezvous and their counters."""
+
+    def __init__(self, args: argparse.Namespace, run_id: str, min_nodes: int, max_nodes: int):
+        self.args = args
+
+        self.backend = InMemoryRendezvousBackend(
+            latency=args.latency,
+            jitter=args.jitter,
+            failure_rate=args.failure_rate,
+            seed=args.seed,
+        )
+
+        self.store = HashStore()
+
+        self.settings = RendezvousSettings(
+            run_id,
+            min_nodes,
+            max_nodes,
+            RendezvousTimeout(
+                join=timedelta(seconds=args.join_timeout),
+                last_call=timedelta(seconds=args.last_call_timeout),
+            ),
+            keep_alive_interval=timedelta(seconds=args.keep_alive_interval),
+            keep_alive_max_attempt=args.keep_alive_max_attempt,
+        )
+
+        self.handlers: List[DynamicRendezvousHandler] = []
+
+        self.cpu_times: Dict[int, float] = {}
+
+        self.errors = 0
+
+        self._lock = threading.Lock()
+
+    def add_nodes(self, num_nodes: int) -> List[DynamicRendezvousHandler]:
+        handlers = []
+        for _ in range(num_nodes):
+            node = DynamicRendezvousHandler._node_desc_generator.generate()
+
+            # Each node is a separate process in a real job; do not let the
+            # simulated nodes share the state cache of this process.
+            state_holder = _BackendRendezvousStateHolder(
+                self.backend,
+                self.settings,
+                per_node_heartbeats=self.args.per_node_heartbeats,
+                state_cache=_RendezvousStateCache(),
+            )
+
+            handlers.append(
+                DynamicRendezvousHandler(
+                    node, self.settings, self.backend.name, self.store, state_holder
+                )
+            )
+
+        self.handlers += handlers
+
+        return handlers
+
+    def form_round(self, handlers: List[DynamicRendezvousHandler]) -> None:
+        """Writes a complete round with ``handlers`` as its participants to the
+        backend without going through the join protocol."""
+        state = _RendezvousState()
+        state.complete = True
+
+        now = datetime.utcnow()
+        for rank, handler in enumerate(handlers):
+            state.participants[handler._this_node] = rank
+            state.last_heartbeats[handler._this_node] = now
+
+        self.backend.set_state(_RendezvousStateCodec().encode(state))
+
+        for handler in handlers:
+            handler._state_holder.sync()
+            handler._start_heartbeats()
+
+        self.reset_counters()
+
+    def join(self, handlers: List[DynamicRendezvousHandler]) -> float:
+        """Runs the next rendezvous on ``handlers`` concurrently and returns the
+        time it took for all of them to join."""
+        barrier = threading.Barrier(len(handlers) + 1)
+
+        def run(handler: DynamicRendezvousHandler) -> None:
+            barrier.wait()
+
+            cpu_start = time.thread_time()
+
+            # Like an agent whose rendezvous has failed, retry until it works.
+            for _ in range(self.args.max_retries + 1):
+                try:
+                    handler.next_rendezvous()
+                    break
+                except RendezvousError:
+                    with self._lock:
+                        self.errors += 1
+
+            cpu_time = time.thread_time() - cpu_start
+
+            with self._lock:
+                key = id(handler)
+                self.cpu_times[key] = self.cpu_times.get(key, 0.0) + cpu_time
+
+        threads = [threading.Thread(target=run, args=(h,), daemon=True) for h in handlers]
+        for t in threads:
+            t.start()
+
+        barrier.wait()
+
+        start = time.monotonic()
+        for t in threads:
+            t.join()
+        return time.monotonic() - start
+
+    def reset_counters(self) -> None:
+        self.backend.stats.clear()
+
+        self.cpu_times.clear()
+
+        self.errors = 0
+
+        for handler in self.handlers:
+            stats = handler._op_executor.stats
+            stats.conflicts = stats.retries = stats.wasted_bytes = 0
+
+    def stop(self) -> None:
+        for handler in self.handlers:
+            handler._stop_heartbeats()
+
+    def report(self, scenario: str, round_time: float) -> Dict[str, Any]:
+        stats = Counter(self.backend.stats)
+
+        num_writes = stats["state_writes"] + stats["failed_state_writes"]
+
+        cpu_times = list(self.cpu_times.values()) or [0.0]
+
+        executor_stats = Counter()
+        for handler in self.handlers:
+            executor_stats.update(vars(handler._op_executor.stats))
+
+        return {
+            "scenario": scenario,
+            "nodes": len(self.handlers),
+            "round_time_s": round(round_time, 4),
+            "state_gets": stats["state_reads"],
+            "state_sets": num_writes,
+            "cas_failures": stats["failed_state_writes"],
+            "cas_failure_rate": round(stats["failed_state_writes"] / max(num_writes, 1), 4),
+            "heartbeat_gets": stats["heartbeat_reads"],
+            "heartbeat_sets": stats["heartbeat_writes"],
+            "bytes_sent": stats["bytes_sent"],
+            "bytes_received": stats["bytes_received"],
+            "injected_failures": stats["injected_failures"],
+            "node_errors": self.errors,
+            "replays": executor_stats["retries"],
+            "cpu_ms_per_node_mean": round(statistics.mean(cpu_times) * 1000, 3),
+            "cpu_ms_per_node_max": round(max(cpu_times) * 1000, 3),
+        }
+
+
+def _cold_start(args: argparse.Namespace) -> Dict[str, Any]:
+    sim = _Simulation(args, "cold_start", args.nodes, args.nodes)
+    try:
+        handlers = sim.add_nodes(args.nodes)
+
+        round_time = sim.join(handlers)
+
+        return sim.report("cold_start", round_time)
+    finally:
+        sim.stop()
+
+
+def _node_leave(args: argparse.Namespace) -> Dict[str, Any]:
+    sim = _Simulation(args, "node_leave", args.nodes - 1, args.nodes)
+    try:
+        handlers = sim.add_nodes(args.nodes)
+
+        sim.form_round(handlers)
+
+        # The last node dies without leaving the rendezvous; the others have
+        # to wait for its heartbeat to expire, and then for the last call
+        # since the maximum number of nodes cannot be reached anymore.
+        dead_handler = handlers.pop()
+        dead_handler._stop_heartbeats()
+
+        sim.handlers.remove(dead_handler)
+
+        round_time = sim.join(handlers)
+
+        return sim.report("node_leave", round_time)
+    finally:
+        sim.stop()
+
+
+def _burst_join(args: argparse.Namespace) -> Dict[str, Any]:
+    # The new round completes as soon as all nodes have joined; it does not
+    # depend on the last call.
+    num_nodes = args.nodes + args.burst
+
+    sim = _Simulation(args, "burst_join", num_nodes, num_nodes)
+    try:
+        handlers = sim.add_nodes(args.nodes)
+
+        sim.form_round(handlers)
+
+        new_handlers = sim.add_nodes(args.burst)
+
+        start = time.monotonic()
+
+        new_nodes_thread = threading.Thread(
+            target=sim.join, args=(new_handlers,), daemon=True
+        )
+        new_nodes_thread.start()
+
+        # Like the agents of the existing nodes, which periodically check for
+        # waiting nodes, re-rendezvous once the new nodes are waiting.
+        while handlers[0].num_nodes_waiting() < args.burst:
+            time.sleep(0.1)
+
+        sim.join(handlers)
+
+        new_nodes_thread.join()
+
+        return sim.report("burst_join", time.monotonic() - start)
+    finally:
+        sim.stop()
+
+
+_SCENARIOS = {
+    "cold_start": _cold_start,
+    "node_leave": _node_leave,
+    "burst_join": _burst_join,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--nodes", type=int, default=256)
+    parser.add_argument("--burst", type=int, default=16, help="The number of nodes joining at once.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(_SCENARIOS), default=list(_SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.001, help="The backend RTT in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.001, help="The backend jitter in seconds.")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--per-node-heartbeats", action="store_true")
+    parser.add_argument("--keep-alive-interval", type=float, default=5.0)
+    parser.add_argument("--keep-alive-max-attempt", type=int, default=3)
+    parser.add_argument("--last-call-timeout", type=float, default=1.0)
+    parser.add_argument("--join-timeout", type=float, default=60.0)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="The file to append the results to. Defaults to stdout.")
+    args = parser.parse_args()
+
+    if args.nodes < 2:
+        parser.error("The number of nodes must be at least 2.")
+
+    config = {
+        name: getattr(args, name)
+        for name in (
+            "latency",
+            "jitter",
+            "failure_rate",
+            "per_node_heartbeats",
+            "keep_alive_interval",
+            "keep_alive_max_attempt",
+            "last_call_timeout",
+            "seed",
+        )
+    }
+
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for scenario in args.scenarios:
+            result = _SCENARIOS[scenario](args)
+
+            result["config"] = config
+
+            out.write(json.dumps(result, sort_keys=True) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
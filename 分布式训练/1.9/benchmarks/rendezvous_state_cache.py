@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Counts the backend reads caused by handlers of the same rendezvous in one
+process that poll ``num_nodes_waiting()``, like the monitor loop of an agent,
+with the previous fixed one-second cache per handler and with the adaptive
+state cache shared by all handlers.
+
+Two phases are run: ``stable``, where the state does not change, and
+``churn``, where another node writes the state every ``--change-interval``
+seconds as it would during a rendezvous.
+
+::
+
+    python rendezvous_state_cache.py --handlers 8 --period 0.05 --duration 30
+"""
+
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from torch.distributed import HashStore
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    DynamicRendezvousHandler,
+    RendezvousSettings,
+    RendezvousTimeout,
+    _BackendRendezvousStateHolder,
+    _NodeDesc,
+    _RendezvousState,
+    _RendezvousStateCache,
+    _RendezvousStateCodec,
+)
+
+from in_memory_backend import InMemoryRendezvousBackend
+
+
+def _run(
+    args: argparse.Namespace, run_id: str, cache_duration: Optional[float], churn: bool
+) -> Dict[str, Optional[float]]:
+    backend = InMemoryRendezvousBackend(latency=args.latency)
+
+    settings = RendezvousSettings(
+        run_id,
+        1,
+        args.handlers,
+        RendezvousTimeout(),
+        keep_alive_interval=timedelta(seconds=5),
+        keep_alive_max_attempt=3,
+    )
+
+    state = _RendezvousState()
+    state.complete = True
+    state.participants[_NodeDesc("trainer-0", 1, 0)] = 0
+    state.last_heartbeats[_NodeDesc("trainer-0", 1, 0)] = datetime.utcnow()
+
+    backend.set_state(_RendezvousStateCodec().encode(state))
+
+    store = HashStore()
+
+    # The handlers share the cache as if they had been created by
+    # create_handler with the same endpoint.
+    state_cache = _RendezvousStateCache() if cache_duration is None else None
+
+    handlers = []
+    for i in range(args.handlers):
+        state_holder = _BackendRendezvousStateHolder(
+            backend, settings, cache_duration, state_cache=state_cache
+        )
+
+        handlers.append(
+            DynamicRendezvousHandler(
+                _NodeDesc("localhost", 1, i), settings, backend.name, store, state_holder
+            )
+        )
+
+    stop = threading.Event()
+
+    num_polls = [0] * len(handlers)
+
+    def poll(idx: int) -> None:
+        while not stop.is_set():
+            handlers[idx].num_nodes_waiting()
+
+            num_polls[idx] += 1
+
+            time.sleep(args.period)
+
+    def write() -> None:
+        while not stop.wait(args.change_interval):
+            # Bump the token without changing the state itself.
+            state_bits, token = backend.get_state()
+            backend.set_state(state_bits, token)
+
+    threads = [threading.Thread(target=poll, args=(i,)) for i in range(len(handlers))]
+    if churn:
+        threads.append(threading.Thread(target=write))
+
+    for t in threads:
+        t.start()
+
+    time.sleep(args.duration)
+
+    stop.set()
+    for t in threads:
+        t.join()
+
+    # The reads of the writer.
+    num_reads = backend.stats["state_reads"] - (backend.stats["state_writes"] - 1)
+
+    result = {
+        "reads/s": num_reads / args.duration,
+        "hit rate": 1 - num_reads / sum(num_polls),
+        "reported hit rate": None,
+    }
+
+    # Only the shared cache reports its statistics.
+    stats = handlers[0].get_state_cache_stats()
+    if stats is not None:
+        result["reported hit rate"] = stats.hit_rate
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--handlers", type=int, default=8)
+    parser.add_argument("--period", type=float, default=0.05, help="The polling period.")
+    parser.add_argument("--change-interval", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"{args.handlers} handlers polling every {args.period}s")
+    print(f"{'phase':>7} {'cache':>9} {'reads/s':>9} {'hit rate':>9} {'reported':>9}")
+    for churn in (False, True):
+        phase = "churn" if churn else "stable"
+
+        for name, cache_duration in (("fixed 1s", 1), ("adaptive", None)):
+            result = _run(args, f"{phase}-{name}", cache_duration, churn)
+
+            reported = result["reported hit rate"]
+
+            print(
+                f"{phase:>7} {name:>9} {result['reads/s']:>9.1f} {result['hit rate']:>9.1%} "
+                + (f"{reported:>9.1%}" if reported is not None else f"{'-':>9}")
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Compares the size and the encode/decode latency of the rendezvous state when
+serialized with ``pickle`` (the old format) and with the binary codec, for a
+sweep of participant counts.
+
+::
+
+    python rendezvous_state_codec.py --nodes 64 256 1024 4096
+"""
+
+import argparse
+import pickle
+import timeit
+from base64 import b64encode
+from datetime import datetime, timedelta
+
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    _NodeDesc,
+    _RendezvousState,
+    _RendezvousStateCodec,
+)
+
+
+def _make_state(num_nodes: int) -> _RendezvousState:
+    state = _RendezvousState()
+
+    state.round = 7
+    state.complete = True
+
+    now = datetime.utcnow()
+
+    for i in range(num_nodes):
+        node = _NodeDesc(f"trainer-{i:05d}.cluster.example.com", 1000 + i, 0)
+
+        # Keep roughly 10% of the nodes in the wait list.
+        if i % 10 == 9:
+            state.wait_list.add(node)
+        else:
+            state.participants[node] = len(state.participants)
+
+        state.last_heartbeats[node] = now - timedelta(milliseconds=i)
+
+    return state
+
+
+def _time_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[64, 256, 1024, 4096])
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'nodes':>6} {'pickle+b64 (B)':>15} {'codec (B)':>10} "
+        f"{'pickle enc/dec (us)':>20} {'codec enc/dec (us)':>19} {'codec cold dec (us)':>20}"
+    )
+    for num_nodes in args.nodes:
+        state = _make_state(num_nodes)
+
+        codec = _RendezvousStateCodec()
+
+        pickled = pickle.dumps(state)
+        encoded = codec.encode(state)
+
+        assert vars(codec.decode(encoded)) == vars(state)
+
+        pickle_enc = _time_us(lambda: pickle.dumps(state), args.number)
+        pickle_dec = _time_us(lambda: pickle.loads(pickled), args.number)
+
+        codec_enc = _time_us(lambda: codec.encode(state), args.number)
+        codec_dec = _time_us(lambda: codec.decode(encoded), args.number)
+        codec_cold = _time_us(lambda: _RendezvousStateCodec().decode(encoded), args.number)
+
+        print(
+            f"{num_nodes:>6} {len(b64encode(pickled)):>15} {len(encoded):>10} "
+            f"{pickle_enc:>9.0f}/{pickle_dec:<10.0f} {codec_enc:>9.0f}/{codec_dec:<9.0f} "
+            f"{codec_cold:>20.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Measures the overhead of :py:mod:`tracing` on the sync and keep-alive
+heartbeat paths of a dynamic rendezvous node, with tracing off and on. Since
+:py:func:`tracing.traced` only wraps functions when ``TORCHELASTIC_TRACE`` is
+set at import time, tracing on is measured in a child process started with it.
+
+For comparison it also estimates the cost of the per-call debug logging the
+traced functions used to start with (the class name and the
+``sys._getframe()`` function name formatted into two ``log.debug`` calls),
+which was paid even when DEBUG was off: the cost of those two lines, measured
+in isolation, times the number of traced calls per operation.
+
+::
+
+    python rendezvous_tracing.py --nodes 64 --number 2000
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from torch.distributed import HashStore
+from torch.distributed.elastic.rendezvous import tracing
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    DynamicRendezvousHandler,
+    RendezvousSettings,
+    RendezvousTimeout,
+    _BackendRendezvousStateHolder,
+    _NodeDesc,
+    _RendezvousState,
+    _RendezvousStateCodec,
+)
+
+from in_memory_backend import InMemoryRendezvousBackend
+
+# Not configured, so DEBUG is off as in a default run of the agent.
+log = logging.getLogger("rendezvous_tracing_bench")
+
+
+class _Plain:
+    def call(self) -> None:
+        pass
+
+
+class _Legacy:
+    def call(self) -> None:
+        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
+        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
+
+
+class _Traced:
+    @tracing.traced
+    def call(self) -> None:
+        pass
+
+
+def _time_us(fn: Callable[[], object], number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def _make_handler(num_nodes: int) -> DynamicRendezvousHandler:
+    backend = InMemoryRendezvousBackend()
+
+    settings = RendezvousSettings(
+        "bench",
+        num_nodes,
+        num_nodes,
+        RendezvousTimeout(heartbeat=timedelta(hours=1)),
+        keep_alive_interval=timedelta(hours=1),
+        keep_alive_max_attempt=3,
+    )
+
+    # Always read the state from the backend instead of serving it from the
+    # cache, like a node that is waiting for others.
+    state_holder = _BackendRendezvousStateHolder(backend, settings, cache_duration=0)
+
+    node = _NodeDesc("localhost", 1, 0)
+
+    handler = DynamicRendezvousHandler(node, settings, backend.name, HashStore(), state_holder)
+
+    state = _RendezvousState()
+    state.complete = True
+
+    now = datetime.utcnow()
+    for rank in range(num_nodes):
+        peer = node if rank == 0 else _NodeDesc(f"trainer-{rank:05d}", 1, 0)
+
+        state.participants[peer] = rank
+        state.last_heartbeats[peer] = now
+
+    backend.set_state(_RendezvousStateCodec().encode(state))
+
+    return handler
+
+
+def _measure(args: argparse.Namespace) -> Dict[str, Any]:
+    handler = _make_handler(args.nodes)
+
+    ops = {
+        "sync": handler._state_holder.sync,
+        "heartbeat": handler._keep_alive,
+    }
+
+    # The cost of a single call with nothing but the entry instrumentation.
+    plain = _time_us(_Plain().call, args.number * 50)
+
+    result: Dict[str, Any] = {
+        "legacy": _time_us(_Legacy().call, args.number * 50) - plain,
+        "traced": _time_us(_Traced().call, args.number * 50) - plain,
+        "ops": {},
+    }
+
+    tracing.enable(buffer_size=args.number * 1000)
+
+    for name, op in ops.items():
+        # Warm the codec caches.
+        op()
+
+        tracing.clear()
+
+        op_us = _time_us(op, args.number)
+
+        # timeit.repeat ran the operation ``5 * args.number`` times.
+        result["ops"][name] = {
+            "us": op_us,
+            "calls": len(tracing.get_trace_events()) / (5 * args.number),
+        }
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=64, help="The number of participants.")
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.json:
+        print(json.dumps(_measure(args)))
+        return
+
+    if tracing.is_enabled():
+        parser.error("TORCHELASTIC_TRACE must not be set.")
+
+    off = _measure(args)
+
+    on = json.loads(
+        subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                f"--nodes={args.nodes}",
+                f"--number={args.number}",
+                "--json",
+            ],
+            env={**os.environ, "TORCHELASTIC_TRACE": "1"},
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout
+    )
+
+    print(
+        f"per call: legacy logging {off['legacy']:.3f} us, "
+        f"tracing off {off['traced']:.3f} us, tracing on {on['traced']:.3f} us"
+    )
+    print()
+    print(
+        f"{'op':>10} {'traced calls':>12} {'off (us)':>9} {'on (us)':>9} "
+        f"{'on overhead':>11} {'legacy logging (us)':>20}"
+    )
+    for name, op_off in off["ops"].items():
+        op_on = on["ops"][name]
+
+        print(
+            f"{name:>10} {op_on['calls']:>12.1f} {op_off['us']:>9.2f} {op_on['us']:>9.2f} "
+            f"{(op_on['us'] - op_off['us']) / op_off['us']:>10.1%} "
+            f"{op_on['calls'] * off['legacy']:>20.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
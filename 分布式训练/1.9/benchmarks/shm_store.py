@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Compares :py:class:`SharedMemoryStore` with a ``TCPStore`` on localhost: the
+operations per second of ``set``, ``get``, ``add``, ``compare_set`` and
+``check`` issued by one process, and the wait-wake latency between two
+processes, measured as half the round trip of a ping-pong where each side
+waits for the key set by the other.
+
+::
+
+    python shm_store.py --stores tcp shm --number 20000 --pings 2000
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict
+
+from torch.distributed import Store, TCPStore
+from torch.distributed.elastic.rendezvous.shm_store import SharedMemoryStore
+
+
+_TIMEOUT = timedelta(seconds=60)
+
+
+def _connect(kind: str, address: Any, is_master: bool = False) -> Store:
+    if kind == "tcp":
+        return TCPStore("localhost", address, is_master=is_master, timeout=_TIMEOUT)  # type: ignore[call-arg]
+    return SharedMemoryStore(address, timeout=_TIMEOUT)
+
+
+def _ops_per_s(fn: Callable[[int], Any], number: int) -> float:
+    start = time.perf_counter()
+    for i in range(number):
+        fn(i)
+    return number / (time.perf_counter() - start)
+
+
+def _pong(kind: str, address: Any, pings: int) -> None:
+    store = _connect(kind, address)
+
+    for i in range(pings):
+        store.get(f"ping{i}")
+        store.set(f"pong{i}", "1")
+
+
+def _run(args: argparse.Namespace, kind: str) -> Dict[str, Any]:
+    if kind == "tcp":
+        address: Any = args.port
+    else:
+        address = os.path.join(tempfile.mkdtemp(dir="/dev/shm"), "store")
+
+    store = _connect(kind, address, is_master=True)
+
+    store.set("key", "value")
+
+    result = {
+        "set": _ops_per_s(lambda i: store.set(f"key{i % 64}", "value"), args.number),
+        "get": _ops_per_s(lambda i: store.get(f"key{i % 64}"), args.number),
+        "add": _ops_per_s(lambda i: store.add("counter", 1), args.number),
+        "compare_set": _ops_per_s(
+            lambda i: store.compare_set("cas", str(i - 1) if i else "", str(i)), args.number
+        ),
+        "check": _ops_per_s(lambda i: store.check(["key"]), args.number),
+    }
+
+    pong = mp.get_context("spawn").Process(target=_pong, args=(kind, address, args.pings))
+    pong.start()
+
+    latencies = []
+    for i in range(args.pings):
+        start = time.perf_counter()
+
+        store.set(f"ping{i}", "1")
+        store.get(f"pong{i}")
+
+        latencies.append((time.perf_counter() - start) / 2)
+
+    pong.join()
+
+    latencies.sort()
+
+    result["wake_p50_us"] = statistics.median(latencies) * 1e6
+    result["wake_p99_us"] = latencies[int(len(latencies) * 0.99)] * 1e6
+
+    if kind == "shm":
+        os.unlink(address)
+        os.rmdir(os.path.dirname(address))
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stores", nargs="+", choices=["tcp", "shm"], default=["tcp", "shm"])
+    parser.add_argument("--number", type=int, default=20000, help="The calls per operation.")
+    parser.add_argument("--pings", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=29577, help="The port of the TCPStore.")
+    args = parser.parse_args()
+
+    print(
+        f"{'store':>6} {'set/s':>9} {'get/s':>9} {'add/s':>9} {'cas/s':>9} {'check/s':>9} "
+        f"{'wake p50 (us)':>14} {'wake p99 (us)':>14}"
+    )
+    for kind in args.stores:
+        result = _run(args, kind)
+
+        print(
+            f"{kind:>6} {result['set']:>9.0f} {result['get']:>9.0f} {result['add']:>9.0f} "
+            f"{result['compare_set']:>9.0f} {result['check']:>9.0f} "
+            f"{result['wake_p50_us']:>14.1f} {result['wake_p99_us']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
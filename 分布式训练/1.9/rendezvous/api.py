@@ -3,7 +3,6 @@
 #
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
-import sys
 import logging
 log = logging.getLogger(__name__)
 
@@ -12,6 +11,8 @@ from typing import Any, Callable, Dict, Optional, Tuple
 
 from torch.distributed import Store
 
+from .tracing import traced
+
 
 class RendezvousError(Exception):
     """Represents the base type for rendezvous errors."""
@@ -212,15 +213,11 @@ class RendezvousParameters:
         self.config = kwargs
 
     def get(self, key: str, default: Any = None) -> Any:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         # 如果key存在，则返回' key '的值，否则返回' default '。
         """Returns the value for ``key`` if ``key`` exists, else ``default``."""
         return self.config.get(key, default)
 
     def get_as_bool(self, key: str, default: Optional[bool] = None) -> Optional[bool]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         # 将key的值返回为bool值
         """Returns the value for ``key`` as a ``bool``."""
         value = self.get(key, default)
@@ -241,8 +238,6 @@ class RendezvousParameters:
         )
 
     def get_as_int(self, key: str, default: Optional[int] = None) -> Optional[int]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Returns the value for ``key`` as an ``int``."""
         value = self.get(key, default)
         if value is None:
@@ -268,9 +263,8 @@ class RendezvousHandlerRegistry:
     def __init__(self) -> None:
         self._registry = {}
 
+    @traced
     def register(self, backend: str, creator: RendezvousHandlerCreator) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """
         注册一个新的rdzv后端
         Registers a new rendezvous backend.
@@ -300,10 +294,9 @@ class RendezvousHandlerRegistry:
 
         self._registry[backend] = creator
 
+    @traced
     def create_handler(self, params: RendezvousParameters) -> RendezvousHandler:
         # 创建一个新的:py:class:`RendezvousHandler`
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         try:
             creator = self._registry[params.backend]
         except KeyError:
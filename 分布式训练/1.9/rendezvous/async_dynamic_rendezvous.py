@@ -0,0 +1,648 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+An asyncio counterpart of :py:class:`DynamicRendezvousHandler`.
+基于asyncio的动态rdzv handler，一个事件循环可以同时驱动多个handler。
+
+The rendezvous protocol itself is unchanged: the same operations (e.g.
+``_RendezvousJoinOp``) decide what to do next and the same executor methods
+apply their actions to the local state; only waiting for the backend, for other
+nodes, and between heartbeats is asynchronous. Many handlers, of the same or of
+different rendezvous, can therefore be driven by a single event loop instead of
+each blocking a thread and running a heartbeat timer thread.
+"""
+
+import asyncio
+import functools
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from datetime import timedelta
+from typing import Any, Callable, Optional, Tuple, Union, cast
+
+from torch.distributed import PrefixStore, Store
+
+from .api import RendezvousClosedError, RendezvousError, RendezvousTimeoutError
+from .dynamic_rendezvous import (
+    DynamicRendezvousHandler,
+    RendezvousBackend,
+    RendezvousSettings,
+    RendezvousTimeout,
+    Token,
+    _Action,
+    _BackendRendezvousStateHolder,
+    _DistributedRendezvousOpExecutor,
+    _NodeDesc,
+    _RendezvousCloseOp,
+    _RendezvousContext,
+    _RendezvousExitOp,
+    _RendezvousJoinOp,
+    _RendezvousKeepAliveOp,
+    _validate_settings,
+)
+from .tracing import traced
+
+log = logging.getLogger(__name__)
+
+
+class AsyncRendezvousBackend(ABC):
+    """Represents a backend that holds the rendezvous state, with an asyncio
+    interface. 表示一个使用asyncio接口保存rdzv状态的backend
+
+    The methods have the same semantics as the ones of
+    :py:class:`RendezvousBackend`. Per-node heartbeat keys are not supported;
+    the heartbeats are kept in the shared rendezvous state.
+    """
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Gets the name of the backend."""
+
+    @abstractmethod
+    async def get_state(self) -> Optional[Tuple[bytes, Token]]:
+        """See :py:meth:`RendezvousBackend.get_state`."""
+
+    @abstractmethod
+    async def set_state(
+        self, state: bytes, token: Optional[Token] = None
+    ) -> Optional[Tuple[bytes, Token, bool]]:
+        """See :py:meth:`RendezvousBackend.set_state`."""
+
+    async def wait_for_state_change(self, token: Optional[Token], timeout: timedelta) -> bool:
+        """See :py:meth:`RendezvousBackend.wait_for_state_change`.
+
+        The default implementation sleeps for ``timeout`` and returns ``False``
+        so that the caller falls back to polling.
+        """
+        await asyncio.sleep(timeout.total_seconds())
+
+        return False
+
+
+class AsyncRendezvousBackendAdapter(AsyncRendezvousBackend):
+    """Adapts a blocking :py:class:`RendezvousBackend`, such as the C10d or the
+    etcd backend, to asyncio by running its calls in an executor.
+    通过线程池将阻塞的backend（如C10d或etcd backend）适配为asyncio接口
+
+    Waiting for a state change is done by a single watcher task per adapter,
+    regardless of the number of waiters, so that the handlers of a rendezvous
+    that share the adapter do not each hold a thread of the executor while they
+    wait for other nodes.
+
+    Args:
+        backend:
+            The blocking backend to adapt.
+        executor:
+            The executor to run the calls of the backend in. Defaults to the
+            default executor of the event loop.
+    """
+
+    # 监视者每次阻塞等待的最长时间，以便在没有等待者之后及时退出。
+    # The maximum amount of time the watcher blocks a thread of the executor
+    # for, so that it exits soon after the last waiter has left.
+    _WATCH_TIMEOUT = timedelta(seconds=1)
+
+    _backend: RendezvousBackend
+    _executor: Optional[Executor]
+    _token: Optional[Token]
+    _token_known: bool
+    _changed: Optional[asyncio.Condition]
+    _num_waiters: int
+    _watcher: Optional["asyncio.Future[None]"]
+
+    def __init__(self, backend: RendezvousBackend, executor: Optional[Executor] = None) -> None:
+        self._backend = backend
+        self._executor = executor
+
+        # 最近一次观察到的token
+        # The latest token seen by a read, a write, or the watcher.
+        self._token = None
+        self._token_known = False
+
+        self._changed = None
+
+        self._num_waiters = 0
+
+        self._watcher = None
+
+    @property
+    def name(self) -> str:
+        """See base class."""
+        return self._backend.name
+
+    @property
+    def backend(self) -> RendezvousBackend:
+        """Gets the adapted backend."""
+        return self._backend
+
+    @traced
+    async def get_state(self) -> Optional[Tuple[bytes, Token]]:
+        """See base class."""
+        response = await self._call(self._backend.get_state)
+
+        await self._observe(response[1] if response is not None else None)
+
+        return response
+
+    @traced
+    async def set_state(
+        self, state: bytes, token: Optional[Token] = None
+    ) -> Optional[Tuple[bytes, Token, bool]]:
+        """See base class."""
+        response = await self._call(self._backend.set_state, state, token)
+
+        if response is not None:
+            await self._observe(response[1])
+
+        return response
+
+    @traced
+    async def wait_for_state_change(self, token: Optional[Token], timeout: timedelta) -> bool:
+        """See base class."""
+        changed = self._get_condition()
+
+        async with changed:
+            self._num_waiters += 1
+            try:
+                if self._watcher is None or self._watcher.done():
+                    self._watcher = asyncio.ensure_future(self._watch())
+
+                try:
+                    await asyncio.wait_for(
+                        changed.wait_for(lambda: self._token_known and self._token != token),
+                        timeout.total_seconds(),
+                    )
+                except asyncio.TimeoutError:
+                    return False
+
+                return True
+            finally:
+                self._num_waiters -= 1
+
+    @traced
+    async def close(self) -> None:
+        """Stops the watcher of the adapter, if it is running."""
+        if self._watcher is None:
+            return
+
+        self._watcher.cancel()
+
+        try:
+            await self._watcher
+        except asyncio.CancelledError:
+            pass
+
+        self._watcher = None
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_event_loop()
+
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    def _get_condition(self) -> asyncio.Condition:
+        # 延迟到事件循环中创建，旧版本Python的asyncio原语会绑定到创建时的事件循环。
+        # Created lazily so that it is bound to the event loop that runs the
+        # handlers, not to the one current when the adapter was constructed.
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+
+        return self._changed
+
+    async def _observe(self, token: Optional[Token]) -> None:
+        changed = self._get_condition()
+
+        async with changed:
+            if self._token_known and token == self._token:
+                return
+
+            self._token, self._token_known = token, True
+
+            changed.notify_all()
+
+    async def _watch(self) -> None:
+        try:
+            if not self._token_known:
+                await self.get_state()
+
+            while self._num_waiters > 0:
+                if await self._call(
+                    self._backend.wait_for_state_change, self._token, self._WATCH_TIMEOUT
+                ):
+                    await self.get_state()
+        except RendezvousError as ex:
+            # 等待者会超时并重新同步，同步会报告错误
+            # The waiters time out and resync; the sync surfaces the error.
+            log.warning(
+                f"The watcher of the rendezvous backend '{self.name}' has stopped due to an "
+                f"error of type {type(ex).__name__}."
+            )
+
+
+class _AsyncBackendRendezvousStateHolder(_BackendRendezvousStateHolder):
+    """Holds the rendezvous state synced with other nodes via an
+    :py:class:`AsyncRendezvousBackend`.
+
+    The local bookkeeping (decoding, the expiry index of the heartbeats) is the
+    one of the base class; only the calls to the backend are asynchronous.
+
+    Args:
+        backend:
+            The rendezvous backend to use.
+        settings:
+            The rendezvous settings.
+        cache_duration:
+            The amount of time, in seconds, to cache the last rendezvous state
+            before requesting it from the backend again.
+    """
+
+    _async_backend: AsyncRendezvousBackend
+
+    def __init__(
+        self,
+        backend: AsyncRendezvousBackend,
+        settings: RendezvousSettings,
+        cache_duration: float = 1,
+    ) -> None:
+        super().__init__(cast(RendezvousBackend, backend), settings, cache_duration)
+
+        self._async_backend = backend
+
+    @traced
+    async def sync(self) -> Optional[bool]:  # type: ignore[override]
+        """See base class."""
+        state_bits: Optional[bytes] = None
+
+        token = None
+
+        has_set: Optional[bool]
+
+        if self._dirty:
+            has_set = False
+
+            state_bits = self._encode_state()
+
+            set_response = await self._async_backend.set_state(state_bits, self._token)
+            if set_response is not None:
+                state_bits, token, has_set = set_response
+        else:
+            has_set = None
+
+            if self._is_cached_state_fresh():
+                return None
+
+            get_response = await self._async_backend.get_state()
+            if get_response is not None:
+                state_bits, token = get_response
+
+        self._apply_sync(state_bits, token, has_set)
+
+        return has_set
+
+    @traced
+    async def wait_for_change(self, timeout: timedelta) -> None:  # type: ignore[override]
+        """See base class."""
+        if self._dirty:
+            return
+
+        if await self._async_backend.wait_for_state_change(self._token, timeout):
+            self.invalidate()
+
+
+class _AsyncRendezvousOpExecutor(_DistributedRendezvousOpExecutor):
+    """Executes rendezvous operations on an asyncio event loop.
+
+    The loop is the one of :py:meth:`_DistributedRendezvousOpExecutor.run`,
+    with the syncs, the waits, and the conflict backoff awaited.
+    """
+
+    _state_holder: _AsyncBackendRendezvousStateHolder
+
+    @traced
+    async def run(  # type: ignore[override]
+        self,
+        state_handler: Callable[[_RendezvousContext, float], _Action],
+        deadline: float,
+        fresh: bool = True,
+    ) -> None:
+        """See base class."""
+        action = None
+
+        if fresh:
+            self._state_holder.invalidate()
+
+        pending_action: Optional[_Action] = None
+
+        num_conflicts = 0
+
+        while action != _Action.FINISH:
+            has_set = await self._state_holder.sync()
+            if has_set is not None:
+                if has_set:
+                    log.debug(
+                        f"The node '{self._node}' has successfully synced its local changes with "
+                        f"other nodes in the rendezvous '{self._settings.run_id}'."
+                    )
+
+                    pending_action = None
+
+                    num_conflicts = 0
+
+                    self._keep_alive_served = self._keep_alive_carried
+                else:
+                    log.debug(
+                        f"The node '{self._node}' has a stale state and failed to sync its local "
+                        f"changes with other nodes in the rendezvous '{self._settings.run_id}'."
+                    )
+
+                    self._stats.conflicts += 1
+                    self._stats.wasted_bytes += self._state_holder.last_write_size
+
+                    num_conflicts += 1
+
+            self._state = self._state_holder.state
+
+            ctx = _RendezvousContext(self._node, self._state, self._settings)
+
+            action = state_handler(ctx, deadline)
+
+            if action == _Action.FINISH:
+                continue
+
+            if action == _Action.ERROR_CLOSED:
+                raise RendezvousClosedError()
+
+            if action == _Action.ERROR_TIMEOUT:
+                raise RendezvousTimeoutError()
+
+            if action == _Action.SYNC:
+                await self._state_holder.wait_for_change(self._get_sync_timeout(deadline))
+            elif has_set is False and action == pending_action:
+                self._stats.retries += 1
+
+                await asyncio.sleep(random.uniform(0, self._get_backoff(num_conflicts, deadline)))
+
+                self._state_holder.invalidate()
+            else:
+                pending_action = action
+
+                self._apply_action(action)
+
+
+class AsyncDynamicRendezvousHandler:
+    """Represents a handler that sets up a rendezvous among a set of nodes on
+    an asyncio event loop. 在asyncio事件循环上设置rdzv的handler
+
+    It mirrors :py:class:`DynamicRendezvousHandler`, with its methods that
+    talk to the backend being coroutines. The keep-alive heartbeats are sent by
+    a task of the event loop instead of a timer thread.
+    """
+
+    _this_node: _NodeDesc
+    _settings: RendezvousSettings
+    _backend_name: str
+    _store: Store
+    _state_holder: _AsyncBackendRendezvousStateHolder
+    _op_executor: _AsyncRendezvousOpExecutor
+    _heartbeat_lock: Optional[asyncio.Lock]
+    _keep_alive_task: Optional["asyncio.Future[None]"]
+
+    @classmethod
+    @traced
+    def from_backend(
+        cls,
+        run_id: str,
+        store: Store,
+        backend: Union[AsyncRendezvousBackend, RendezvousBackend],
+        min_nodes: int,
+        max_nodes: int,
+        timeout: Optional[RendezvousTimeout] = None,
+    ):
+        """Creates a new :py:class:`AsyncDynamicRendezvousHandler`.
+
+        Args:
+            run_id:
+                The run id of the rendezvous.
+            store:
+                The C10d store to return as part of the rendezvous.
+            backend:
+                The backend to use to hold the rendezvous state. A blocking
+                :py:class:`RendezvousBackend` is wrapped in an
+                :py:class:`AsyncRendezvousBackendAdapter`; pass the same adapter
+                to the handlers of a rendezvous to share its watcher.
+            min_nodes:
+                The minimum number of nodes to admit to the rendezvous.
+            max_nodes:
+                The maximum number of nodes to admit to the rendezvous.
+            timeout:
+                The timeout configuration of the rendezvous.
+        """
+        if isinstance(backend, RendezvousBackend):
+            backend = AsyncRendezvousBackendAdapter(backend)
+
+        node = DynamicRendezvousHandler._node_desc_generator.generate()
+
+        settings = RendezvousSettings(
+            run_id,
+            min_nodes,
+            max_nodes,
+            timeout or RendezvousTimeout(),
+            keep_alive_interval=timedelta(seconds=5),
+            keep_alive_max_attempt=3,
+        )
+
+        state_holder = _AsyncBackendRendezvousStateHolder(backend, settings)
+
+        return cls(node, settings, backend.name, store, state_holder)
+
+    def __init__(
+        self,
+        node: _NodeDesc,
+        settings: RendezvousSettings,
+        backend_name: str,
+        store: Store,
+        state_holder: _AsyncBackendRendezvousStateHolder,
+    ) -> None:
+        _validate_settings(settings)
+
+        self._this_node = node
+
+        self._settings = settings
+
+        self._backend_name = backend_name
+
+        self._store = store
+
+        self._state_holder = state_holder
+
+        self._op_executor = _AsyncRendezvousOpExecutor(
+            self._this_node, self._state_holder, self._settings
+        )
+
+        self._heartbeat_lock = None
+
+        self._keep_alive_task = None
+
+    @property
+    def settings(self) -> RendezvousSettings:
+        """Gets the settings of the rendezvous."""
+        return self._settings
+
+    def get_backend(self) -> str:
+        """See :py:meth:`RendezvousHandler.get_backend`."""
+        return self._backend_name
+
+    def get_run_id(self) -> str:
+        """See :py:meth:`RendezvousHandler.get_run_id`."""
+        return self._settings.run_id
+
+    @traced
+    async def next_rendezvous(self) -> Tuple[Store, int, int]:
+        """See :py:meth:`RendezvousHandler.next_rendezvous`."""
+        log.info(
+            f"The node '{self._this_node}' attempts to join the next round of the rendezvous "
+            f"'{self._settings.run_id}'."
+        )
+
+        await self._stop_heartbeats()
+
+        if self._state_holder.state.round == 0:
+            await asyncio.sleep(random.uniform(0, 0.3))
+
+        deadline = self._get_deadline(self._settings.timeout.join)
+
+        await self._op_executor.run(_RendezvousExitOp(), deadline)
+        await self._op_executor.run(_RendezvousJoinOp(), deadline)
+
+        self._start_heartbeats()
+
+        rank, world_size = self._get_world()
+        store = self._get_store()
+
+        log.info(
+            f"The node '{self._this_node}' has joined round {self._state_holder.state.round} of "
+            f"the rendezvous '{self._settings.run_id}' as rank {rank} in a world of size "
+            f"{world_size}."
+        )
+
+        return store, rank, world_size
+
+    @traced
+    async def is_closed(self) -> bool:
+        """See :py:meth:`RendezvousHandler.is_closed`."""
+        async with self._get_heartbeat_lock():
+            await self._state_holder.sync()
+
+            return self._state_holder.state.closed
+
+    @traced
+    async def set_closed(self) -> None:
+        """See :py:meth:`RendezvousHandler.set_closed`."""
+        async with self._get_heartbeat_lock():
+            await self._close()
+
+    @traced
+    async def num_nodes_waiting(self) -> int:
+        """See :py:meth:`RendezvousHandler.num_nodes_waiting`."""
+        async with self._get_heartbeat_lock():
+            await self._state_holder.sync()
+
+            return len(self._state_holder.state.wait_list)
+
+    @traced
+    async def shutdown(self) -> bool:
+        """See :py:meth:`RendezvousHandler.shutdown`."""
+        await self._stop_heartbeats()
+
+        try:
+            await self._close()
+
+            return True
+        except RendezvousError as ex:
+            log.warning(
+                f"The node '{self._this_node}' has failed to shutdown the rendezvous "
+                f"'{self._settings.run_id}' due to an error of type {type(ex).__name__}."
+            )
+
+            return False
+
+    @traced
+    async def _close(self) -> None:
+        deadline = self._get_deadline(self._settings.timeout.close)
+
+        await self._op_executor.run(_RendezvousCloseOp(), deadline)
+
+        log.info(
+            f"The node '{self._this_node}' has closed the rendezvous '{self._settings.run_id}'."
+        )
+
+    @traced
+    async def _keep_alive(self) -> None:
+        async with self._get_heartbeat_lock():
+            deadline = self._get_deadline(self._settings.timeout.heartbeat)
+
+            try:
+                await self._op_executor.run(_RendezvousKeepAliveOp(), deadline, fresh=False)
+
+                log.debug(
+                    f"The node '{self._this_node}' has sent a keep-alive heartbeat to the "
+                    f"rendezvous '{self._settings.run_id}'."
+                )
+            except RendezvousError as ex:
+                log.warning(
+                    f"The node '{self._this_node}' has failed to send a keep-alive heartbeat to "
+                    f"the rendezvous '{self._settings.run_id}' due to an error of type "
+                    f"{type(ex).__name__}."
+                )
+
+    async def _run_heartbeats(self) -> None:
+        interval = self._settings.keep_alive_interval.total_seconds()
+
+        while True:
+            await asyncio.sleep(interval)
+
+            await self._keep_alive()
+
+    def _start_heartbeats(self) -> None:
+        self._keep_alive_task = asyncio.ensure_future(self._run_heartbeats())
+
+    async def _stop_heartbeats(self) -> None:
+        if self._keep_alive_task is None:
+            return
+
+        self._keep_alive_task.cancel()
+
+        # 等待正在进行的心跳结束，以免它与下一个操作交错。
+        # Wait for an in-flight heartbeat to unwind so that it does not
+        # interleave with the next operation.
+        try:
+            await self._keep_alive_task
+        except asyncio.CancelledError:
+            pass
+
+        self._keep_alive_task = None
+
+    def _get_heartbeat_lock(self) -> asyncio.Lock:
+        if self._heartbeat_lock is None:
+            self._heartbeat_lock = asyncio.Lock()
+
+        return self._heartbeat_lock
+
+    def _get_world(self) -> Tuple[int, int]:
+        state = self._state_holder.state
+
+        return state.participants[self._this_node], len(state.participants)
+
+    def _get_store(self) -> Store:
+        key_prefix = f"torch.rendezvous.{self._settings.run_id}.{self._state_holder.state.round}"
+
+        return PrefixStore(key_prefix, self._store)
+
+    def _get_deadline(self, timeout: timedelta) -> float:
+        return time.monotonic() + timeout.total_seconds()
@@ -0,0 +1,687 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import datetime
+import itertools
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# pyre-ignore[21]: Could not find name `Store` in `torch.distributed`.
+from torch.distributed import Store
+
+
+log = logging.getLogger(__name__)
+
+
+# Every message is a header followed by a payload of length-prefixed fields.
+# The header of a request holds the opcode, the one of a response the status;
+# responses carry the id of their request, so that a client can have many
+# requests in flight on one connection and a blocked wait does not hold back
+# the requests behind it.
+_HEADER = struct.Struct("<IIB")  # payload length, request id, opcode/status
+_FIELD = struct.Struct("<I")
+
+_SET = 1
+_GET = 2
+_ADD = 3
+_COMPARE_SET = 4
+_WAIT = 5
+_CHECK = 6
+_DELETE_KEY = 7
+_NUM_KEYS = 8
+_SCAN = 9
+
+_OK = 0
+_ERROR = 1
+_TIMEOUT = 2
+
+
+def _pack(request_id: int, code: int, fields: Iterable[bytes]) -> bytes:
+    parts = [b""]
+    for field in fields:
+        parts.append(_FIELD.pack(len(field)))
+        parts.append(field)
+    payload = b"".join(parts)
+
+    return _HEADER.pack(len(payload), request_id, code) + payload
+
+
+def _unpack_fields(buffer: bytearray, offset: int, end: int) -> List[bytes]:
+    fields = []
+    while offset < end:
+        (length,) = _FIELD.unpack_from(buffer, offset)
+        offset += _FIELD.size
+        fields.append(bytes(buffer[offset : offset + length]))
+        offset += length
+    return fields
+
+
+#
+# Splits the complete messages off the front of ``buffer``.
+#
+def _parse_messages(buffer: bytearray) -> List[Tuple[int, int, List[bytes]]]:
+    messages = []
+
+    offset = 0
+    while len(buffer) - offset >= _HEADER.size:
+        length, request_id, code = _HEADER.unpack_from(buffer, offset)
+
+        end = offset + _HEADER.size + length
+        if len(buffer) < end:
+            break
+
+        messages.append((request_id, code, _unpack_fields(buffer, offset + _HEADER.size, end)))
+
+        offset = end
+
+    del buffer[:offset]
+
+    return messages
+
+
+def _to_bytes(value) -> bytes:
+    if type(value) == bytes:
+        return value
+    elif type(value) == str:
+        return value.encode()
+    raise ValueError("Value must be of type str or bytes")
+
+
+def _to_ms(timeout: datetime.timedelta) -> bytes:
+    return str(max(int(timeout.total_seconds() * 1000), 0)).encode()
+
+
+class _Waiter:
+    """
+    A ``get`` or ``wait`` whose keys are not all set yet. It is registered
+    under its first missing key only and rechecked when that key is set.
+    """
+
+    __slots__ = ("_server", "_conn", "_request_id", "_keys", "_is_get", "_key", "_timer")
+
+    def __init__(self, server, conn, request_id: int, keys: List[bytes], is_get: bool):
+        self._server = server
+        self._conn = conn
+        self._request_id = request_id
+        self._keys = keys
+        self._is_get = is_get
+        self._key: Optional[bytes] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def start(self, timeout: float) -> None:
+        if self._try_complete():
+            return
+
+        if timeout <= 0:
+            self._time_out()
+            return
+
+        self._timer = self._server._loop.call_later(timeout, self._time_out)
+
+        self._conn._waiters.add(self)
+
+    def notify(self) -> None:
+        self._key = None
+
+        if self._try_complete():
+            self._finish()
+
+    def cancel(self) -> None:
+        self._unregister()
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def _try_complete(self) -> bool:
+        data = self._server._data
+
+        for key in self._keys:
+            if key not in data:
+                self._server._waiters.setdefault(key, set()).add(self)
+                self._key = key
+                return False
+
+        fields = [data[self._keys[0]]] if self._is_get else []
+
+        self._conn.respond(self._request_id, _OK, fields)
+
+        return True
+
+    def _time_out(self) -> None:
+        self._timer = None
+
+        self._unregister()
+        self._finish()
+
+        self._conn.respond(self._request_id, _TIMEOUT, [])
+
+    def _finish(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self._conn._waiters.discard(self)
+
+    def _unregister(self) -> None:
+        if self._key is None:
+            return
+
+        waiters = self._server._waiters.get(self._key)
+        if waiters is not None:
+            waiters.discard(self)
+            if not waiters:
+                del self._server._waiters[self._key]
+
+        self._key = None
+
+
+class _ServerProtocol(asyncio.Protocol):
+    def __init__(self, server: "StoreServer") -> None:
+        self._server = server
+        self._buffer = bytearray()
+        self._transport: Optional[asyncio.Transport] = None
+        self._waiters: Set[_Waiter] = set()
+
+    def connection_made(self, transport) -> None:
+        self._transport = transport
+
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self._server._connections.add(self)
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer += data
+
+        for request_id, op, fields in _parse_messages(self._buffer):
+            self._server._handle(self, request_id, op, fields)
+
+    def connection_lost(self, exc) -> None:
+        for waiter in list(self._waiters):
+            waiter.cancel()
+
+        self._waiters.clear()
+
+        self._server._connections.discard(self)
+
+    def respond(self, request_id: int, status: int, fields: Iterable[bytes]) -> None:
+        if self._transport is not None and not self._transport.is_closing():
+            self._transport.write(_pack(request_id, status, fields))
+
+
+class StoreServer:
+    """
+    A key-value store server on asyncio with the operations of a c10d store
+    plus a prefix scan. All the state lives on the event loop of the server,
+    so the operations need no locks; a ``get`` or ``wait`` whose keys are
+    missing is parked until a write sets them or its timeout expires, and is
+    answered by the server instead of being polled by the client.
+
+    Args:
+        host:
+            The host to listen on; the empty string listens on all interfaces.
+        port:
+            The port to listen on; ``0`` picks a free port.
+    """
+
+    def __init__(self, host: str = "", port: int = 0) -> None:
+        self.host = host
+        self.port = port
+
+        self._data: Dict[bytes, bytes] = {}
+        self._waiters: Dict[bytes, Set[_Waiter]] = {}
+        self._connections: Set[_ServerProtocol] = set()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        """
+        Starts listening on the running event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+
+        self._server = await self._loop.create_server(
+            lambda: _ServerProtocol(self), self.host or None, self.port, backlog=4096
+        )
+
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """
+        Stops listening and closes the client connections.
+        """
+        if self._server is None:
+            return
+
+        self._server.close()
+
+        for conn in list(self._connections):
+            if conn._transport is not None:
+                conn._transport.close()
+
+        await self._server.wait_closed()
+
+        self._server = None
+
+    def start_in_thread(self) -> None:
+        """
+        Runs the server on an event loop of its own in a daemon thread and
+        returns once it listens.
+
+        Raises:
+            OSError - If the server cannot listen on its address
+        """
+        started = threading.Event()
+        error: List[BaseException] = []
+
+        def run() -> None:
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self.start())
+            except BaseException as exc:
+                error.append(exc)
+                started.set()
+                loop.close()
+                return
+
+            started.set()
+
+            try:
+                loop.run_forever()
+            finally:
+                loop.run_until_complete(self.close())
+                loop.close()
+
+        self._thread = threading.Thread(target=run, name=f"StoreServer_{self.port}", daemon=True)
+        self._thread.start()
+
+        started.wait()
+
+        if error:
+            raise error[0]
+
+    def stop_thread(self) -> None:
+        """
+        Stops a server started with ``start_in_thread``.
+        """
+        if self._thread is None or self._loop is None:
+            return
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+        self._thread.join()
+        self._thread = None
+
+    def _handle(self, conn: _ServerProtocol, request_id: int, op: int, fields: List[bytes]) -> None:
+        data = self._data
+
+        try:
+            if op == _SET:
+                self._set(fields[0], fields[1])
+
+                conn.respond(request_id, _OK, [])
+            elif op == _GET:
+                _Waiter(self, conn, request_id, [fields[0]], True).start(int(fields[1]) / 1000)
+            elif op == _ADD:
+                value = int(data.get(fields[0], b"0")) + int(fields[1])
+
+                self._set(fields[0], str(value).encode())
+
+                conn.respond(request_id, _OK, [str(value).encode()])
+            elif op == _COMPARE_SET:
+                key, expected, desired = fields
+
+                value = data.get(key)
+                if value is None and expected:
+                    value = expected
+                elif value is None or value == expected:
+                    self._set(key, desired)
+                    value = desired
+
+                conn.respond(request_id, _OK, [value])
+            elif op == _WAIT:
+                _Waiter(self, conn, request_id, fields[:-1], False).start(int(fields[-1]) / 1000)
+            elif op == _CHECK:
+                present = all(key in data for key in fields)
+
+                conn.respond(request_id, _OK, [b"1" if present else b"0"])
+            elif op == _DELETE_KEY:
+                deleted = data.pop(fields[0], None) is not None
+
+                conn.respond(request_id, _OK, [b"1" if deleted else b"0"])
+            elif op == _NUM_KEYS:
+                conn.respond(request_id, _OK, [str(len(data)).encode()])
+            elif op == _SCAN:
+                prefix = fields[0]
+
+                items = []
+                for key, value in data.items():
+                    if key.startswith(prefix):
+                        items += (key, value)
+
+                conn.respond(request_id, _OK, items)
+            else:
+                raise ValueError(f"Unknown operation {op}")
+        except (ValueError, IndexError) as exc:
+            conn.respond(request_id, _ERROR, [str(exc).encode()])
+
+    def _set(self, key: bytes, value: bytes) -> None:
+        self._data[key] = value
+
+        waiters = self._waiters.pop(key, None)
+        if waiters:
+            for waiter in waiters:
+                waiter.notify()
+
+
+class _PendingRequest:
+    __slots__ = ("event", "status", "fields")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.status = _ERROR
+        self.fields: List[bytes] = [b"The connection to the store has been lost."]
+
+
+# pyre-fixme[11]: Annotation `Store` is not defined as a type.
+class StoreClient(Store):
+    """
+    Implements a c10 Store interface as a client of a :py:class:`StoreServer`.
+    The client is thread-safe; the requests of all threads are pipelined on a
+    single connection and the responses are dispatched by a reader thread.
+
+    Connection errors and timeouts raise ``RuntimeError`` like the C++ stores.
+    """
+
+    # How long the client keeps trying to connect to a server that is not
+    # listening yet, at most.
+    _CONNECT_RETRY_INTERVAL = 0.1
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        # Default timeout same as in c10d/Store.hpp
+        timeout: Optional[datetime.timedelta] = None,
+    ):
+        super().__init__()  # required for pybind trampoline.
+
+        if timeout is not None:
+            self.set_timeout(timeout)
+
+        self._sock = self._connect(host, port)
+
+        self._send_lock = threading.Lock()
+
+        self._pending: Dict[int, _PendingRequest] = {}
+        self._request_ids = itertools.count(1)
+
+        self._closed = False
+
+        self._reader = threading.Thread(
+            target=self._read, name=f"StoreClient_{host}:{port}", daemon=True
+        )
+        self._reader.start()
+
+    def close(self) -> None:
+        """
+        Closes the connection to the server.
+        """
+        self._closed = True
+
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self._sock.close()
+
+    def set(self, key, value) -> None:
+        self._call(_SET, [_to_bytes(key), _to_bytes(value)])
+
+    def get(self, key) -> bytes:
+        timeout = self.timeout  # type: ignore[attr-defined]
+
+        return self._call(_GET, [_to_bytes(key), _to_ms(timeout)], timeout)[0]
+
+    def add(self, key, num: int) -> int:
+        return int(self._call(_ADD, [_to_bytes(key), str(num).encode()])[0])
+
+    def compare_set(self, key, expected_value, desired_value) -> bytes:
+        fields = [_to_bytes(key), _to_bytes(expected_value), _to_bytes(desired_value)]
+
+        return self._call(_COMPARE_SET, fields)[0]
+
+    def wait(self, keys, override_timeout: Optional[datetime.timedelta] = None) -> None:
+        timeout = self.timeout if override_timeout is None else override_timeout  # type: ignore[attr-defined]
+
+        self._call(_WAIT, [_to_bytes(key) for key in keys] + [_to_ms(timeout)], timeout)
+
+    def check(self, keys) -> bool:
+        return self._call(_CHECK, [_to_bytes(key) for key in keys])[0] == b"1"
+
+    def delete_key(self, key) -> bool:
+        return self._call(_DELETE_KEY, [_to_bytes(key)])[0] == b"1"
+
+    def num_keys(self) -> int:
+        return int(self._call(_NUM_KEYS, [])[0])
+
+    def scan(self, prefix) -> Dict[str, bytes]:
+        """
+        Returns the keys that start with ``prefix`` and their values.
+        """
+        fields = self._call(_SCAN, [_to_bytes(prefix)])
+
+        return {fields[i].decode(): fields[i + 1] for i in range(0, len(fields), 2)}
+
+    def _call(
+        self, op: int, fields: List[bytes], timeout: Optional[datetime.timedelta] = None
+    ) -> List[bytes]:
+        request = _PendingRequest()
+
+        with self._send_lock:
+            if self._closed:
+                raise RuntimeError("The connection to the store has been lost.")
+
+            request_id = next(self._request_ids)
+
+            self._pending[request_id] = request
+
+            try:
+                self._sock.sendall(_pack(request_id, op, fields))
+            except OSError as exc:
+                self._pending.pop(request_id, None)
+
+                raise RuntimeError("The connection to the store has been lost.") from exc
+
+        # The server enforces the timeout of a wait; the client only guards
+        # against a server that does not answer at all.
+        if timeout is None:
+            timeout = self.timeout  # type: ignore[attr-defined]
+
+        if not request.event.wait(timeout.total_seconds() + 5):  # type: ignore[union-attr]
+            self._pending.pop(request_id, None)
+
+            raise RuntimeError("The store has not answered in time.")
+
+        if request.status == _TIMEOUT:
+            raise RuntimeError("Wait timeout")
+
+        if request.status == _ERROR:
+            raise RuntimeError(request.fields[0].decode())
+
+        return request.fields
+
+    def _read(self) -> None:
+        buffer = bytearray()
+
+        try:
+            while True:
+                data = self._sock.recv(65536)
+                if not data:
+                    break
+
+                buffer += data
+
+                for request_id, status, fields in _parse_messages(buffer):
+                    request = self._pending.pop(request_id, None)
+                    if request is None:
+                        continue
+
+                    request.status = status
+                    request.fields = fields
+                    request.event.set()
+        except OSError:
+            pass
+        finally:
+            self._closed = True
+
+            for request in list(self._pending.values()):
+                request.event.set()
+
+            self._pending.clear()
+
+    def _connect(self, host: str, port: int) -> socket.socket:
+        deadline = time.monotonic() + self.timeout.total_seconds()  # type: ignore[attr-defined]
+
+        while True:
+            try:
+                sock = socket.create_connection((host, port))
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(f"The store at {host}:{port} is not reachable.")
+
+                time.sleep(self._CONNECT_RETRY_INTERVAL)
+            except OSError as exc:
+                raise RuntimeError(f"The store at {host}:{port} is not reachable.") from exc
+
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        return sock
+
+
+class _ClientProtocol(asyncio.Protocol):
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self.transport: Optional[asyncio.Transport] = None
+        self.pending: Dict[int, "asyncio.Future[Tuple[int, List[bytes]]]"] = {}
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer += data
+
+        for request_id, status, fields in _parse_messages(self._buffer):
+            future = self.pending.pop(request_id, None)
+            if future is not None and not future.done():
+                future.set_result((status, fields))
+
+    def connection_lost(self, exc) -> None:
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(
+                    RuntimeError("The connection to the store has been lost.")
+                )
+
+        self.pending.clear()
+
+
+class AsyncStoreClient:
+    """
+    The asyncio counterpart of :py:class:`StoreClient`; any number of
+    coroutines can have requests in flight on its connection.
+
+    Use :py:meth:`connect` to create one.
+    """
+
+    def __init__(self, protocol: _ClientProtocol, timeout: datetime.timedelta) -> None:
+        self.timeout = timeout
+
+        self._protocol = protocol
+        self._request_ids = itertools.count(1)
+
+    @classmethod
+    async def connect(
+        cls, host: str, port: int, timeout: Optional[datetime.timedelta] = None
+    ) -> "AsyncStoreClient":
+        loop = asyncio.get_running_loop()
+
+        _, protocol = await loop.create_connection(_ClientProtocol, host, port)
+
+        sock = protocol.transport.get_extra_info("socket")  # type: ignore[union-attr]
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        return cls(protocol, timeout or datetime.timedelta(seconds=300))
+
+    def close(self) -> None:
+        if self._protocol.transport is not None:
+            self._protocol.transport.close()
+
+    async def set(self, key, value) -> None:
+        await self._call(_SET, [_to_bytes(key), _to_bytes(value)])
+
+    async def get(self, key) -> bytes:
+        return (await self._call(_GET, [_to_bytes(key), _to_ms(self.timeout)]))[0]
+
+    async def add(self, key, num: int) -> int:
+        return int((await self._call(_ADD, [_to_bytes(key), str(num).encode()]))[0])
+
+    async def compare_set(self, key, expected_value, desired_value) -> bytes:
+        fields = [_to_bytes(key), _to_bytes(expected_value), _to_bytes(desired_value)]
+
+        return (await self._call(_COMPARE_SET, fields))[0]
+
+    async def wait(self, keys, override_timeout: Optional[datetime.timedelta] = None) -> None:
+        timeout = self.timeout if override_timeout is None else override_timeout
+
+        await self._call(_WAIT, [_to_bytes(key) for key in keys] + [_to_ms(timeout)])
+
+    async def check(self, keys) -> bool:
+        return (await self._call(_CHECK, [_to_bytes(key) for key in keys]))[0] == b"1"
+
+    async def delete_key(self, key) -> bool:
+        return (await self._call(_DELETE_KEY, [_to_bytes(key)]))[0] == b"1"
+
+    async def num_keys(self) -> int:
+        return int((await self._call(_NUM_KEYS, []))[0])
+
+    async def scan(self, prefix) -> Dict[str, bytes]:
+        fields = await self._call(_SCAN, [_to_bytes(prefix)])
+
+        return {fields[i].decode(): fields[i + 1] for i in range(0, len(fields), 2)}
+
+    async def _call(self, op: int, fields: List[bytes]) -> List[bytes]:
+        transport = self._protocol.transport
+        if transport is None or transport.is_closing():
+            raise RuntimeError("The connection to the store has been lost.")
+
+        request_id = next(self._request_ids)
+
+        future = asyncio.get_running_loop().create_future()
+
+        self._protocol.pending[request_id] = future
+
+        transport.write(_pack(request_id, op, fields))
+
+        status, response = await future
+
+        if status == _TIMEOUT:
+            raise RuntimeError("Wait timeout")
+
+        if status == _ERROR:
+            raise RuntimeError(response[0].decode())
+
+        return response
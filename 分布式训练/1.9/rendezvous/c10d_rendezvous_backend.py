@@ -3,43 +3,234 @@
 #
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
-import sys
-import binascii
 import logging
 import os
-from base64 import b64decode, b64encode
-from datetime import timedelta
-from typing import Any, Optional, Tuple, cast
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
 
 from torch.distributed import Store, TCPStore
 
 from .api import RendezvousConnectionError, RendezvousParameters, RendezvousStateError
 from .dynamic_rendezvous import RendezvousBackend, Token
+from .tracing import traced
 from .utils import _matches_machine_hostname, parse_rendezvous_endpoint
 
 log = logging.getLogger(__name__)
 
 
+class _ChangeKeyWaiter:
+    """
+    Waits for the change keys of a :py:class:`C10dRendezvousBackend` from a
+    single thread over a connection of its own, so that the waits of the
+    callers can time out without a wait on the connection timing out.
+      由一个线程在单独的连接上等待change key，调用方的等待超时不会使连接上的wait超时。
+
+    A TCPStore still answers a wait after it has timed out on the client, and
+    the late answer is taken as the answer of the next wait on the connection.
+    Therefore the thread waits with a long timeout, and once a wait has timed
+    out it only keeps waiting for the same key, for which a late answer is as
+    good as a timely one. The connection is only replaced before a wait for
+    another key after such a timeout, or after an error.
+    """
+
+    # How long a single wait on the connection may block. The thread exits
+    # within this time once the waiter has been garbage collected.
+    _WAIT_TIMEOUT = timedelta(seconds=60)
+
+    # How long to wait before connecting again after an error.
+    _RETRY_DELAY = 1.0
+
+    # The number of change keys remembered as set.
+    _MAX_SET_KEYS = 16
+
+    def __init__(self, store_factory: Callable[[], Store]) -> None:
+        self._store_factory = store_factory
+
+        self._cond = threading.Condition()
+
+        # The key the callers wait for.
+        self._key: Optional[str] = None
+
+        # The change keys seen set, least recently first.
+        self._set_keys: "OrderedDict[str, None]" = OrderedDict()
+
+        self._thread: Optional[threading.Thread] = None
+
+        # The connection and, if a wait on it has timed out, the key of that
+        # wait; both only used by the thread.
+        self._store: Optional[Store] = None
+        self._pending_key: Optional[str] = None
+
+    def wait(self, key: str, timeout: timedelta) -> bool:
+        """
+        Waits until ``key`` is set, or ``timeout`` has passed; returns whether
+        the key is set.
+        """
+        with self._cond:
+            if key not in self._set_keys:
+                self._key = key
+
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=_ChangeKeyWaiter._wait_weak,
+                        args=(weakref.ref(self),),
+                        name="C10dChangeKeyWaiter",
+                        daemon=True,
+                    )
+                    self._thread.start()
+
+                self._cond.notify_all()
+
+                self._cond.wait_for(lambda: key in self._set_keys, timeout.total_seconds())
+
+            return key in self._set_keys
+
+    @staticmethod
+    def _wait_weak(weak_self) -> None:
+        while True:
+            self = weak_self()
+            if self is None:
+                return
+
+            self._wait_once()
+
+            del self
+
+    def _wait_once(self) -> None:
+        with self._cond:
+            key = self._key
+
+            # Nothing to wait for until a caller asks for a new key.
+            if key is None or key in self._set_keys:
+                self._cond.wait(self._WAIT_TIMEOUT.total_seconds())
+                return
+
+        # A late answer for another key would be taken for this one.
+        if self._pending_key is not None and self._pending_key != key:
+            self._reset()
+
+        if self._store is None:
+            try:
+                self._store = self._store_factory()
+            except (ValueError, RuntimeError) as exc:
+                self._fail(exc)
+                return
+
+        start = time.monotonic()
+
+        try:
+            self._store.wait([key], self._WAIT_TIMEOUT)
+        except (ValueError, RuntimeError) as exc:
+            if time.monotonic() - start < self._WAIT_TIMEOUT.total_seconds():
+                self._fail(exc)
+            else:
+                self._pending_key = key
+            return
+
+        # The answers of the waits that have timed out are still to come.
+        if self._pending_key is not None:
+            self._reset()
+
+        with self._cond:
+            self._set_keys[key] = None
+
+            while len(self._set_keys) > self._MAX_SET_KEYS:
+                self._set_keys.popitem(last=False)
+
+            self._cond.notify_all()
+
+    def _reset(self) -> None:
+        self._store = None
+        self._pending_key = None
+
+    def _fail(self, exc: Exception) -> None:
+        self._reset()
+
+        # The callers time out and the next read surfaces the error.
+        log.warning(
+            f"The wait for a change of the rendezvous state has failed due to an error of type "
+            f"{type(exc).__name__}; retrying."
+        )
+
+        time.sleep(self._RETRY_DELAY)
+
+
 class C10dRendezvousBackend(RendezvousBackend):
     """Represents a C10d-backed rendezvous backend.
 
+    The state is versioned and kept in a chain of change keys: the state that
+    replaces version ``v`` is written to the change key of ``v`` with a
+    ``compare_set`` that only creates the key if it does not exist yet. The
+    change key is therefore both the fencing point of a write and the key on
+    which the nodes waiting for ``v`` to change are woken up, so a write takes
+    a single ``compare_set``, whose answer tells whether it has succeeded.
+    状态带有版本号并保存在由change key组成的链中：替换版本``v``的状态通过只在key不存在时
+    才写入的``compare_set``写入``v``的change key，它既是写入的fencing点，也是等待``v``
+    变化的节点所等待的key，因此一次写入只需一个``compare_set``。
+
+    Readers follow the chain from the last version they have seen; a version
+    pointer, updated every few versions, spares new readers most of it. A
+    state that has been replaced is overwritten with a small tombstone, so
+    that only the latest state is kept in full. The change keys themselves
+    are never deleted, since a missing one would accept a write based on a
+    long replaced version.
+    读取方从自己见过的最后一个版本沿链读取；每隔几个版本更新一次的版本指针让新的读取方
+    跳过链的大部分。被替换的状态会被覆盖为很小的墓碑值；change key本身从不删除，否则
+    基于很早版本的写入会被接受。
+
     Args:
         store:
             The :py:class:`torch.distributed.Store` instance to use to
             communicate with the C10d store.
         run_id:
             The run id of the rendezvous.
+        wait_store_factory:
+            An optional callable that opens a new connection to the C10d store,
+            over which the waits of :py:meth:`wait_for_state_change` are sent
+            instead of over ``store``.
+              可选的可调用对象，用于打开一个新的C10d store连接，专门用于等待状态变化。
     """
 
-    # See the explanation in the __init__ method.
+    # The version of the pointer before the first write, i.e. no state.
+    _NULL_VERSION = 0
+
+    # The value returned by a non-blocking read (see _try_get) of a key that
+    # does not exist. It cannot collide with a state since those are written
+    # with the _RAW_PREFIX.
     _NULL_SENTINEL = "Y2FuaW1hZGFt"
 
+    # C10d stores accept arbitrary bytes; therefore states are written raw
+    # with this prefix.
+    _RAW_PREFIX = b"\x00"
+
+    # The value of a change key whose state has been replaced as well.
+    _TOMBSTONE = b"\x01"
+
+    # The number of versions after which the version pointer gets updated; a
+    # reader that follows more change keys than that reads it to skip ahead.
+    _POINTER_INTERVAL = 8
+
+    # The interval at which the change key is checked when the waits cannot be
+    # sent over a connection of their own.
+    _WAIT_POLL_INTERVAL = 0.1
+
     _store: Store
     _key: str
-
-    def __init__(self, store: Store, run_id: str) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
+    _waiter: Optional[_ChangeKeyWaiter]
+    _last_seen: Tuple[int, Optional[bytes]]
+
+    @traced
+    def __init__(
+        self,
+        store: Store,
+        run_id: str,
+        wait_store_factory: Optional[Callable[[], Store]] = None,
+    ) -> None:
         if not run_id:
             raise ValueError("The run id must be a non-empty string.")
 
@@ -47,68 +238,288 @@ class C10dRendezvousBackend(RendezvousBackend):
 
         self._key = "torch.rendezvous." + run_id
 
+        # TCPStore会在客户端超时之后仍然回复超时的wait，而这个迟到的回复会被当作同一连接上
+        # 下一个请求的回复；因此wait不能与训练共享同一个连接。
+        # A TCPStore still answers a wait after it has timed out on the client,
+        # and the late answer is then taken as the answer of the next request on
+        # the connection. Since the trainer shares the connection of ``store``,
+        # the waits go over a connection of their own, or, if there is none, the
+        # change key is polled with the non-blocking check operation.
+        self._waiter = _ChangeKeyWaiter(wait_store_factory) if wait_store_factory else None
+
+        self._poll_for_changes = wait_store_factory is None and isinstance(store, TCPStore)
+
+        # The latest version read or written through this backend and the value
+        # of the change key holding its state, from which the reads start.
+        self._last_seen = (self._NULL_VERSION, None)
+
+        self._last_seen_lock = threading.Lock()
+
         # The read operation of a store blocks the caller until the specified
         # key becomes available. This behavior makes it tricky to use a store
         # as a regular key-value dictionary.
         #
-        # As a workaround we initially set a sentinel value as the rendezvous
-        # state. Whenever this value gets returned we treat it as a None.
-        self._call_store("compare_set", self._key, "", self._NULL_SENTINEL)
+        # As a workaround we initially set the version pointer to the null
+        # version, so that it can always be read; the change keys are only
+        # read with the non-blocking _try_get.
+        self._call_store("compare_set", self._get_pointer_key(), "", str(self._NULL_VERSION))
 
     @property
     def name(self) -> str:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
         return "c10d"
 
+    @traced
     def get_state(self) -> Optional[Tuple[bytes, Token]]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
-        base64_state: bytes = self._call_store("get", self._key)
+        with self._last_seen_lock:
+            version, value = self._last_seen
 
-        return self._decode_state(base64_state)
+        return self._read_state(version, value)
 
+    @traced
     def set_state(
         self, state: bytes, token: Optional[Token] = None
     ) -> Optional[Tuple[bytes, Token, bool]]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
-        base64_state_str: str = b64encode(state).decode()
-
-        if token:
+        if token is None:
+            token = self._NULL_VERSION
+        elif not isinstance(token, int):
             # Shortcut if we know for sure that the token is not valid.
-            if not isinstance(token, bytes):
-                result = self.get_state()
-                if result is not None:
-                    tmp = *result, False
-                    # Python 3.6 does not support tuple unpacking in return
-                    # statements.
-                    return tmp
+            result = self.get_state()
+            if result is not None:
+                tmp = *result, False
+                # Python 3.6 does not support tuple unpacking in return
+                # statements.
+                return tmp
+            return None
+
+        # 只有第一个写入者能创建被替换版本的change key，store返回的是该key的当前值。
+        # Only the first writer creates the change key of the replaced version;
+        # the store answers with the value the key holds.
+        value = self._RAW_PREFIX + self._compress_state(state)
+
+        current_value: bytes = self._call_store(
+            "compare_set", self._get_change_key(token), "", value
+        )
+
+        version = token + 1
+
+        if current_value != value:
+            # The state that has replaced ours may have been replaced as well;
+            # start from the latest version we know of.
+            with self._last_seen_lock:
+                last_version, last_value = self._last_seen
+
+            if last_version > version:
+                version, current_value = last_version, last_value  # type: ignore[assignment]
+
+            result = self._read_state(version, current_value)
+            if result is not None:
+                tmp = *result, False
+                return tmp
+            return None
+
+        self._remember(version, value)
+
+        # 被替换的状态不会再被读取，只保留它的key以拒绝基于它的写入。
+        # The replaced state is not read anymore; only its key is kept to turn
+        # down writes based on the version before it.
+        if token != self._NULL_VERSION:
+            self._call_store("set", self._get_change_key(token - 1), self._TOMBSTONE)
+
+        if version % self._POINTER_INTERVAL == 0:
+            self._call_store("set", self._get_pointer_key(), str(version))
+
+        return state, version, True
+
+    @traced
+    def _read_state(self, version: int, value: Optional[bytes]) -> Optional[Tuple[bytes, Token]]:
+        # 从``version``开始沿change key链读取到最新版本；``value``是保存其状态的change key的值，
+        # 未知时为None。
+        # Follow the change keys from ``version`` to the latest version.
+        # ``value`` is the one of the change key that holds its state, or None
+        # if it is not known.
+        if version == self._NULL_VERSION:
+            version = self._get_version()
+
+        num_hops = 0
+
+        while True:
+            next_value = self._try_get(self._get_change_key(version))
+            if next_value is not None:
+                version, value = version + 1, next_value
+
+                num_hops += 1
+
+                # 落后太多时跳到版本指针处。
+                # Skip ahead to the version pointer if we lag far behind.
+                if num_hops % self._POINTER_INTERVAL == 0:
+                    pointer = self._get_version()
+                    if pointer > version:
+                        version, value = pointer, None
+
+                continue
+
+            if version == self._NULL_VERSION:
                 return None
 
-            token = token.decode()
-        else:
-            token = self._NULL_SENTINEL
+            if value is None or value == self._TOMBSTONE:
+                value = self._try_get(self._get_change_key(version - 1))
+                if value is None:
+                    raise RendezvousStateError(
+                        f"The state of version {version} of the rendezvous is missing."
+                    )
+
+                # The version has been replaced in the meantime.
+                if value == self._TOMBSTONE:
+                    continue
+
+            if value[:1] != self._RAW_PREFIX:
+                raise RendezvousStateError(
+                    f"The state of version {version} of the rendezvous is corrupt."
+                )
+
+            self._remember(version, value)
+
+            return self._decompress_state(value[1:]), version
+
+    def _remember(self, version: int, value: bytes) -> None:
+        with self._last_seen_lock:
+            if version > self._last_seen[0]:
+                self._last_seen = (version, value)
+
+    @traced
+    def wait_for_state_change(self, token: Optional[Token], timeout: timedelta) -> bool:
+        """See base class."""
+        if timeout <= timedelta(0):
+            return False
+
+        if token is None:
+            token = self._NULL_VERSION
+        elif not isinstance(token, int):
+            return True
+
+        # The change key of a version gets set by the node that replaces it. If
+        # the version has already been replaced the wait returns immediately.
+        key = self._get_change_key(token)
+
+        if self._waiter is not None:
+            return self._waiter.wait(key, timeout)
+
+        if self._poll_for_changes:
+            return self._poll_for_state_change(key, timeout)
+
+        try:
+            self._store.wait([key], timeout)
+        except (ValueError, RuntimeError):
+            # Either the wait has timed out or the store is not reachable; in
+            # the latter case the next read will surface the error.
+            return False
+
+        return True
+
+    @traced
+    def _poll_for_state_change(self, key: str, timeout: timedelta) -> bool:
+        deadline = time.monotonic() + timeout.total_seconds()
+
+        while not self._call_store("check", [key]):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            time.sleep(min(self._WAIT_POLL_INTERVAL, remaining))
+
+        return True
+
+    @property
+    def supports_heartbeats(self) -> bool:
+        """See base class."""
+        return True
+
+    @traced
+    def set_heartbeat(self, node: str, ttl: timedelta) -> None:
+        """See base class."""
+        # 每个节点只写自己的key，不需要compare_set。C10d store的key不会过期；读取方根据
+        # 心跳时间判断节点是否已经dead。
+        # Each node only writes a key of its own, so a plain set will do. C10d
+        # stores do not support expiring keys; the readers tell from the time
+        # of the heartbeat whether it has expired.
+        self._call_store("set", self._get_heartbeat_key(node), str(int(time.time() * 1000)))
+
+    @traced
+    def get_heartbeats(self, nodes: List[str]) -> Dict[str, datetime]:
+        """See base class."""
+        keys = [self._get_heartbeat_key(node) for node in nodes]
+
+        values = self._try_multi_get(keys)
+        if values is None:
+            values = [self._try_get(key) for key in keys]
+
+        heartbeats = {}
+
+        for node, value in zip(nodes, values):
+            if value is None:
+                continue
 
-        base64_state: bytes = self._call_store("compare_set", self._key, token, base64_state_str)
+            try:
+                heartbeats[node] = datetime.utcfromtimestamp(int(value) / 1000)
+            except ValueError as exc:
+                raise RendezvousStateError(
+                    f"The heartbeat of the node '{node}' is corrupt. See inner exception for "
+                    "details."
+                ) from exc
+
+        return heartbeats
 
-        state_token_pair = self._decode_state(base64_state)
-        if state_token_pair is None:
+    @traced
+    def delete_heartbeat(self, node: str) -> None:
+        """See base class."""
+        self._call_store("delete_key", self._get_heartbeat_key(node))
+
+    @traced
+    def _try_multi_get(self, keys: List[str]) -> Optional[List[Optional[bytes]]]:
+        # 只有store支持multi_get时才能一次读取所有key（例如etcd store）；multi_get会等待
+        # 缺失的key，因此先用check确认所有key都存在。
+        # Stores that provide ``multi_get`` (e.g. the etcd stores) return all
+        # keys with one read. Since it waits for missing keys, it is only used
+        # once ``check`` has confirmed that all of them exist. Only the key of a
+        # node that has left the rendezvous gets deleted, so a read racing with
+        # that deletion is rare; it fails once the store times out, and the
+        # keys are then read one by one.
+        multi_get = getattr(self._store, "multi_get", None)
+        if multi_get is None or not keys:
             return None
 
-        new_state, new_token = state_token_pair
+        try:
+            if not self._call_store("check", keys):
+                return None
 
-        # C10d Store's compare_set method does not offer an easy way to find out
-        # whether our write attempt was successful. As a brute-force solution we
-        # perform a bitwise comparison of our local state and the remote state.
-        return new_state, new_token, new_state == state
+            return list(multi_get(keys))
+        except (LookupError, ValueError, RuntimeError):
+            return None
 
+    def shutdown(self) -> None:
+        """See base class."""
+        # 删除共享内存store的文件，使同一run_id的下一次运行从空store开始；本次运行的进程仍然映射着
+        # 旧文件，看到的rdzv依然是关闭的。
+        # Unlink the file of a shared memory store, so that the next run with
+        # the same run id starts from an empty store. The processes of this run
+        # keep the old file mapped and still see the rendezvous as closed.
+        unlink = getattr(self._store, "unlink", None)
+        if unlink is None:
+            return
+
+        try:
+            unlink()
+        except OSError as exc:
+            log.warning(
+                f"The file of the store of the rendezvous '{self._key}' could not be removed due "
+                f"to an error of type {type(exc).__name__}."
+            )
+
+    @traced
     def _call_store(self, store_op: str, *args, **kwargs) -> Any:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         try:
             return getattr(self._store, store_op)(*args, **kwargs)
         except (ValueError, RuntimeError) as exc:
@@ -116,25 +527,45 @@ class C10dRendezvousBackend(RendezvousBackend):
                 "The connection to the C10d store has failed. See inner exception for details."
             ) from exc
 
-    def _decode_state(self, base64_state: bytes) -> Optional[Tuple[bytes, Token]]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
-        if base64_state == self._NULL_SENTINEL.encode():
+    @traced
+    def _get_version(self) -> int:
+        return self._parse_version(self._call_store("get", self._get_pointer_key()))
+
+    @traced
+    def _try_get(self, key: str) -> Optional[bytes]:
+        # Unlike get, which blocks until the key is set, a compare_set whose
+        # expected value is not empty does not create a missing key and
+        # returns the expected value instead.
+        value: bytes = self._call_store(
+            "compare_set", key, self._NULL_SENTINEL, self._NULL_SENTINEL
+        )
+
+        if value == self._NULL_SENTINEL.encode():
             return None
 
+        return value
+
+    def _parse_version(self, value: bytes) -> int:
         try:
-            state = b64decode(base64_state)
-        except binascii.Error as exc:
+            return int(value)
+        except ValueError as exc:
             raise RendezvousStateError(
-                "The state object is corrupt. See inner exception for details."
+                "The version of the rendezvous state is corrupt. See inner exception for details."
             ) from exc
 
-        return state, base64_state
+    def _get_pointer_key(self) -> str:
+        return self._key + ".version"
+
+    def _get_change_key(self, version: int) -> str:
+        return self._key + ".next." + str(version)
 
+    def _get_heartbeat_key(self, node: str) -> str:
+        return self._key + ".heartbeat." + node
 
+
+@traced
 def _create_tcp_store(params: RendezvousParameters) -> TCPStore:
 
-    log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
     host, port = parse_rendezvous_endpoint(params.endpoint, default_port=29400)
 
     cfg_is_host = params.get_as_bool("is_host")
@@ -181,19 +612,124 @@ def _create_tcp_store(params: RendezvousParameters) -> TCPStore:
     return store
 
 
+@traced
+def _create_tcp_wait_store_factory(params: RendezvousParameters) -> Callable[[], Store]:
+    host, port = parse_rendezvous_endpoint(params.endpoint, default_port=29400)
+
+    read_timeout = cast(int, params.get_as_int("read_timeout", 60))
+
+    def create_wait_store() -> Store:
+        return TCPStore(  # type: ignore[call-arg]
+            host, port, is_master=False, timeout=timedelta(seconds=read_timeout)
+        )
+
+    return create_wait_store
+
+
+@traced
+def _create_asyncio_tcp_store(params: RendezvousParameters) -> Store:
+    from .asyncio_tcp_store import StoreClient, StoreServer
+
+    host, port = parse_rendezvous_endpoint(params.endpoint, default_port=29400)
+
+    cfg_is_host = params.get_as_bool("is_host")
+    if cfg_is_host is not None:
+        is_host = cfg_is_host
+    else:
+        is_host = _matches_machine_hostname(host)
+
+    read_timeout = cast(int, params.get_as_int("read_timeout", 60))
+    if read_timeout <= 0:
+        raise ValueError("The read timeout must be a positive integer.")
+
+    # Same as for the TCP store, if we have only inferred that we are the host
+    # and the port is already taken, another process on this machine hosts the
+    # store and we connect to it as a client.
+    if is_host:
+        server = StoreServer("", port)
+        try:
+            server.start_in_thread()
+
+            log.info(
+                f"Process {os.getpid()} hosts the asyncio TCP store for the C10d rendezvous "
+                "backend."
+            )
+        except OSError as exc:
+            if cfg_is_host is not None:
+                raise RendezvousConnectionError(
+                    "The connection to the C10d store has failed. See inner exception for details."
+                ) from exc
+
+    try:
+        store = StoreClient(host, port, timeout=timedelta(seconds=read_timeout))
+    except RuntimeError as exc:
+        raise RendezvousConnectionError(
+            "The connection to the C10d store has failed. See inner exception for details."
+        ) from exc
+
+    return store
+
+
+class SharedMemoryRendezvousBackend(C10dRendezvousBackend):
+    """Represents a C10d rendezvous backend on a :py:class:`SharedMemoryStore`,
+    registered as the "shm" backend.
+    共享内存store上的C10d rendezvous backend，注册为“shm”。
+    """
+
+    @property
+    def name(self) -> str:
+        """See base class."""
+        return "shm"
+
+
+@traced
+def _create_shm_store(params: RendezvousParameters) -> Store:
+    from .shm_store import SharedMemoryStore
+
+    path = params.get("shm_path")
+    if not path:
+        shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+        path = os.path.join(shm_dir, "torch.rendezvous." + params.run_id)
+
+    size = cast(int, params.get_as_int("shm_size", 64 * 1024 * 1024))
+    if size <= 0:
+        raise ValueError("The shared memory size must be a positive integer.")
+
+    read_timeout = cast(int, params.get_as_int("read_timeout", 60))
+    if read_timeout <= 0:
+        raise ValueError("The read timeout must be a positive integer.")
+
+    try:
+        store = SharedMemoryStore(path, size, timeout=timedelta(seconds=read_timeout))
+    except OSError as exc:
+        raise RendezvousConnectionError(
+            f"The shared memory store '{path}' cannot be opened. See inner exception for details."
+        ) from exc
+
+    log.info(f"Process {os.getpid()} uses the shared memory store '{path}'.")
+
+    return store
+
+
+@traced
 def create_backend(params: RendezvousParameters) -> Tuple[C10dRendezvousBackend, Store]:
 
-    log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
     """Creates a new :py:class:`C10dRendezvousBackend` from the specified
     parameters.
 
     +--------------+-----------------------------------------------------------+
     | Parameter    | Description                                               |
     +==============+===========================================================+
-    | store_type   | The type of the C10d store. As of today the only          |
-    |              | supported type is "tcp" which corresponds to              |
-    |              | :py:class:`torch.distributed.TCPStore`. Defaults to "tcp".|
-        C10d store的类型，目前唯一支持的类型是“tcp”，它对应于'torch.distributed.TCPStore‘。默认为“tcp”。
+    | store_type   | The type of the C10d store. "tcp" corresponds to          |
+    |              | :py:class:`torch.distributed.TCPStore`, "asyncio" to the  |
+    |              | asyncio based :py:class:`StoreServer`, which notifies     |
+    |              | waiting clients instead of having them poll, and "shm" to |
+    |              | :py:class:`SharedMemoryStore`, for runs whose agents are  |
+    |              | all on one host. Defaults to "tcp".                       |
+        C10d store的类型。“tcp”对应于'torch.distributed.TCPStore'，“asyncio”对应于基于asyncio的
+        'StoreServer'（由服务端通知等待的客户端，而不是客户端轮询），“shm”对应于'SharedMemoryStore'，
+        用于所有agent都在同一台机器上的情况。默认为“tcp”。
     +--------------+-----------------------------------------------------------+
     | read_timeout | The read timeout, in seconds, for store operations.       |
     |              | Defaults to 60 seconds.   存储操作的读取超时，默认60s                                |
@@ -205,7 +741,7 @@ def create_backend(params: RendezvousParameters) -> Tuple[C10dRendezvousBackend,
     |              | endpoint. Defaults to ``None``.                           |
     |              |                                                           |
     |              | Note that this configuration option only applies to       |
-    |              | :py:class:`torch.distributed.TCPStore`. In normal         |
+    |              | the "tcp" and "asyncio" store types. In normal            |
     |              | circumstances you can safely skip it; the only time when  |
     |              | it is needed is if its value cannot be correctly          |
     |              | determined (e.g. the rendezvous endpoint has a CNAME as   |
@@ -213,13 +749,64 @@ def create_backend(params: RendezvousParameters) -> Tuple[C10dRendezvousBackend,
                一个布尔值，指示该backend实例是否将host C10d存储。如果没有指定，
                将通过将本机的主机名或IP地址与指定的rdzv端点进行匹配来推断。默认为'None'。
     +--------------+-----------------------------------------------------------+
+    | shm_path     | The file of the shared memory store. Defaults to          |
+    |              | ``/dev/shm/torch.rendezvous.<run_id>``. The file is       |
+    |              | removed once the rendezvous has been shut down.           |
+        共享内存store的文件。
+    +--------------+-----------------------------------------------------------+
+    | shm_size     | The size, in bytes, of the file of the shared memory      |
+    |              | store. Defaults to 64 MiB.                                |
+    +--------------+-----------------------------------------------------------+
     """
-    # As of today we only support TCPStore. Other store types do not have the
-    # required functionality (e.g. compare_set) yet.
+    # As of today we only support TCPStore, the asyncio TCP store and
+    # SharedMemoryStore. Other store types do not have the required
+    # functionality (e.g. compare_set) yet.
     store_type = params.get("store_type", "tcp").strip().lower()
-    if store_type != "tcp":
-        raise ValueError("The store type must be 'tcp'. Other store types are not supported yet.")
 
-    store = _create_tcp_store(params)
+    # 只有TCPStore需要为wait单独建立连接；另外两种store可以安全地在共享连接上等待。
+    # Only the TCP store needs a connection of its own for the waits; the
+    # asyncio TCP store matches answers to requests and the shared memory store
+    # has no connection.
+    wait_store_factory = None
+
+    if store_type == "tcp":
+        store = _create_tcp_store(params)
+
+        wait_store_factory = _create_tcp_wait_store_factory(params)
+    elif store_type == "asyncio":
+        store = _create_asyncio_tcp_store(params)
+    elif store_type == "shm":
+        store = _create_shm_store(params)
+    else:
+        raise ValueError(
+            "The store type must be 'tcp', 'asyncio' or 'shm'. Other store types are not "
+            "supported yet."
+        )
+
+    return C10dRendezvousBackend(store, params.run_id, wait_store_factory), store
+
+
+@traced
+def create_shm_backend(
+    params: RendezvousParameters,
+) -> Tuple[SharedMemoryRendezvousBackend, Store]:
+    """Creates a new :py:class:`SharedMemoryRendezvousBackend` from the
+    specified parameters. The endpoint is not used.
+
+    +--------------+-----------------------------------------------------------+
+    | Parameter    | Description                                               |
+    +==============+===========================================================+
+    | shm_path     | The file of the shared memory store. Defaults to          |
+    |              | ``/dev/shm/torch.rendezvous.<run_id>``. The file is       |
+    |              | removed once the rendezvous has been shut down.           |
+    +--------------+-----------------------------------------------------------+
+    | shm_size     | The size, in bytes, of the file of the shared memory      |
+    |              | store. Defaults to 64 MiB.                                |
+    +--------------+-----------------------------------------------------------+
+    | read_timeout | The read timeout, in seconds, for store operations.       |
+    |              | Defaults to 60 seconds.                                   |
+    +--------------+-----------------------------------------------------------+
+    """
+    store = _create_shm_store(params)
 
-    return C10dRendezvousBackend(store, params.run_id), store
+    return SharedMemoryRendezvousBackend(store, params.run_id), store
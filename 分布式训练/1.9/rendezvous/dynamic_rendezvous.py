@@ -3,19 +3,21 @@
 #
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
-import sys
+import heapq
 import logging
 import os
 import pickle
 import socket
+import struct
 import threading
 import time
 import weakref
+import zlib
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple, cast
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar, cast
 
 from torch.distributed import PrefixStore, Store
 
@@ -28,6 +30,7 @@ from .api import (
     RendezvousTimeoutError,
 )
 
+from .tracing import traced
 from .utils import _delay, _PeriodicTimer
 
 
@@ -37,6 +40,139 @@ log = logging.getLogger(__name__)
 Token = Any
 """Represents an opaque fencing token used by the rendezvous backend."""
 
+_T = TypeVar("_T")
+
+
+@dataclass
+class RendezvousCompressionStats:
+    """Holds the statistics of the compression of the rendezvous states of a
+    backend. 保存backend压缩rdzv状态的统计信息
+
+    Attributes:
+        encoded:
+            The number of states written.
+        compressed:
+              其中超过阈值而被压缩的数量
+            The number of those that were above the threshold and compressed.
+        uncompressed_bytes:
+            The total size, in bytes, of the states written.
+        encoded_bytes:
+            The total size, in bytes, of the states written after compression.
+        encode_time:
+            The total time, in seconds, spent compressing.
+        decoded:
+            The number of compressed states read.
+        decode_time:
+            The total time, in seconds, spent decompressing.
+    """
+
+    encoded: int = 0
+    compressed: int = 0
+    uncompressed_bytes: int = 0
+    encoded_bytes: int = 0
+    encode_time: float = 0.0
+    decoded: int = 0
+    decode_time: float = 0.0
+
+    @property
+    def ratio(self) -> float:
+        """Gets the ratio of the bytes written to the bytes of the states."""
+        if self.uncompressed_bytes == 0:
+            return 1.0
+        return self.encoded_bytes / self.uncompressed_bytes
+
+
+class RendezvousStateCompression:
+    """Compresses the rendezvous states written by a backend with zlib.
+      使用zlib压缩backend写入的rdzv状态
+
+    A compressed state starts with :py:attr:`MARKER`, which neither the
+    encoded nor the pickled states of older versions start with, so the states
+    below the threshold are written as is and readers tell the two apart.
+    Readers always decompress, whether or not they compress themselves; the
+    nodes of a rendezvous can therefore turn compression on one by one, as long
+    as all of them run a version that can read compressed states.
+
+    Args:
+        level:
+            The zlib compression level, from 1 (fastest) to 9 (smallest).
+        threshold:
+              小于该大小（字节）的状态不压缩
+            The size, in bytes, below which states are written uncompressed.
+    """
+
+    MARKER = b"RDZZ"
+
+    _stats: RendezvousCompressionStats
+    _lock: threading.Lock
+
+    def __init__(self, level: int = 6, threshold: int = 1024) -> None:
+        if not 1 <= level <= 9:
+            raise ValueError(f"The compression level ({level}) must be between 1 and 9.")
+
+        if threshold < 0:
+            raise ValueError(f"The compression threshold ({threshold}) must not be negative.")
+
+        self.level = level
+        self.threshold = threshold
+
+        self._stats = RendezvousCompressionStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> RendezvousCompressionStats:
+        """Gets a snapshot of the compression statistics."""
+        with self._lock:
+            return replace(self._stats)
+
+    def compress(self, state: bytes) -> bytes:
+        """Compresses ``state`` if it is above the threshold."""
+        if len(state) < self.threshold:
+            value = state
+
+            encode_time = 0.0
+        else:
+            start = time.perf_counter()
+
+            value = self.MARKER + zlib.compress(state, self.level)
+
+            encode_time = time.perf_counter() - start
+
+        with self._lock:
+            self._stats.encoded += 1
+            self._stats.uncompressed_bytes += len(state)
+            self._stats.encoded_bytes += len(value)
+
+            if value is not state:
+                self._stats.compressed += 1
+                self._stats.encode_time += encode_time
+
+        return value
+
+    def decompress(self, value: bytes) -> bytes:
+        """Decompresses ``value`` if it is compressed."""
+        if value[: len(self.MARKER)] != self.MARKER:
+            return value
+
+        start = time.perf_counter()
+
+        state = _decompress_state(value)
+
+        with self._lock:
+            self._stats.decoded += 1
+            self._stats.decode_time += time.perf_counter() - start
+
+        return state
+
+
+def _decompress_state(value: bytes) -> bytes:
+    try:
+        return zlib.decompress(value[len(RendezvousStateCompression.MARKER) :])
+    except zlib.error as exc:
+        raise RendezvousStateError(
+            "The rendezvous state is corrupt. See inner exception for details."
+        ) from exc
+
 
 class RendezvousBackend(ABC):
     # 表示保存rdzv状态的backend
@@ -45,15 +181,11 @@ class RendezvousBackend(ABC):
     @property
     @abstractmethod
     def name(self) -> str:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         # 得到backend的名称
         """Gets the name of the backend."""
 
     @abstractmethod
     def get_state(self) -> Optional[Tuple[bytes, Token]]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Gets the rendezvous state.得到rdzv状态
 
         Returns:
@@ -72,8 +204,6 @@ class RendezvousBackend(ABC):
     def set_state(
         self, state: bytes, token: Optional[Token] = None
     ) -> Optional[Tuple[bytes, Token, bool]]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Sets the rendezvous state. 设置rdzv状态
           新的rdzv状态的设置是有条件的
         The new rendezvous state is set conditionally:
@@ -116,6 +246,148 @@ class RendezvousBackend(ABC):
                 The rendezvous state is corrupt.
         """
 
+    @traced
+    def wait_for_state_change(self, token: Optional[Token], timeout: timedelta) -> bool:
+        """Blocks until the rendezvous state changes or ``timeout`` elapses.
+          阻塞直到rdzv状态发生变化或超时。
+
+        Backends that are able to watch the rendezvous state should override
+        this method. The default implementation simply sleeps for ``timeout``
+        which is equivalent to polling the backend.
+
+        Args:
+            token:
+                  调用方已知的状态的fencing token，通过之前调用的'get_state'或'set_state'获取。
+                The fencing token of the state known to the caller that was
+                retrieved by a previous call to :py:meth:`get_state` or
+                :py:meth:`set_state`. ``None`` if no state was found.
+            timeout:
+                The maximum amount of time to wait for a change.
+
+        Returns:
+            A boolean value indicating whether the state might have changed
+            since ``token``; ``False`` if the wait has timed out.
+
+        Raises:
+            RendezvousConnectionError:
+                The connection to the backend has failed.
+        """
+        _delay(seconds=timeout.total_seconds())
+
+        return False
+
+    @property
+    def supports_heartbeats(self) -> bool:
+        """Indicates whether the backend can store heartbeats in per-node keys.
+          指示backend是否支持将心跳保存在每个节点自己的key中。
+
+        Backends that return ``True`` must implement :py:meth:`set_heartbeat`
+        and :py:meth:`get_heartbeats`. A heartbeat is written by its node only,
+        so it should not need a compare-and-swap; the heartbeats of several
+        nodes should be read in a single call where the backend supports it.
+        """
+        return False
+
+    @traced
+    def set_heartbeat(self, node: str, ttl: timedelta) -> None:
+        """Records a keep-alive heartbeat for ``node`` outside of the rendezvous
+        state. 在rdzv状态之外为节点记录一次心跳
+
+        Args:
+            node:
+                The id of the node.
+            ttl:
+                The amount of time after which the heartbeat is considered
+                expired. Backends that support expiring keys can use it to
+                clean up the heartbeats of dead nodes.
+
+        Raises:
+            RendezvousConnectionError:
+                The connection to the backend has failed.
+        """
+        raise NotImplementedError(f"The backend '{self.name}' does not support per-node heartbeats.")
+
+    @traced
+    def get_heartbeats(self, nodes: List[str]) -> Dict[str, datetime]:
+        """Gets the last heartbeat times, in UTC, of ``nodes``.
+          获取节点最后一次心跳的时间
+
+        Args:
+            nodes:
+                The ids of the nodes to look up.
+
+        Returns:
+            A dictionary that maps the id of a node to the time of its last
+            heartbeat. Nodes without a (non-expired) heartbeat are omitted.
+
+        Raises:
+            RendezvousConnectionError:
+                The connection to the backend has failed.
+        """
+        raise NotImplementedError(f"The backend '{self.name}' does not support per-node heartbeats.")
+
+    @traced
+    def delete_heartbeat(self, node: str) -> None:
+        """Deletes the heartbeat of ``node``, which has left the rendezvous.
+          删除已离开rdzv的节点的心跳
+
+        Also called for the nodes that have been removed from the rendezvous
+        since they had no heartbeat.
+
+        Args:
+            node:
+                The id of the node.
+
+        Raises:
+            RendezvousConnectionError:
+                The connection to the backend has failed.
+        """
+
+    def shutdown(self) -> None:
+        """Releases what the backend keeps of the rendezvous once it has been
+        closed. 在rdzv关闭之后释放backend为其保留的内容
+
+        Called after the rendezvous has been closed. Backends whose state
+        would otherwise be picked up by a later rendezvous with the same run
+        id, e.g. a file on the host, should remove it here; the nodes of the
+        closed rendezvous are expected to still see it as closed.
+        """
+
+    # 默认不压缩；子类不需要调用基类的构造函数
+    # No compression by default; as a class attribute so that subclasses do
+    # not have to call the constructor of the base class.
+    _compression: Optional[RendezvousStateCompression] = None
+
+    @property
+    def compression(self) -> Optional[RendezvousStateCompression]:
+        """Gets the compression of the states written by the backend, or
+        ``None`` if they are written uncompressed."""
+        return self._compression
+
+    @compression.setter
+    def compression(self, value: Optional[RendezvousStateCompression]) -> None:
+        self._compression = value
+
+    def _compress_state(self, state: bytes) -> bytes:
+        """Returns ``state`` as it should be written to the backend. To be
+        called by the implementations of :py:meth:`set_state`."""
+        if self._compression is None:
+            return state
+
+        return self._compression.compress(state)
+
+    def _decompress_state(self, value: bytes) -> bytes:
+        """Returns the state read from the backend as ``value``. To be called by
+        the implementations of :py:meth:`get_state` and :py:meth:`set_state`;
+        compressed states are read even if the backend does not compress."""
+        if self._compression is not None:
+            return self._compression.decompress(value)
+
+        if value[: len(RendezvousStateCompression.MARKER)] != RendezvousStateCompression.MARKER:
+            return value
+
+        return _decompress_state(value)
+
 
 class RendezvousTimeout:
     """
@@ -167,35 +439,25 @@ class RendezvousTimeout:
 
     @property
     def join(self) -> timedelta:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Gets the join timeout."""
         return self._join
 
     @property
     def last_call(self) -> timedelta:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Gets the last call timeout."""
         return self._last_call
 
     @property
     def close(self) -> timedelta:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Gets the close timeout."""
         return self._close
 
     @property
     def heartbeat(self) -> timedelta:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Gets the keep-alive heartbeat timeout."""
         return self._heartbeat
 
     def _set_timeouts(self, **timeouts: Optional[timedelta]):
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         for name, timeout in timeouts.items():
             if timeout is None:
                 timeout = self._DEFAULT_TIMEOUTS[name]
@@ -265,18 +527,16 @@ class _NodeDescGenerator:
     _lock: threading.Lock
     _local_id: int
 
+    @traced
     def __init__(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         self._lock = threading.Lock()
 
         # 一个整数，每次调用generate()时递增
         # An integer that is incremented with each call to generate().
         self._local_id = 0
 
+    @traced
     def generate(self) -> _NodeDesc:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         # 这个方法可以被多个线程并发调用;因此,我们必须以原子的方式递增整数。
         # This method can be called by multiple threads concurrently; therefore,
         # we must increment the integer atomically.
@@ -314,6 +574,11 @@ class _RendezvousState:
         last_heartbeats:
               包含每个节点最后一次心跳时间的字典
             A dictionary containing each node's last heartbeat time.
+        last_participants:
+              最近一次完成的rdzv轮次的参与者；只由这些节点组成的新一轮rdzv无需等待last call即可完成。
+            The participants of the last completed round of the rendezvous. A
+            round made up of exactly these nodes, with nobody else waiting, is
+            complete without a last call.
     """
 
     round: int
@@ -323,10 +588,9 @@ class _RendezvousState:
     participants: Dict[_NodeDesc, int]
     wait_list: Set[_NodeDesc]
     last_heartbeats: Dict[_NodeDesc, datetime]
+    last_participants: Set[_NodeDesc]
 
     def __init__(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         self.round = 0
         self.complete = False
         self.deadline = None
@@ -334,6 +598,272 @@ class _RendezvousState:
         self.participants = {}
         self.wait_list = set()
         self.last_heartbeats = {}
+        self.last_participants = set()
+
+
+class _RendezvousStateCodec:
+    """Encodes and decodes the rendezvous state. 编码和解码rdzv状态
+
+    The state is encoded in a compact, versioned binary format. Each node
+    descriptor is stored once in a node table and referenced by its index from
+    the participants, the wait list, and the heartbeats. Timestamps are stored
+    as integer offsets, in microseconds, from the earliest timestamp in the
+    state.
+
+    Since the node table rarely changes between two syncs, the codec reuses
+    the node descriptors of the last decoded table if its bytes are identical.
+    States encoded with version 1, which lack the participants of the last
+    completed round, or with ``pickle`` by older versions can still be
+    decoded.
+    """
+
+    MAGIC = b"RDZV"
+
+    VERSION = 2
+
+    # magic, version, round, flags, base time, deadline offset, size of the
+    # FQDN table, number of nodes, participants, wait list, heartbeats, and
+    # participants of the last completed round.
+    _HEADER = struct.Struct("<4sBQBqqIIIIII")
+
+    # Version 1 has no participants of the last completed round.
+    _HEADER_V1 = struct.Struct("<4sBQBqqIIIII")
+
+    _FLAG_COMPLETE = 1
+    _FLAG_CLOSED = 2
+    _FLAG_DEADLINE = 4
+
+    _EPOCH = datetime(1970, 1, 1)
+
+    _US = timedelta(microseconds=1)
+
+    # The encoder side cache.
+    _enc_nodes: Optional[Set[_NodeDesc]]
+    _enc_node_idx: Dict[_NodeDesc, int]
+    _enc_node_table: bytes
+    _enc_num_fqdns: int
+
+    # The decoder side cache.
+    _dec_node_table: Optional[bytes]
+    _dec_nodes: List[_NodeDesc]
+
+    def __init__(self) -> None:
+        self._enc_nodes = None
+        self._enc_node_idx = {}
+        self._enc_node_table = b""
+        self._enc_num_fqdns = 0
+
+        self._dec_node_table = None
+        self._dec_nodes = []
+
+    def encode(self, state: _RendezvousState) -> bytes:
+        """Encodes ``state``."""
+        nodes = (
+            state.participants.keys()
+            | state.wait_list
+            | state.last_heartbeats.keys()
+            | state.last_participants
+        )
+        if nodes != self._enc_nodes:
+            self._build_node_table(nodes)
+
+        node_idx = self._enc_node_idx
+
+        flags = 0
+        if state.complete:
+            flags |= self._FLAG_COMPLETE
+        if state.closed:
+            flags |= self._FLAG_CLOSED
+
+        heartbeat_times = [
+            (t - self._EPOCH) // self._US for t in state.last_heartbeats.values()
+        ]
+
+        deadline_time = 0
+        if state.deadline is not None:
+            flags |= self._FLAG_DEADLINE
+
+            deadline_time = (state.deadline - self._EPOCH) // self._US
+
+        if heartbeat_times:
+            base_time = min(heartbeat_times)
+        else:
+            base_time = deadline_time
+
+        num_participants = len(state.participants)
+        num_waiting = len(state.wait_list)
+        num_heartbeats = len(heartbeat_times)
+        num_last_participants = len(state.last_participants)
+
+        header = self._HEADER.pack(
+            self.MAGIC,
+            self.VERSION,
+            state.round,
+            flags,
+            base_time,
+            deadline_time - base_time,
+            len(self._enc_node_table) - 12 * len(node_idx),
+            len(node_idx),
+            num_participants,
+            num_waiting,
+            num_heartbeats,
+            num_last_participants,
+        )
+
+        participants = []
+        for node, rank in state.participants.items():
+            participants.append(node_idx[node])
+            participants.append(rank)
+
+        return b"".join(
+            [
+                header,
+                self._enc_node_table,
+                struct.pack(f"<{2 * num_participants}I", *participants),
+                struct.pack(f"<{num_waiting}I", *[node_idx[n] for n in state.wait_list]),
+                struct.pack(
+                    f"<{num_heartbeats}I", *[node_idx[n] for n in state.last_heartbeats]
+                ),
+                struct.pack(f"<{num_heartbeats}q", *[t - base_time for t in heartbeat_times]),
+                struct.pack(
+                    f"<{num_last_participants}I", *[node_idx[n] for n in state.last_participants]
+                ),
+            ]
+        )
+
+    def _build_node_table(self, nodes: Set[_NodeDesc]) -> None:
+        # 排序以保证不同节点对同一组节点生成相同的表，这样解码端的缓存才能命中。
+        # Sort the nodes so that every encoder produces the same table for the
+        # same set of nodes; otherwise the decoder side cache would miss.
+        sorted_nodes = sorted(nodes, key=lambda n: (n.fqdn, n.pid, n.local_id))
+
+        fqdn_idx: Dict[str, int] = {}
+        for node in sorted_nodes:
+            fqdn_idx.setdefault(node.fqdn, len(fqdn_idx))
+
+        node_ints = []
+        for node in sorted_nodes:
+            node_ints += (fqdn_idx[node.fqdn], node.pid, node.local_id)
+
+        self._enc_nodes = set(nodes)
+        self._enc_node_idx = {node: idx for idx, node in enumerate(sorted_nodes)}
+        self._enc_node_table = "\0".join(fqdn_idx).encode() + struct.pack(
+            f"<{len(node_ints)}I", *node_ints
+        )
+
+    def decode(self, state_bits: bytes) -> _RendezvousState:
+        """Decodes ``state_bits``.
+
+        Raises:
+            RendezvousStateError:
+                The rendezvous state is corrupt.
+        """
+        if state_bits[: len(self.MAGIC)] != self.MAGIC:
+            # The state has been encoded by an older version.
+            try:
+                state = pickle.loads(state_bits)
+            except (pickle.PickleError, EOFError) as exc:
+                raise RendezvousStateError(
+                    "The rendezvous state is corrupt. See inner exception for details."
+                ) from exc
+
+            if not hasattr(state, "last_participants"):
+                state.last_participants = set()
+
+            return state
+
+        try:
+            return self._decode(state_bits)
+        except (struct.error, IndexError, ValueError) as exc:
+            raise RendezvousStateError(
+                "The rendezvous state is corrupt. See inner exception for details."
+            ) from exc
+
+    def _decode(self, state_bits: bytes) -> _RendezvousState:
+        version = state_bits[len(self.MAGIC)]
+
+        if version == self.VERSION:
+            header = self._HEADER.unpack_from(state_bits)
+
+            offset = self._HEADER.size
+        elif version == 1:
+            header = self._HEADER_V1.unpack_from(state_bits) + (0,)
+
+            offset = self._HEADER_V1.size
+        else:
+            raise ValueError(f"The state encoding version {version} is not supported.")
+
+        (
+            _,
+            _,
+            round,
+            flags,
+            base_time,
+            deadline_offset,
+            fqdn_table_size,
+            num_nodes,
+            num_participants,
+            num_waiting,
+            num_heartbeats,
+            num_last_participants,
+        ) = header
+
+        node_table_size = fqdn_table_size + 12 * num_nodes
+
+        node_table = state_bits[offset : offset + node_table_size]
+        if node_table == self._dec_node_table:
+            nodes = self._dec_nodes
+        else:
+            fqdns = node_table[:fqdn_table_size].decode().split("\0")
+
+            node_ints = struct.unpack_from(f"<{3 * num_nodes}I", node_table, fqdn_table_size)
+
+            nodes = [
+                _NodeDesc(fqdns[node_ints[i]], node_ints[i + 1], node_ints[i + 2])
+                for i in range(0, len(node_ints), 3)
+            ]
+
+            self._dec_node_table = node_table
+            self._dec_nodes = nodes
+
+        offset += node_table_size
+
+        participants = struct.unpack_from(f"<{2 * num_participants}I", state_bits, offset)
+        offset += 8 * num_participants
+
+        wait_list = struct.unpack_from(f"<{num_waiting}I", state_bits, offset)
+        offset += 4 * num_waiting
+
+        heartbeat_nodes = struct.unpack_from(f"<{num_heartbeats}I", state_bits, offset)
+        offset += 4 * num_heartbeats
+
+        heartbeat_offsets = struct.unpack_from(f"<{num_heartbeats}q", state_bits, offset)
+        offset += 8 * num_heartbeats
+
+        last_participants = struct.unpack_from(f"<{num_last_participants}I", state_bits, offset)
+
+        base = self._EPOCH + timedelta(microseconds=base_time)
+
+        state = _RendezvousState()
+
+        state.round = round
+        state.complete = bool(flags & self._FLAG_COMPLETE)
+        state.closed = bool(flags & self._FLAG_CLOSED)
+
+        if flags & self._FLAG_DEADLINE:
+            state.deadline = base + timedelta(microseconds=deadline_offset)
+
+        state.participants = {
+            nodes[idx]: rank for idx, rank in zip(participants[0::2], participants[1::2])
+        }
+        state.wait_list = {nodes[idx] for idx in wait_list}
+        state.last_heartbeats = {
+            nodes[idx]: base + timedelta(microseconds=off)
+            for idx, off in zip(heartbeat_nodes, heartbeat_offsets)
+        }
+        state.last_participants = {nodes[idx] for idx in last_participants}
+
+        return state
 
 
 class _RendezvousStateHolder(ABC):
@@ -342,14 +872,10 @@ class _RendezvousStateHolder(ABC):
     @property
     @abstractmethod
     def state(self) -> _RendezvousState:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Gets the local state."""
 
     @abstractmethod
     def sync(self) -> Optional[bool]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Reads or writes the latest state.读写最新状态
 
         Returns:
@@ -360,11 +886,269 @@ class _RendezvousStateHolder(ABC):
 
     @abstractmethod
     def mark_dirty(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         # 将本地状态标记为’dirty‘
         """Marks the local state as dirty."""
 
+    @traced
+    def wait_for_change(self, timeout: timedelta) -> None:
+        """Waits until the shared state changes or ``timeout`` elapses.
+          等待共享状态发生变化或超时
+
+        The next call to :py:meth:`sync` is expected to return the latest
+        state if a change has been observed.
+        """
+        _delay(seconds=timeout.total_seconds())
+
+    @traced
+    def keep_alive(self, node: _NodeDesc) -> bool:
+        """Records a keep-alive heartbeat for ``node`` outside of the shared
+        state. 在共享状态之外记录节点的心跳
+
+        Returns:
+              如果返回False，心跳需要作为共享状态的一部分写回。
+            A boolean value indicating whether the heartbeat has been recorded.
+            If ``False``, the heartbeat has to be written as part of the shared
+            state.
+        """
+        return False
+
+    @traced
+    def invalidate(self) -> None:
+        """Forces the next call to :py:meth:`sync` to read the latest state.
+          强制下一次同步调用读取最新状态
+        """
+
+    @property
+    def last_write_size(self) -> int:
+        """Gets the size, in bytes, of the state last written to the backend.
+          获取最后一次写入backend的状态的大小(以字节为单位)
+        """
+        return 0
+
+    @property
+    def cache_stats(self) -> Optional["RendezvousStateCacheStats"]:
+        """Gets the statistics of the state cache, if the holder has one.
+          获取状态缓存的统计信息
+        """
+        return None
+
+    def shutdown(self) -> None:
+        """Releases the resources of the closed rendezvous.
+          释放已关闭的rdzv的资源
+        """
+
+
+@dataclass
+class RendezvousStateCacheStats:
+    """Holds the statistics of a rendezvous state cache.
+      保存rdzv状态缓存的统计信息
+
+    Attributes:
+        hits:
+            The number of reads served from the cache.
+        coalesced_reads:
+              等待另一个调用者正在进行的backend读取的次数
+            The number of reads that have waited for a backend read already in
+            flight for another caller instead of issuing their own.
+        backend_reads:
+            The number of reads that have gone to the backend.
+    """
+
+    hits: int = 0
+    coalesced_reads: int = 0
+    backend_reads: int = 0
+
+    @property
+    def reads_saved(self) -> int:
+        """Gets the number of backend reads saved by the cache."""
+        return self.hits + self.coalesced_reads
+
+    @property
+    def hit_rate(self) -> float:
+        """Gets the ratio of the reads that have not gone to the backend."""
+        num_reads = self.reads_saved + self.backend_reads
+        if num_reads == 0:
+            return 0.0
+        return self.reads_saved / num_reads
+
+
+class _RendezvousStateCache:
+    """Caches the rendezvous state read from a backend.
+      缓存从backend读取的rdzv状态，由进程中同一个rdzv的所有状态持有者共享。
+
+    The cache is shared by all state holders of a rendezvous in the process
+    that use the same backend endpoint (see :py:func:`_get_state_cache`).
+    Concurrent reads are coalesced into a
+    single backend read, and the time during which a cached state is served
+    adapts to how often the state changes: a state that has not changed for a
+    while is likely to stay the same, whereas one that has just changed, e.g.
+    in the middle of a rendezvous, is likely to change again soon.
+    """
+
+    # 缓存的状态可以使用的时间是状态上次变化以来时间的一部分，并限制在这个范围内。
+    # A cached state is served for a fraction of the time since the state last
+    # changed, bounded by these values.
+    _MIN_FRESHNESS = 0.1
+    _MAX_FRESHNESS = 5.0
+    _FRESHNESS_FACTOR = 0.1
+
+    _cond: threading.Condition
+    _entry: Optional[Tuple[bytes, Token]]
+    _entry_time: float
+    _token: Token
+    _last_change_time: float
+    _read_time: Optional[float]
+    _stats: RendezvousStateCacheStats
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._entry = None
+        # 缓存状态的读取开始时间；负无穷表示还没有缓存状态
+        # The time at which the read of the cached state started; -inf if
+        # nothing has been cached yet.
+        self._entry_time = float("-inf")
+        self._token = None
+        self._last_change_time = time.monotonic()
+        # 正在进行的最新backend读取的开始时间
+        # The start time of the latest backend read in flight, if any.
+        self._read_time = None
+        self._stats = RendezvousStateCacheStats()
+
+    @property
+    def stats(self) -> RendezvousStateCacheStats:
+        """Gets a snapshot of the statistics of the cache."""
+        with self._cond:
+            return replace(self._stats)
+
+    @property
+    def freshness(self) -> float:
+        """Gets the time, in seconds, for which a cached state is currently
+        served."""
+        with self._cond:
+            return self._get_freshness(time.monotonic())
+
+    @traced
+    def get_state(self, backend: RendezvousBackend, fresh: bool = False) -> Optional[Tuple[bytes, Token]]:
+        """Gets the rendezvous state.
+
+        Args:
+            backend:
+                The backend to read the state from if the cached one is stale.
+            fresh:
+                  如果为True，只返回在调用之后开始读取的状态。
+                A boolean value indicating whether only a state whose read has
+                started after this call can be returned.
+        """
+        waited = False
+
+        with self._cond:
+            now = time.monotonic()
+
+            min_time = now if fresh else now - self._get_freshness(now)
+
+            while True:
+                if self._entry_time >= min_time:
+                    if waited:
+                        self._stats.coalesced_reads += 1
+                    else:
+                        self._stats.hits += 1
+
+                    return self._entry
+
+                # 另一个调用者已经开始了一次足够新的读取，等待它的结果，而不是再发起一次读取。
+                # Another caller has already started a read that is recent
+                # enough; wait for its result instead of issuing another one.
+                if self._read_time is not None and self._read_time >= min_time:
+                    waited = True
+
+                    self._cond.wait()
+                else:
+                    break
+
+            read_time = self._read_time = time.monotonic()
+
+        try:
+            response = backend.get_state()
+        except BaseException:
+            with self._cond:
+                # 让等待者自己重试读取
+                # Let the waiters issue their own read.
+                if self._read_time == read_time:
+                    self._read_time = None
+
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._stats.backend_reads += 1
+
+            self._put(response, read_time)
+
+            if self._read_time == read_time:
+                self._read_time = None
+
+            self._cond.notify_all()
+
+        return response
+
+    def clear(self) -> None:
+        """Drops the cached state, e.g. once the backend has been reset."""
+        with self._cond:
+            self._entry = None
+            self._entry_time = float("-inf")
+            self._token = None
+
+    def update(self, state_bits: bytes, token: Token) -> None:
+        """Caches a state returned by the backend after a write."""
+        with self._cond:
+            self._put((state_bits, token), time.monotonic())
+
+            self._cond.notify_all()
+
+    def _put(self, response: Optional[Tuple[bytes, Token]], entry_time: float) -> None:
+        # 一个较早开始的读取可能在较晚开始的读取之后完成。
+        # A read that has started earlier might complete after a later one.
+        if entry_time < self._entry_time:
+            return
+
+        self._entry = response
+        self._entry_time = entry_time
+
+        token = response[1] if response is not None else None
+        if token != self._token:
+            self._token = token
+
+            self._last_change_time = time.monotonic()
+
+    def _get_freshness(self, now: float) -> float:
+        freshness = (now - self._last_change_time) * self._FRESHNESS_FACTOR
+
+        return min(max(freshness, self._MIN_FRESHNESS), self._MAX_FRESHNESS)
+
+
+# 每个backend名称、endpoint和run_id对应一个缓存，使同一进程中同一个rdzv的所有handler共享缓存，
+# 即使它们各自创建了backend实例。当所有的状态持有者都被释放时缓存也随之释放。
+# One cache per backend name, endpoint, and run id, so that all handlers of a
+# rendezvous in the process share it even if each of them has created a
+# backend instance of its own. A cache goes away with its last state holder.
+_state_caches: "weakref.WeakValueDictionary[Tuple[str, str, str], _RendezvousStateCache]" = (
+    weakref.WeakValueDictionary()
+)
+
+_state_caches_lock = threading.Lock()
+
+
+def _get_state_cache(backend_name: str, endpoint: str, run_id: str) -> _RendezvousStateCache:
+    """Gets the state cache shared by the state holders of ``run_id`` on the
+    backend ``backend_name`` at ``endpoint`` in the process."""
+    key = (backend_name, endpoint, run_id)
+
+    with _state_caches_lock:
+        cache = _state_caches.get(key)
+        if cache is None:
+            cache = _state_caches[key] = _RendezvousStateCache()
+        return cache
+
 
 class _BackendRendezvousStateHolder(_RendezvousStateHolder):
     """
@@ -378,41 +1162,101 @@ class _BackendRendezvousStateHolder(_RendezvousStateHolder):
             The rendezvous settings.
         cache_duration:
               在再次从backend请求最后一个rdzv状态之前,缓存该状态的时间量(以秒为单位)。
+              如果为None，则使用进程内共享的、时长自适应的状态缓存。
             The amount of time, in seconds, to cache the last rendezvous state
-            before requesting it from the backend again.
+            before requesting it from the backend again. If ``None``, the state
+            is cached in a :py:class:`_RendezvousStateCache` whose duration
+            adapts to how often the state changes.
+        per_node_heartbeats:
+              是否将心跳保存在每个节点自己的key中，而不是共享的rdzv状态中。
+            A boolean value indicating whether to keep the heartbeats in per-node
+            keys of the backend instead of the shared rendezvous state. In this
+            mode the shared state only changes when the membership changes.
+        state_cache:
+            The adaptive state cache to use if ``cache_duration`` is ``None``.
+            Defaults to a cache of the state holder's own.
     """
 
     _backend: RendezvousBackend
     _state: _RendezvousState
     _settings: RendezvousSettings
-    _cache_duration: int
+    _codec: _RendezvousStateCodec
+    _cache_duration: Optional[float]
+    _state_cache: Optional[_RendezvousStateCache]
     _token: Token
     _dirty: bool
     _last_sync_time: float
     _dead_nodes: List[_NodeDesc]
+    _per_node_heartbeats: bool
+    _heartbeats: Dict[_NodeDesc, datetime]
+    _heartbeat_nodes: Set[_NodeDesc]
+    _last_write_size: int
+    _expiry_heap: Optional[List[Tuple[datetime, int, _NodeDesc]]]
 
     def __init__(
-        self, backend: RendezvousBackend, settings: RendezvousSettings, cache_duration: int = 1
+        self,
+        backend: RendezvousBackend,
+        settings: RendezvousSettings,
+        cache_duration: Optional[float] = None,
+        per_node_heartbeats: bool = False,
+        state_cache: Optional[_RendezvousStateCache] = None,
     ) -> None:
+        if per_node_heartbeats and not backend.supports_heartbeats:
+            raise ValueError(f"The backend '{backend.name}' does not support per-node heartbeats.")
+
+        if cache_duration is None and state_cache is None:
+            state_cache = _RendezvousStateCache()
+
         self._backend = backend
         self._state = _RendezvousState()
         self._settings = settings
+        self._codec = _RendezvousStateCodec()
         self._cache_duration = cache_duration
+        self._state_cache = state_cache if cache_duration is None else None
         self._token = None
         self._dirty = False
         self._last_sync_time = -1
         self._dead_nodes = []
+        self._per_node_heartbeats = per_node_heartbeats
+        # 从backend读取到的最新心跳时间，在多次同步之间复用
+        # The latest heartbeat times read from the backend; kept across syncs
+        # so that only the nodes about to expire have to be looked up.
+        self._heartbeats = {}
+        # 本持有者写过心跳key的节点以及被本持有者移除的dead节点，在它们离开rdzv之后删除其心跳
+        # The nodes whose heartbeats have been written by this holder and the
+        # dead nodes it has removed; their heartbeats are deleted once they
+        # have left the rendezvous.
+        self._heartbeat_nodes = set()
+        self._last_write_size = 0
+        # 按心跳时间排序的最小堆，只在状态token变化时重建
+        # A min-heap of the nodes ordered by their last heartbeat; rebuilt only
+        # when the state token changes so that sanitizing the state does not
+        # have to scan all nodes on every sync.
+        self._expiry_heap = None
 
     @property
     def state(self) -> _RendezvousState:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
         return self._state
 
+    @property
+    def cache_stats(self) -> Optional[RendezvousStateCacheStats]:
+        """See base class."""
+        if self._state_cache is None:
+            return None
+        return self._state_cache.stats
+
+    def shutdown(self) -> None:
+        """See base class."""
+        self._backend.shutdown()
+
+        # 共享缓存中的状态来自已经释放的backend内容
+        # The cached state may come from what the backend has just released.
+        if self._state_cache is not None:
+            self._state_cache.clear()
+
+    @traced
     def sync(self) -> Optional[bool]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
         state_bits: Optional[bytes] = None
 
@@ -423,34 +1267,74 @@ class _BackendRendezvousStateHolder(_RendezvousStateHolder):
         if self._dirty:
             has_set = False
 
-            state_bits = pickle.dumps(self._state)
+            state_bits = self._encode_state()
 
             set_response = self._backend.set_state(state_bits, self._token)
             if set_response is not None:
                 state_bits, token, has_set = set_response
+
+                if self._state_cache is not None:
+                    self._state_cache.update(state_bits, token)
         else:
             has_set = None
 
-            if self._cache_duration > 0:
+            if self._state_cache is not None:
+                # 共享缓存：并发的读取合并为一次backend读取；invalidate()之后必须读取最新状态。
+                # The shared cache coalesces concurrent reads into one backend
+                # read; after invalidate() only a fresh read will do.
+                get_response = self._state_cache.get_state(
+                    self._backend, fresh=self._last_sync_time < 0
+                )
+            else:
                 # 如果我们被要求重复检索状态，避免重载后端。尝试提供缓存状态。
                 # Avoid overloading the backend if we are asked to retrieve the
                 # state repeatedly. Try to serve the cached state.
-                if self._last_sync_time >= max(time.monotonic() - self._cache_duration, 0):
+                if self._is_cached_state_fresh():
                     return None
 
-            get_response = self._backend.get_state()
+                get_response = self._backend.get_state()
+
             if get_response is not None:
                 state_bits, token = get_response
 
-        if state_bits is not None:
-            try:
-                self._state = pickle.loads(state_bits)
-            except pickle.PickleError as exc:
-                raise RendezvousStateError(
-                    "The rendezvous state is corrupt. See inner exception for details."
-                ) from exc
+        self._apply_sync(state_bits, token, has_set)
+
+        return has_set
+
+    @traced
+    def _encode_state(self) -> bytes:
+        state_bits = self._codec.encode(self._state)
+
+        self._last_write_size = len(state_bits)
+
+        return state_bits
+
+    def _is_cached_state_fresh(self) -> bool:
+        if not self._cache_duration or self._cache_duration <= 0:
+            return False
+
+        return self._last_sync_time >= max(time.monotonic() - self._cache_duration, 0)
+
+    @traced
+    def _apply_sync(
+        self, state_bits: Optional[bytes], token: Token, has_set: Optional[bool]
+    ) -> None:
+        """Updates the local state with the result of a backend read or write.
+          用backend读写的结果更新本地状态
+        """
+        if has_set is None and token is not None and token == self._token:
+            # 状态自上次同步以来没有变化；保留本地副本（其中已删除了dead节点），过期索引也因此保持有效。
+            # The state has not changed since the last sync; keep the local
+            # copy, from which the dead nodes have already been removed, so
+            # that the expiry index stays valid.
+            pass
         else:
-            self._state = _RendezvousState()
+            if state_bits is not None:
+                self._state = self._codec.decode(state_bits)
+            else:
+                self._state = _RendezvousState()
+
+            self._expiry_heap = None
 
         if has_set and self._dead_nodes and log.isEnabledFor(logging.DEBUG):
             # dead nodes列表
@@ -469,28 +1353,58 @@ class _BackendRendezvousStateHolder(_RendezvousStateHolder):
 
         self._sanitize()
 
-        return has_set
+        if self._heartbeat_nodes:
+            self._delete_heartbeats()
+
+    @traced
+    def _delete_heartbeats(self) -> None:
+        for node in [n for n in self._heartbeat_nodes if n not in self._state.last_heartbeats]:
+            self._heartbeat_nodes.remove(node)
 
+            # 删除失败也没有关系，过期的心跳不会再被当作存活。
+            # A failure is fine; an expired heartbeat does not count as alive
+            # anyway.
+            try:
+                self._backend.delete_heartbeat(repr(node))
+            except RendezvousError as exc:
+                log.debug(
+                    f"The heartbeat of the node '{node}' could not be deleted from the rendezvous "
+                    f"'{self._settings.run_id}' due to an error of type {type(exc).__name__}."
+                )
+
+    @traced
     def _sanitize(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         expire_time = datetime.utcnow() - (
             self._settings.keep_alive_interval * self._settings.keep_alive_max_attempt
         )
 
+        if self._expiry_heap is None:
+            self._build_expiry_heap()
+
         # 过滤掉dead节点
         # Filter out the dead nodes.
-        self._dead_nodes = [
-            node
-            for node, last_heartbeat in self._state.last_heartbeats.items()
-            if last_heartbeat < expire_time
-        ]
+        expired_nodes = self._pop_expired_nodes(expire_time)
+
+        if expired_nodes and self._per_node_heartbeats:
+            expired_nodes = self._refresh_heartbeats(expired_nodes, expire_time)
+
+        self._dead_nodes = [node for _, node in expired_nodes]
+
+        # 不支持过期key的backend（C10d）不会自己清理dead节点的心跳
+        # Backends without expiring keys (C10d) do not clean up the heartbeats
+        # of dead nodes on their own.
+        if self._per_node_heartbeats:
+            self._heartbeat_nodes.update(self._dead_nodes)
+
+        participant_removed = False
 
         for dead_node in self._dead_nodes:
             del self._state.last_heartbeats[dead_node]
 
             try:
                 del self._state.participants[dead_node]
+
+                participant_removed = True
             except KeyError:
                 pass
 
@@ -499,9 +1413,150 @@ class _BackendRendezvousStateHolder(_RendezvousStateHolder):
             except KeyError:
                 pass
 
+        # 与节点主动离开时一样推进rdzv；否则在最后一个参与者死掉之后，rdzv将停留在一个没有参与者的已完成轮次中。
+        # Advance the rendezvous the same way as when a node leaves it on its
+        # own; otherwise a completed round whose last participant has died
+        # would never move on to the next round.
+        if participant_removed:
+            _remove_participant_epilogue(self._state, self._settings)
+
+    @traced
+    def _build_expiry_heap(self) -> None:
+        last_heartbeats = self._state.last_heartbeats
+
+        if self._per_node_heartbeats:
+            # 共享状态中的心跳时间只在节点加入时写入；用已知的更新的心跳时间替换它。
+            # The heartbeat times in the shared state are only written when a
+            # node joins; replace them with the newer ones we already know of.
+            self._heartbeats = {
+                node: heartbeat
+                for node, heartbeat in self._heartbeats.items()
+                if node in last_heartbeats
+            }
+
+            for node, heartbeat in self._heartbeats.items():
+                if heartbeat > last_heartbeats[node]:
+                    last_heartbeats[node] = heartbeat
+
+        # 序号用于在心跳时间相同时决定顺序，因为节点本身不可比较。
+        # The sequence number breaks ties between equal heartbeat times since
+        # the nodes themselves are not comparable.
+        self._expiry_heap = [
+            (last_heartbeat, seq, node)
+            for seq, (node, last_heartbeat) in enumerate(last_heartbeats.items())
+        ]
+
+        heapq.heapify(self._expiry_heap)
+
+    @traced
+    def _pop_expired_nodes(self, expire_time: datetime) -> List[Tuple[int, _NodeDesc]]:
+        heap = cast(List[Tuple[datetime, int, _NodeDesc]], self._expiry_heap)
+
+        last_heartbeats = self._state.last_heartbeats
+
+        expired_nodes = []
+
+        while heap and heap[0][0] < expire_time:
+            _, seq, node = heapq.heappop(heap)
+
+            last_heartbeat = last_heartbeats.get(node)
+            # 节点已经被删除
+            # The node has already been removed.
+            if last_heartbeat is None:
+                continue
+
+            if last_heartbeat < expire_time:
+                expired_nodes.append((seq, node))
+            else:
+                # 心跳在堆建立之后被原地更新过（例如本节点的keep-alive），按新的时间重新入堆。
+                # The heartbeat has been updated in place since the heap was
+                # built (e.g. by a local keep-alive); requeue it.
+                heapq.heappush(heap, (last_heartbeat, seq, node))
+
+        return expired_nodes
+
+    @traced
+    def _refresh_heartbeats(
+        self, expired_nodes: List[Tuple[int, _NodeDesc]], expire_time: datetime
+    ) -> List[Tuple[int, _NodeDesc]]:
+        heap = cast(List[Tuple[datetime, int, _NodeDesc]], self._expiry_heap)
+
+        last_heartbeats = self._state.last_heartbeats
+
+        # 一次查询所有节点的心跳：支持批量读取的backend只需一次读取，而且这样其余节点的心跳在
+        # 一段时间内都不会再被视为过期。
+        # Look up the heartbeats of all nodes, not only of the ones that would
+        # otherwise be considered dead: backends that support it read them in
+        # a single call, and the other nodes then do not look expired again for
+        # a while. The heap entries of the nodes updated in place get requeued
+        # as they come up.
+        nodes = {repr(node): node for node in last_heartbeats}
+
+        heartbeats = self._backend.get_heartbeats(list(nodes))
+
+        for node_id, heartbeat in heartbeats.items():
+            node = nodes[node_id]
+            if heartbeat > last_heartbeats[node]:
+                last_heartbeats[node] = heartbeat
+
+                self._heartbeats[node] = heartbeat
+
+        dead_nodes = []
+
+        for seq, node in expired_nodes:
+            if last_heartbeats[node] < expire_time:
+                dead_nodes.append((seq, node))
+            else:
+                heapq.heappush(heap, (last_heartbeats[node], seq, node))
+
+        return dead_nodes
+
+    @traced
+    def keep_alive(self, node: _NodeDesc) -> bool:
+        """See base class."""
+        if not self._per_node_heartbeats:
+            return False
+
+        # 只有已经是rdzv成员的节点才需要心跳
+        # Only the members of the rendezvous have a heartbeat.
+        if node not in self._state.last_heartbeats:
+            return False
+
+        self._backend.set_heartbeat(
+            repr(node), self._settings.keep_alive_interval * self._settings.keep_alive_max_attempt
+        )
+
+        self._state.last_heartbeats[node] = self._heartbeats[node] = datetime.utcnow()
+
+        self._heartbeat_nodes.add(node)
+
+        return True
+
+    @traced
+    def invalidate(self) -> None:
+        """See base class."""
+        self._last_sync_time = -1
+
+    @property
+    def last_write_size(self) -> int:
+        """See base class."""
+        return self._last_write_size
+
+    @traced
+    def wait_for_change(self, timeout: timedelta) -> None:
+        """See base class."""
+        # 本地有未同步的更改，不需要等待
+        # There is nothing to wait for if we have local changes to sync.
+        if self._dirty:
+            return
+
+        if self._backend.wait_for_state_change(self._token, timeout):
+            # 使缓存失效，以便下一次同步调用从backend读取最新状态。
+            # Invalidate the cache so that the next sync call reads the latest
+            # state from the backend.
+            self.invalidate()
+
     def mark_dirty(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class.
           如果本地rdzv状态是dirty的，那么下一个同步调用将尝试将更改写回后端。
           但是，如果另一个具有相同状态的节点也在我们之前进行了更改并将其写入，那么这种尝试可能会失败。
@@ -562,10 +1617,11 @@ class _RendezvousOpExecutor(ABC):
 
     @abstractmethod
     def run(
-        self, state_handler: Callable[[_RendezvousContext, float], _Action], deadline: float
+        self,
+        state_handler: Callable[[_RendezvousContext, float], _Action],
+        deadline: float,
+        fresh: bool = True,
     ) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Executes a rendezvous operation.
 
           一个操作在一个状态机中运行，期望将rdzv从一个状态转换到另一个状态。
@@ -580,9 +1636,37 @@ class _RendezvousOpExecutor(ABC):
             deadline:
                 The time, in seconds, at which the operation will be considered
                 timed-out.
+            fresh:
+                  是否从最新状态开始操作；为False时可以从缓存的状态开始
+                A boolean value indicating whether to start the operation from
+                the latest state. If ``False``, it may start from the cached
+                state; an operation whose writes are fenced by the backend,
+                such as a keep-alive heartbeat, then only risks a replay.
         """
 
 
+@dataclass
+class _RendezvousSyncStats:
+    """Holds the statistics of the state writes of a rendezvous op executor.
+      保存rdzv操作执行器写入状态的统计信息
+
+    Attributes:
+        conflicts:
+              因为本地状态过期而被backend拒绝的写入次数
+            The number of writes rejected by the backend because the local
+            state was stale.
+        retries:
+            The number of times a conflicting action has been replayed on the
+            latest state.
+        wasted_bytes:
+            The total size, in bytes, of the rejected writes.
+    """
+
+    conflicts: int = 0
+    retries: int = 0
+    wasted_bytes: int = 0
+
+
 class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
     """Executes rendezvous operations using a shared state.使用共享状态去执行rdzv操作
 
@@ -599,10 +1683,26 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
             The rendezvous settings.
     """
 
+    # 在重新评估rdzv状态之前，等待状态变化的最长时间
+    # The maximum amount of time to wait for a state change before the state
+    # of the rendezvous gets re-evaluated.
+    _MAX_SYNC_WAIT = timedelta(seconds=1)
+
+    # 立即重放再次冲突之后的随机退避时间的基数和上限；第一次冲突之后立即重放。
+    # The base and the cap of the jittered backoff before an action whose
+    # immediate replay has conflicted with another node as well gets replayed
+    # again; after the first conflict it is replayed right away.
+    _CONFLICT_BACKOFF_BASE = timedelta(milliseconds=50)
+    _MAX_CONFLICT_BACKOFF = timedelta(seconds=1)
+
     _node: _NodeDesc
     _state: _RendezvousState
     _state_holder: _RendezvousStateHolder
     _settings: RendezvousSettings
+    _stats: _RendezvousSyncStats
+    _keep_alive_requests: int
+    _keep_alive_carried: int
+    _keep_alive_served: int
 
     def __init__(
         self,
@@ -613,15 +1713,64 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
         self._node = node
         self._state_holder = state_holder
         self._settings = settings
+        self._stats = _RendezvousSyncStats()
+        # 请求搭载在下一次状态写入中的心跳数、随最近一次写入携带的请求数，以及已成功写入的请求数
+        # The number of keep-alive heartbeats requested to ride along with the
+        # next state write, the number carried by the pending write, and the
+        # number written so far.
+        self._keep_alive_requests = 0
+        self._keep_alive_carried = 0
+        self._keep_alive_served = 0
+
+    @property
+    def stats(self) -> _RendezvousSyncStats:
+        """Gets the write statistics of the executor."""
+        return self._stats
+
+    def request_keep_alive(self) -> int:
+        """Asks the next write of the shared state by the operation in flight
+        to also carry a keep-alive heartbeat of the node.
+          请求正在进行的操作在下一次写入共享状态时一并携带本节点的心跳
+
+        Returns:
+            A ticket to pass to :py:meth:`is_keep_alive_served`.
+        """
+        self._keep_alive_requests += 1
+
+        return self._keep_alive_requests
 
+    def is_keep_alive_served(self, ticket: int) -> bool:
+        """Indicates whether the heartbeat requested with ``ticket`` has been
+        written to the backend."""
+        return self._keep_alive_served >= ticket
+
+    @traced
     def run(
-        self, state_handler: Callable[[_RendezvousContext, float], _Action], deadline: float
+        self,
+        state_handler: Callable[[_RendezvousContext, float], _Action],
+        deadline: float,
+        fresh: bool = True,
     ) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
         action = None
 
+        # 操作基于最新的状态开始；缓存的状态只用于只读的查询，如num_nodes_waiting()。
+        # Start the operation from the latest state; a cached one is only good
+        # for read-only queries such as num_nodes_waiting().
+        if fresh:
+            self._state_holder.invalidate()
+
+        # 已应用到本地状态但尚未同步的操作、自上次成功写入以来退避的次数，以及下一次冲突
+        # 之后是否立即重放
+        # The action applied to the local state that has not been synced yet,
+        # the number of backoffs since the last successful write, and whether
+        # to replay the action right away after its next conflict.
+        pending_action: Optional[_Action] = None
+
+        num_backoffs = 0
+
+        replay_immediately = True
+
         while action != _Action.FINISH:
             # 读取或写入rdzv中所有节点共享的最新rdzv状态。
             # 请注意，如果另一个节点在我们之前同步了它的更改，那么我们的本地更改可能会被该节点覆盖。
@@ -636,6 +1785,12 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
                         f"The node '{self._node}' has successfully synced its local changes with "
                         f"other nodes in the rendezvous '{self._settings.run_id}'."
                     )
+
+                    pending_action = None
+
+                    num_backoffs = 0
+
+                    self._keep_alive_served = self._keep_alive_carried
                 else:
                     # 同步失败
                     log.debug(
@@ -643,6 +1798,9 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
                         f"changes with other nodes in the rendezvous '{self._settings.run_id}'."
                     )
 
+                    self._stats.conflicts += 1
+                    self._stats.wasted_bytes += self._state_holder.last_write_size
+
             self._state = self._state_holder.state
 
             ctx = _RendezvousContext(self._node, self._state, self._settings)
@@ -662,31 +1820,123 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
                 raise RendezvousTimeoutError()
 
             if action == _Action.SYNC:
-                # Delay the execution by one second to avoid overloading the
-                # backend if we are asked to poll for state changes.
-                _delay(seconds=1)
+                # 等待其他节点更改rdzv状态，而不是每秒轮询一次backend。
+                # Wait for another node to change the rendezvous state instead
+                # of polling the backend. The wait is capped so that time-based
+                # transitions (e.g. the last call deadline) are still handled
+                # on time.
+                self._state_holder.wait_for_change(self._get_sync_timeout(deadline))
+            elif action == _Action.KEEP_ALIVE and self._state_holder.keep_alive(self._node):
+                # 心跳已写入节点自己的key，共享状态没有变化。
+                # The heartbeat has been written to the per-node key of the
+                # backend; the shared state has not changed.
+                log.debug(
+                    f"The node '{self._node}' updated its keep-alive heartbeat key for the "
+                    f"rendezvous '{self._settings.run_id}'."
+                )
             else:
-                if action == _Action.KEEP_ALIVE:
-                    self._keep_alive()
-                elif action == _Action.ADD_TO_PARTICIPANTS:
-                    self._add_to_participants()
-                elif action == _Action.ADD_TO_WAIT_LIST:
-                    self._add_to_wait_list()
-                elif action == _Action.REMOVE_FROM_PARTICIPANTS:
-                    self._remove_from_participants()
-                elif action == _Action.REMOVE_FROM_WAIT_LIST:
-                    self._remove_from_wait_list()
-                elif action == _Action.MARK_RENDEZVOUS_COMPLETE:
-                    self._mark_rendezvous_complete()
-                elif action == _Action.MARK_RENDEZVOUS_CLOSED:
-                    self._mark_rendezvous_closed()
-
-                # Attempt to sync our changes back to other nodes.
-                self._state_holder.mark_dirty()
+                if has_set is False and action == pending_action:
+                    # 写入与另一个节点冲突，但该操作仍然适用于失败的写入所返回的最新状态，
+                    # 立即在该状态上重放，不需要再读取一次。如果立即重放再次冲突，说明有多个
+                    # 节点在竞争，随机退避一段时间让它们错开；退避之后的重放基于的状态可能已经
+                    # 过时，如果它冲突了，其返回的最新状态就相当于一次读取，下一次重放又会立即
+                    # 进行。心跳与主线程共享分发器，从不退避。
+                    # Our write has conflicted with another node, but the action
+                    # still applies to the latest state, which the failed write
+                    # has returned; replay it on that state right away without
+                    # reading it again. If an immediate replay conflicts as
+                    # well, several nodes are contending, and we back off for a
+                    # jittered period so that they spread out. The replay after
+                    # a backoff is based on a state that has aged meanwhile; if
+                    # it conflicts, the state it returns serves as the fresh
+                    # read, and the next replay is immediate again. A
+                    # keep-alive, which shares the dispatcher with the main
+                    # thread, never waits.
+                    self._stats.retries += 1
+
+                    if replay_immediately or action == _Action.KEEP_ALIVE:
+                        replay_immediately = False
+                    else:
+                        num_backoffs += 1
+
+                        self._backoff(num_backoffs, deadline)
+
+                        replay_immediately = True
+                else:
+                    replay_immediately = True
+
+                pending_action = action
 
+                self._apply_action(action)
+
+    @traced
+    def _apply_action(self, action: _Action) -> None:
+        """Applies ``action`` to the local state and marks it dirty.
+          将操作应用到本地状态，并将其标记为dirty
+        """
+        if action == _Action.KEEP_ALIVE:
+            self._keep_alive()
+        elif action == _Action.ADD_TO_PARTICIPANTS:
+            self._add_to_participants()
+        elif action == _Action.ADD_TO_WAIT_LIST:
+            self._add_to_wait_list()
+        elif action == _Action.REMOVE_FROM_PARTICIPANTS:
+            self._remove_from_participants()
+        elif action == _Action.REMOVE_FROM_WAIT_LIST:
+            self._remove_from_wait_list()
+        elif action == _Action.MARK_RENDEZVOUS_COMPLETE:
+            self._mark_rendezvous_complete()
+        elif action == _Action.MARK_RENDEZVOUS_CLOSED:
+            self._mark_rendezvous_closed()
+
+        self._carry_keep_alive(action)
+
+        # Attempt to sync our changes back to other nodes.
+        self._state_holder.mark_dirty()
+
+    @traced
+    def _carry_keep_alive(self, action: _Action) -> None:
+        requested = self._keep_alive_requests
+
+        if action in (_Action.REMOVE_FROM_PARTICIPANTS, _Action.REMOVE_FROM_WAIT_LIST):
+            # 节点正在离开，不需要心跳
+            # The node is leaving; there is no heartbeat to send.
+            self._keep_alive_carried = self._keep_alive_served
+        elif action in (_Action.MARK_RENDEZVOUS_COMPLETE, _Action.MARK_RENDEZVOUS_CLOSED):
+            if requested > self._keep_alive_served and self._node in self._state.last_heartbeats:
+                self._keep_alive()
+
+                self._keep_alive_carried = requested
+            else:
+                self._keep_alive_carried = self._keep_alive_served
+        else:
+            # 这些操作本身就会更新心跳
+            # These actions update the heartbeat themselves.
+            self._keep_alive_carried = requested
+
+    def _get_backoff(self, num_backoffs: int, deadline: float) -> float:
+        """Gets the upper bound, in seconds, of the ``num_backoffs``-th jittered
+        backoff since the last successful write."""
+        backoff = min(
+            self._MAX_CONFLICT_BACKOFF,
+            self._CONFLICT_BACKOFF_BASE * 2 ** min(num_backoffs - 1, 16),
+        )
+
+        remaining = max(deadline - time.monotonic(), 0.0)
+
+        return min(backoff.total_seconds(), remaining)
+
+    def _get_sync_timeout(self, deadline: float) -> timedelta:
+        remaining = max(deadline - time.monotonic(), 0.0)
+
+        return min(self._MAX_SYNC_WAIT, timedelta(seconds=remaining))
+
+    @traced
+    def _backoff(self, num_backoffs: int, deadline: float) -> None:
+        _delay(seconds=(0, self._get_backoff(num_backoffs, deadline)))
+
+    @traced
     def _keep_alive(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         # 节点更新心跳时间，等待同步
         log.debug(
             f"The node '{self._node}' updated its keep-alive heartbeat time for the rendezvous "
@@ -695,10 +1945,9 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
 
         self._state.last_heartbeats[self._node] = datetime.utcnow()
 
+    @traced
     def _add_to_participants(self) -> None:
         # 添加节点到{self._state.round}(当前rdzv轮次)的participants中。等待同步。
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
 
         log.debug(
             f"The node '{self._node}' added itself to the participants of round "
@@ -724,10 +1973,17 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
 
         if len(state.participants) == self._settings.max_nodes:
             self._mark_rendezvous_complete()
+        # 上一轮的参与者全部重新加入且没有其他节点等待时（例如在一个worker失败后重启），
+        # 无需等待last call，rank也保持不变。
+        # Once all participants of the last round have rejoined and nobody
+        # else is waiting, e.g. after a restart of the workers, complete the
+        # round without a last call; sorted the same way, they keep their
+        # ranks.
+        elif not state.wait_list and state.participants.keys() == state.last_participants:
+            self._mark_rendezvous_complete()
 
+    @traced
     def _add_to_wait_list(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         log.debug(
             f"The node '{self._node}' added itself to the wait list of round "
             f"{self._state.round + 1} of the rendezvous '{self._settings.run_id}'. Pending sync."
@@ -737,9 +1993,8 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
 
         self._keep_alive()
 
+    @traced
     def _remove_from_participants(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         log.debug(
             f"The node '{self._node}' removed itself from the participants of round "
             f"{self._state.round} of the rendezvous '{self._settings.run_id}'. Pending sync."
@@ -751,19 +2006,10 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
 
         del state.last_heartbeats[self._node]
 
-        if state.complete:
-            # If we do not have any participants left, move to the next round.
-            if not state.participants:
-                state.complete = False
-
-                state.round += 1
-        else:
-            if len(state.participants) < self._settings.min_nodes:
-                state.deadline = None
+        _remove_participant_epilogue(state, self._settings)
 
+    @traced
     def _remove_from_wait_list(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         log.debug(
             f"The node '{self._node}' removed itself from the wait list of round "
             f"{self._state.round + 1} of the rendezvous '{self._settings.run_id}'. Pending sync."
@@ -773,9 +2019,8 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
 
         del self._state.last_heartbeats[self._node]
 
+    @traced
     def _mark_rendezvous_complete(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         log.debug(
             f"The node '{self._node}' marked round {self._state.round} of the rendezvous "
             f"'{self._settings.run_id}' as complete. Pending sync."
@@ -790,9 +2035,10 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
         for rank, node in enumerate(sorted(state.participants)):
             state.participants[node] = rank
 
+        state.last_participants = set(state.participants)
+
+    @traced
     def _mark_rendezvous_closed(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         log.debug(
             f"The node '{self._node}' marked the rendezvous '{self._settings.run_id}' as closed. "
             "Pending sync."
@@ -801,9 +2047,39 @@ class _DistributedRendezvousOpExecutor(_RendezvousOpExecutor):
         self._state.closed = True
 
 
+def _validate_settings(settings: RendezvousSettings) -> None:
+    if not settings.run_id:
+        raise ValueError("The run id must be a non-empty string.")
+
+    if settings.min_nodes < 1:
+        raise ValueError(
+            f"The minimum number of nodes ({settings.min_nodes}) must be greater than zero."
+        )
+
+    if settings.max_nodes < settings.min_nodes:
+        raise ValueError(
+            f"The maximum number of nodes ({settings.max_nodes}) must be greater than or equal "
+            f"to the minimum number of nodes ({settings.min_nodes})."
+        )
+
+
+def _remove_participant_epilogue(state: _RendezvousState, settings: RendezvousSettings) -> None:
+    """Updates ``state`` after one or more participants have been removed.
+      在参与者被移除后更新rdzv状态
+    """
+    if state.complete:
+        # If we do not have any participants left, move to the next round.
+        if not state.participants:
+            state.complete = False
+
+            state.round += 1
+    else:
+        if len(state.participants) < settings.min_nodes:
+            state.deadline = None
+
+
 def _should_keep_alive(ctx: _RendezvousContext) -> bool:
 
-    log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
     """Determines whether a keep-alive heartbeat should be sent. 确定是否应该发送一个保持活动的心跳"""
     try:
         last_heartbeat = ctx.state.last_heartbeats[ctx.node]
@@ -816,10 +2092,9 @@ def _should_keep_alive(ctx: _RendezvousContext) -> bool:
 class _RendezvousExitOp:
     """Represents a rendezvous exit operation."""
 
+    @traced
     def __call__(self, ctx: _RendezvousContext, deadline: float) -> _Action:
 
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         if ctx.node in ctx.state.participants:
             if time.monotonic() > deadline:
                 return _Action.ERROR_TIMEOUT
@@ -830,9 +2105,8 @@ class _RendezvousExitOp:
 class _RendezvousJoinOp:
     """Represents a rendezvous join operation."""
 
+    @traced
     def __call__(self, ctx: _RendezvousContext, deadline: float) -> _Action:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         state = ctx.state
         # closed rendezvous意味着不再接受新的节点。
         # A closed rendezvous means that it no longer accepts new nodes.
@@ -867,7 +2141,7 @@ class _RendezvousJoinOp:
                 # If we are in the wait list, it means we couldn't wait till the
                 # next round of the rendezvous.
                 if ctx.node in state.wait_list:
-                    return _Action.REMOVE_FROM_WAIT_LISTv
+                    return _Action.REMOVE_FROM_WAIT_LIST
             return _Action.ERROR_TIMEOUT
 
         if state.complete:
@@ -905,9 +2179,8 @@ class _RendezvousJoinOp:
 class _RendezvousCloseOp:
     """Represents a rendezvous close operation."""
 
+    @traced
     def __call__(self, ctx: _RendezvousContext, deadline: float) -> _Action:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         if ctx.state.closed:
             return _Action.FINISH
         if time.monotonic() > deadline:
@@ -918,9 +2191,8 @@ class _RendezvousCloseOp:
 class _RendezvousKeepAliveOp:
     """Represents a rendezvous keep-alive update operation."""
 
+    @traced
     def __call__(self, ctx: _RendezvousContext, deadline: float) -> _Action:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         if _should_keep_alive(ctx):
             if time.monotonic() > deadline:
                 return _Action.ERROR_TIMEOUT
@@ -928,6 +2200,192 @@ class _RendezvousKeepAliveOp:
         return _Action.FINISH
 
 
+@dataclass
+class RendezvousDispatchStats:
+    """Holds the statistics of the dispatcher that serializes the operations
+    run by the threads of a rendezvous handler.
+      保存rdzv handler的调度器的统计信息
+
+    Attributes:
+        acquisitions:
+            The number of operations dispatched.
+        lock_wait_time:
+              等待其他线程正在进行的操作的总时间（秒）
+            The total amount of time, in seconds, the operations have waited
+            for an operation of another thread to finish.
+        max_lock_wait_time:
+            The longest of those waits, in seconds.
+        coalesced_reads:
+            The number of read-only queries answered from the state synced by
+            an operation already in flight instead of their own sync.
+        coalesced_keep_alives:
+            The number of keep-alive heartbeats written by a state write
+            already in flight instead of their own.
+    """
+
+    acquisitions: int = 0
+    lock_wait_time: float = 0.0
+    max_lock_wait_time: float = 0.0
+    coalesced_reads: int = 0
+    coalesced_keep_alives: int = 0
+
+    @property
+    def mean_lock_wait_time(self) -> float:
+        """Gets the mean wait, in seconds, per dispatched operation."""
+        if self.acquisitions == 0:
+            return 0.0
+        return self.lock_wait_time / self.acquisitions
+
+
+class _RendezvousDispatcher:
+    """Serializes the operations that the threads of a rendezvous handler, the
+    agent's main thread and the keep-alive timer, run on its state, and
+    coalesces those that can share a backend round trip.
+      串行化handler的各线程（agent主线程和心跳定时器）对rdzv状态的操作，并合并可以共享一次backend请求的操作。
+
+    - A read-only query that arrives while an operation is in flight waits for
+      it and is answered from the state it has synced, instead of issuing a
+      sync of its own once the operation has finished.
+    - A keep-alive heartbeat that arrives while an operation is in flight asks
+      the executor to carry the heartbeat in the next state write of that
+      operation, and only runs its own operation if none was made.
+
+    Args:
+        state_holder:
+            The state holder of the handler.
+        op_executor:
+            The operation executor of the handler.
+    """
+
+    _state_holder: _RendezvousStateHolder
+    _op_executor: _RendezvousOpExecutor
+    _cond: threading.Condition
+    _busy: bool
+    _last_op_failed: bool
+    _stats: RendezvousDispatchStats
+
+    def __init__(
+        self, state_holder: _RendezvousStateHolder, op_executor: _RendezvousOpExecutor
+    ) -> None:
+        self._state_holder = state_holder
+        self._op_executor = op_executor
+        self._cond = threading.Condition()
+        self._busy = False
+        self._last_op_failed = False
+        self._stats = RendezvousDispatchStats()
+
+    @property
+    def stats(self) -> RendezvousDispatchStats:
+        """Gets a snapshot of the statistics of the dispatcher."""
+        with self._cond:
+            return replace(self._stats)
+
+    @traced
+    def query(self, fn: Callable[[_RendezvousState], _T]) -> _T:
+        """Returns ``fn`` applied to the latest rendezvous state."""
+        with self._cond:
+            if self._wait_until_idle():
+                self._stats.coalesced_reads += 1
+
+                return fn(self._state_holder.state)
+
+            self._busy = True
+
+        failed = True
+        try:
+            self._state_holder.sync()
+
+            result = fn(self._state_holder.state)
+
+            failed = False
+
+            return result
+        finally:
+            self._release(failed)
+
+    @traced
+    def run(
+        self, state_handler: Callable[[_RendezvousContext, float], _Action], deadline: float
+    ) -> None:
+        """Runs a rendezvous operation once no other one is in flight."""
+        with self._cond:
+            self._wait_until_idle()
+
+            self._busy = True
+
+        self._run(state_handler, deadline)
+
+    @traced
+    def keep_alive(self, deadline: float) -> None:
+        """Sends a keep-alive heartbeat, carried by the operation in flight if
+        it writes the state."""
+        with self._cond:
+            ticket = None
+            if self._busy and isinstance(self._op_executor, _DistributedRendezvousOpExecutor):
+                ticket = self._op_executor.request_keep_alive()
+
+            self._wait_until_idle()
+
+            if ticket is not None and self._op_executor.is_keep_alive_served(ticket):
+                self._stats.coalesced_keep_alives += 1
+
+                return
+
+            self._busy = True
+
+        # 心跳写入由backend的CAS保护，可以从缓存的状态开始，从而少一次backend往返。
+        # The heartbeat write is fenced by the backend, so it can start from
+        # the cached state and save a round trip while holding the dispatcher.
+        self._run(_RendezvousKeepAliveOp(), deadline, fresh=False)
+
+    def _run(
+        self,
+        state_handler: Callable[[_RendezvousContext, float], _Action],
+        deadline: float,
+        fresh: bool = True,
+    ) -> None:
+        failed = True
+        try:
+            self._op_executor.run(state_handler, deadline, fresh)
+
+            failed = False
+        finally:
+            self._release(failed)
+
+    def _wait_until_idle(self) -> bool:
+        """Waits for the operation in flight, if any, to finish; must be called
+        with the condition held.
+
+        Returns:
+            A boolean value indicating whether an operation was in flight and
+            has synced the state successfully.
+        """
+        self._stats.acquisitions += 1
+
+        if not self._busy:
+            return False
+
+        start = time.monotonic()
+
+        while self._busy:
+            self._cond.wait()
+
+        wait_time = time.monotonic() - start
+
+        self._stats.lock_wait_time += wait_time
+        self._stats.max_lock_wait_time = max(self._stats.max_lock_wait_time, wait_time)
+
+        return not self._last_op_failed
+
+    def _release(self, failed: bool) -> None:
+        with self._cond:
+            self._busy = False
+
+            self._last_op_failed = failed
+
+            self._cond.notify_all()
+
+
 class DynamicRendezvousHandler(RendezvousHandler):
     # 表示在一组节点之间设置rdzv的处理程序
     """Represents a handler that sets up a rendezvous among a set of nodes."""
@@ -940,10 +2398,11 @@ class DynamicRendezvousHandler(RendezvousHandler):
     _store: Store
     _state_holder: _RendezvousStateHolder
     _op_executor: _RendezvousOpExecutor
-    _heartbeat_lock: threading.Lock
+    _dispatcher: _RendezvousDispatcher
     _keep_alive_timer: Optional[_PeriodicTimer]
 
     @classmethod
+    @traced
     def from_backend(
         cls,
         run_id: str,
@@ -952,6 +2411,8 @@ class DynamicRendezvousHandler(RendezvousHandler):
         min_nodes: int,
         max_nodes: int,
         timeout: Optional[RendezvousTimeout] = None,
+        per_node_heartbeats: bool = False,
+        endpoint: Optional[str] = None,
     ):
         """Creates a new :py:class:`DynamicRendezvousHandler`.
 
@@ -968,8 +2429,16 @@ class DynamicRendezvousHandler(RendezvousHandler):
                 The maximum number of nodes to admit to the rendezvous.
             timeout:
                 The timeout configuration of the rendezvous.
+            per_node_heartbeats:
+                A boolean value indicating whether to keep the heartbeats in
+                per-node keys of the backend instead of the shared rendezvous
+                state.
+            endpoint:
+                The endpoint of the backend. The handlers of a rendezvous in
+                the process whose backends have the same name and endpoint
+                share the state cache; if ``None``, the handler has a cache of
+                its own.
         """
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         # 我们将每个handler实例与一个唯一的节点描述符关联
         # We associate each handler instance with a unique node descriptor.
         node = cls._node_desc_generator.generate()
@@ -983,7 +2452,13 @@ class DynamicRendezvousHandler(RendezvousHandler):
             keep_alive_max_attempt=3,
         )
 
-        state_holder = _BackendRendezvousStateHolder(backend, settings)
+        state_cache = None
+        if endpoint is not None:
+            state_cache = _get_state_cache(backend.name, endpoint, run_id)
+
+        state_holder = _BackendRendezvousStateHolder(
+            backend, settings, per_node_heartbeats=per_node_heartbeats, state_cache=state_cache
+        )
 
         return cls(node, settings, backend.name, store, state_holder)
 
@@ -995,19 +2470,7 @@ class DynamicRendezvousHandler(RendezvousHandler):
         store: Store,
         state_holder: _RendezvousStateHolder,
     ) -> None:
-        if not settings.run_id:
-            raise ValueError("The run id must be a non-empty string.")
-
-        if settings.min_nodes < 1:
-            raise ValueError(
-                f"The minimum number of nodes ({settings.min_nodes}) must be greater than zero."
-            )
-
-        if settings.max_nodes < settings.min_nodes:
-            raise ValueError(
-                f"The maximum number of nodes ({settings.max_nodes}) must be greater than or equal "
-                f"to the minimum number of nodes ({settings.min_nodes})."
-            )
+        _validate_settings(settings)
 
         self._this_node = node
 
@@ -1023,28 +2486,21 @@ class DynamicRendezvousHandler(RendezvousHandler):
             self._this_node, self._state_holder, self._settings
         )
 
-        self._heartbeat_lock = threading.Lock()
+        self._dispatcher = _RendezvousDispatcher(self._state_holder, self._op_executor)
 
         self._keep_alive_timer = None
 
     @property
     def settings(self) -> RendezvousSettings:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """Gets the settings of the rendezvous."""
         return self._settings
 
     def get_backend(self) -> str:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
         return self._backend_name
 
+    @traced
     def next_rendezvous(self) -> Tuple[Store, int, int]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
         log.info(
             f"The node '{self._this_node}' attempts to join the next round of the rendezvous "
@@ -1082,46 +2538,49 @@ class DynamicRendezvousHandler(RendezvousHandler):
 
         return store, rank, world_size
 
+    @traced
     def is_closed(self) -> bool:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
-        with self._heartbeat_lock:
-            self._state_holder.sync()
-
-            return self._state_holder.state.closed
+        return self._dispatcher.query(lambda state: state.closed)
 
+    @traced
     def set_closed(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
-        with self._heartbeat_lock:
-            self._close()
+        self._close()
 
+    @traced
     def num_nodes_waiting(self) -> int:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
-        with self._heartbeat_lock:
-            self._state_holder.sync()
-
-            return len(self._state_holder.state.wait_list)
+        return self._dispatcher.query(lambda state: len(state.wait_list))
 
     def get_run_id(self) -> str:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
         return self._settings.run_id
 
+    def get_state_cache_stats(self) -> Optional[RendezvousStateCacheStats]:
+        """Gets the statistics of the state cache shared by the handlers of the
+        rendezvous in this process, or ``None`` if the state is not cached in
+        one. 获取进程内共享的rdzv状态缓存的命中率等统计信息
+        """
+        return self._state_holder.cache_stats
+
+    def get_dispatch_stats(self) -> RendezvousDispatchStats:
+        """Gets the statistics of the operations run by the threads of this
+        handler, including how long they have waited for each other.
+          获取本handler各线程所执行操作的统计信息，包括互相等待的时间
+        """
+        return self._dispatcher.stats
+
+    @traced
     def shutdown(self) -> bool:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         """See base class."""
         self._stop_heartbeats()
 
         try:
             self._close()
 
+            self._state_holder.shutdown()
+
             return True
         except RendezvousError as ex:
             log.warning(
@@ -1131,38 +2590,32 @@ class DynamicRendezvousHandler(RendezvousHandler):
 
             return False
 
+    @traced
     def _close(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         op = _RendezvousCloseOp()
 
         deadline = self._get_deadline(self._settings.timeout.close)
 
-        self._op_executor.run(op, deadline)
+        self._dispatcher.run(op, deadline)
 
         log.info(
             f"The node '{self._this_node}' has closed the rendezvous '{self._settings.run_id}'."
         )
 
     @staticmethod
+    @traced
     def _keep_alive_weak(weak_self) -> None:
 
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         self = weak_self()
         if self is not None:
             self._keep_alive()
 
+    @traced
     def _keep_alive(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
-        self._heartbeat_lock.acquire()
-
-        op = _RendezvousKeepAliveOp()
-
         deadline = self._get_deadline(self._settings.timeout.heartbeat)
 
         try:
-            self._op_executor.run(op, deadline)
+            self._dispatcher.keep_alive(deadline)
 
             log.debug(
                 f"The node '{self._this_node}' has sent a keep-alive heartbeat to the rendezvous "
@@ -1173,12 +2626,9 @@ class DynamicRendezvousHandler(RendezvousHandler):
                 f"The node '{self._this_node}' has failed to send a keep-alive heartbeat to the "
                 f"rendezvous '{self._settings.run_id}' due to an error of type {type(ex).__name__}."
             )
-        finally:
-            self._heartbeat_lock.release()
 
+    @traced
     def _start_heartbeats(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         self._keep_alive_timer = _PeriodicTimer(
             self._settings.keep_alive_interval, self._keep_alive_weak, weakref.ref(self)
         )
@@ -1187,46 +2637,41 @@ class DynamicRendezvousHandler(RendezvousHandler):
 
         self._keep_alive_timer.start()
 
+    @traced
     def _stop_heartbeats(self) -> None:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         if self._keep_alive_timer is None:
             return
 
         self._keep_alive_timer.cancel()
 
+    @traced
     def _get_world(self) -> Tuple[int, int]:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         state = self._state_holder.state
 
         return state.participants[self._this_node], len(state.participants)
 
+    @traced
     def _get_store(self) -> Store:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         key_prefix = f"torch.rendezvous.{self._settings.run_id}.{self._state_holder.state.round}"
 
         return PrefixStore(key_prefix, self._store)
 
     def _get_deadline(self, timeout: timedelta) -> float:
-        log.debug(f" =====> 当前类名称：{self.__class__.__name__}")
-        log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
         return time.monotonic() + timeout.total_seconds()
 
 
+@traced
 def _get_timeout(params: RendezvousParameters, key: str) -> Optional[timedelta]:
-    log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
     timeout = params.get_as_int(key + "_timeout")
     if timeout is None:
         return None
     return timedelta(seconds=timeout)
 
 
+@traced
 def create_handler(
     store: Store, backend: RendezvousBackend, params: RendezvousParameters
 ) -> DynamicRendezvousHandler:
-    log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
     """Creates a new :py:class:`DynamicRendezvousHandler` from the specified
     parameters. 从指定的参数创建一个新的:py:class:`DynamicRendezvousHandler`
 
@@ -1258,13 +2703,38 @@ def create_handler(
                         在调用RendezvousHandler.set_closed`或`RendezvousHandler.shutdown`后，
                         预计rdzv结束的时间(以秒为单位)。默认为30秒。
     +-------------------+------------------------------------------------------+
+    | per_node_heartbeats | A boolean value indicating whether to keep the     |
+    |                   | heartbeats in per-node keys of the backend instead   |
+    |                   | of the shared rendezvous state. Requires a backend   |
+    |                   | that supports it. Defaults to ``False``.             |
+    |                   | 是否将心跳保存在每个节点自己的key中，以免心跳改写共享的rdzv状态。 |
+    +-------------------+------------------------------------------------------+
+    | compression       | The compression of the rendezvous states written to  |
+    |                   | the backend; "zlib" or "none". Defaults to "none".   |
+    |                   | States are decompressed on read either way.          |
+    |                   | 写入backend的rdzv状态的压缩方式。                          |
+    +-------------------+------------------------------------------------------+
+    | compression_level | The zlib compression level, from 1 to 9. Defaults to |
+    |                   | 6.                                                   |
+    +-------------------+------------------------------------------------------+
+    | compression_      | The size, in bytes, below which states are written   |
+    | threshold         | uncompressed. Defaults to 1024.                      |
+    +-------------------+------------------------------------------------------+
     """
+    compression = params.get("compression", "none").strip().lower()
+    if compression == "zlib":
+        backend.compression = RendezvousStateCompression(
+            cast(int, params.get_as_int("compression_level", 6)),
+            cast(int, params.get_as_int("compression_threshold", 1024)),
+        )
+    elif compression != "none":
+        raise ValueError(f"The compression '{compression}' is not supported.")
+
     timeout = RendezvousTimeout(
         _get_timeout(params, "join"),
         _get_timeout(params, "last_call"),
         _get_timeout(params, "close"),
     )
-    log.debug(f" =====> 当前函数名：{sys._getframe().f_code.co_name}")
     return DynamicRendezvousHandler.from_backend(
         params.run_id,
         store,
@@ -1272,4 +2742,6 @@ def create_handler(
         params.min_nodes,
         params.max_nodes,
         timeout,
+        per_node_heartbeats=cast(bool, params.get_as_bool("per_node_heartbeats", False)),
+        endpoint=params.endpoint,
     )
@@ -0,0 +1,304 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+import weakref
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Set, Tuple
+
+import etcd  # type: ignore[import]
+
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class EtcdLeaseManagerStats:
+    """Holds the statistics of an :py:class:`EtcdLeaseManager`.
+
+    Attributes:
+        refreshes:
+            The number of refresh requests that have succeeded.
+        failed_refreshes:
+            The number of refresh requests that have failed and have been
+            retried.
+        expired_keys:
+            The number of keys that have been found gone, and whose leases
+            have ended.
+        wakeups:
+            The number of times the renewal thread has sent a batch of
+            refreshes.
+    """
+
+    refreshes: int = 0
+    failed_refreshes: int = 0
+    expired_keys: int = 0
+    wakeups: int = 0
+
+
+class EtcdLease:
+    """
+    A lease on an ephemeral etcd key, kept alive by an
+    :py:class:`EtcdLeaseManager` until cancelled or until the key is found
+    gone.
+    """
+
+    def __init__(self, manager: "EtcdLeaseManager", path: str, ttl: int) -> None:
+        self._manager = manager
+        self._path = path
+        self._ttl = ttl
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def ttl(self) -> int:
+        return self._ttl
+
+    def cancel(self) -> None:
+        """Stops renewing the key for this lease. The key expires after its
+        TTL unless other leases on it remain. Can be called more than once."""
+        self._manager._cancel(self)
+
+
+class _LeasedKey:
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self.leases: Set[EtcdLease] = set()
+        # The monotonic time of the next refresh.
+        self.due = 0.0
+
+
+class EtcdLeaseManager:
+    """
+    Renews the TTL of ephemeral etcd v2 keys from a single thread.
+
+    Every lease used to take a thread of its own that refreshed its key every
+    ``ttl / 2`` seconds, so the threads added up over the rendezvous rounds
+    and handlers of a process, and a key leased by several handlers, e.g. the
+    run_id directory, was refreshed by each of them. Here the keys are kept in
+    a schedule ordered by their next refresh; a key leased more than once is
+    refreshed once, and the keys due within ``_BATCH_WINDOW`` of each other
+    are refreshed in the same wake-up of the thread. The thread only runs
+    while there are leases.
+
+    Use :py:func:`get_etcd_lease_manager` to get the manager of a client.
+
+    Args:
+        client:
+            The ``etcd.Client`` to refresh the keys with. Only a weak
+            reference to it is held.
+    """
+
+    # Keys due within this many seconds of the first one, and at most an
+    # eighth of their TTL, are refreshed along with it.
+    _BATCH_WINDOW = 1.0
+
+    # How long to wait before refreshing a key again after an error.
+    _RETRY_DELAY = 1.0
+
+    def __init__(self, client) -> None:
+        self._client_ref = weakref.ref(client)
+
+        self._cond = threading.Condition()
+
+        self._keys: Dict[str, _LeasedKey] = {}
+
+        # (due, sequence number, path, key); entries of keys cancelled or
+        # rescheduled since are skipped.
+        self._schedule: List[Tuple[float, int, str, _LeasedKey]] = []
+
+        self._sequence = itertools.count()
+
+        self._thread: Optional[threading.Thread] = None
+
+        self._stats = EtcdLeaseManagerStats()
+
+    @property
+    def stats(self) -> EtcdLeaseManagerStats:
+        """Gets a snapshot of the statistics of the manager."""
+        with self._cond:
+            return replace(self._stats)
+
+    @property
+    def num_keys(self) -> int:
+        """Gets the number of keys being renewed."""
+        with self._cond:
+            return len(self._keys)
+
+    def lease(self, path: str, ttl: int) -> EtcdLease:
+        """
+        Starts renewing the TTL of ``path`` to ``ttl`` seconds, refreshing it
+        right away and then every ``ttl / 2`` seconds, until the returned
+        lease is cancelled. If the key is already leased, it is refreshed with
+        the largest TTL of its leases.
+        """
+        lease = EtcdLease(self, path, ttl)
+
+        with self._cond:
+            key = self._keys.get(path)
+            if key is None:
+                key = self._keys[path] = _LeasedKey(ttl)
+
+                self._schedule_key(path, key, time.monotonic())
+            else:
+                key.ttl = max(key.ttl, ttl)
+
+            key.leases.add(lease)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="EtcdLeaseManager", daemon=True
+                )
+                self._thread.start()
+
+            self._cond.notify_all()
+
+        return lease
+
+    def _cancel(self, lease: EtcdLease) -> None:
+        with self._cond:
+            key = self._keys.get(lease.path)
+            if key is None or lease not in key.leases:
+                return
+
+            key.leases.remove(lease)
+
+            if not key.leases:
+                del self._keys[lease.path]
+
+            self._cond.notify_all()
+
+    #
+    # Must be called with the lock held.
+    #
+    def _schedule_key(self, path: str, key: _LeasedKey, due: float) -> None:
+        key.due = due
+
+        heapq.heappush(self._schedule, (due, next(self._sequence), path, key))
+
+    def _is_current(self, path: str, key: _LeasedKey, due: float) -> bool:
+        return self._keys.get(path) is key and key.due == due
+
+    def _next_batch(self) -> Optional[List[Tuple[str, _LeasedKey, int]]]:
+        while True:
+            while self._schedule:
+                due, _, path, key = self._schedule[0]
+                if self._is_current(path, key, due):
+                    break
+                heapq.heappop(self._schedule)
+
+            if not self._schedule:
+                return None
+
+            now = time.monotonic()
+
+            due = self._schedule[0][0]
+            if due <= now:
+                break
+
+            self._cond.wait(due - now)
+
+        batch = []
+        rescheduled = []
+        while self._schedule and self._schedule[0][0] <= now + self._BATCH_WINDOW:
+            entry = heapq.heappop(self._schedule)
+
+            due, _, path, key = entry
+            if not self._is_current(path, key, due):
+                continue
+
+            # Do not cut the interval of short TTLs by much.
+            if due <= now + min(self._BATCH_WINDOW, key.ttl / 8):
+                batch.append((path, key, key.ttl))
+            else:
+                rescheduled.append(entry)
+
+        for entry in rescheduled:
+            heapq.heappush(self._schedule, entry)
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                if batch is None:
+                    self._thread = None
+                    return
+
+                self._stats.wakeups += 1
+
+            client = self._client_ref()
+            if client is None:
+                with self._cond:
+                    self._keys.clear()
+                    self._schedule.clear()
+                    self._thread = None
+                return
+
+            for path, key, ttl in batch:
+                # NOTE: For ephemeral key TTL renewal (~lease) to work
+                # correctly, make sure you don't call any long-blocking methods
+                # that do not release the Python's GIL!
+                expired = failed = False
+                try:
+                    client.refresh(path, ttl=ttl)
+                except etcd.EtcdKeyNotFound:
+                    expired = True
+                except ConnectionRefusedError:
+                    # This error usually occurs during test when the server
+                    # already got terminated but the python garbage collector
+                    # have not yet invoked the __del__ method.
+                    expired = True
+                except etcd.EtcdException as exc:
+                    log.warning(
+                        f"The lease of '{path}' could not be renewed due to an error of type "
+                        f"{type(exc).__name__}; retrying."
+                    )
+
+                    failed = True
+
+                with self._cond:
+                    if self._keys.get(path) is not key:
+                        continue
+
+                    if expired:
+                        self._stats.expired_keys += 1
+
+                        del self._keys[path]
+                    elif failed:
+                        self._stats.failed_refreshes += 1
+
+                        self._schedule_key(path, key, time.monotonic() + self._RETRY_DELAY)
+                    else:
+                        self._stats.refreshes += 1
+
+                        self._schedule_key(path, key, time.monotonic() + ttl / 2)
+
+            del client
+
+
+_managers: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_managers_lock = threading.Lock()
+
+
+def get_etcd_lease_manager(client) -> EtcdLeaseManager:
+    """
+    Returns the lease manager of ``client``, creating it on first use, so that
+    all handlers sharing a client share its renewal thread.
+    """
+    with _managers_lock:
+        manager = _managers.get(client)
+        if manager is None:
+            manager = _managers[client] = EtcdLeaseManager(client)
+
+    return manager
@@ -9,10 +9,13 @@
 
 import json
 import logging
+import random
 import sys
 import threading
 import time
-from typing import Optional
+import urllib.parse
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple, cast
 
 import etcd  # type: ignore[import]
 from torch.distributed.elastic.rendezvous import (
@@ -24,7 +27,9 @@ from torch.distributed.elastic.rendezvous import (
 )
 
 from .utils import parse_rendezvous_endpoint
-from .etcd_store import EtcdStore, cas_delay
+from .etcd_lease import get_etcd_lease_manager
+from .etcd_store import EtcdStore
+from .etcd_transport import PooledEtcdClient, get_etcd_transport
 
 
 _log_fmt = logging.Formatter("%(levelname)s %(asctime)s %(message)s")
@@ -51,6 +56,147 @@ class EtcdRendezvousRetryImmediately(Exception):
     pass
 
 
+class EtcdRendezvousRetryPolicy:
+    """
+    Decides how long :py:meth:`EtcdRendezvous.rendezvous_barrier` waits
+    before it retries after a failure, and counts the retries per type of
+    failure. No delay extends past the deadline of the rendezvous.
+
+    Subclasses implement :py:meth:`get_delay`; a policy is used by a single
+    rendezvous at a time.
+    """
+
+    # The barrier observed a state that allows it to retry right away.
+    RETRY_IMMEDIATELY = "retry_immediately"
+
+    # The barrier was too late for a state transition, e.g. lost a race.
+    RETRYABLE_FAILURE = "retryable_failure"
+
+    # Any other error of an attempt, e.g. a lost connection to etcd.
+    ERROR = "error"
+
+    # A compare-and-swap of the rendezvous state within an attempt failed.
+    CAS_CONFLICT = "cas_conflict"
+
+    def __init__(self) -> None:
+        self._retries: Dict[str, int] = Counter()
+
+    @property
+    def retries(self) -> Dict[str, int]:
+        """Gets the number of retries per type of failure."""
+        return dict(self._retries)
+
+    def reset(self) -> None:
+        """Called when a ``rendezvous_barrier()`` starts."""
+
+    def reset_cas(self) -> None:
+        """Called when a compare-and-swap of the rendezvous state succeeds."""
+
+    def get_delay(self, failure: str) -> float:
+        """Returns the delay, in seconds, before the retry after ``failure``."""
+        raise NotImplementedError()
+
+    def backoff(self, failure: str, deadline: Optional[float] = None) -> None:
+        """
+        Counts a retry after ``failure`` and waits for its delay, or until
+        ``deadline`` (a ``time.time()`` value) if it comes first.
+        """
+        self._retries[failure] += 1
+
+        if failure == self.RETRY_IMMEDIATELY:
+            return
+
+        delay = self.get_delay(failure)
+        if deadline is not None:
+            delay = min(delay, max(deadline - time.time(), 0.0))
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FixedDelayRetryPolicy(EtcdRendezvousRetryPolicy):
+    """
+    Retries an attempt after a fixed ``delay`` and a failed compare-and-swap
+    after a uniform delay of up to ``cas_delay``, both in seconds; the delays
+    :py:class:`EtcdRendezvous` has always used. Nodes that fail together, e.g.
+    after a restart of the job, retry together.
+    """
+
+    def __init__(self, delay: float = 1.0, cas_delay: float = 0.1) -> None:
+        super().__init__()
+
+        self._delay = delay
+        self._cas_delay = cas_delay
+
+    def get_delay(self, failure: str) -> float:
+        if failure == self.CAS_CONFLICT:
+            return random.uniform(0, self._cas_delay)
+        return self._delay
+
+
+class DecorrelatedJitterRetryPolicy(EtcdRendezvousRetryPolicy):
+    """
+    Backs off exponentially with decorrelated jitter: each delay is drawn
+    uniformly between ``base`` and three times the previous delay, and capped
+    at ``cap``. The attempts of a barrier and the compare-and-swaps within
+    them back off separately, the latter from ``cas_base`` up to ``cas_cap``;
+    both start over with every ``rendezvous_barrier()``, and the latter also
+    with every successful compare-and-swap.
+
+    Unlike with :py:class:`FixedDelayRetryPolicy`, nodes that fail together
+    spread their retries out instead of hitting etcd in synchronized bursts.
+    """
+
+    def __init__(
+        self, base: float = 0.1, cap: float = 5.0, cas_base: float = 0.01, cas_cap: float = 1.0
+    ) -> None:
+        super().__init__()
+
+        if base <= 0 or cap < base or cas_base <= 0 or cas_cap < cas_base:
+            raise ValueError("The backoff bases must be positive and not exceed their caps.")
+
+        self._bounds = {"attempt": (base, cap), "cas": (cas_base, cas_cap)}
+
+        # The previous delay of each kind of retry.
+        self._previous: Dict[str, float] = {}
+
+    def reset(self) -> None:
+        self._previous.clear()
+
+    def reset_cas(self) -> None:
+        self._previous.pop("cas", None)
+
+    def get_delay(self, failure: str) -> float:
+        kind = "cas" if failure == self.CAS_CONFLICT else "attempt"
+
+        base, cap = self._bounds[kind]
+
+        delay = min(cap, random.uniform(base, self._previous.get(kind, base) * 3))
+
+        self._previous[kind] = delay
+
+        return delay
+
+
+def _create_retry_policy(params: RendezvousParameters) -> EtcdRendezvousRetryPolicy:
+    retry_policy = params.get("retry_policy", "fixed").strip().lower()
+
+    if retry_policy == "fixed":
+        return FixedDelayRetryPolicy()
+
+    if retry_policy == "jitter":
+        base_ms = cast(int, params.get_as_int("retry_backoff_base_ms", 100))
+        cap_ms = cast(int, params.get_as_int("retry_backoff_cap_ms", 5000))
+        cas_base_ms = cast(int, params.get_as_int("retry_cas_backoff_base_ms", 10))
+        cas_cap_ms = cast(int, params.get_as_int("retry_cas_backoff_cap_ms", 1000))
+
+        return DecorrelatedJitterRetryPolicy(
+            base_ms / 1000, cap_ms / 1000, cas_base_ms / 1000, cas_cap_ms / 1000
+        )
+
+    raise ValueError("The retry policy must be 'fixed' or 'jitter'.")
+
+
 # Default timeout for the rendezvous.
 _DEFAULT_TIMEOUT: int = 600  # 10 minutes
 
@@ -66,6 +212,15 @@ CONST_ETCD_JOINABLE_EPHEMERAL_TTL = 10
 # Ephemeral node TTL for worker's keep-alive key:
 CONST_WORKER_KEEPALIVE_TTL = 10
 
+# How long the participants of a final rendezvous that re-enter the barrier
+# wait for each other to renew it with the same ranks, before they fall back
+# to a new rendezvous. A worker stops renewing its keep-alive key when it
+# re-enters the barrier, and the final rendezvous is destroyed once that key
+# has expired; so the window never exceeds the TTL of the key, and the sticky
+# phase does not delay the fallback beyond what the full protocol would wait
+# anyway.
+_DEFAULT_STICKY_WINDOW: int = CONST_WORKER_KEEPALIVE_TTL
+
 # TTL for the ephemeral run_id-specific directory. All rendezvous state data
 # for a specific run_id (job instance) is contained within directory.
 # Its only role is to clean-up rendezvous data from old runs (for the case when
@@ -73,6 +228,9 @@ CONST_WORKER_KEEPALIVE_TTL = 10
 # larger than any timeouts that a worker process is expected to survive:
 CONST_RUNID_SUBROOT_TTL = 7200  # 2 hours
 
+# The number of extra_data values kept by load_extra_data.
+_EXTRA_DATA_CACHE_SIZE = 128
+
 
 class EtcdRendezvousHandler(RendezvousHandler):
     """
@@ -179,6 +337,12 @@ class EtcdRendezvousHandler(RendezvousHandler):
     def get_run_id(self) -> str:
         return self._rdzv_impl._run_id
 
+    @property
+    def retry_policy(self) -> EtcdRendezvousRetryPolicy:
+        """Gets the retry policy of the rendezvous, e.g. to read its retry
+        counts."""
+        return self._rdzv_impl.retry_policy
+
     def shutdown(self) -> bool:
         try:
             self.set_closed()
@@ -209,6 +373,8 @@ class EtcdRendezvous(object):
         num_max_workers,
         timeout,
         last_call_timeout,
+        retry_policy: Optional[EtcdRendezvousRetryPolicy] = None,
+        sticky_window: float = _DEFAULT_STICKY_WINDOW,
     ):
         self.client = client
         log.info("Etcd machines: " + str(self.client.machines))
@@ -220,20 +386,39 @@ class EtcdRendezvous(object):
         self._timeout = timeout
         self._last_call_timeout = last_call_timeout
 
-        # For cleaning up TTL refresher threads (for ephemeral keys)
-        self._lease_run_id_stop = None
-        self._lease_this_rank_stop = None
+        # Decides the delays before the retries of the barrier
+        self._retry_policy = retry_policy or FixedDelayRetryPolicy()
+
+        # The deadline of the current barrier, no delay extends past it
+        self._rendezvous_deadline: Optional[float] = None
+
+        # The version of the last rendezvous this worker completed and its
+        # rank in it, which the next barrier tries to renew; see sticky_phase.
+        self._sticky_window = sticky_window
+        self._last_rendezvous: Optional[Tuple[str, int]] = None
+
+        # The final rendezvous in whose num_workers_waiting this worker has
+        # been counted by the sticky phase of the current barrier.
+        self._counted_version: Optional[str] = None
+
+        # The leases on the ephemeral keys, cancelled to stop renewing them
+        self._lease_run_id = None
+        self._lease_this_rank = None
 
         if not self._prefix.endswith("/"):
             self._prefix += "/"
 
+        # The extra_data values already loaded, least recently used first
+        self._extra_data_cache: "OrderedDict[Tuple[Any, Any], Any]" = OrderedDict()
+        self._extra_data_lock = threading.Lock()
+
         # Setup a permanent prefix dir, if didn't exist
         if self._prefix != "/":
             self.create_path_if_not_exists(self._prefix)
 
         # Lease a "sub-root" node specific to this job instance (run_id)
         self.create_path_if_not_exists(self.get_path(""), ttl=CONST_RUNID_SUBROOT_TTL)
-        self._lease_run_id_stop = self.setup_lease_renewal(
+        self._lease_run_id = self.setup_lease_renewal(
             self.get_path(""), ttl=CONST_RUNID_SUBROOT_TTL
         )
 
@@ -250,11 +435,11 @@ class EtcdRendezvous(object):
 
     def __del__(self):
         # TODO: look into using weakref here instead.
-        if self._lease_run_id_stop is not None:
-            self._lease_run_id_stop.set()
+        if self._lease_run_id is not None:
+            self._lease_run_id.cancel()
 
-        if self._lease_this_rank_stop is not None:
-            self._lease_this_rank_stop.set()
+        if self._lease_this_rank is not None:
+            self._lease_this_rank.cancel()
 
     def rendezvous_barrier(self):
         """
@@ -271,26 +456,47 @@ class EtcdRendezvous(object):
              render the rendezvous non-retryable
         """
         self._rendezvous_deadline = time.time() + self._timeout
+        self._retry_policy.reset()
+
+        # Try the fast path only on the first attempt.
+        sticky, self._last_rendezvous = self._last_rendezvous, None
+        self._counted_version = None
         while True:
             if time.time() > self._rendezvous_deadline:
                 raise RendezvousTimeoutError()
 
             log.info("Attempting to join next rendezvous")
             try:
+                if sticky is not None:
+                    last_version, last_rank = sticky
+                    sticky = None
+
+                    result = self.sticky_phase(last_version, last_rank)
+                    if result is not None:
+                        self._last_rendezvous = result[:2]
+                        return result
+
+                    log.info("Could not renew the previous rendezvous; joining a new one")
+
                 # Dis-own our lease in the previous rendezvous, if exists
-                if self._lease_this_rank_stop is not None:
-                    self._lease_this_rank_stop.set()
+                if self._lease_this_rank is not None:
+                    self._lease_this_rank.cancel()
+
+                result = self.init_phase()
 
-                return self.init_phase()
+                self._last_rendezvous = result[:2]
+                return result
 
             except EtcdRendezvousRetryImmediately:
                 # The type of failure suggests we can retry without delay
-                pass
+                self._retry_policy.backoff(EtcdRendezvousRetryPolicy.RETRY_IMMEDIATELY)
 
             except EtcdRendezvousRetryableFailure:
                 # In case of retryable failure, wait a small delay
                 # to avoid spamming etcd
-                time.sleep(1)
+                self._retry_policy.backoff(
+                    EtcdRendezvousRetryPolicy.RETRYABLE_FAILURE, self._rendezvous_deadline
+                )
 
             except RendezvousTimeoutError:
                 log.info("Rendezvous timeout occured in EtcdRendezvousHandler")
@@ -311,7 +517,9 @@ class EtcdRendezvous(object):
                 # FIXME: there are a few things that fall under this like
                 # etcd.EtcdKeyNotFound, etc, which could be handled more explicitly.
                 log.info("Rendezvous attempt failed, will retry. Reason: " + str(e))
-                time.sleep(1)
+                self._retry_policy.backoff(
+                    EtcdRendezvousRetryPolicy.ERROR, self._rendezvous_deadline
+                )
 
     def init_phase(self):
         """
@@ -461,9 +669,7 @@ class EtcdRendezvous(object):
         )
 
         try:
-            version_counter = self.client.get(self.get_path("/rdzv/version_counter"))
-            version_counter.value = str(int(version_counter.value) + 1)
-            self.client.update(version_counter)
+            version = self.create_version()
         except (etcd.EtcdKeyNotFound, etcd.EtcdCompareFailed):
             raise RendezvousError(
                 "Unexpected state of EtcdRendezvousHandler, worker needs to die."
@@ -473,14 +679,6 @@ class EtcdRendezvous(object):
         # The ephemeral /rdzv/active_version will expire and someone can then
         # re-try the setup process.
 
-        # Create directory node for participant data
-        self.client.write(
-            key=self.get_path("/rdzv/v_{}".format(version_counter.value)),
-            value=None,
-            dir=True,
-            prevExist=False,
-        )
-
         # Publish rendezvous version and signal it is ready-to-be-joined.
         # If rendezvous was set closed just before this, a retry will happen,
         # where the closed condition will be handled.
@@ -489,13 +687,170 @@ class EtcdRendezvous(object):
             value=json.dumps(
                 {
                     "status": "joinable",
-                    "version": version_counter.value,
+                    "version": version,
                     "participants": [],
                 }
             ),
             prev_value=active_version.value,
         )
 
+    def create_version(self):
+        """
+        Increments the rendezvous version counter and creates the directory
+        node for the participant data of the new version.
+
+        Raises:
+             etcd.EtcdCompareFailed - if someone else incremented the counter
+              concurrently
+        """
+        version_counter = self.client.get(self.get_path("/rdzv/version_counter"))
+        version_counter.value = str(int(version_counter.value) + 1)
+        self.client.update(version_counter)
+
+        # Create directory node for participant data
+        self.client.write(
+            key=self.get_path("/rdzv/v_{}".format(version_counter.value)),
+            value=None,
+            dir=True,
+            prevExist=False,
+        )
+
+        return version_counter.value
+
+    def sticky_phase(self, expected_version, this_rank):
+        """
+        Fast path of a worker that completed the 'final' rendezvous
+        ``expected_version`` as ``this_rank``, e.g. when its workers are
+        restarted after a failure.
+
+        The worker stops renewing its keep-alive key, as on the full path,
+        and re-announces itself in that rendezvous. If every participant
+        re-announces before the key has expired, at most within the sticky
+        window, and no other worker is waiting, the last one to do so replaces
+        the rendezvous with a 'frozen' one of a new version with the same
+        participants, so the ranks are kept and only the confirm phase
+        remains.
+
+        Returns:
+            ``(rdzv_version, rank, world_size)``, or ``None`` if the previous
+            rendezvous cannot be renewed and the full protocol has to be run
+
+        Raises:
+            RendezvousClosedError - current rendezvous was/is closed
+        """
+        if self._sticky_window <= 0:
+            return None
+
+        # Once the keep-alive key has expired the full protocol destroys the
+        # rendezvous anyway, so waiting longer than its TTL only delays the
+        # fallback.
+        window = min(self._sticky_window, CONST_WORKER_KEEPALIVE_TTL)
+
+        if self._lease_this_rank is not None:
+            self._lease_this_rank.cancel()
+
+        deadline = min(time.time() + window, self._rendezvous_deadline)
+
+        try:
+            active_version = self.reannounce(expected_version, this_rank)
+            if active_version is None:
+                return None
+
+            state = json.loads(active_version.value)
+            while True:
+                if state["status"] == "closed":
+                    raise RendezvousClosedError()
+
+                if state["status"] == "frozen" and state.get("renews") == expected_version:
+                    log.info(
+                        "Renewing rendezvous version {} as version {} with rank {}.".format(
+                            expected_version, state["version"], this_rank
+                        )
+                    )
+                    return self.confirm_phase(state["version"], this_rank)
+
+                # The rendezvous was destroyed or replaced, or a worker that
+                # did not take part in it is waiting to join.
+                if (
+                    state["status"] != "final"
+                    or state["version"] != expected_version
+                    or state["num_workers_waiting"] > len(state.get("reannounced", []))
+                ):
+                    return None
+
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    return None
+
+                active_version, state = self.try_wait_for_state_change(
+                    etcd_index=active_version.etcd_index + 1, timeout=timeout
+                )
+        except etcd.EtcdKeyNotFound:
+            # The rendezvous state has expired or was destroyed.
+            return None
+
+    def reannounce(self, expected_version, this_rank):
+        """
+        Helper method for the sticky phase. Adds ``this_rank`` to the
+        participants of the 'final' rendezvous ``expected_version`` that want
+        to renew it, and, if it is the last one and nobody else waits, renews
+        it in the same compare-and-swap.
+
+        Returns:
+            The new state, or ``None`` if the rendezvous is no longer the one
+            this worker took part in
+        """
+        new_version = None
+
+        while True:
+            active_version, state = self.get_rdzv_state()
+
+            if state["status"] != "final" or state["version"] != expected_version:
+                return None
+
+            if this_rank >= len(state["participants"]):
+                return None
+
+            reannounced = state.setdefault("reannounced", [])
+            if this_rank in reannounced:
+                self._counted_version = expected_version
+                return active_version
+
+            reannounced.append(this_rank)
+
+            # Also signal the running workers that the rendezvous is about to
+            # change, see EtcdRendezvousHandler.num_nodes_waiting.
+            state["num_workers_waiting"] += 1
+
+            ttl = None
+            if len(reannounced) == len(state["participants"]) == state["num_workers_waiting"]:
+                if new_version is None:
+                    new_version = self.create_version()
+
+                state = {
+                    "status": "frozen",
+                    "version": new_version,
+                    "participants": state["participants"],
+                    "keep_alives": [],
+                    "renews": expected_version,
+                }
+                ttl = CONST_ETCD_FROZEN_TTL
+
+            try:
+                active_version = self.client.test_and_set(
+                    key=self.get_path("/rdzv/active_version"),
+                    value=json.dumps(state),
+                    prev_value=active_version.value,
+                    ttl=ttl,
+                )
+                self._retry_policy.reset_cas()
+                self._counted_version = expected_version
+                return active_version
+
+            except etcd.EtcdCompareFailed:
+                log.info("Re-announce self CAS unsuccessful, retrying")
+                self._cas_backoff()
+
     def join_rendezvous(self, expected_version):
         """
         Helper method for the join phase.
@@ -503,7 +858,6 @@ class EtcdRendezvous(object):
 
         # Use compare-and-swap to add self to rendezvous state:
         while True:
-            cas_delay()
             active_version, state = self.get_rdzv_state()
 
             if state["status"] != "joinable":
@@ -542,11 +896,13 @@ class EtcdRendezvous(object):
                     prev_value=active_version.value,
                     ttl=set_ttl,
                 )
+                self._retry_policy.reset_cas()
                 # We succeeded joining.
                 return active_version, this_rank
 
             except etcd.EtcdCompareFailed:
                 log.info("Join rendezvous CAS unsuccessful, retrying")
+                self._cas_backoff()
 
     def wait_for_peers(self, expected_version):
         """
@@ -577,7 +933,6 @@ class EtcdRendezvous(object):
 
         # Compare-and-swap loop
         while True:
-            cas_delay()
             active_version, state = self.get_rdzv_state()
 
             if state["status"] != "frozen":
@@ -612,14 +967,16 @@ class EtcdRendezvous(object):
                     prev_value=active_version.value,
                     ttl=None if finalize else CONST_ETCD_FROZEN_TTL,
                 )
+                self._retry_policy.reset_cas()
 
-                self._lease_this_rank_stop = self.setup_lease_renewal(
+                self._lease_this_rank = self.setup_lease_renewal(
                     this_lease_key, ttl=CONST_WORKER_KEEPALIVE_TTL
                 )
                 return active_version
 
             except etcd.EtcdCompareFailed:
                 log.info("Confirm membership CAS unsuccessful, retrying")
+                self._cas_backoff()
 
     def wait_for_final(self, expected_version):
         """
@@ -650,12 +1007,16 @@ class EtcdRendezvous(object):
         """
 
         while True:
-            cas_delay()
             active_version, state = self.get_rdzv_state()
 
             if state["status"] != "final" or state["version"] != expected_version:
                 raise EtcdRendezvousRetryImmediately()
 
+            # The worker has already been counted when it re-announced itself
+            # in this rendezvous during the sticky phase.
+            if self._counted_version == expected_version:
+                return active_version
+
             # Increment counter to signal an additional waiting worker.
             state["num_workers_waiting"] += 1
 
@@ -665,10 +1026,12 @@ class EtcdRendezvous(object):
                     value=json.dumps(state),
                     prev_value=active_version.value,
                 )
+                self._retry_policy.reset_cas()
                 return active_version
 
             except etcd.EtcdCompareFailed:
                 log.info("Announce self as waiting CAS unsuccessful, retrying")
+                self._cas_backoff()
 
     def wait_for_rendezvous_to_free(self, expected_version):
         """
@@ -780,11 +1143,12 @@ class EtcdRendezvous(object):
                         prev_value=active_version.value,
                         ttl=CONST_ETCD_FROZEN_TTL,
                     )
+                    self._retry_policy.reset_cas()
                     # We successfully made this rendezvous frozen.
                     return
                 except etcd.EtcdCompareFailed:
                     log.info("Join last-call transition CAS unsuccessful. Will retry")
-                    cas_delay()
+                    self._cas_backoff()
                     active_version, state = self.get_rdzv_state()
                     continue
 
@@ -799,6 +1163,7 @@ class EtcdRendezvous(object):
                     prev_value=active_version.value,
                     ttl=CONST_ETCD_JOINABLE_EPHEMERAL_TTL,
                 )
+                self._retry_policy.reset_cas()
 
                 # Minimize "oversleeping":
                 timeout = min(
@@ -810,7 +1175,7 @@ class EtcdRendezvous(object):
                 )
             except etcd.EtcdCompareFailed:
                 log.info("Join last-call TTL refresh CAS unsuccessful, will retry")
-                cas_delay()
+                self._cas_backoff()
                 active_version, state = self.get_rdzv_state()
 
     def set_closed(self):
@@ -833,11 +1198,21 @@ class EtcdRendezvous(object):
                     value=json.dumps(state),
                     prev_value=active_version.value,
                 )
+                self._retry_policy.reset_cas()
                 return
 
             except etcd.EtcdCompareFailed:
                 log.info("Set closed CAS unsuccessful, retrying")
-                cas_delay()
+                self._cas_backoff()
+
+    @property
+    def retry_policy(self) -> EtcdRendezvousRetryPolicy:
+        return self._retry_policy
+
+    def _cas_backoff(self) -> None:
+        self._retry_policy.backoff(
+            EtcdRendezvousRetryPolicy.CAS_CONFLICT, self._rendezvous_deadline
+        )
 
     def get_rdzv_state(self):
         active_version = self.client.get(key=self.get_path("/rdzv/active_version"))
@@ -878,92 +1253,88 @@ class EtcdRendezvous(object):
             pass
 
     def setup_lease_renewal(self, full_path, ttl):
-        # NOTE: For ephemeral key TTL renewal (~lease) to work correctly,
-        # make sure you don't call any long-blocking methods that do not
-        # release the Python's GIL! An example of this is calling a pybind11
-        # extension function that is blocking / long-running, but is not
-        # doing a scoped release of the GIL.
-        def lease_worker(client, path, ttl, stop_event):
-            while True:
-                try:
-                    client.refresh(path, ttl=ttl)
-                except etcd.EtcdKeyNotFound:
-                    break
-                except ConnectionRefusedError:
-                    # This error usually occurs during test when the server already got terminated but the
-                    # python garbage collector have not yet invoked the __del__ method.
-                    break
-
-                if stop_event.wait(timeout=ttl / 2):
-                    break
-
-        lease_stop_event = threading.Event()
-        lease_thread = threading.Thread(
-            target=lease_worker, args=(self.client, full_path, ttl, lease_stop_event)
-        )
-
-        lease_thread.daemon = True
-        lease_thread.start()
-
-        return lease_stop_event
+        # The keys of all handlers sharing the client are renewed by a single
+        # thread; see EtcdLeaseManager.
+        return get_etcd_lease_manager(self.client).lease(full_path, ttl)
 
     def store_extra_data(self, rdzv_version, key, value):
-        node = self.get_path("/rdzv/v_{}/extra_data".format(rdzv_version))
-        try:
-            # If first time we are storing anything:
-            extra_data = self.client.write(
-                key=node, value=json.dumps({key: value}), prevExist=False
-            )
-            return
-        except etcd.EtcdAlreadyExist:
-            pass
+        """
+        Publishes ``value`` under ``key`` for the rendezvous version. Every key
+        is a node of its own under ``extra_data``, so concurrent stores of
+        different keys never conflict. A key is meant to be stored once per
+        rendezvous version; see ``load_extra_data``.
+        每个key是extra_data下的一个独立节点，不同key的并发写入不会冲突。
+        """
+        node = self._get_extra_data_path(rdzv_version, key)
 
-        # CAS loop, to make sure we don't lose concurrent stores.
-        while True:
-            # We never delete extra_data. Failure here should be fatal, no special handling.
-            extra_data = self.client.get(node)
+        # Like the rest of the rendezvous data, cleaned up with the run_id directory.
+        self.client.write(key=node, value=json.dumps(value))
 
-            new_extra_data_value = json.loads(extra_data.value)
-            new_extra_data_value[key] = value
+    def load_extra_data(self, rdzv_version, key, timeout=None):
+        """
+        Returns the value published under ``key`` for the rendezvous version,
+        waiting until it is published.
 
-            try:
-                extra_data = self.client.test_and_set(
-                    key=node,
-                    value=json.dumps(new_extra_data_value),
-                    prev_value=extra_data.value,
-                )
-                return
-            except etcd.EtcdCompareFailed:
-                log.info("Store extra_data CAS unsuccessful, retrying")
-                time.sleep(0.1)
+        The values already loaded are kept in a small LRU cache, since a key
+        is not stored again for the same version.
+        已加载的值缓存在一个小的LRU中。
 
-    def load_extra_data(self, rdzv_version, key, timeout=None):
-        # 'extra_data' node itself, and the directory it is located in:
-        node = self.get_path("/rdzv/v_{}/extra_data".format(rdzv_version))
-        node_dir = self.get_path("/rdzv/v_{}".format(rdzv_version))
+        Raises:
+            RendezvousTimeoutError - if the key is not published within
+                ``timeout`` seconds
+        """
+        cache_key = (rdzv_version, key)
 
-        # TODO: implement timeout
-        # https://github.com/pytorch/elastic/issues/12
-        while True:
-            # Combined wait for the node itself, and the key inside it.
-            root = self.client.get(node_dir)
+        with self._extra_data_lock:
+            if cache_key in self._extra_data_cache:
+                self._extra_data_cache.move_to_end(cache_key)
+                return self._extra_data_cache[cache_key]
 
-            # Find the extra_data node, if it exists
-            extra_data = [n for n in root.children if n.key == node]
-            assert len(extra_data) <= 1
+        node = self._get_extra_data_path(rdzv_version, key)
 
-            # Node for extra_data exists, check the desired key inside it.
-            if len(extra_data) == 1:
-                extra_data_dict = json.loads(extra_data[0].value)
-                if key in extra_data_dict:
-                    return extra_data_dict[key]
+        deadline = None if timeout is None else time.monotonic() + timeout
 
-            # The 'extra_data' node doesn't exist, or they key isn't published yet.
-            # Wait for interesting events on the extra_data node and retry.
+        while True:
             try:
-                self.client.watch(node, index=root.etcd_index + 1)
+                result = self.client.get(node)
+                break
+            except etcd.EtcdKeyNotFound as exc:
+                # Wait for the key itself to be written, starting right after
+                # the index at which it was found missing.
+                # 从确认key不存在的index之后开始，等待该key被写入。
+                index = int((getattr(exc, "payload", None) or {}).get("index", 0))
+
+            watch_timeout = None
+            if deadline is not None:
+                watch_timeout = deadline - time.monotonic()
+                if watch_timeout <= 0:
+                    raise RendezvousTimeoutError(
+                        f"The extra data '{key}' of the rendezvous version {rdzv_version} has "
+                        f"not been published within {timeout} seconds."
+                    )
+
+            try:
+                result = self.client.watch(node, index=index + 1, timeout=watch_timeout)
             except (etcd.EtcdEventIndexCleared, etcd.EtcdWatchTimedOut):
-                pass
+                continue
+
+            if result.action in ("set", "create", "update", "compareAndSwap"):
+                break
+
+        value = json.loads(result.value)
+
+        with self._extra_data_lock:
+            self._extra_data_cache[cache_key] = value
+            if len(self._extra_data_cache) > _EXTRA_DATA_CACHE_SIZE:
+                self._extra_data_cache.popitem(last=False)
+
+        return value
+
+    def _get_extra_data_path(self, rdzv_version, key):
+        # Any character may appear in a key; keep it to a single path segment.
+        return self.get_path(
+            "/rdzv/v_{}/extra_data/{}".format(rdzv_version, urllib.parse.quote(str(key), safe=""))
+        )
 
     def setup_kv_store(self, rdzv_version):
         store_path = self.get_path(f"/rdzv/v_{rdzv_version}/kv")
@@ -997,7 +1368,17 @@ def _create_etcd_client(params: RendezvousParameters) -> etcd.Client:
     # The root certificate
     ca_cert = params.config.get("cacert")
 
-    return etcd.Client(
+    # The connections kept alive for short requests and for watches, shared by
+    # the clients of all handlers of the process.
+    transport = get_etcd_transport(
+        params.get_as_int("pool_size", 10),
+        params.get_as_int("watch_pool_size", 10),
+        ssl_cert,
+        ca_cert,
+    )
+
+    return PooledEtcdClient(
+        transport,
         hostname,
         port,
         protocol=protocol,
@@ -1056,6 +1437,32 @@ def create_rdzv_handler(params: RendezvousParameters) -> RendezvousHandler:
         cacert - CA cert to access etcd, only makes sense with https.
         cert - client cert to access etcd, only makes sense with https.
         key - client key to access etcd, only makes sense with https.
+        pool_size - connections per etcd host kept alive for short requests.
+                    Defaults to 10.
+        watch_pool_size - connections per etcd host kept alive for watches,
+                          which never take a connection from the pool of
+                          the short requests. Defaults to 10.
+        retry_policy - the delays before the barrier retries after a failure:
+                       "fixed" (default) for 1 second per attempt and up to
+                       100 ms per failed compare-and-swap, or "jitter" for
+                       exponential backoff with decorrelated jitter.
+        retry_backoff_base_ms - the smallest delay of "jitter" before an
+                                attempt in milliseconds. Defaults to 100.
+        retry_backoff_cap_ms - the largest delay of "jitter" before an
+                               attempt in milliseconds. Defaults to 5000.
+        retry_cas_backoff_base_ms - the smallest delay of "jitter" after a
+                                    failed compare-and-swap in milliseconds.
+                                    Defaults to 10.
+        retry_cas_backoff_cap_ms - the largest delay of "jitter" after a
+                                   failed compare-and-swap in milliseconds.
+                                   Defaults to 1000.
+        sticky_window - how long, in seconds, the participants of the last
+                        rendezvous wait for each other to renew it with the
+                        same ranks when they re-enter the barrier together,
+                        e.g. after a worker failure. 0 disables it. Defaults
+                        to, and is capped at, the TTL of the keep-alive keys
+                        (10), after which the full protocol destroys the
+                        last rendezvous anyway.
     """
     client = _create_etcd_client(params)
 
@@ -1069,5 +1476,7 @@ def create_rdzv_handler(params: RendezvousParameters) -> RendezvousHandler:
         num_max_workers=params.max_nodes,
         timeout=params.get_as_int("timeout", _DEFAULT_TIMEOUT),
         last_call_timeout=params.get_as_int("last_call_timeout", _DEFAULT_LAST_CALL_TIMEOUT),
+        retry_policy=_create_retry_policy(params),
+        sticky_window=params.get_as_int("sticky_window", _DEFAULT_STICKY_WINDOW),
     )
     return EtcdRendezvousHandler(rdzv_impl=rdzv)
@@ -5,25 +5,256 @@
 # LICENSE file in the root directory of this source tree.
 
 import binascii
+import logging
+import math
+import threading
+import time
+import weakref
 from base64 import b64decode, b64encode
-from typing import Optional, Tuple, cast
+from datetime import datetime, timedelta
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple, cast
 
 import urllib3.exceptions  # type: ignore[import]
 from etcd import Client as EtcdClient  # type: ignore[import]
 from etcd import (
     EtcdAlreadyExist,
     EtcdCompareFailed,
+    EtcdEventIndexCleared,
     EtcdException,
     EtcdKeyNotFound,
     EtcdResult,
+    EtcdWatchTimedOut,
 )
 from torch.distributed import Store
 
 from .api import RendezvousConnectionError, RendezvousParameters, RendezvousStateError
-from .dynamic_rendezvous import RendezvousBackend, Token
+from .dynamic_rendezvous import RendezvousBackend, RendezvousStateCacheStats, Token
 from .etcd_store import EtcdStore
+from .etcd_transport import PooledEtcdClient, get_etcd_transport
+from .tracing import traced
 from .utils import parse_rendezvous_endpoint
 
+log = logging.getLogger(__name__)
+
+
+class _EtcdStateWatcher:
+    """
+    Keeps the last rendezvous state read from or written to etcd, together
+    with the etcd index up to which it is known to be current, and follows the
+    changes of the state key with a single watcher thread, so that reads are
+    answered locally while nothing has changed. After an event that is not
+    the latest change in etcd the watcher reads the state once and resumes
+    from the index of that read, rather than replaying the changes one by one.
+      保存最近读取或写入的rdzv状态及其有效的etcd索引，由一个watcher线程跟踪状态key的变化。
+
+    The cached state is only served while the watcher is caught up; it is
+    dropped whenever the watch fails, until the next read from etcd. A quiet
+    watch does not tell a state that has not changed from an etcd that cannot
+    be reached, so the cached state is also read again once no change or read
+    has confirmed it for ``_MAX_AGE`` seconds.
+      缓存的状态在_MAX_AGE秒内未被确认时会重新从etcd读取，以免在网络分区时一直返回过期状态。
+    """
+
+    # How long a single watch request may block. The watcher thread exits
+    # within this time once the backend has been garbage collected.
+    _WATCH_TIMEOUT = 10.0
+
+    # How long the watcher waits before retrying after a connection error.
+    _RETRY_DELAY = 1.0
+
+    # How long the cached state is served without being confirmed by etcd.
+    _MAX_AGE = 10.0
+
+    def __init__(self, backend: "EtcdRendezvousBackend") -> None:
+        self._client = backend._client
+        self._key = backend._key
+
+        self._lock = threading.Lock()
+
+        # Notified whenever the cached state changes or is dropped.
+        self._changed = threading.Condition(self._lock)
+
+        self._valid = False
+
+        # The time at which etcd last confirmed the cached state.
+        self._confirmed = 0.0
+
+        self._state: Optional[Tuple[bytes, Token]] = None
+
+        # The etcd index up to which the cached state is current.
+        self._index = 0
+
+        # Set whenever a state is cached, so that the idle watcher resumes.
+        self._cached = threading.Event()
+
+        self._stats = RendezvousStateCacheStats()
+
+        watcher = threading.Thread(
+            target=_EtcdStateWatcher._watch_weak,
+            args=(weakref.ref(backend), weakref.ref(self)),
+            name=f"EtcdStateWatcher_{self._key}",
+            daemon=True,
+        )
+        watcher.start()
+
+    @property
+    def stats(self) -> RendezvousStateCacheStats:
+        with self._lock:
+            return replace(self._stats)
+
+    def get(self) -> Tuple[bool, Optional[Tuple[bytes, Token]]]:
+        """
+        Returns whether a state is cached and, if so, the state.
+        """
+        with self._lock:
+            if not self._valid or time.monotonic() - self._confirmed > self._MAX_AGE:
+                self._stats.backend_reads += 1
+                return False, None
+
+            self._stats.hits += 1
+
+            return True, self._state
+
+    def update(self, state: Optional[Tuple[bytes, Token]], index: int) -> None:
+        """
+        Caches ``state``, which is current as of the etcd ``index``, unless a
+        more recent state is already cached.
+        """
+        with self._lock:
+            if self._valid and index < self._index:
+                return
+
+            self._state = state
+            self._index = index
+            self._valid = True
+
+            self._confirmed = time.monotonic()
+
+            self._changed.notify_all()
+
+        self._cached.set()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._valid = False
+
+            self._cached.clear()
+
+            self._changed.notify_all()
+
+    def wait(self, token: Optional[int], timeout: float) -> Optional[bool]:
+        """
+        Waits until the cached state is no longer the one of ``token``.
+
+        Returns ``None`` if no state is cached to wait on; otherwise whether
+        the state has changed, or might have as the cache has been dropped,
+        before ``timeout`` seconds have passed.
+        """
+        deadline = time.monotonic() + timeout
+
+        with self._lock:
+            if not self._valid:
+                return None
+
+            while self._valid:
+                cached_token = self._state[1] if self._state is not None else None
+                if cached_token != token:
+                    return True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+
+                self._changed.wait(remaining)
+
+            return True
+
+    def apply(self, backend: "EtcdRendezvousBackend", result: EtcdResult) -> None:
+        """
+        Caches the state of the watch event ``result``.
+        """
+        if result.action in ("delete", "expire", "compareAndDelete"):
+            self.update(None, result.modifiedIndex)
+            return
+
+        try:
+            state = backend._decode_state(result)
+        except RendezvousStateError:
+            # Let the next read from etcd surface the error.
+            self.invalidate()
+            return
+
+        self.update(state, result.modifiedIndex)
+
+    @staticmethod
+    def _watch_weak(weak_backend, weak_self) -> None:
+        while True:
+            backend, self = weak_backend(), weak_self()
+            if backend is None or self is None:
+                return
+
+            self._watch_once(backend)
+
+            del backend, self
+
+    def _watch_once(self, backend: "EtcdRendezvousBackend") -> None:
+        with self._lock:
+            index = self._index if self._valid else None
+
+        # Nothing to keep current until the next read from etcd.
+        if index is None:
+            self._cached.wait(self._WATCH_TIMEOUT)
+            return
+
+        try:
+            result = self._client.watch(self._key, index=index + 1, timeout=self._WATCH_TIMEOUT)
+        except EtcdWatchTimedOut:
+            return
+        except EtcdEventIndexCleared:
+            # The state has not changed for longer than the event history of
+            # etcd goes back; read it again to get a recent index.
+            self._reload(backend)
+            return
+        except (EtcdException, urllib3.exceptions.TimeoutError) as exc:
+            self.invalidate()
+
+            log.warning(
+                f"The watch of the rendezvous state '{self._key}' has failed due to an error of "
+                f"type {type(exc).__name__}; retrying."
+            )
+
+            time.sleep(self._RETRY_DELAY)
+
+            return
+
+        # Later changes have been made since the event, so it is already out
+        # of date; read the current state instead of replaying them.
+        if (result.etcd_index or 0) > result.modifiedIndex:
+            self._refresh(backend)
+        else:
+            self.apply(backend, result)
+
+    def _refresh(self, backend: "EtcdRendezvousBackend") -> None:
+        try:
+            backend._read_state()
+        except (RendezvousConnectionError, RendezvousStateError):
+            # Let the next read from etcd surface the error.
+            self.invalidate()
+
+    def _reload(self, backend: "EtcdRendezvousBackend") -> None:
+        self.invalidate()
+
+        try:
+            backend._read_state()
+        except (RendezvousConnectionError, RendezvousStateError) as exc:
+            log.warning(
+                f"The rendezvous state '{self._key}' could not be reloaded due to an error of "
+                f"type {type(exc).__name__}; retrying."
+            )
+
+            time.sleep(self._RETRY_DELAY)
+
 
 class EtcdRendezvousBackend(RendezvousBackend):
     """Represents an etcd-based rendezvous backend.
@@ -40,6 +271,11 @@ class EtcdRendezvousBackend(RendezvousBackend):
         ttl:
               rdzv状态的TTL。如果没有指定，默认为两个小时。
             The TTL of the rendezvous state. If not specified, defaults to two hours.
+        cache_state:
+              是否缓存rdzv状态，由watch使其更新或失效。
+            A boolean value indicating whether to keep the last read or
+            written state and answer :py:meth:`get_state` from it as long as
+            a background watch of the state key sees no change.
     """
 
     _DEFAULT_TTL = 7200  # 2 hours
@@ -47,13 +283,16 @@ class EtcdRendezvousBackend(RendezvousBackend):
     _client: EtcdClient
     _key: str
     _ttl: int
+    _watcher: Optional[_EtcdStateWatcher]
 
+    @traced
     def __init__(
         self,
         client: EtcdClient,
         run_id: str,
         key_prefix: Optional[str] = None,
         ttl: Optional[int] = None,
+        cache_state: bool = True,
     ) -> None:
         if not run_id:
             raise ValueError("The run id must be a non-empty string.")
@@ -70,34 +309,69 @@ class EtcdRendezvousBackend(RendezvousBackend):
         else:
             self._ttl = self._DEFAULT_TTL
 
+        self._watcher = _EtcdStateWatcher(self) if cache_state else None
+
     @property
     def name(self) -> str:
         """See base class."""
         return "etcd-v2"
 
+    @property
+    def cache_stats(self) -> Optional[RendezvousStateCacheStats]:
+        """Gets the statistics of the state cache, if the state is cached.
+          获取状态缓存的统计信息；``hits``为从缓存返回的读取次数。
+        """
+        if self._watcher is None:
+            return None
+        return self._watcher.stats
+
+    @traced
     def get_state(self) -> Optional[Tuple[bytes, Token]]:
         """See base class."""
+        if self._watcher is not None:
+            cached, state = self._watcher.get()
+            if cached:
+                return state
+
+        return self._read_state()
+
+    @traced
+    def _read_state(self) -> Optional[Tuple[bytes, Token]]:
         try:
             result = self._client.read(self._key)
-        except EtcdKeyNotFound:
+        except EtcdKeyNotFound as exc:
+            index = (getattr(exc, "payload", None) or {}).get("index")
+            if self._watcher is not None and index is not None:
+                self._watcher.update(None, int(index))
             return None
         except (EtcdException, urllib3.exceptions.TimeoutError) as exc:
             raise RendezvousConnectionError(
                 "The connection to etcd has failed. See inner exception for details."
             ) from exc
 
-        return self._decode_state(result)
+        state = self._decode_state(result)
+
+        # The state is current as of the index of the read, which may be well
+        # past its modified index; watching from there does not run into the
+        # end of the event history when the state stays the same for long.
+        if self._watcher is not None:
+            self._watcher.update(state, max(result.etcd_index or 0, result.modifiedIndex))
 
+        return state
+
+    @traced
     def set_state(
         self, state: bytes, token: Optional[Token] = None
     ) -> Optional[Tuple[bytes, Token, bool]]:
         """See base class."""
-        base64_state = b64encode(state).decode()
+        base64_state = b64encode(self._compress_state(state)).decode()
 
         kwargs = {}
 
         def get_state():
-            result = self.get_state()
+            # Our token is out of date, so may be the cached state; read the
+            # state from etcd.
+            result = self._read_state()
             if result is not None:
                 tmp = *result, False
                 # Python 3.6 does not support tuple unpacking in return
@@ -128,9 +402,137 @@ class EtcdRendezvousBackend(RendezvousBackend):
         if result is None:
             return get_state()
 
-        tmp = *self._decode_state(result), True
+        new_state = self._decode_state(result)
+
+        if self._watcher is not None:
+            self._watcher.update(new_state, result.modifiedIndex)
+
+        tmp = *new_state, True
         return tmp
 
+    @traced
+    def wait_for_state_change(self, token: Optional[Token], timeout: timedelta) -> bool:
+        """See base class."""
+        timeout_seconds = timeout.total_seconds()
+        if timeout_seconds <= 0:
+            return False
+
+        if token:
+            try:
+                token = int(token)
+            except ValueError:
+                return True
+
+        # 若状态已被缓存，则等待watcher看到变化，而不另开一个watch；
+        # 这样get_state()返回的总是结束等待的那个状态。
+        # If the state is cached, wait for the watcher to see the change rather
+        # than opening a watch of our own; this way get_state() never returns
+        # the state we have been waiting to change.
+        if self._watcher is not None:
+            changed = self._watcher.wait(token, timeout_seconds)
+            if changed is not None:
+                return changed
+
+        kwargs = {}
+
+        # 从token之后的下一个索引开始监听，这样就不会错过在上次读取之后发生的更改。
+        # Watch from the index right after our token so that we do not miss a
+        # change that happened after our last read.
+        if token:
+            kwargs["index"] = token + 1
+
+        try:
+            result = self._client.watch(self._key, timeout=timeout_seconds, **kwargs)
+        except EtcdWatchTimedOut:
+            return False
+        except EtcdEventIndexCleared:
+            # The index is too old to be watched; the state must have changed
+            # in the meantime.
+            return True
+        except (EtcdException, urllib3.exceptions.TimeoutError) as exc:
+            raise RendezvousConnectionError(
+                "The connection to etcd has failed. See inner exception for details."
+            ) from exc
+
+        # Cache the change so that the next get_state() returns it.
+        if self._watcher is not None:
+            self._watcher.apply(self, result)
+
+        return True
+
+    @property
+    def supports_heartbeats(self) -> bool:
+        """See base class."""
+        return True
+
+    @traced
+    def set_heartbeat(self, node: str, ttl: timedelta) -> None:
+        """See base class."""
+        # etcd removes the key of a node once its heartbeat has expired.
+        try:
+            self._client.write(
+                self._get_heartbeat_key(node),
+                repr(time.time()),
+                max(math.ceil(ttl.total_seconds()), 1),
+            )
+        except (EtcdException, urllib3.exceptions.TimeoutError) as exc:
+            raise RendezvousConnectionError(
+                "The connection to etcd has failed. See inner exception for details."
+            ) from exc
+
+    @traced
+    def get_heartbeats(self, nodes: List[str]) -> Dict[str, datetime]:
+        """See base class."""
+        # A single read returns the heartbeats of all nodes regardless of how
+        # many we are interested in.
+        try:
+            result = self._client.read(self._key + ".heartbeats", recursive=True)
+        except EtcdKeyNotFound:
+            return {}
+        except (EtcdException, urllib3.exceptions.TimeoutError) as exc:
+            raise RendezvousConnectionError(
+                "The connection to etcd has failed. See inner exception for details."
+            ) from exc
+
+        wanted = set(nodes)
+
+        heartbeats = {}
+
+        for leaf in result.leaves:
+            if leaf.dir:
+                continue
+
+            node = leaf.key.rsplit("/", 1)[-1]
+            if node not in wanted:
+                continue
+
+            try:
+                heartbeats[node] = datetime.utcfromtimestamp(float(leaf.value))
+            except ValueError as exc:
+                raise RendezvousStateError(
+                    f"The heartbeat of the node '{node}' is corrupt. See inner exception for "
+                    "details."
+                ) from exc
+
+        return heartbeats
+
+    @traced
+    def delete_heartbeat(self, node: str) -> None:
+        """See base class."""
+        try:
+            self._client.delete(self._get_heartbeat_key(node))
+        except EtcdKeyNotFound:
+            pass
+        except (EtcdException, urllib3.exceptions.TimeoutError) as exc:
+            raise RendezvousConnectionError(
+                "The connection to etcd has failed. See inner exception for details."
+            ) from exc
+
+    def _get_heartbeat_key(self, node: str) -> str:
+        # The heartbeats are kept next to, not under, the state key so that
+        # they do not trigger the watchers of the state.
+        return self._key + ".heartbeats/" + node
+
     def _decode_state(self, result: EtcdResult) -> Tuple[bytes, Token]:
         base64_state = result.value.encode()
 
@@ -141,9 +543,10 @@ class EtcdRendezvousBackend(RendezvousBackend):
                 "The state object is corrupt. See inner exception for details."
             ) from exc
 
-        return state, result.modifiedIndex
+        return self._decompress_state(state), result.modifiedIndex
 
 
+@traced
 def _create_etcd_client(params: RendezvousParameters) -> EtcdClient:
     host, port = parse_rendezvous_endpoint(params.endpoint, default_port=2379)
 
@@ -169,8 +572,15 @@ def _create_etcd_client(params: RendezvousParameters) -> EtcdClient:
     # The root certificate
     ca_cert = params.get("ca_cert")
 
+    # The connections kept alive for short requests and for watches
+    pool_size = cast(int, params.get_as_int("pool_size", 10))
+    watch_pool_size = cast(int, params.get_as_int("watch_pool_size", 10))
+
     try:
-        return EtcdClient(
+        transport = get_etcd_transport(pool_size, watch_pool_size, ssl_cert, ca_cert)
+
+        return PooledEtcdClient(
+            transport,
             host,
             port,
             read_timeout=read_timeout,
@@ -185,6 +595,7 @@ def _create_etcd_client(params: RendezvousParameters) -> EtcdClient:
         ) from exc
 
 
+@traced
 def create_backend(params: RendezvousParameters) -> Tuple[EtcdRendezvousBackend, Store]:
     """Creates a new :py:class:`EtcdRendezvousBackend` from the specified
     parameters.
@@ -208,6 +619,15 @@ def create_backend(params: RendezvousParameters) -> Tuple[EtcdRendezvousBackend,
     | ca_cert      | The path to the rool SSL authority certificate. Defaults  |
     |              | to ``None``.                                              |
     +--------------+-----------------------------------------------------------+
+    | pool_size    | The number of connections per etcd host kept alive for    |
+    |              | short requests. Defaults to 10.                           |
+                    为短请求保持的连接数                                         |
+    +--------------+-----------------------------------------------------------+
+    | watch_pool_  | The number of connections per etcd host kept alive for    |
+    | size         | long-poll watches, which never take a connection from the |
+    |              | pool of the short requests. Defaults to 10.               |
+                    为watch保持的连接数，watch不会占用短请求的连接                 |
+    +--------------+-----------------------------------------------------------+
     """
     client = _create_etcd_client(params)
 
@@ -5,10 +5,14 @@
 # LICENSE file in the root directory of this source tree.
 
 import datetime
+import logging
 import random
+import threading
 import time
+import weakref
 from base64 import b64decode, b64encode
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 import etcd  # type: ignore[import]
 
@@ -16,12 +20,198 @@ import etcd  # type: ignore[import]
 from torch.distributed import Store
 
 
+log = logging.getLogger(__name__)
+
+
 # Delay (sleep) for a small random amount to reduce CAS failures.
 # This does not affect correctness, but will reduce requests to etcd server.
 def cas_delay():
     time.sleep(random.uniform(0, 0.1))
 
 
+class _EtcdStoreMirror:
+    """
+    A local copy of the keys under the prefix of an ``EtcdStore``, kept up to
+    date by a single watcher thread that follows the changes of the prefix in
+    etcd, one event at a time.
+
+    Callers waiting for keys that are not there yet register a waiter for the
+    first missing key and are woken up once the watcher (or a local write)
+    applies it, instead of each re-reading the whole directory and setting up
+    a watch of its own on every change.
+    """
+
+    # How long a single watch request may block. The watcher thread exits
+    # within this time once the mirror has been garbage collected.
+    _WATCH_TIMEOUT = 10.0
+
+    # How long the watcher waits before retrying after a connection error.
+    _RETRY_DELAY = 1.0
+
+    def __init__(self, client, prefix: str):
+        self._client = client
+        self._prefix = prefix
+
+        self._lock = threading.Lock()
+
+        self._values: Dict[str, str] = {}
+
+        # The modified index of each key, so that an event that is older than
+        # a value applied by a local write does not overwrite it.
+        self._indices: Dict[str, int] = {}
+
+        self._waiters: Dict[str, List[threading.Event]] = {}
+
+        # The etcd index up to which the changes have been applied.
+        self._index = 0
+
+        self._load()
+
+        watcher = threading.Thread(
+            target=_EtcdStoreMirror._watch_weak,
+            args=(weakref.ref(self),),
+            name=f"EtcdStoreMirror_{prefix}",
+            daemon=True,
+        )
+        watcher.start()
+
+    def try_wait_get(self, keys, timeout: float) -> Optional[Dict[str, str]]:
+        """
+        Returns the values of ``keys`` once all of them are present, or
+        ``None`` if they are not within ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                missing = next((key for key in keys if key not in self._values), None)
+                if missing is None:
+                    return {key: self._values[key] for key in keys}
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+
+                event = threading.Event()
+
+                self._waiters.setdefault(missing, []).append(event)
+
+            if not event.wait(remaining):
+                with self._lock:
+                    waiters = self._waiters.get(missing, [])
+                    if event in waiters:
+                        waiters.remove(event)
+
+    def apply(self, node) -> None:
+        """
+        Applies the result of a local write so that this process reads its
+        own writes without waiting for the watcher.
+        """
+        with self._lock:
+            self._apply(node.key, node.value, node.modifiedIndex)
+
+    #
+    # Must be called with the lock held. A value of ``None`` removes the key.
+    #
+    def _apply(self, key: str, value: Optional[str], modified_index: int) -> None:
+        if self._indices.get(key, 0) > modified_index:
+            return
+
+        self._indices[key] = modified_index
+
+        if value is None:
+            self._values.pop(key, None)
+            return
+
+        self._values[key] = value
+
+        for event in self._waiters.pop(key, []):
+            event.set()
+
+    #
+    # Reads the whole directory; done once at start and whenever the watcher
+    # has fallen too far behind the event history of etcd.
+    #
+    def _load(self) -> None:
+        try:
+            result = self._client.get(key=self._prefix)
+        except etcd.EtcdKeyNotFound as exc:
+            nodes = []
+            index = int((getattr(exc, "payload", None) or {}).get("index", 0))
+        else:
+            nodes = [node for node in result.leaves if not node.dir]
+            index = result.etcd_index
+
+        with self._lock:
+            self._values = {node.key: node.value for node in nodes}
+            self._indices = {node.key: node.modifiedIndex for node in nodes}
+
+            self._index = index
+
+            # Let every waiter re-check the keys it waits for.
+            for waiters in self._waiters.values():
+                for event in waiters:
+                    event.set()
+
+            self._waiters.clear()
+
+    @staticmethod
+    def _watch_weak(weak_self) -> None:
+        while True:
+            self = weak_self()
+            if self is None:
+                return
+
+            self._watch_once()
+
+            del self
+
+    def _watch_once(self) -> None:
+        try:
+            result = self._client.watch(
+                key=self._prefix,
+                recursive=True,
+                timeout=self._WATCH_TIMEOUT,
+                index=self._index + 1,
+            )
+        except etcd.EtcdWatchTimedOut:
+            return
+        except etcd.EtcdEventIndexCleared:
+            self._reload()
+            return
+        except etcd.EtcdException as exc:
+            log.warning(
+                f"The watch of the etcd store prefix '{self._prefix}' has failed due to an "
+                f"error of type {type(exc).__name__}; retrying."
+            )
+
+            time.sleep(self._RETRY_DELAY)
+
+            return
+
+        with self._lock:
+            self._index = max(self._index, result.modifiedIndex)
+
+            if result.dir:
+                return
+
+            if result.action in ("delete", "expire", "compareAndDelete"):
+                self._apply(result.key, None, result.modifiedIndex)
+            else:
+                self._apply(result.key, result.value, result.modifiedIndex)
+
+    def _reload(self) -> None:
+        try:
+            self._load()
+        except etcd.EtcdException as exc:
+            log.warning(
+                f"The etcd store prefix '{self._prefix}' could not be reloaded due to an error "
+                f"of type {type(exc).__name__}; retrying."
+            )
+
+            time.sleep(self._RETRY_DELAY)
+
+
 # pyre-fixme[11]: Annotation `Store` is not defined as a type.
 class EtcdStore(Store):
     """
@@ -29,6 +219,9 @@ class EtcdStore(Store):
     instance. This is the store object returned by ``EtcdRendezvous``
     """
 
+    # The maximum number of requests of a ``multi_set`` in flight at once.
+    _MAX_PIPELINED_REQUESTS = 16
+
     def __init__(
         self,
         etcd_client,
@@ -47,12 +240,18 @@ class EtcdStore(Store):
         if not self.prefix.endswith("/"):
             self.prefix += "/"
 
+        # Created on the first read, see _get_mirror.
+        self._mirror: Optional[_EtcdStoreMirror] = None
+        self._mirror_lock = threading.Lock()
+
     def set(self, key, value):
         """
         Write a key/value pair into ``EtcdStore``.
         Both key and value may be either Python ``str`` or ``bytes``.
         """
-        self.client.set(key=self.prefix + self._encode(key), value=self._encode(value))
+        node = self.client.set(key=self.prefix + self._encode(key), value=self._encode(value))
+
+        self._apply_to_mirror(node)
 
     def get(self, key) -> bytes:
         """
@@ -76,6 +275,47 @@ class EtcdStore(Store):
 
         return self._decode(kvs[b64_key])
 
+    def multi_set(self, keys, values) -> None:
+        """
+        Write several key/value pairs into ``EtcdStore``.
+
+        The etcd v2 API has no transactions, so the writes are not atomic;
+        they are issued concurrently over the connection pool of the client
+        instead of one round trip after the other.
+        """
+        if len(keys) != len(values):
+            raise ValueError("The number of keys and values must be equal")
+
+        pairs = [(self.prefix + self._encode(k), self._encode(v)) for k, v in zip(keys, values)]
+
+        def write(pair):
+            return self.client.set(key=pair[0], value=pair[1])
+
+        if len(pairs) <= 1:
+            nodes = [write(pair) for pair in pairs]
+        else:
+            with ThreadPoolExecutor(min(len(pairs), self._MAX_PIPELINED_REQUESTS)) as executor:
+                nodes = list(executor.map(write, pairs))
+
+        for node in nodes:
+            self._apply_to_mirror(node)
+
+    def multi_get(self, keys) -> List[bytes]:
+        """
+        Get the values of several keys, in the order of ``keys``, waiting for
+        at most ``timeout`` until all of them are published.
+
+        Raises:
+            LookupError - If the keys are still not published after timeout
+        """
+        b64_keys = [self.prefix + self._encode(key) for key in keys]
+        kvs = self._try_wait_get(b64_keys)
+
+        if kvs is None:
+            raise LookupError("Timeout while waiting for keys in EtcdStore")
+
+        return [self._decode(kvs[b64_key]) for b64_key in b64_keys]
+
     def add(self, key, num: int) -> int:
         """
         Atomically increment a value by an integer amount. The integer is
@@ -96,6 +336,7 @@ class EtcdStore(Store):
                 value=self._encode(str(num)),  # i.e. 0 + num
                 prevExist=False,
             )
+            self._apply_to_mirror(node)
             return int(self._decode(node.value))
         except etcd.EtcdAlreadyExist:
             pass
@@ -109,6 +350,7 @@ class EtcdStore(Store):
                 node = self.client.test_and_set(
                     key=node.key, value=new_value, prev_value=node.value
                 )
+                self._apply_to_mirror(node)
                 return int(self._decode(node.value))
             except etcd.EtcdCompareFailed:
                 cas_delay()
@@ -133,7 +375,7 @@ class EtcdStore(Store):
         b64_keys = [self.prefix + self._encode(key) for key in keys]
         kvs = self._try_wait_get(
             b64_keys,
-            override_timeout=datetime.timedelta(microseconds=1),  # as if no wait
+            override_timeout=datetime.timedelta(0),  # no wait
         )
         return kvs is not None
 
@@ -170,34 +412,21 @@ class EtcdStore(Store):
     #
     def _try_wait_get(self, b64_keys, override_timeout=None):
         timeout = self.timeout if override_timeout is None else override_timeout  # type: ignore[attr-defined]
-        deadline = time.time() + timeout.total_seconds()
 
-        while True:
-            # Read whole directory (of keys), filter only the ones waited for
-            all_nodes = self.client.get(key=self.prefix)
-            req_nodes = {
-                node.key: node.value for node in all_nodes.children if node.key in b64_keys
-            }
+        return self._get_mirror().try_wait_get(b64_keys, timeout.total_seconds())
 
-            if len(req_nodes) == len(b64_keys):
-                # All keys are available
-                return req_nodes
+    #
+    # The mirror of the store prefix is created on the first read, so that a
+    # store that is only written to does not run a watcher.
+    #
+    def _get_mirror(self) -> _EtcdStoreMirror:
+        with self._mirror_lock:
+            if self._mirror is None:
+                self._mirror = _EtcdStoreMirror(self.client, self.prefix)
 
-            watch_timeout = deadline - time.time()
-            if watch_timeout <= 0:
-                return None
+            return self._mirror
 
-            try:
-                self.client.watch(
-                    key=self.prefix,
-                    recursive=True,
-                    timeout=watch_timeout,
-                    index=all_nodes.etcd_index + 1,
-                )
-            except etcd.EtcdWatchTimedOut:
-                if time.time() >= deadline:
-                    return None
-                else:
-                    continue
-            except etcd.EtcdEventIndexCleared:
-                continue
+    def _apply_to_mirror(self, node) -> None:
+        mirror = self._mirror
+        if mirror is not None:
+            mirror.apply(node)
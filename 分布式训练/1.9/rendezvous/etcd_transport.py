@@ -0,0 +1,294 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import collections
+import socket
+import ssl
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+import etcd  # type: ignore[import]
+import urllib3  # type: ignore[import]
+from urllib3.connection import HTTPConnection  # type: ignore[import]
+
+
+@dataclass
+class EtcdTransportStats:
+    """Holds the statistics of an :py:class:`EtcdTransport`.
+
+    Attributes:
+        requests:
+            The number of short requests, i.e. all but the watches.
+        watches:
+            The number of long-poll watch requests.
+        failed_requests:
+            The number of requests, of either kind, that have raised.
+        new_connections:
+            The number of connections that have been opened.
+        reused_connections:
+            The number of requests that have been sent on a kept-alive
+            connection instead of opening one.
+        request_time:
+            The total time, in seconds, the short requests have taken.
+        max_request_time:
+            The time, in seconds, the slowest short request has taken.
+    """
+
+    requests: int = 0
+    watches: int = 0
+    failed_requests: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+    request_time: float = 0.0
+    max_request_time: float = 0.0
+
+    @property
+    def reuse_rate(self) -> float:
+        """Gets the ratio of the connections taken from a pool that have been
+        reused."""
+        num_connections = self.new_connections + self.reused_connections
+        if num_connections == 0:
+            return 0.0
+        return self.reused_connections / num_connections
+
+    @property
+    def mean_request_time(self) -> float:
+        """Gets the mean time, in seconds, of a short request."""
+        if self.requests == 0:
+            return 0.0
+        return self.request_time / self.requests
+
+
+def _keepalive_socket_options() -> List[Tuple[int, int, int]]:
+    options = list(HTTPConnection.default_socket_options)
+
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+    # Detect a peer that has gone away within about a minute instead of the
+    # two hours of the kernel default, so that a dead connection is not kept
+    # in a pool.
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+
+    return options
+
+
+class EtcdTransport:
+    """
+    The HTTP transport of an :py:class:`PooledEtcdClient`, with a pool of
+    kept-alive connections for short requests and a separate one for the
+    long-poll watches.
+
+    An ``etcd.Client`` sends all of its requests through a single pool of its
+    own, so a watch that blocks for its whole timeout holds one of the pooled
+    connections; with the rendezvous barrier, the store and the lease renewal
+    threads all sharing a client, the connections in use beyond the pool size
+    are closed as they are returned and opened again on the next burst, and a
+    new client, e.g. of a restarted handler, starts without any. Here a watch
+    never takes a connection from the pool of the short requests, and the
+    pools outlive the clients.
+
+    A transport can be shared by any number of clients; see
+    :py:func:`get_etcd_transport`.
+
+    Args:
+        pool_size:
+            The number of connections per etcd host kept alive for short
+            requests.
+        watch_pool_size:
+            The number of connections per etcd host kept alive for watches.
+        cert:
+            The SSL client certificate, or a tuple of the certificate and its
+            key, as for ``etcd.Client``.
+        ca_cert:
+            The root certificate, as for ``etcd.Client``.
+    """
+
+    # The number of latencies kept to compute the percentiles from.
+    _LATENCY_WINDOW = 4096
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        watch_pool_size: int = 10,
+        cert: Optional[Union[str, Tuple[str, str]]] = None,
+        ca_cert: Optional[str] = None,
+    ) -> None:
+        if pool_size <= 0 or watch_pool_size <= 0:
+            raise ValueError("The pool sizes must be positive integers.")
+
+        self._lock = threading.Lock()
+
+        self._stats = EtcdTransportStats()
+
+        self._latencies: Deque[float] = collections.deque(maxlen=self._LATENCY_WINDOW)
+
+        kw: Dict[str, Any] = {"socket_options": _keepalive_socket_options()}
+
+        if cert:
+            if isinstance(cert, tuple):
+                kw["cert_file"], kw["key_file"] = cert
+            else:
+                kw["cert_file"] = cert
+
+        if ca_cert:
+            kw["ca_certs"] = ca_cert
+            kw["cert_reqs"] = ssl.CERT_REQUIRED
+
+        self._request_pools = self._create_pool_manager(pool_size, kw)
+        self._watch_pools = self._create_pool_manager(watch_pool_size, kw)
+
+    @property
+    def stats(self) -> EtcdTransportStats:
+        """Gets a snapshot of the statistics of the transport."""
+        with self._lock:
+            return replace(self._stats)
+
+    def request_time_percentile(self, p: float) -> float:
+        """Gets the ``p``-th percentile, in seconds, of the time of the recent
+        short requests."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        if not latencies:
+            return 0.0
+
+        return latencies[min(int(len(latencies) * p / 100), len(latencies) - 1)]
+
+    def request(self, method: str, url: str, fields=None, **kwargs):
+        is_watch = isinstance(fields, dict) and fields.get("wait") == "true"
+
+        pools = self._watch_pools if is_watch else self._request_pools
+
+        return self._send(is_watch, pools.request, method, url, fields=fields, **kwargs)
+
+    def request_encode_body(self, method: str, url: str, fields=None, **kwargs):
+        return self._send(
+            False, self._request_pools.request_encode_body, method, url, fields=fields, **kwargs
+        )
+
+    def urlopen(self, method: str, url: str, **kwargs):
+        return self._send(False, self._request_pools.urlopen, method, url, **kwargs)
+
+    def clear(self) -> None:
+        """Closes all pooled connections."""
+        self._request_pools.clear()
+        self._watch_pools.clear()
+
+    def _send(self, is_watch: bool, send, *args, **kwargs):
+        start = time.perf_counter()
+
+        try:
+            response = send(*args, **kwargs)
+
+            # A watch only completes once an event arrives; the client reads
+            # its body itself. Read the body of short requests here, so that
+            # their latency includes it.
+            if not is_watch:
+                _ = response.data
+        except BaseException:
+            with self._lock:
+                self._stats.failed_requests += 1
+            raise
+
+        with self._lock:
+            if is_watch:
+                self._stats.watches += 1
+            else:
+                latency = time.perf_counter() - start
+
+                self._stats.requests += 1
+                self._stats.request_time += latency
+                self._stats.max_request_time = max(self._stats.max_request_time, latency)
+
+                self._latencies.append(latency)
+
+        return response
+
+    def _create_pool_manager(self, size: int, kw: Dict[str, Any]) -> urllib3.PoolManager:
+        transport = self
+
+        def count(conn):
+            with transport._lock:
+                if conn.sock is None:
+                    transport._stats.new_connections += 1
+                else:
+                    transport._stats.reused_connections += 1
+            return conn
+
+        class _HTTPConnectionPool(urllib3.HTTPConnectionPool):
+            def _get_conn(self, timeout=None):
+                return count(super()._get_conn(timeout))
+
+        class _HTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+            def _get_conn(self, timeout=None):
+                return count(super()._get_conn(timeout))
+
+        pools = urllib3.PoolManager(num_pools=10, maxsize=size, **kw)
+
+        pools.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+
+        return pools
+
+
+_transports: Dict[Tuple, EtcdTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_etcd_transport(
+    pool_size: int = 10,
+    watch_pool_size: int = 10,
+    cert: Optional[Union[str, Tuple[str, str]]] = None,
+    ca_cert: Optional[str] = None,
+) -> EtcdTransport:
+    """
+    Returns the transport of the process with the specified configuration,
+    creating it on first use, so that the connections it keeps alive are
+    reused by all clients, including those of a restarted handler.
+    """
+    key = (pool_size, watch_pool_size, cert, ca_cert)
+
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = _transports[key] = EtcdTransport(pool_size, watch_pool_size, cert, ca_cert)
+
+    return transport
+
+
+class PooledEtcdClient(etcd.Client):
+    """
+    An ``etcd.Client`` that sends its requests through ``transport`` instead
+    of a connection pool of its own. The remaining arguments are the ones of
+    ``etcd.Client``.
+    """
+
+    def __init__(self, transport: EtcdTransport, *args, **kwargs) -> None:
+        self._transport = transport
+
+        super().__init__(*args, **kwargs)
+
+    @property
+    def transport(self) -> EtcdTransport:
+        return self._transport
+
+    # ``etcd.Client`` creates its pool in its constructor and sends its first
+    # request right after; route both through the transport.
+    @property
+    def http(self) -> EtcdTransport:
+        return self._transport
+
+    @http.setter
+    def http(self, value) -> None:
+        pass
+
+    def __del__(self) -> None:
+        # Unlike ``etcd.Client``, do not close the connections on collection;
+        # they belong to the transport and are reused by the next client.
+        pass
@@ -37,10 +37,19 @@ def _create_c10d_handler(params: RendezvousParameters) -> RendezvousHandler:
     return create_handler(store, backend, params)
 
 
+def _create_shm_handler(params: RendezvousParameters) -> RendezvousHandler:
+    from .c10d_rendezvous_backend import create_shm_backend
+
+    backend, store = create_shm_backend(params)
+
+    return create_handler(store, backend, params)
+
+
 def _register_default_handlers() -> None:
     handler_registry.register("etcd", _create_etcd_handler)
     handler_registry.register("etcd-v2", _create_etcd_v2_handler)
     handler_registry.register("c10d", _create_c10d_handler)
+    handler_registry.register("shm", _create_shm_handler)
     handler_registry.register("static", _create_static_handler)
 
 
@@ -0,0 +1,485 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import ctypes
+import datetime
+import fcntl
+import mmap
+import os
+import platform
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# pyre-ignore[21]: Could not find name `Store` in `torch.distributed`.
+from torch.distributed import Store
+
+
+# The futex syscall numbers of the architectures the wakeups are supported
+# on; elsewhere waiters poll.
+_SYS_FUTEX = {"x86_64": 202, "aarch64": 98}.get(platform.machine())
+
+_FUTEX_WAIT = 0
+_FUTEX_WAKE = 1
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def _load_libc():
+    if _SYS_FUTEX is None or not platform.system() == "Linux":
+        return None
+
+    try:
+        return ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return None
+
+
+_libc = _load_libc()
+
+
+# pyre-fixme[11]: Annotation `Store` is not defined as a type.
+class SharedMemoryStore(Store):
+    """
+    Implements a c10 Store interface on top of a memory-mapped file that any
+    process on the host can open, e.g. one under ``/dev/shm``. It lets the
+    agents of a single-host run meet without a TCP server or etcd.
+
+    The file holds a header and an append-only log of key/value records,
+    which every process indexes incrementally. Operations are serialized with
+    an exclusive ``flock`` on the file; waiters block on a futex on the
+    generation word of the header, which every write increments, and are
+    woken up by the writer. When the log is full it is compacted in place.
+
+    Like the key space of etcd, the file outlives the processes; a path must
+    not be reused by an unrelated run while it exists. :py:meth:`unlink`
+    removes it once the run is over.
+    """
+
+    _MAGIC = b"TESHM001"
+
+    # magic, generation (the futex word), epoch (incremented by compactions),
+    # end of the log
+    _HEADER = struct.Struct("<8sIIQ")
+    _GENERATION_OFFSET = 8
+
+    _DATA_OFFSET = 64
+
+    # key length, value length (-1 for a deleted key)
+    _RECORD = struct.Struct("<Ii")
+
+    # How long a waiter sleeps between checks where futexes are unavailable.
+    _POLL_INTERVAL = 0.001
+
+    def __init__(
+        self,
+        path: str,
+        size: int = 64 * 1024 * 1024,
+        # Default timeout same as in c10d/Store.hpp
+        timeout: Optional[datetime.timedelta] = None,
+    ):
+        super().__init__()  # required for pybind trampoline.
+
+        self.path = path
+
+        if timeout is not None:
+            self.set_timeout(timeout)
+
+        # flock is held per open file; the threads of this process take this
+        # lock first.
+        self._thread_lock = threading.Lock()
+
+        while True:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+            # The file might have been unlinked between the open and the lock;
+            # a store opened then has to use the file that replaces it.
+            with self._file_lock():
+                if self._is_linked():
+                    self._map(size)
+                    break
+
+            os.close(self._fd)
+
+        self._generation = ctypes.c_uint32.from_buffer(self._mm, self._GENERATION_OFFSET)
+
+        # key -> (offset, length) of the value in the log
+        self._index: Dict[bytes, Tuple[int, int]] = {}
+        self._indexed_epoch = 0
+        self._indexed_end = self._DATA_OFFSET
+
+    def __del__(self):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Unmaps the file. The keys stay in the file.
+        """
+        if getattr(self, "_fd", None) is None:
+            return
+
+        self._generation = None  # releases the export of the mmap buffer
+
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+
+        os.close(self._fd)
+        self._fd = None
+
+    def unlink(self) -> bool:
+        """
+        Removes the file from its path, so that the next store opened at the
+        path starts empty. The processes that have the file open keep using
+        it until they close it.
+
+        Returns:
+            ``True`` if the file has been removed, ``False`` if it had already
+            been removed or replaced by another file.
+        """
+        with self._file_lock():
+            if not self._is_linked():
+                return False
+
+            os.unlink(self.path)
+
+            return True
+
+    def set(self, key, value) -> None:
+        """
+        Write a key/value pair into ``SharedMemoryStore``.
+        Both key and value may be either Python ``str`` or ``bytes``.
+        """
+        with self._locked():
+            self._append(self._to_bytes(key), self._to_bytes(value))
+
+        self._wake()
+
+    def get(self, key) -> bytes:
+        """
+        Get a value by key, possibly doing a blocking wait.
+
+        If key is not immediately present, will do a blocking wait
+        for at most ``timeout`` duration or until the key is published.
+
+        Returns:
+            value ``(bytes)``
+
+        Raises:
+            RuntimeError - If key still not published after timeout
+        """
+        b_key = self._to_bytes(key)
+
+        return self._wait_get([b_key], self.timeout)[0]  # type: ignore[attr-defined]
+
+    def add(self, key, num: int) -> int:
+        """
+        Atomically increment a value by an integer amount. The integer is
+        represented as a string using base 10. If key is not present,
+        a default value of ``0`` will be assumed.
+
+        Returns:
+             the new (incremented) value
+        """
+        b_key = self._to_bytes(key)
+
+        with self._locked():
+            value = self._read(b_key)
+
+            new_value = (0 if value is None else int(value)) + num
+
+            self._append(b_key, str(new_value).encode())
+
+        self._wake()
+
+        return new_value
+
+    def compare_set(self, key, expected_value, desired_value) -> bytes:
+        """
+        Atomically sets ``key`` to ``desired_value`` if its value is
+        ``expected_value``, with the semantics of ``TCPStore``: a missing key
+        is only created if ``expected_value`` is empty, and otherwise
+        ``expected_value`` is returned.
+
+        Returns:
+            the value of the key after the operation
+        """
+        b_key = self._to_bytes(key)
+        expected = self._to_bytes(expected_value)
+        desired = self._to_bytes(desired_value)
+
+        with self._locked():
+            value = self._read(b_key)
+
+            if value is None and expected:
+                return expected
+
+            if value is not None and value != expected:
+                return value
+
+            self._append(b_key, desired)
+
+        self._wake()
+
+        return desired
+
+    def wait(self, keys, override_timeout: Optional[datetime.timedelta] = None) -> None:
+        """
+        Waits until all of the keys are published, or until timeout.
+
+        Raises:
+            RuntimeError - if timeout occurs
+        """
+        timeout = self.timeout if override_timeout is None else override_timeout  # type: ignore[attr-defined]
+
+        self._wait_get([self._to_bytes(key) for key in keys], timeout)
+
+    def check(self, keys) -> bool:
+        """
+        Check if all of the keys are immediately present (without waiting).
+        """
+        with self._locked():
+            return all(self._to_bytes(key) in self._index for key in keys)
+
+    def delete_key(self, key) -> bool:
+        """
+        Deletes ``key``.
+
+        Returns:
+            whether the key was present
+        """
+        b_key = self._to_bytes(key)
+
+        with self._locked():
+            if b_key not in self._index:
+                return False
+
+            self._append(b_key, None)
+
+        return True
+
+    def num_keys(self) -> int:
+        """
+        Returns the number of keys in the store.
+        """
+        with self._locked():
+            return len(self._index)
+
+    #
+    # Waits until all keys are present and returns their values. The
+    # generation word is read under the lock, so a write made after the check
+    # changes it and the futex wait returns right away.
+    #
+    def _wait_get(self, keys: List[bytes], timeout: datetime.timedelta) -> List[bytes]:
+        deadline = time.monotonic() + timeout.total_seconds()
+
+        while True:
+            with self._locked():
+                values = [self._read(key) for key in keys]
+                if all(value is not None for value in values):
+                    return values  # type: ignore[return-value]
+
+                generation = self._generation.value  # type: ignore[union-attr]
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("Wait timeout")
+
+            self._sleep(generation, remaining)
+
+    def _sleep(self, generation: int, timeout: float) -> None:
+        if _libc is None:
+            time.sleep(min(timeout, self._POLL_INTERVAL))
+            return
+
+        ts = _Timespec(int(timeout), int((timeout % 1) * 1e9))
+
+        _libc.syscall(
+            _SYS_FUTEX,
+            ctypes.byref(self._generation),
+            _FUTEX_WAIT,
+            ctypes.c_uint32(generation),
+            ctypes.byref(ts),
+            None,
+            0,
+        )
+
+    def _wake(self) -> None:
+        if _libc is not None:
+            _libc.syscall(
+                _SYS_FUTEX, ctypes.byref(self._generation), _FUTEX_WAKE, 0x7FFFFFFF, None, None, 0
+            )
+
+    # Must be called with the lock held.
+    def _map(self, size: int) -> None:
+        # The first process to open the file decides its size.
+        if os.fstat(self._fd).st_size < self._DATA_OFFSET:
+            os.ftruncate(self._fd, max(size, self._DATA_OFFSET * 2))
+
+            self._size = os.fstat(self._fd).st_size
+
+            self._mm = mmap.mmap(self._fd, self._size)
+            self._HEADER.pack_into(self._mm, 0, self._MAGIC, 0, 0, self._DATA_OFFSET)
+        else:
+            self._size = os.fstat(self._fd).st_size
+
+            self._mm = mmap.mmap(self._fd, self._size)
+            if self._mm[: len(self._MAGIC)] != self._MAGIC:
+                raise ValueError(f"The file '{self.path}' is not a shared memory store.")
+
+    # Must be called with the lock held.
+    def _is_linked(self) -> bool:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        fst = os.fstat(self._fd)
+
+        return (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    #
+    # Takes the lock of the file and brings the index up to date with the
+    # records appended by other processes since the last operation.
+    #
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._file_lock():
+            _, _, epoch, end = self._HEADER.unpack_from(self._mm, 0)
+
+            if epoch != self._indexed_epoch:
+                self._index = {}
+                self._indexed_epoch = epoch
+                self._indexed_end = self._DATA_OFFSET
+
+            self._index_records(end)
+
+            yield
+
+    # Must be called with the lock held.
+    def _index_records(self, end: int) -> None:
+        offset = self._indexed_end
+
+        while offset < end:
+            key_len, value_len = self._RECORD.unpack_from(self._mm, offset)
+
+            key_offset = offset + self._RECORD.size
+            value_offset = key_offset + key_len
+
+            key = self._mm[key_offset:value_offset]
+
+            if value_len < 0:
+                self._index.pop(key, None)
+                value_len = 0
+            else:
+                self._index[key] = (value_offset, value_len)
+
+            offset = value_offset + value_len
+
+        self._indexed_end = end
+
+    # Must be called with the lock held.
+    def _read(self, key: bytes) -> Optional[bytes]:
+        location = self._index.get(key)
+        if location is None:
+            return None
+
+        offset, length = location
+
+        return self._mm[offset : offset + length]
+
+    #
+    # Must be called with the lock held. A value of ``None`` deletes the key.
+    # The end of the log is only moved once the record is complete.
+    #
+    def _append(self, key: bytes, value: Optional[bytes]) -> None:
+        record_size = self._RECORD.size + len(key) + (0 if value is None else len(value))
+
+        if self._indexed_end + record_size > self._size:
+            self._compact()
+
+            if self._indexed_end + record_size > self._size:
+                raise RuntimeError(f"The shared memory store '{self.path}' is full.")
+
+        offset = self._indexed_end
+
+        self._RECORD.pack_into(self._mm, offset, len(key), -1 if value is None else len(value))
+
+        key_offset = offset + self._RECORD.size
+        value_offset = key_offset + len(key)
+
+        self._mm[key_offset:value_offset] = key
+
+        if value is None:
+            self._index.pop(key, None)
+            end = value_offset
+        else:
+            self._mm[value_offset : value_offset + len(value)] = value
+            self._index[key] = (value_offset, len(value))
+            end = value_offset + len(value)
+
+        _, generation, epoch, _ = self._HEADER.unpack_from(self._mm, 0)
+
+        self._HEADER.pack_into(
+            self._mm, 0, self._MAGIC, (generation + 1) & 0xFFFFFFFF, epoch, end
+        )
+
+        self._indexed_end = end
+
+    #
+    # Must be called with the lock held. Rewrites the log with only the
+    # current value of each key and bumps the epoch, so that the other
+    # processes rebuild their index.
+    #
+    def _compact(self) -> None:
+        live = [(key, self._read(key)) for key in self._index]
+
+        _, generation, epoch, _ = self._HEADER.unpack_from(self._mm, 0)
+
+        self._index = {}
+        self._indexed_end = self._DATA_OFFSET
+
+        offset = self._DATA_OFFSET
+        for key, value in live:
+            self._RECORD.pack_into(self._mm, offset, len(key), len(value))  # type: ignore[arg-type]
+
+            key_offset = offset + self._RECORD.size
+            value_offset = key_offset + len(key)
+
+            self._mm[key_offset:value_offset] = key
+            self._mm[value_offset : value_offset + len(value)] = value  # type: ignore[arg-type]
+
+            self._index[key] = (value_offset, len(value))  # type: ignore[arg-type]
+
+            offset = value_offset + len(value)  # type: ignore[arg-type]
+
+        self._indexed_epoch = (epoch + 1) & 0xFFFFFFFF
+        self._indexed_end = offset
+
+        self._HEADER.pack_into(
+            self._mm, 0, self._MAGIC, generation, self._indexed_epoch, offset
+        )
+
+    @staticmethod
+    def _to_bytes(value) -> bytes:
+        if type(value) == bytes:
+            return value
+        elif type(value) == str:
+            return value.encode()
+        raise ValueError("Value must be of type str or bytes")
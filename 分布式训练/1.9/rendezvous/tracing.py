@@ -0,0 +1,250 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Records the entry and exit of the rendezvous and agent functions decorated with
+:py:func:`traced` into an in-memory ring buffer that can be exported in the
+Chrome trace event format (``chrome://tracing`` or https://ui.perfetto.dev).
+记录被 ``traced`` 装饰的函数的调用及其耗时，可以导出为Chrome trace格式。
+
+Tracing is off by default, and then :py:func:`traced` returns the functions
+unchanged, so it costs nothing. It is switched on by setting the
+``TORCHELASTIC_TRACE`` environment variable to ``1`` before the process
+starts, which makes :py:func:`traced` wrap the functions as their modules get
+imported. :py:func:`disable` and :py:func:`enable` then pause and resume the
+recording, e.g. to trace a single rendezvous.
+追踪默认关闭，此时 ``traced`` 直接返回原函数，没有任何开销；需要在进程启动前设置环境变量。
+
+::
+
+    from torch.distributed.elastic.rendezvous import tracing
+
+    tracing.clear()
+    tracing.enable()
+    ...
+    tracing.export_chrome_trace("/tmp/rdzv_trace.json")
+
+The following environment variables are read at import time:
+
++--------------------------------+---------------------------------------------+
+| ``TORCHELASTIC_TRACE``         | ``1`` to enable tracing.                    |
++--------------------------------+---------------------------------------------+
+| ``TORCHELASTIC_TRACE_BUFFER``  | The number of calls kept in the ring buffer.|
+|                                | Defaults to 65536.                          |
++--------------------------------+---------------------------------------------+
+| ``TORCHELASTIC_TRACE_FILE``    | A file to which the trace is exported when  |
+|                                | the process exits.                          |
++--------------------------------+---------------------------------------------+
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import IO, Any, Callable, Deque, Dict, List, Optional, Tuple, TypeVar, Union, cast
+
+__all__ = [
+    "traced",
+    "enable",
+    "disable",
+    "is_enabled",
+    "clear",
+    "get_trace_events",
+    "export_chrome_trace",
+]
+
+_DEFAULT_BUFFER_SIZE = 65536
+
+# name, category, thread id, start time in ns, duration in ns
+_Record = Tuple[str, str, int, int, int]
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+
+def _is_requested() -> bool:
+    return os.environ.get("TORCHELASTIC_TRACE", "0").lower() in ("1", "true", "yes", "on")
+
+
+# 只在导入时请求了追踪的情况下才包装函数。
+# Whether the functions get wrapped at all; decided once, at import time.
+_requested: bool = _is_requested()
+
+# 这两个模块级变量在每次调用被包装的函数时都会被读取，因此不封装成对象以节省一次属性查找。
+# Both are read on every call of a wrapped function; they are kept as module
+# globals to save an attribute lookup.
+_enabled: bool = False
+
+# ``deque.append`` is atomic, so the buffer can be written to by any thread
+# without a lock; the oldest calls are dropped once it is full.
+_buffer: Deque[_Record] = deque(maxlen=_DEFAULT_BUFFER_SIZE)
+
+
+def traced(fn: _F) -> _F:
+    """Records the calls of ``fn`` while tracing is enabled.
+    被装饰的函数在追踪开启时记录每次调用的开始时间和耗时。
+
+    Unless tracing has been requested through ``TORCHELASTIC_TRACE`` when
+    this module was imported, ``fn`` is returned as it is. Otherwise the
+    qualified name of ``fn`` and its module are resolved once here, so unlike
+    logging them on entry nothing is formatted per call.
+    """
+    if not _requested:
+        return fn
+
+    name = fn.__qualname__
+    category = fn.__module__
+
+    if inspect.iscoroutinefunction(fn):
+        # 协程的耗时包括它被挂起的时间。
+        # The duration of a coroutine includes the time it was suspended.
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if not _enabled:
+                return await fn(*args, **kwargs)
+
+            start = time.perf_counter_ns()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _buffer.append(
+                    (name, category, threading.get_ident(), start, time.perf_counter_ns() - start)
+                )
+
+        return cast(_F, async_wrapper)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+
+        start = time.perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _buffer.append(
+                (name, category, threading.get_ident(), start, time.perf_counter_ns() - start)
+            )
+
+    return cast(_F, wrapper)
+
+
+def enable(buffer_size: Optional[int] = None) -> None:
+    """Enables tracing.
+
+    Only the calls of the functions wrapped by :py:func:`traced` are
+    recorded, i.e. nothing unless ``TORCHELASTIC_TRACE`` was set when the
+    process started.
+
+    Args:
+        buffer_size:
+            The number of calls to keep. If specified and different from the
+            current size, the buffer is recreated and its records are lost.
+    """
+    global _enabled, _buffer
+
+    if buffer_size is not None and buffer_size != _buffer.maxlen:
+        if buffer_size < 1:
+            raise ValueError(f"The buffer size ({buffer_size}) must be positive.")
+
+        _buffer = deque(maxlen=buffer_size)
+
+    _enabled = True
+
+
+def disable() -> None:
+    """Disables tracing. The records in the buffer are kept."""
+    global _enabled
+
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    """Indicates whether tracing is enabled."""
+    return _enabled
+
+
+def clear() -> None:
+    """Discards all records in the buffer."""
+    _buffer.clear()
+
+
+def get_trace_events() -> List[Dict[str, Any]]:
+    """Returns the records in the buffer as Chrome trace events.
+
+    Each call is a complete (``"ph": "X"``) event with its timestamp and
+    duration in microseconds; the names of the threads that are still alive
+    are added as metadata events.
+    """
+    pid = os.getpid()
+
+    records = list(_buffer)
+
+    events: List[Dict[str, Any]] = []
+
+    thread_names = {t.ident: t.name for t in threading.enumerate()}
+    for tid in sorted({record[2] for record in records}):
+        if tid in thread_names:
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": thread_names[tid]},
+                }
+            )
+
+    for name, category, tid, start, duration in records:
+        events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+            }
+        )
+
+    return events
+
+
+def export_chrome_trace(file: Union[str, IO[str]]) -> None:
+    """Writes the records in the buffer to ``file`` in the Chrome trace event
+    format.
+
+    Args:
+        file:
+            A path or a text file object.
+    """
+    trace = {"traceEvents": get_trace_events(), "displayTimeUnit": "ms"}
+
+    if isinstance(file, str):
+        with open(file, "w") as f:
+            json.dump(trace, f)
+    else:
+        json.dump(trace, file)
+
+
+def _init_from_env() -> None:
+    if not _requested:
+        return
+
+    buffer_size = os.environ.get("TORCHELASTIC_TRACE_BUFFER")
+
+    enable(int(buffer_size) if buffer_size else None)
+
+    trace_file = os.environ.get("TORCHELASTIC_TRACE_FILE")
+    if trace_file:
+        atexit.register(export_chrome_trace, trace_file)
+
+
+_init_from_env()
@@ -0,0 +1,61 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+from unittest import TestCase
+
+from torch.distributed import HashStore
+from torch.distributed.elastic.rendezvous.c10d_rendezvous_backend import C10dRendezvousBackend
+
+
+class C10dRendezvousBackendTest(TestCase):
+    def setUp(self) -> None:
+        self._store = HashStore()
+
+        self._backend = C10dRendezvousBackend(self._store, "dummy_run_id")
+
+    def test_get_state_returns_none_if_no_state_is_set(self) -> None:
+        self.assertIsNone(self._backend.get_state())
+
+    def test_set_state_fails_if_token_is_stale(self) -> None:
+        _, token1, _ = self._backend.set_state(b"state1")  # type: ignore[misc]
+        _, token2, _ = self._backend.set_state(b"state2", token1)  # type: ignore[misc]
+
+        state, token, has_set = self._backend.set_state(b"state3", token1)  # type: ignore[misc]
+
+        self.assertFalse(has_set)
+        self.assertEqual(state, b"state2")
+        self.assertEqual(token, token2)
+
+        # The write must not succeed even though the state of token1 has been
+        # replaced by a tombstone in the meantime.
+        _, token3, _ = self._backend.set_state(b"state3", token2)  # type: ignore[misc]
+
+        self.assertFalse(self._backend.set_state(b"state4", token1)[2])  # type: ignore[index]
+        self.assertFalse(self._backend.set_state(b"state4", token2)[2])  # type: ignore[index]
+
+        self.assertEqual(self._backend.get_state(), (b"state3", token3))
+
+    def test_get_state_of_new_backend_returns_latest_state(self) -> None:
+        token = None
+        for i in range(20):
+            _, token, has_set = self._backend.set_state(f"state{i}".encode(), token)  # type: ignore[misc]
+
+            self.assertTrue(has_set)
+
+        backend = C10dRendezvousBackend(self._store, "dummy_run_id")
+
+        self.assertEqual(backend.get_state(), (b"state19", token))
+
+    def test_get_state_returns_state_written_by_another_backend(self) -> None:
+        backend = C10dRendezvousBackend(self._store, "dummy_run_id")
+
+        _, token, _ = self._backend.set_state(b"state1")  # type: ignore[misc]
+
+        self.assertEqual(backend.get_state(), (b"state1", token))
+
+        _, token, _ = self._backend.set_state(b"state2", token)  # type: ignore[misc]
+
+        self.assertEqual(backend.get_state(), (b"state2", token))
@@ -0,0 +1,228 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from unittest import TestCase
+
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import (
+    RendezvousBackend,
+    RendezvousSettings,
+    RendezvousTimeout,
+    Token,
+    _BackendRendezvousStateHolder,
+    _DistributedRendezvousOpExecutor,
+    _NodeDesc,
+    _RendezvousJoinOp,
+    _RendezvousState,
+    _RendezvousStateCache,
+    _RendezvousStateCodec,
+)
+
+
+class FakeRendezvousBackend(RendezvousBackend):
+    _state: Optional[bytes]
+    _token: int
+
+    def __init__(self) -> None:
+        self._state = None
+        self._token = 0
+
+    @property
+    def name(self) -> str:
+        return "fake_backend"
+
+    def get_state(self) -> Optional[Tuple[bytes, Token]]:
+        if self._token == 0:
+            return None
+
+        return self._state, self._token  # type: ignore[return-value]
+
+    def set_state(
+        self, state: bytes, token: Optional[Token] = None
+    ) -> Optional[Tuple[bytes, Token, bool]]:
+        if token is None:
+            token = 0
+
+        if token == self._token:
+            self._state = state
+            self._token += 1
+
+            has_set = True
+        else:
+            has_set = False
+
+        return self._state, self._token, has_set  # type: ignore[return-value]
+
+
+class BackendRendezvousStateHolderTest(TestCase):
+    def setUp(self) -> None:
+        self._backend = FakeRendezvousBackend()
+
+        self._settings = RendezvousSettings(
+            run_id="dummy_run_id",
+            min_nodes=1,
+            max_nodes=2,
+            timeout=RendezvousTimeout(),
+            keep_alive_interval=timedelta(seconds=30),
+            keep_alive_max_attempt=3,
+        )
+
+        self._alive_node = _NodeDesc("dummy1", 1, 1)
+        self._dead_node = _NodeDesc("dummy2", 1, 1)
+
+        self._now = datetime.utcnow()
+        self._expired = self._now - timedelta(seconds=600)
+
+    def _create_state_holder(self) -> _BackendRendezvousStateHolder:
+        return _BackendRendezvousStateHolder(
+            self._backend, self._settings, state_cache=_RendezvousStateCache()
+        )
+
+    def _set_state(self, state: _RendezvousState) -> None:
+        self._backend.set_state(_RendezvousStateCodec().encode(state))
+
+    def test_sync_moves_to_next_round_if_last_participant_is_dead(self) -> None:
+        state = _RendezvousState()
+        state.round = 3
+        state.complete = True
+        state.participants[self._dead_node] = 0
+        state.last_heartbeats[self._dead_node] = self._expired
+        # The other node has already left the round and waits for the next one.
+        state.wait_list.add(self._alive_node)
+        state.last_heartbeats[self._alive_node] = self._now
+
+        self._set_state(state)
+
+        state_holder = self._create_state_holder()
+
+        state_holder.sync()
+
+        self.assertEqual(state_holder.state.participants, {})
+        self.assertFalse(state_holder.state.complete)
+        self.assertEqual(state_holder.state.round, 4)
+        self.assertEqual(state_holder.state.wait_list, {self._alive_node})
+
+    def test_sync_keeps_round_if_participants_are_left(self) -> None:
+        state = _RendezvousState()
+        state.round = 3
+        state.complete = True
+        state.participants[self._alive_node] = 0
+        state.participants[self._dead_node] = 1
+        state.last_heartbeats[self._alive_node] = self._now
+        state.last_heartbeats[self._dead_node] = self._expired
+
+        self._set_state(state)
+
+        state_holder = self._create_state_holder()
+
+        state_holder.sync()
+
+        self.assertEqual(state_holder.state.participants, {self._alive_node: 0})
+        self.assertTrue(state_holder.state.complete)
+        self.assertEqual(state_holder.state.round, 3)
+
+    def test_sync_resets_deadline_if_participants_drop_below_min_nodes(self) -> None:
+        state = _RendezvousState()
+        state.deadline = self._now + timedelta(seconds=30)
+        state.participants[self._dead_node] = 0
+        state.last_heartbeats[self._dead_node] = self._expired
+
+        self._set_state(state)
+
+        state_holder = self._create_state_holder()
+
+        state_holder.sync()
+
+        self.assertEqual(state_holder.state.participants, {})
+        self.assertIsNone(state_holder.state.deadline)
+
+
+class RendezvousStateCodecTest(TestCase):
+    def setUp(self) -> None:
+        self._node1 = _NodeDesc("dummy1", 1, 1)
+        self._node2 = _NodeDesc("dummy2", 1, 1)
+
+        self._state = _RendezvousState()
+        self._state.round = 2
+        self._state.participants[self._node1] = 0
+        self._state.last_heartbeats[self._node1] = datetime(2000, 1, 1)
+        self._state.last_participants = {self._node1, self._node2}
+
+    def test_decode_restores_last_participants(self) -> None:
+        codec = _RendezvousStateCodec()
+
+        state = codec.decode(codec.encode(self._state))
+
+        self.assertEqual(state.participants, {self._node1: 0})
+        self.assertEqual(state.last_heartbeats, {self._node1: datetime(2000, 1, 1)})
+        self.assertEqual(state.last_participants, {self._node1, self._node2})
+
+    def test_decode_reads_version_1(self) -> None:
+        self._state.last_participants = set()
+
+        state_bits = _RendezvousStateCodec().encode(self._state)
+
+        # Strip the count of the last participants to get the version 1 encoding.
+        header = _RendezvousStateCodec._HEADER.unpack_from(state_bits)
+        state_bits = (
+            _RendezvousStateCodec._HEADER_V1.pack(header[0], 1, *header[2:-1])
+            + state_bits[_RendezvousStateCodec._HEADER.size :]
+        )
+
+        state = _RendezvousStateCodec().decode(state_bits)
+
+        self.assertEqual(state.round, 2)
+        self.assertEqual(state.participants, {self._node1: 0})
+        self.assertEqual(state.last_participants, set())
+
+
+class DistributedRendezvousOpExecutorTest(TestCase):
+    def setUp(self) -> None:
+        self._backend = FakeRendezvousBackend()
+
+        self._settings = RendezvousSettings(
+            run_id="dummy_run_id",
+            min_nodes=1,
+            max_nodes=3,
+            timeout=RendezvousTimeout(last_call=timedelta(seconds=60)),
+            keep_alive_interval=timedelta(seconds=5),
+            keep_alive_max_attempt=3,
+        )
+
+        self._node1 = _NodeDesc("dummy1", 1, 1)
+        self._node2 = _NodeDesc("dummy2", 1, 1)
+
+    def _join(self, node: _NodeDesc) -> None:
+        state_holder = _BackendRendezvousStateHolder(
+            self._backend, self._settings, state_cache=_RendezvousStateCache()
+        )
+
+        executor = _DistributedRendezvousOpExecutor(node, state_holder, self._settings)
+
+        executor.run(_RendezvousJoinOp(), time.monotonic() + 10)
+
+    def test_run_completes_without_last_call_if_last_participants_rejoin(self) -> None:
+        state = _RendezvousState()
+        state.round = 1
+        state.last_participants = {self._node1, self._node2}
+
+        self._backend.set_state(_RendezvousStateCodec().encode(state))
+
+        threads = [threading.Thread(target=self._join, args=(n,)) for n in state.last_participants]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        state_bits, _ = self._backend.get_state()  # type: ignore[misc]
+
+        state = _RendezvousStateCodec().decode(state_bits)
+
+        self.assertTrue(state.complete)
+        self.assertEqual(state.participants, {self._node1: 0, self._node2: 1})
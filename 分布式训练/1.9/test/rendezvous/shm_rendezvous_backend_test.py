@@ -0,0 +1,87 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+from unittest import TestCase
+
+from torch.distributed.elastic.rendezvous import RendezvousParameters
+from torch.distributed.elastic.rendezvous.c10d_rendezvous_backend import create_shm_backend
+from torch.distributed.elastic.rendezvous.dynamic_rendezvous import create_handler
+from torch.distributed.elastic.rendezvous.shm_store import SharedMemoryStore
+
+
+class SharedMemoryStoreTest(TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+
+        self._path = os.path.join(self._dir.name, "store")
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_unlink_leaves_open_store_and_empties_next_store(self) -> None:
+        store1 = SharedMemoryStore(self._path, size=4096)
+        store1.set("key", "value1")
+
+        self.assertTrue(store1.unlink())
+        self.assertFalse(os.path.exists(self._path))
+
+        store2 = SharedMemoryStore(self._path, size=4096)
+
+        self.assertFalse(store2.check(["key"]))
+
+        store2.set("key", "value2")
+
+        self.assertEqual(store1.get("key"), b"value1")
+
+        # The path now belongs to the second store.
+        self.assertFalse(store1.unlink())
+        self.assertTrue(os.path.exists(self._path))
+
+        store1.close()
+        store2.close()
+
+
+class SharedMemoryRendezvousBackendTest(TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+
+        self._path = os.path.join(self._dir.name, "torch.rendezvous.dummy_run_id")
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _run_rendezvous(self) -> None:
+        params = RendezvousParameters(
+            backend="shm",
+            endpoint="",
+            run_id="dummy_run_id",
+            min_nodes=1,
+            max_nodes=1,
+            shm_path=self._path,
+            shm_size=1024 * 1024,
+            last_call_timeout=1,
+        )
+
+        backend, store = create_shm_backend(params)
+
+        handler = create_handler(store, backend, params)
+
+        _, rank, world_size = handler.next_rendezvous()
+
+        self.assertEqual((rank, world_size), (0, 1))
+
+        self.assertTrue(handler.shutdown())
+
+        self.assertTrue(handler.is_closed())
+
+    def test_consecutive_runs_with_same_run_id_do_not_share_state(self) -> None:
+        self._run_rendezvous()
+
+        self.assertFalse(os.path.exists(self._path))
+
+        self._run_rendezvous()